@@ -0,0 +1,125 @@
+"""
+Всплеск нагрузки с ограничением одновременных запросов и без него
+(AdmissionMiddleware, см. src/menu_app/admission.py).
+
+Запускается gunicorn с одним рабочим процессом, и много соединений
+одновременно запрашивают статистику цен меню: она не кешируется
+и каждый раз читается из базы через пул соединений. Клиент, получивший
+503, повторяет запрос через паузу. Для каждой настройки выводятся
+успешные ответы в секунду, p50 и p99 их времени и доля отказов.
+
+Запуск из корня проекта (нужны PostgreSQL с данными каталога и Redis):
+    PYTHONPATH=.:src python -m benchmarks.admission --connections 256
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import select
+
+from benchmarks.workers import HOST, content_length, prefix, start_server
+from database import AsyncSession
+from models.models import Menu
+
+# Название и переменные окружения сервера
+SETTINGS = (
+    ('без ограничения', {'ADMISSION_READ_LIMIT': '0'}),
+    ('ограничение 8', {
+        'ADMISSION_READ_LIMIT': '8', 'ADMISSION_QUEUE_SIZE': '16'
+    }),
+    ('подстройка до 64', {
+        'ADMISSION_READ_LIMIT': '64', 'ADMISSION_QUEUE_SIZE': '16',
+        'ADMISSION_TARGET_LATENCY': '0.2',
+    }),
+)
+
+
+async def client(
+    port: int,
+    requests: list[bytes],
+    deadline: float,
+    retry_delay: float,
+    timings: list[float],
+    statuses: dict[int, int]
+) -> None:
+    reader, writer = await asyncio.open_connection(HOST, port)
+    index = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        writer.write(requests[index % len(requests)])
+        head = await reader.readuntil(b'\r\n\r\n')
+        await reader.readexactly(content_length(head))
+        status = int(head[9:12])
+        statuses[status] = statuses.get(status, 0) + 1
+        index += 1
+        if status == 200:
+            timings.append((time.perf_counter() - started) * 1e3)
+        else:
+            await asyncio.sleep(retry_delay)
+    writer.close()
+
+
+async def load(
+    port: int,
+    urls: list[str],
+    connections: int,
+    duration: float,
+    retry_delay: float
+) -> tuple[list[float], dict[int, int]]:
+    timings: list[float] = []
+    statuses: dict[int, int] = {}
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(
+        client(
+            port,
+            [
+                f'GET {url} HTTP/1.1\r\nHost: bench\r\n\r\n'.encode()
+                for url in urls[number:] + urls[:number]
+            ],
+            deadline, retry_delay, timings, statuses
+        )
+        for number in range(connections)
+    ))
+    return timings, statuses
+
+
+async def get_urls(count: int) -> list[str]:
+    async with AsyncSession() as session:
+        menu_ids = (await session.execute(
+            select(Menu.id).
+            where(Menu.deleted_at.is_(None)).
+            order_by(Menu.id).
+            limit(count)
+        )).scalars().all()
+    return [f'{prefix}/{menu_id}/price-stats' for menu_id in menu_ids]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=256)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--retry-delay', type=float, default=1)
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+    urls = asyncio.run(get_urls(10))
+    print(f'соединений: {args.connections}')
+    for name, env in SETTINGS:
+        server = start_server(1, args.port, env)
+        try:
+            timings, statuses = asyncio.run(load(
+                args.port, urls, args.connections, args.duration,
+                args.retry_delay
+            ))
+        finally:
+            server.terminate()
+            server.wait()
+        percentiles = statistics.quantiles(timings, n=100)
+        total = sum(statuses.values())
+        print(f'{name:17}: {len(timings) / args.duration:6.0f} ответов/с, '
+              f'p50 {percentiles[49]:7.1f} мс, p99 {percentiles[98]:7.1f} мс, '
+              f'503: {statuses.get(503, 0) / total:4.0%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Списки меню и подменю с количеством подменю и блюд: подсчет запросом
+с группировкой при каждом промахе кеша и чтение из материализованных
+представлений (AGGREGATES_MATVIEW).
+
+Для представлений выводится и цена свежести: время пересчета.
+После изменения списки показывают прежнее количество не дольше
+AGGREGATES_REFRESH_DELAY + время пересчета.
+
+Запуск из корня проекта (нужны PostgreSQL и Redis из .env с данными каталога):
+    PYTHONPATH=.:src python -m benchmarks.aggregates --calls 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import func, select
+
+from database import AsyncSession
+from menu_app.repositories import menu_repository, submenu_repository
+from menu_app.repositories.menu_repository import MenuRepository
+from menu_app.repositories.submenu_repository import SubMenuRepository
+from menu_app.services.aggregate_service import AggregateService
+from models.models import Dish, SubMenu
+
+
+def set_matview_mode(enabled: bool) -> None:
+    menu_repository.AGGREGATES_MATVIEW = enabled
+    submenu_repository.AGGREGATES_MATVIEW = enabled
+
+
+async def measure(query, calls: int) -> list[float]:
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await query()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    percentile = statistics.quantiles(timings, n=100)
+    print(f'{name:28} p50 {percentile[49] * 1000:7.2f} ms  '
+          f'p95 {percentile[94] * 1000:7.2f} ms')
+
+
+async def run(calls: int) -> None:
+    async with AsyncSession() as session:
+        menu_id, dishes = (await session.execute(
+            select(SubMenu.menu_id, func.count(Dish.id)).
+            join(Dish, Dish.submenu_id == SubMenu.id).
+            group_by(SubMenu.menu_id).
+            order_by(func.count(Dish.id).desc()).
+            limit(1)
+        )).one()
+        total = await session.scalar(select(func.count(Dish.id)))
+    print(f'dishes in catalogue: {total}, in largest menu: {dishes}')
+
+    aggregates = AggregateService()
+    refresh_timings = await measure(aggregates.refresh, 5)
+
+    async with AsyncSession() as session:
+        menus = MenuRepository(session)
+        submenus = SubMenuRepository(session)
+        for enabled, name in ((False, 'group by'), (True, 'matview')):
+            set_matview_mode(enabled)
+            await menus.get_menu_list_with_counts()
+            report(f'menu list, {name}', await measure(
+                menus.get_menu_list_with_counts, calls
+            ))
+            await submenus.get_submenu_list_with_dishes_count(menu_id)
+            report(f'submenu list, {name}', await measure(
+                lambda: submenus.get_submenu_list_with_dishes_count(menu_id),
+                calls
+            ))
+    report('refresh (staleness)', refresh_timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Скорость сверки кеша каталога с базой (AuditService): сколько ключей
+в секунду проверяется без ограничения и с ограничением AUDIT_RATE.
+
+В кеш записываются блюда первых меню, их списки и списки подменю,
+у части блюд в кеше меняется название. Проверка не исправляет кеш,
+после замеров он очищается новым поколением.
+
+Запуск из корня проекта (нужны PostgreSQL с данными каталога и Redis):
+    PYTHONPATH=.:src python -m benchmarks.audit --menus 10 --rates 0 1000
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select
+
+from database import AsyncSession
+from menu_app.redis_backend import RedisBackend
+from menu_app.repositories.dish_repository import DishRepository
+from menu_app.repositories.submenu_repository import SubMenuRepository
+from menu_app.services.audit_service import AuditService
+from models.models import Menu
+
+
+async def fill_cache(menus: int, drift: float) -> int:
+    """Записывает каталог первых меню в кеш, возвращает число блюд"""
+    redis_cli = RedisBackend()
+    await redis_cli.bump_generation()
+    dishes = 0
+    async with AsyncSession() as session:
+        menu_ids = (await session.execute(
+            select(Menu.id).
+            where(Menu.deleted_at.is_(None)).
+            order_by(Menu.id).
+            limit(menus)
+        )).scalars().all()
+        submenu_repository = SubMenuRepository(session)
+        dish_repository = DishRepository(session)
+        for menu_id in menu_ids:
+            submenu_list = await submenu_repository.\
+                get_submenu_list_with_dishes_count(menu_id)
+            await redis_cli.set_submenu_list(submenu_list, menu_id)
+            for submenu_obj in submenu_list:
+                dish_list = await dish_repository.\
+                    get_dish_list(menu_id, submenu_obj.id)
+                await redis_cli.\
+                    set_dish_list(dish_list, menu_id, submenu_obj.id)
+                for dish_obj in dish_list:
+                    dishes += 1
+                    if dishes % round(1 / drift) == 0:
+                        # Отсоединенный объект не попадет в базу
+                        session.expunge(dish_obj)
+                        dish_obj.title += ' (устарело)'
+                await redis_cli.set_dishes(dish_list, menu_id)
+    return dishes
+
+
+async def run(menus: int, drift: float, rates: list[float]) -> None:
+    dishes = await fill_cache(menus, drift)
+    print(f'блюд в кеше: {dishes}, с измененным названием: {drift:.0%}')
+    try:
+        for rate in rates:
+            service = AuditService(
+                rate=rate or float('inf'), confirm_delay=0
+            )
+            started = time.perf_counter()
+            report = await service.audit(repair=False)
+            elapsed = time.perf_counter() - started
+            checked = sum(
+                family.checked for family in report.families.values()
+            )
+            drifted = sum(
+                family.drifted for family in report.families.values()
+            )
+            print(f'ограничение {rate or "нет":>5}: {checked} ключей '
+                  f'за {elapsed:6.2f} с ({checked / elapsed:6.0f}/с), '
+                  f'расходятся {drifted}')
+    finally:
+        await RedisBackend().bump_generation()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--menus', type=int, default=10)
+    parser.add_argument('--drift', type=float, default=0.01)
+    parser.add_argument('--rates', type=float, nargs='+', default=[0, 1000])
+    args = parser.parse_args()
+    asyncio.run(run(args.menus, args.drift, args.rates))
+
+
+if __name__ == '__main__':
+    main()
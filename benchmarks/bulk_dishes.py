@@ -0,0 +1,80 @@
+"""
+Сравнение пропускной способности создания блюд:
+по одному запросу на блюдо и одним bulk-запросом.
+
+Запуск из корня проекта (нужны PostgreSQL и Redis из .env):
+    PYTHONPATH=.:src python -m benchmarks.bulk_dishes --dishes 10000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from httpx import AsyncClient
+
+from main import app
+
+prefix = '/api/v1/menus'
+
+
+async def run(dishes: int, single: int) -> None:
+    tag = uuid.uuid4().hex[:8]
+    async with AsyncClient(app=app, base_url='http://bench') as client:
+        menu = (await client.post(prefix, json={
+            'title': f'bench menu {tag}', 'description': ''
+        })).json()
+        submenu = (await client.post(
+            f'{prefix}/{menu["id"]}/submenus',
+            json={'title': f'bench submenu {tag}', 'description': ''}
+        )).json()
+        dishes_url = f'{prefix}/{menu["id"]}/submenus/{submenu["id"]}/dishes'
+
+        started = time.perf_counter()
+        for number in range(single):
+            await client.post(dishes_url, json={
+                'title': f'single {tag} {number}',
+                'description': 'bench',
+                'price': '10.50',
+            })
+        single_elapsed = time.perf_counter() - started
+
+        items = [
+            {
+                'title': f'bulk {tag} {number}',
+                'description': 'bench',
+                'price': '10.50',
+                'submenu_id': submenu['id'],
+            }
+            for number in range(dishes)
+        ]
+        started = time.perf_counter()
+        response = await client.post(
+            f'{prefix}/{menu["id"]}/dishes/bulk', json=items
+        )
+        bulk_elapsed = time.perf_counter() - started
+        created = sum(
+            item['status'] == 'created'
+            for item in response.json()['items']
+        )
+
+        await client.delete(f'{prefix}/{menu["id"]}')
+
+    print(f'single: {single} dishes in {single_elapsed:.2f}s, '
+          f'{single / single_elapsed:.0f} dishes/s')
+    print(f'bulk:   {created} dishes in {bulk_elapsed:.2f}s, '
+          f'{created / bulk_elapsed:.0f} dishes/s')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dishes', type=int, default=10000)
+    parser.add_argument(
+        '--single', type=int, default=500,
+        help='сколько блюд создать по одному для сравнения'
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.dishes, args.single))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Пропускная способность GET-запросов, на которые отвечает кеш:
+с ленивой сессией (текущая get_async_session) и с сессией,
+которая создается на каждый запрос.
+
+Запуск из корня проекта (нужны PostgreSQL и Redis из .env):
+    PYTHONPATH=.:src python -m benchmarks.cache_hits --requests 5000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from typing import AsyncGenerator
+
+from httpx import AsyncClient
+
+import database
+from main import app
+
+prefix = '/api/v1/menus'
+
+
+async def get_eager_session() -> AsyncGenerator[database.AsyncSession, None]:
+    async with database.AsyncSession() as session:
+        yield session
+
+
+async def measure(
+    client: AsyncClient,
+    url: str,
+    requests: int,
+    concurrency: int
+) -> float:
+    async def worker(count: int) -> None:
+        for _ in range(count):
+            response = await client.get(url)
+            assert response.status_code == 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(requests // concurrency) for _ in range(concurrency)
+    ))
+    return requests / (time.perf_counter() - started)
+
+
+async def run(requests: int, concurrency: int, rounds: int) -> None:
+    tag = uuid.uuid4().hex[:8]
+    async with AsyncClient(app=app, base_url='http://bench') as client:
+        menu = (await client.post(prefix, json={
+            'title': f'bench menu {tag}', 'description': ''
+        })).json()
+        url = f'{prefix}/{menu["id"]}'
+        await client.get(url)
+
+        # Варианты чередуются, берется лучший результат каждого
+        eager = lazy = 0.0
+        for _ in range(rounds):
+            app.dependency_overrides[database.get_async_session] = \
+                get_eager_session
+            eager = max(eager, await measure(client, url, requests, concurrency))
+            app.dependency_overrides.clear()
+            lazy = max(lazy, await measure(client, url, requests, concurrency))
+
+        await client.delete(url)
+
+    print(f'eager session: {eager:.0f} requests/s')
+    print(f'lazy session:  {lazy:.0f} requests/s ({lazy / eager - 1:+.1%})')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.rounds))
+
+
+if __name__ == '__main__':
+    main()
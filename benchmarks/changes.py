@@ -0,0 +1,97 @@
+"""
+Стоимость синхронизации каталога через ленту изменений.
+
+Сравниваются полная загрузка (/menus/all без кеша и лента с since=0)
+и загрузка изменений после того, как переписаны N блюд: время
+и размер ответа ленты растут с N, а не с размером каталога.
+Блюда переписываются теми же значениями, данные не меняются.
+
+Запуск из корня проекта (нужны PostgreSQL с данными каталога и Redis):
+    PYTHONPATH=.:src python -m benchmarks.changes --changes 10 100 1000
+"""
+import argparse
+import asyncio
+import time
+
+from httpx import AsyncClient
+from sqlalchemy import select
+
+from database import AsyncSession
+from main import app
+from menu_app.redis_backend import RedisBackend
+from models.models import Dish, SubMenu
+
+prefix = '/api/v1/menus'
+
+
+async def sync(client: AsyncClient, since: str) -> tuple[str, float, int]:
+    """Позиция после всех изменений, время в мс и переданные байты"""
+    started = time.perf_counter()
+    size = 0
+    has_more = True
+    while has_more:
+        response = await client.get(
+            f'{prefix}/changes', params={'since': since, 'limit': 5000}
+        )
+        size += response.num_bytes_downloaded
+        page = response.json()
+        since, has_more = page['next'], page['has_more']
+    return since, (time.perf_counter() - started) * 1e3, size
+
+
+async def touch_dishes(client: AsyncClient, count: int) -> None:
+    """Переписывает count блюд одного меню их же значениями"""
+    async with AsyncSession() as session:
+        rows = (await session.execute(
+            select(
+                SubMenu.menu_id, Dish.id, Dish.title,
+                Dish.description, Dish.price
+            ).
+            join(SubMenu, Dish.submenu_id == SubMenu.id).
+            where(SubMenu.menu_id == select(SubMenu.menu_id).
+                  limit(1).scalar_subquery()).
+            order_by(Dish.id).
+            limit(count)
+        )).all()
+    menu_id = rows[0].menu_id
+    for start in range(0, len(rows), 1000):
+        await client.patch(f'{prefix}/{menu_id}/dishes/bulk', json=[
+            {'id': row.id, 'title': row.title,
+             'description': row.description or '', 'price': str(row.price)}
+            for row in rows[start:start + 1000]
+        ])
+
+
+async def run(changes: list[int]) -> None:
+    async with AsyncClient(app=app, base_url='http://bench') as client:
+        await RedisBackend().delete_all_list()
+        started = time.perf_counter()
+        response = await client.get(
+            f'{prefix}/all', headers={'Accept-Encoding': 'identity'}
+        )
+        all_ms = (time.perf_counter() - started) * 1e3
+        print(f'/menus/all без кеша: {all_ms:9.1f} мс '
+              f'{response.num_bytes_downloaded:10} байт')
+
+        since, full_ms, full_size = await sync(client, '0')
+        print(f'лента с since=0:    {full_ms:9.1f} мс {full_size:10} байт')
+        for count in changes:
+            await touch_dishes(client, count)
+            since_before = since
+            since, changes_ms, changes_size = await sync(client, since)
+            print(f'{count:5} изменений:     {changes_ms:9.1f} мс '
+                  f'{changes_size:10} байт')
+            assert since != since_before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--changes', type=int, nargs='+', default=[10, 100, 1000]
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.changes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Трафик и процессорное время на сжатие больших ответов.
+
+Для каждого ответа выводится размер тела и время сжатия в режимах
+middleware (на лету, при каждом запросе) и precompress (один раз
+при записи в кеш). При попадании в кеш сжатое тело отдается готовым,
+то есть процессорное время на сжатие равно нулю. Данные загружаются
+из базы один раз.
+
+Запуск из корня проекта (нужен PostgreSQL из .env с данными каталога):
+    PYTHONPATH=.:src python -m benchmarks.compression --calls 5
+"""
+import argparse
+import asyncio
+import time
+
+import orjson
+from sqlalchemy import func, select
+
+from database import AsyncSession
+from menu_app import compression, serializers
+from menu_app.repositories.dish_repository import DishRepository
+from menu_app.repositories.menu_repository import MenuRepository
+from menu_app.repositories.submenu_repository import SubMenuRepository
+from models.models import Dish, SubMenu
+
+
+def measure(body: bytes, encoding: str, precompress: bool, calls: int):
+    """Размер сжатого тела и процессорное время на одно сжатие в мс"""
+    started = time.process_time()
+    for _ in range(calls):
+        compressed = compression.compress(body, encoding, precompress)
+    return len(compressed), (time.process_time() - started) / calls * 1e3
+
+
+async def run(calls: int) -> None:
+    async with AsyncSession() as session:
+        menu_id, submenu_id = (await session.execute(
+            select(SubMenu.menu_id, SubMenu.id).
+            join(Dish, Dish.submenu_id == SubMenu.id).
+            group_by(SubMenu.id).
+            order_by(func.count(Dish.id).desc()).
+            limit(1)
+        )).one()
+        menus = MenuRepository(session)
+        submenu_list = await SubMenuRepository(session).\
+            get_submenu_list_with_dishes_count(menu_id)
+        dish_list = await DishRepository(session).\
+            get_dish_list(menu_id, submenu_id)
+        all_list = await menus.get_all_list()
+        menu_list = await menus.get_menu_list_with_counts()
+
+    cases = [
+        ('GET /menus', [serializers.menu(obj) for obj in menu_list]),
+        (f'GET .../submenus ({len(submenu_list)})',
+         [serializers.submenu(obj) for obj in submenu_list]),
+        (f'GET .../dishes ({len(dish_list)})',
+         [serializers.dish(obj) for obj in dish_list]),
+        ('GET /menus/all',
+         [serializers.menu_with_submenus(obj) for obj in all_list]),
+    ]
+    print(f'brotli: {"yes" if compression.brotli is not None else "no"}, '
+          f'порог {compression.COMPRESSION_MIN_SIZE} байт')
+    for name, content in cases:
+        body = orjson.dumps(content)
+        print(f'\n{name}: {len(body)} байт без сжатия')
+        if len(body) < compression.COMPRESSION_MIN_SIZE:
+            print('  меньше порога, не сжимается')
+            continue
+        for encoding in compression.ENCODINGS:
+            for mode, precompress in (('middleware', False),
+                                      ('precompress', True)):
+                size, cpu = measure(body, encoding, precompress, calls)
+                print(f'  {encoding:5} {mode:12} {size:10} байт '
+                      f'({size / len(body):6.1%})  {cpu:9.2f} мс')
+        print('  попадание в кеш: сжатие 0 мс')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+
+if __name__ == '__main__':
+    main()
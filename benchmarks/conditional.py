@@ -0,0 +1,84 @@
+"""
+Трафик и время ответа на повторные GET-запросы с If-None-Match.
+
+Для каждого адреса сравниваются ответ 200 из кеша (клиент загружает
+тело заново) и ответ 304 по версии данных. Ответы кеша прогреваются
+заранее, поэтому выигрыш 304 - это только передача и разбор тела.
+
+Запуск из корня проекта (нужны PostgreSQL с данными каталога и Redis):
+    PYTHONPATH=.:src python -m benchmarks.conditional --requests 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from database import AsyncSession
+from main import app
+from models.models import Dish, SubMenu
+
+prefix = '/api/v1/menus'
+
+
+async def measure(
+    client: AsyncClient,
+    url: str,
+    headers: dict,
+    requests: int
+) -> tuple[float, int, int]:
+    """Медиана времени ответа в мс, переданные байты тела и код ответа"""
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        timings.append((time.perf_counter() - started) * 1e3)
+    return statistics.median(timings), response.num_bytes_downloaded, \
+        response.status_code
+
+
+async def run(requests: int) -> None:
+    async with AsyncSession() as session:
+        menu_id, submenu_id = (await session.execute(
+            select(SubMenu.menu_id, SubMenu.id).
+            join(Dish, Dish.submenu_id == SubMenu.id).
+            group_by(SubMenu.id).
+            order_by(func.count(Dish.id).desc()).
+            limit(1)
+        )).one()
+    urls = [
+        f'{prefix}/all',
+        prefix,
+        f'{prefix}/{menu_id}/submenus',
+        f'{prefix}/{menu_id}/submenus/{submenu_id}/dishes',
+    ]
+    async with AsyncClient(app=app, base_url='http://bench') as client:
+        for url in urls:
+            for encoding in ('identity', 'gzip'):
+                headers = {'Accept-Encoding': encoding}
+                etag = (await client.get(url, headers=headers)).\
+                    headers['etag']
+                full_ms, full_size, _ = \
+                    await measure(client, url, headers, requests)
+                cached_ms, cached_size, code = await measure(
+                    client, url, {**headers, 'If-None-Match': etag}, requests
+                )
+                assert code == 304
+                print(f'{url} ({encoding})')
+                print(f'  200: {full_size:10} байт {full_ms:9.2f} мс')
+                print(f'  304: {cached_size:10} байт {cached_ms:9.2f} мс '
+                      f'(-{full_size - cached_size} байт, '
+                      f'x{full_ms / cached_ms:.1f})')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == '__main__':
+    main()
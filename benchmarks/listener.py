@@ -0,0 +1,101 @@
+"""
+Задержка инвалидации кеша после записи в обход API: время от commit
+UPDATE блюд до момента, когда все их записи outbox обработаны.
+Сравнивается слушатель уведомлений (ListenerService) с периодическим
+диспетчером, который проверяет outbox раз в OUTBOX_INTERVAL секунд.
+Изменения от overflow_size объектов слушатель обрабатывает новым
+поколением кеша, а не точечно.
+
+Описания блюд перезаписываются теми же значениями, данные каталога
+не меняются.
+
+Запуск из корня проекта (нужны PostgreSQL с данными каталога и Redis):
+    PYTHONPATH=.:src python -m benchmarks.listener --dishes 1 100 1000 20000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from prometheus_client import REGISTRY
+from sqlalchemy import select, update
+
+from config import OUTBOX_INTERVAL
+from database import AsyncSession
+from menu_app.repositories.outbox_repository import OutboxRepository
+from menu_app.services.listener_service import ListenerService
+from menu_app.services.outbox_service import OutboxService
+from models.models import Dish
+
+
+async def touch_dishes(dish_ids: list[int]) -> None:
+    async with AsyncSession() as session:
+        await session.execute(
+            update(Dish).
+            where(Dish.id.in_(dish_ids)).
+            values(description=Dish.description)
+        )
+        await session.commit()
+
+
+async def wait_dispatched() -> None:
+    while True:
+        async with AsyncSession() as session:
+            count, _ = await OutboxRepository(session).get_backlog()
+        if not count:
+            return
+        await asyncio.sleep(0.002)
+
+
+async def measure(dish_ids: list[int], repeat: int) -> list[float]:
+    """Задержки инвалидации в мс"""
+    timings = []
+    for _ in range(repeat):
+        await touch_dishes(dish_ids)
+        started = time.perf_counter()
+        await wait_dispatched()
+        timings.append((time.perf_counter() - started) * 1e3)
+    return timings
+
+
+async def run(counts: list[int], repeat: int) -> None:
+    service = OutboxService(settle_delay=0)
+    await service.catch_up()
+    await service.settle()
+    async with AsyncSession() as session:
+        dish_ids = (await session.execute(
+            select(Dish.id).order_by(Dish.id).limit(max(counts))
+        )).scalars().all()
+
+    for name, task in (
+        (f'диспетчер раз в {OUTBOX_INTERVAL:g} с', service.run_forever()),
+        ('слушатель', ListenerService(service).run_forever()),
+    ):
+        task = asyncio.create_task(task)
+        while name == 'слушатель' and not REGISTRY.get_sample_value(
+            'cache_listener_connected'
+        ):
+            await asyncio.sleep(0.01)
+        for count in counts:
+            timings = await measure(dish_ids[:count], repeat)
+            overflow = ' (поколение)' \
+                if name == 'слушатель' and count >= service.overflow_size \
+                else ''
+            print(f'{name:22}: {count:6} блюд{overflow}: '
+                  f'p50 {statistics.median(timings):7.1f} мс, '
+                  f'max {max(timings):7.1f} мс')
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await service.settle()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dishes', type=int, nargs='+', default=[1, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.dishes, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
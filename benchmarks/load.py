@@ -0,0 +1,619 @@
+"""
+Нагрузочный сценарий для всех маршрутов src/menu_app/router.py:
+виртуальные пользователи по очереди выбирают операцию по весам смеси
+(--mix read, mixed или write) и ждут ответа. Чтения берут случайные
+меню, подменю и блюда каталога (его можно создать benchmarks.seed),
+записи идут в собственное меню каждого пользователя, созданное перед
+замером, и в каталог не попадают.
+
+Замеров два: cold - сразу после сброса кеша новым поколением, warm -
+после прогрева тем же сценарием. Для каждого выводятся запросы в
+секунду, ошибки и p50, p95 и p99 времени ответа в мс, всего и по каждому
+маршруту, одним JSON (в stdout или в --output) для сравнения прогонов.
+Ошибкой считается любой ответ 4xx и 5xx, в том числе 503 от
+AdmissionMiddleware.
+
+Запуск из корня проекта (нужны PostgreSQL с данными каталога и Redis):
+    PYTHONPATH=.:src python -m benchmarks.load --mix mixed --users 32 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+
+import httpx
+from sqlalchemy import func, select
+
+from benchmarks.seed import WORDS, reset_cache
+from benchmarks.workers import HOST, start_server
+from database import AsyncSession
+from menu_app.spreadsheet import COLUMNS
+from models.models import Dish, Menu, SubMenu
+
+prefix = '/api/v1/menus'
+
+# Через сколько секунд после сброса кеша начинается замер cold:
+# процессы сервера должны получить уведомление о новом поколении
+RESET_DELAY = 0.5
+
+
+class VirtualUser:
+    """
+    Пользователь сценария: общий клиент, случайные объекты каталога
+    для чтений и собственное меню с подменю для записей. Созданные
+    подменю и блюда запоминаются, их меняют и удаляют следующие записи
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        catalogue: list[tuple[int, int, int]],
+        run_id: str,
+        number: int
+    ) -> None:
+        self.client = client
+        self.catalogue = catalogue
+        # Общие для всех пользователей замера, см. phase
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[str, int]] = \
+            defaultdict(lambda: defaultdict(int))
+        self.rng = random.Random(number)
+        self.name = f'Нагрузка {run_id} {number}'
+        self.counter = 0
+        self.menu_id = None
+        self.submenu_id = None
+        self.menus: list[int] = []
+        self.submenus: list[int] = []
+        self.dishes: list[int] = []
+
+    def title(self) -> str:
+        """Уникальное название: названия блюд уникальны во всем каталоге"""
+        self.counter += 1
+        return f'{self.name} {self.counter}'
+
+    def pick(self) -> tuple[int, int, int]:
+        return self.rng.choice(self.catalogue)
+
+    async def request(
+        self,
+        route: str,
+        method: str,
+        url: str,
+        stream: bool = False,
+        **kwargs
+    ) -> httpx.Response:
+        """Запрос с замером времени, route - шаблон пути для отчета"""
+        started = time.perf_counter()
+        try:
+            if stream:
+                # Поток событий не кончается: ответ закрывается сразу
+                async with self.client.stream(method, url, **kwargs) as response:
+                    pass
+            else:
+                response = await self.client.request(method, url, **kwargs)
+        except httpx.TransportError as error:
+            # Обрыв соединения или таймаут - ошибка без кода ответа
+            self.statuses[route][type(error).__name__] += 1
+            return httpx.Response(0)
+        self.timings[route].append((time.perf_counter() - started) * 1e3)
+        self.statuses[route][str(response.status_code)] += 1
+        return response
+
+    async def setup(self) -> None:
+        """Меню и подменю для записей, создаются до замера"""
+        response = await self.client.post(prefix, json={
+            'title': self.name, 'description': ''
+        })
+        self.menu_id = response.json()['id']
+        response = await self.client.post(
+            f'{prefix}/{self.menu_id}/submenus',
+            json={'title': self.name, 'description': ''}
+        )
+        self.submenu_id = response.json()['id']
+
+    async def teardown(self) -> None:
+        for menu_id in (self.menu_id, *self.menus):
+            await self.client.delete(f'{prefix}/{menu_id}')
+
+    @property
+    def submenus_url(self) -> str:
+        return f'{prefix}/{self.menu_id}/submenus'
+
+    @property
+    def dishes_url(self) -> str:
+        return f'{self.submenus_url}/{self.submenu_id}/dishes'
+
+    def body(self, price: bool = False) -> dict[str, str]:
+        body = {
+            'title': self.title(),
+            'description': ' '.join(self.rng.sample(WORDS, 3)),
+        }
+        if price:
+            body['price'] = f'{self.rng.randrange(5000, 500000) / 100:.2f}'
+        return body
+
+
+async def menu_list(user: VirtualUser) -> None:
+    await user.request('GET /menus', 'GET', prefix)
+
+
+async def menu_all(user: VirtualUser) -> None:
+    await user.request('GET /menus/all', 'GET', f'{prefix}/all')
+
+
+async def search(user: VirtualUser) -> None:
+    """
+    Поиск по номеру в названии блюда из benchmarks.seed: общее слово
+    названия или описания нашло бы большую часть каталога
+    """
+    _, _, dish_id = user.pick()
+    await user.request(
+        'GET /menus/search', 'GET', f'{prefix}/search',
+        params={'q': str(dish_id).zfill(2), 'limit': 20}
+    )
+
+
+async def changes(user: VirtualUser) -> None:
+    await user.request(
+        'GET /menus/changes', 'GET', f'{prefix}/changes',
+        params={'limit': 100}
+    )
+
+
+async def events(user: VirtualUser) -> None:
+    """Подписка на события: время до заголовков ответа"""
+    await user.request(
+        'GET /menus/events', 'GET', f'{prefix}/events', stream=True
+    )
+
+
+async def export(user: VirtualUser) -> None:
+    await user.request('GET /menus/export', 'GET', f'{prefix}/export')
+
+
+async def catalogue_import(user: VirtualUser) -> None:
+    """Импорт строки в собственное меню и запрос статуса задачи"""
+    title = user.title()
+    row = (user.name, '', user.name, '', title, '', '10.00')
+    content = '\n'.join((','.join(COLUMNS), ','.join(row)))
+    response = await user.request(
+        'POST /menus/import', 'POST', f'{prefix}/import',
+        files={'file': ('catalogue.csv', content, 'text/csv')}
+    )
+    if response.status_code == 202:
+        await user.request(
+            'GET /menus/import/{job_id}', 'GET',
+            f'{prefix}/import/{response.json()["id"]}'
+        )
+
+
+async def menu_detail(user: VirtualUser) -> None:
+    menu_id, _, _ = user.pick()
+    await user.request('GET /menus/{menu_id}', 'GET', f'{prefix}/{menu_id}')
+
+
+async def menu_price_stats(user: VirtualUser) -> None:
+    menu_id, _, _ = user.pick()
+    await user.request(
+        'GET /menus/{menu_id}/price-stats', 'GET',
+        f'{prefix}/{menu_id}/price-stats'
+    )
+
+
+async def submenu_list(user: VirtualUser) -> None:
+    menu_id, _, _ = user.pick()
+    await user.request(
+        'GET /menus/{menu_id}/submenus', 'GET', f'{prefix}/{menu_id}/submenus'
+    )
+
+
+async def submenu_batch(user: VirtualUser) -> None:
+    menu_id, submenu_id, _ = user.pick()
+    ids = [submenu_id] + [
+        other for menu, other, _ in user.rng.sample(user.catalogue, 9)
+        if menu == menu_id
+    ]
+    await user.request(
+        'GET /menus/{menu_id}/submenus/batch', 'GET',
+        f'{prefix}/{menu_id}/submenus/batch', params={'ids': ids}
+    )
+
+
+async def submenu_detail(user: VirtualUser) -> None:
+    menu_id, submenu_id, _ = user.pick()
+    await user.request(
+        'GET /menus/{menu_id}/submenus/{submenu_id}', 'GET',
+        f'{prefix}/{menu_id}/submenus/{submenu_id}'
+    )
+
+
+async def submenu_price_stats(user: VirtualUser) -> None:
+    menu_id, submenu_id, _ = user.pick()
+    await user.request(
+        'GET /menus/{menu_id}/submenus/{submenu_id}/price-stats', 'GET',
+        f'{prefix}/{menu_id}/submenus/{submenu_id}/price-stats'
+    )
+
+
+async def dish_list(user: VirtualUser) -> None:
+    menu_id, submenu_id, _ = user.pick()
+    await user.request(
+        'GET /menus/{menu_id}/submenus/{submenu_id}/dishes', 'GET',
+        f'{prefix}/{menu_id}/submenus/{submenu_id}/dishes'
+    )
+
+
+async def dish_batch(user: VirtualUser) -> None:
+    menu_id, submenu_id, dish_id = user.pick()
+    await user.request(
+        'GET /menus/{menu_id}/submenus/{submenu_id}/dishes/batch', 'GET',
+        f'{prefix}/{menu_id}/submenus/{submenu_id}/dishes/batch',
+        params={'ids': list(range(dish_id, dish_id + 10))}
+    )
+
+
+async def dish_detail(user: VirtualUser) -> None:
+    menu_id, submenu_id, dish_id = user.pick()
+    await user.request(
+        'GET /menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}', 'GET',
+        f'{prefix}/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}'
+    )
+
+
+async def menu_create(user: VirtualUser) -> None:
+    response = await user.request('POST /menus', 'POST', prefix, json=user.body())
+    if response.status_code == 201:
+        user.menus.append(response.json()['id'])
+
+
+async def menu_patch(user: VirtualUser) -> None:
+    await user.request(
+        'PATCH /menus/{menu_id}', 'PATCH', f'{prefix}/{user.menu_id}',
+        json={'title': user.name, 'description': user.body()['description']}
+    )
+
+
+async def menu_delete(user: VirtualUser) -> None:
+    if not user.menus:
+        return await menu_create(user)
+    await user.request(
+        'DELETE /menus/{menu_id}', 'DELETE', f'{prefix}/{user.menus.pop()}'
+    )
+
+
+async def submenu_create(user: VirtualUser) -> None:
+    response = await user.request(
+        'POST /menus/{menu_id}/submenus', 'POST', user.submenus_url,
+        json=user.body()
+    )
+    if response.status_code == 201:
+        user.submenus.append(response.json()['id'])
+
+
+async def submenu_patch(user: VirtualUser) -> None:
+    if not user.submenus:
+        return await submenu_create(user)
+    await user.request(
+        'PATCH /menus/{menu_id}/submenus/{submenu_id}', 'PATCH',
+        f'{user.submenus_url}/{user.rng.choice(user.submenus)}',
+        json=user.body()
+    )
+
+
+async def submenu_delete(user: VirtualUser) -> None:
+    if not user.submenus:
+        return await submenu_create(user)
+    await user.request(
+        'DELETE /menus/{menu_id}/submenus/{submenu_id}', 'DELETE',
+        f'{user.submenus_url}/{user.submenus.pop()}'
+    )
+
+
+async def submenu_bulk_create(user: VirtualUser) -> None:
+    response = await user.request(
+        'POST /menus/{menu_id}/submenus/bulk', 'POST',
+        f'{user.submenus_url}/bulk', json=[user.body() for _ in range(5)]
+    )
+    if response.status_code == 200:
+        user.submenus.extend(
+            int(item['id']) for item in response.json()['items']
+            if item['status'] == 'created'
+        )
+
+
+async def submenu_bulk_patch(user: VirtualUser) -> None:
+    if not user.submenus:
+        return await submenu_bulk_create(user)
+    await user.request(
+        'PATCH /menus/{menu_id}/submenus/bulk', 'PATCH',
+        f'{user.submenus_url}/bulk',
+        json=[{'id': submenu_id, **user.body()} for submenu_id in user.submenus[-5:]]
+    )
+
+
+async def submenu_bulk_delete(user: VirtualUser) -> None:
+    if not user.submenus:
+        return await submenu_bulk_create(user)
+    ids, user.submenus = user.submenus[-5:], user.submenus[:-5]
+    await user.request(
+        'DELETE /menus/{menu_id}/submenus/bulk', 'DELETE',
+        f'{user.submenus_url}/bulk', json=ids
+    )
+
+
+async def dish_create(user: VirtualUser) -> None:
+    response = await user.request(
+        'POST /menus/{menu_id}/submenus/{submenu_id}/dishes', 'POST',
+        user.dishes_url, json=user.body(price=True)
+    )
+    if response.status_code == 201:
+        user.dishes.append(response.json()['id'])
+
+
+async def dish_patch(user: VirtualUser) -> None:
+    if not user.dishes:
+        return await dish_create(user)
+    await user.request(
+        'PATCH /menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}',
+        'PATCH', f'{user.dishes_url}/{user.rng.choice(user.dishes)}',
+        json=user.body(price=True)
+    )
+
+
+async def dish_delete(user: VirtualUser) -> None:
+    if not user.dishes:
+        return await dish_create(user)
+    await user.request(
+        'DELETE /menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}',
+        'DELETE', f'{user.dishes_url}/{user.dishes.pop()}'
+    )
+
+
+async def dish_bulk_create(user: VirtualUser) -> None:
+    response = await user.request(
+        'POST /menus/{menu_id}/dishes/bulk', 'POST',
+        f'{prefix}/{user.menu_id}/dishes/bulk',
+        json=[
+            {'submenu_id': user.submenu_id, **user.body(price=True)}
+            for _ in range(10)
+        ]
+    )
+    if response.status_code == 200:
+        user.dishes.extend(
+            int(item['id']) for item in response.json()['items']
+            if item['status'] == 'created'
+        )
+
+
+async def dish_bulk_patch(user: VirtualUser) -> None:
+    if not user.dishes:
+        return await dish_bulk_create(user)
+    await user.request(
+        'PATCH /menus/{menu_id}/dishes/bulk', 'PATCH',
+        f'{prefix}/{user.menu_id}/dishes/bulk',
+        json=[
+            {'id': dish_id, **user.body(price=True)}
+            for dish_id in user.dishes[-10:]
+        ]
+    )
+
+
+async def dish_bulk_delete(user: VirtualUser) -> None:
+    if not user.dishes:
+        return await dish_bulk_create(user)
+    ids, user.dishes = user.dishes[-10:], user.dishes[:-10]
+    await user.request(
+        'DELETE /menus/{menu_id}/dishes/bulk', 'DELETE',
+        f'{prefix}/{user.menu_id}/dishes/bulk', json=ids
+    )
+
+
+# Веса операций в смесях read, mixed и write. Выгрузки всего каталога
+# (all, export) редки: каждая читает все блюда. Изменить или удалить
+# можно только созданное, иначе операция сначала создает объект
+OPERATIONS: tuple[tuple[Callable[[VirtualUser], Awaitable], tuple[float, ...]], ...] = (
+    (menu_list, (10, 8, 4)),
+    (menu_all, (0.1, 0.1, 0.1)),
+    (search, (5, 4, 2)),
+    (changes, (2, 2, 2)),
+    (events, (1, 1, 1)),
+    (export, (0.1, 0.1, 0.1)),
+    (menu_detail, (10, 8, 4)),
+    (menu_price_stats, (3, 2, 1)),
+    (submenu_list, (8, 6, 3)),
+    (submenu_batch, (3, 2, 1)),
+    (submenu_detail, (10, 8, 4)),
+    (submenu_price_stats, (2, 2, 1)),
+    (dish_list, (10, 8, 4)),
+    (dish_batch, (4, 3, 2)),
+    (dish_detail, (20, 15, 8)),
+    (catalogue_import, (0, 1, 2)),
+    (menu_create, (0, 1, 2)),
+    (menu_patch, (0, 1, 3)),
+    (menu_delete, (0, 1, 2)),
+    (submenu_create, (0, 2, 4)),
+    (submenu_patch, (0, 2, 4)),
+    (submenu_delete, (0, 1, 3)),
+    (submenu_bulk_create, (0, 1, 2)),
+    (submenu_bulk_patch, (0, 1, 2)),
+    (submenu_bulk_delete, (0, 1, 2)),
+    (dish_create, (0, 3, 6)),
+    (dish_patch, (0, 3, 6)),
+    (dish_delete, (0, 2, 5)),
+    (dish_bulk_create, (0, 1, 2)),
+    (dish_bulk_patch, (0, 1, 2)),
+    (dish_bulk_delete, (0, 1, 2)),
+)
+MIXES = ('read', 'mixed', 'write')
+
+
+async def get_catalogue(count: int) -> list[tuple[int, int, int]]:
+    """Случайные тройки (меню, подменю, блюдо) неудаленного каталога"""
+    async with AsyncSession() as session:
+        rows = (await session.execute(
+            select(SubMenu.menu_id, SubMenu.id, Dish.id).
+            join(Dish, Dish.submenu_id == SubMenu.id).
+            join(Menu, Menu.id == SubMenu.menu_id).
+            where(Menu.deleted_at.is_(None), SubMenu.deleted_at.is_(None)).
+            order_by(func.random()).
+            limit(count)
+        )).all()
+    return [
+        (menu_id, submenu_id, dish_id)
+        for menu_id, submenu_id, dish_id in rows
+    ]
+
+
+def percentiles(timings: list[float]) -> dict[str, float | None]:
+    if len(timings) < 2:
+        value = timings[0] if timings else None
+        return {'p50': value, 'p95': value, 'p99': value}
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'p50': round(cuts[49], 2),
+        'p95': round(cuts[94], 2),
+        'p99': round(cuts[98], 2),
+    }
+
+
+def summarize(
+    timings: dict[str, list[float]],
+    statuses: dict[str, dict[str, int]],
+    duration: float
+) -> dict:
+    """Отчет замера: всего и по маршрутам, время - только ответов"""
+    routes: dict[str, dict] = {}
+    for route in sorted(statuses):
+        requests = sum(statuses[route].values())
+        routes[route] = {
+            'requests': requests,
+            'errors': sum(
+                count for code, count in statuses[route].items()
+                if not code.startswith(('2', '3'))
+            ),
+            'rps': round(requests / duration, 1),
+            **percentiles(timings[route]),
+            'statuses': dict(sorted(statuses[route].items())),
+        }
+    requests = sum(route['requests'] for route in routes.values())
+    return {
+        'duration': duration,
+        'requests': requests,
+        'errors': sum(route['errors'] for route in routes.values()),
+        'rps': round(requests / duration, 1),
+        **percentiles([timing for route in timings.values() for timing in route]),
+        'routes': routes,
+    }
+
+
+async def phase(
+    users: list[VirtualUser],
+    weights: list[float],
+    duration: float
+) -> dict:
+    """Пользователи выполняют операции до конца замера"""
+    timings: dict[str, list[float]] = defaultdict(list)
+    statuses: dict[str, dict[str, int]] = \
+        defaultdict(lambda: defaultdict(int))
+    for user in users:
+        user.timings, user.statuses = timings, statuses
+    operations = [operation for operation, _ in OPERATIONS]
+    deadline = time.perf_counter() + duration
+
+    async def run_user(user: VirtualUser) -> None:
+        while time.perf_counter() < deadline:
+            operation, = user.rng.choices(operations, weights)
+            await operation(user)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_user(user) for user in users))
+    return summarize(timings, statuses, time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace, base_url: str) -> dict:
+    catalogue = await get_catalogue(args.sample)
+    if not catalogue:
+        raise RuntimeError('catalogue is empty, run benchmarks.seed first')
+    weights = [weights[MIXES.index(args.mix)] for _, weights in OPERATIONS]
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=args.users)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=args.timeout
+    ) as client:
+        users = [
+            VirtualUser(client, catalogue, run_id, number)
+            for number in range(args.users)
+        ]
+        await asyncio.gather(*(user.setup() for user in users))
+        try:
+            await reset_cache()
+            await asyncio.sleep(RESET_DELAY)
+            cold = await phase(users, weights, args.cold_duration)
+            await phase(users, weights, args.warmup)
+            warm = await phase(users, weights, args.duration)
+        finally:
+            await asyncio.gather(*(user.teardown() for user in users))
+    return {'cold': cold, 'warm': warm}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--mix', choices=MIXES, default='mixed')
+    parser.add_argument('--users', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--cold-duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=10)
+    parser.add_argument('--sample', type=int, default=1000)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument(
+        '--url', help='адрес запущенного сервера, иначе запускается gunicorn'
+    )
+    parser.add_argument('--output', help='файл для JSON, иначе stdout')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server = start_server(args.workers, args.port)
+        base_url = f'http://{HOST}:{args.port}'
+    try:
+        phases = asyncio.run(run(args, base_url))
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+    report = {
+        'commit': git_commit(),
+        'cpu_count': os.cpu_count(),
+        'config': vars(args),
+        'phases': phases,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Стоимость outbox инвалидации кеша: время изменения блюд одним
+UPDATE с триггерами outbox и без них, время обработки записей
+диспетчером (drain и settle) и сколько записей в секунду он разбирает.
+
+Триггеры отключаются внутри транзакции, которая затем откатывается,
+данные каталога не меняются.
+
+Запуск из корня проекта (нужны PostgreSQL с данными каталога и Redis):
+    PYTHONPATH=.:src python -m benchmarks.outbox --dishes 1000 10000
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, text, update
+
+from database import AsyncSession
+from menu_app.services.outbox_service import OutboxService
+from models.models import Dish
+
+
+async def update_dishes(dish_ids: list[int], outbox: bool) -> float:
+    """Время UPDATE блюд в мс, изменения откатываются"""
+    async with AsyncSession() as session:
+        if not outbox:
+            await session.execute(
+                text('ALTER TABLE dish DISABLE TRIGGER dish_outbox_update')
+            )
+        started = time.perf_counter()
+        await session.execute(
+            update(Dish).
+            where(Dish.id.in_(dish_ids)).
+            values(description=Dish.description)
+        )
+        elapsed = (time.perf_counter() - started) * 1e3
+        await session.rollback()
+    return elapsed
+
+
+async def run(counts: list[int], repeat: int) -> None:
+    service = OutboxService(settle_delay=0)
+    await service.drain()
+    await service.settle()
+    async with AsyncSession() as session:
+        dish_ids = (await session.execute(
+            select(Dish.id).order_by(Dish.id).limit(max(counts))
+        )).scalars().all()
+
+    for count in counts:
+        ids = dish_ids[:count]
+        plain = min([await update_dishes(ids, False) for _ in range(repeat)])
+        with_outbox = min([
+            await update_dishes(ids, True) for _ in range(repeat)
+        ])
+
+        async with AsyncSession() as session:
+            await session.execute(
+                update(Dish).
+                where(Dish.id.in_(ids)).
+                values(description=Dish.description)
+            )
+            await session.commit()
+        started = time.perf_counter()
+        drained = await service.drain()
+        drain_elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        settled = await service.settle()
+        settle_elapsed = time.perf_counter() - started
+
+        print(f'{count:6} блюд: UPDATE {plain:7.1f} мс без outbox, '
+              f'{with_outbox:7.1f} мс с outbox; '
+              f'drain {drained} за {drain_elapsed * 1e3:6.1f} мс '
+              f'({drained / drain_elapsed:6.0f}/с), '
+              f'settle {settled} за {settle_elapsed * 1e3:6.1f} мс')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dishes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.dishes, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Накладные расходы Python на горячие запросы репозиториев.
+
+Каждый метод вызывается много раз под cProfile. Для каждого запроса
+выводится время на вызов (wall), процессорное время интерпретатора (cpu)
+и часть cpu, потраченная в sqlalchemy.sql: построение и компиляция запроса.
+Сервер базы данных работает в отдельном процессе и в cpu не попадает.
+pstats отдает время по имени функции, одноименные функции разных модулей
+sqlalchemy.sql учитываются один раз: время sqlalchemy.sql - нижняя оценка.
+
+С --per-call каждый запрос измеряется еще и в прежнем виде: тот же
+select() собирается заново на каждый вызов с подставленными значениями,
+как до сборки горячих запросов при импорте модулей репозиториев.
+
+Запуск из корня проекта (нужен PostgreSQL из .env с данными каталога):
+    PYTHONPATH=.:src python -m benchmarks.query_overhead --calls 2000 --per-call
+"""
+import argparse
+import asyncio
+import cProfile
+import functools
+import os
+import pstats
+import time
+from collections.abc import Callable
+
+import sqlalchemy
+from sqlalchemy import Select, and_, select
+from sqlalchemy.sql import func
+
+from config import AGGREGATES_MATVIEW
+from database import AsyncSession
+from menu_app.repositories.base_repository import MENU_ALIVE, SUBMENU_ALIVE
+from menu_app.repositories.dish_repository import DishRepository
+from menu_app.repositories.menu_repository import MenuRepository
+from menu_app.repositories.submenu_repository import SubMenuRepository
+from models.models import Dish, Menu, SubMenu, submenu_stats
+
+SQL_PACKAGE = os.path.join(os.path.dirname(sqlalchemy.__file__), 'sql')
+
+
+def get_sql_time(profile: cProfile.Profile) -> float:
+    """Суммарное собственное время функций из sqlalchemy.sql"""
+    functions = pstats.Stats(profile).get_stats_profile().func_profiles
+    return sum(
+        function.tottime for function in functions.values()
+        if function.file_name.startswith(SQL_PACKAGE)
+    )
+
+
+def submenu_list_query(menu_id: int) -> Select:
+    if AGGREGATES_MATVIEW:
+        return \
+            select(SubMenu, func.coalesce(submenu_stats.c.dishes_count, 0)).\
+            join(Menu, SubMenu.menu_id == Menu.id).\
+            outerjoin(submenu_stats, SubMenu.id == submenu_stats.c.submenu_id).\
+            filter(SubMenu.menu_id == menu_id, SUBMENU_ALIVE, MENU_ALIVE).\
+            order_by(SubMenu.id)
+    return \
+        select(SubMenu, func.count(Dish.id)).\
+        select_from(SubMenu).\
+        join(Menu, SubMenu.menu_id == Menu.id).\
+        filter(SubMenu.menu_id == menu_id, SUBMENU_ALIVE, MENU_ALIVE).\
+        outerjoin(Dish, SubMenu.id == Dish.submenu_id).\
+        group_by(SubMenu.id).order_by(SubMenu.id)
+
+
+def dish_list_query(menu_id: int, submenu_id: int) -> Select:
+    return \
+        select(Dish).\
+        join(SubMenu, Dish.submenu_id == SubMenu.id).\
+        join(Menu, SubMenu.menu_id == Menu.id).\
+        filter(
+            Dish.submenu_id == submenu_id,
+            SubMenu.menu_id == menu_id,
+            SUBMENU_ALIVE,
+            MENU_ALIVE
+        )
+
+
+async def execute_per_call(
+    session: AsyncSession,
+    build: Callable[[], Select]
+) -> list:
+    return (await session.execute(build())).all()
+
+
+async def measure(name: str, query, calls: int) -> None:
+    for _ in range(10):
+        await query()
+    profile = cProfile.Profile()
+    started, cpu_started = time.perf_counter(), time.process_time()
+    profile.enable()
+    for _ in range(calls):
+        await query()
+    profile.disable()
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    print(f'{name:40} wall {wall / calls * 1e6:7.0f} us  '
+          f'cpu {cpu / calls * 1e6:7.0f} us  '
+          f'sqlalchemy.sql {get_sql_time(profile) / calls * 1e6:6.0f} us')
+
+
+async def run(calls: int, per_call: bool) -> None:
+    async with AsyncSession() as session:
+        dish = (await session.execute(
+            select(Dish, SubMenu.menu_id).
+            join(SubMenu, Dish.submenu_id == SubMenu.id).
+            limit(1)
+        )).first()
+    if dish is None:
+        raise SystemExit('Каталог пуст: сначала импортируйте данные')
+    dish, menu_id = dish
+    submenu_id = dish.submenu_id
+
+    async with AsyncSession() as session:
+        menus = MenuRepository(session)
+        submenus = SubMenuRepository(session)
+        dishes = DishRepository(session)
+        queries = {
+            'MenuRepository.get_menu_by_id':
+                lambda: menus.get_menu_by_id(menu_id),
+            'MenuRepository.get_dishes_count_in_menu':
+                lambda: menus.get_dishes_count_in_menu(menu_id),
+            'MenuRepository.get_submenus_count_in_menu':
+                lambda: menus.get_submenus_count_in_menu(menu_id),
+            'SubMenuRepository.get_submenu_list_...':
+                lambda: submenus.get_submenu_list_with_dishes_count(menu_id),
+            'SubMenuRepository.get_submenu_by_id':
+                lambda: submenus.get_submenu_by_id(menu_id, submenu_id),
+            'SubMenuRepository.get_count_dishes_...':
+                lambda: submenus.get_count_dishes_in_submenu(submenu_id),
+            'DishRepository.get_dish_list':
+                lambda: dishes.get_dish_list(menu_id, submenu_id),
+            'DishRepository.get_dish_by_id':
+                lambda: dishes.get_dish_by_id(menu_id, submenu_id, dish.id),
+        }
+        # Те же запросы в прежнем виде: собираются на каждый вызов
+        per_call_queries = {
+            'MenuRepository.get_menu_by_id': lambda:
+                select(Menu).
+                filter(Menu.id == menu_id, MENU_ALIVE),
+            'MenuRepository.get_dishes_count_in_menu': lambda:
+                select(func.count(Dish.id)).
+                select_from(Menu).
+                outerjoin(
+                    SubMenu, and_(Menu.id == SubMenu.menu_id, SUBMENU_ALIVE)
+                ).
+                outerjoin(Dish, SubMenu.id == Dish.submenu_id).
+                filter(Menu.id == menu_id),
+            'MenuRepository.get_submenus_count_in_menu': lambda:
+                select(func.count(SubMenu.menu_id)).
+                select_from(SubMenu).
+                filter(SubMenu.menu_id == menu_id, SUBMENU_ALIVE),
+            'SubMenuRepository.get_submenu_list_...': lambda:
+                submenu_list_query(menu_id),
+            'SubMenuRepository.get_submenu_by_id': lambda:
+                select(SubMenu).
+                join(Menu, SubMenu.menu_id == Menu.id).
+                filter(
+                    SubMenu.id == submenu_id,
+                    SubMenu.menu_id == menu_id,
+                    SUBMENU_ALIVE,
+                    MENU_ALIVE
+                ),
+            'SubMenuRepository.get_count_dishes_...': lambda:
+                select(func.count(Dish.id)).
+                filter(Dish.submenu_id == submenu_id),
+            'DishRepository.get_dish_list': lambda:
+                dish_list_query(menu_id, submenu_id),
+            'DishRepository.get_dish_by_id': lambda:
+                dish_list_query(menu_id, submenu_id).
+                filter(Dish.id == dish.id),
+        }
+        for name, query in queries.items():
+            await measure(name, query, calls)
+            if per_call:
+                await measure(
+                    '  собирается на каждый вызов',
+                    functools.partial(
+                        execute_per_call, session, per_call_queries[name]
+                    ),
+                    calls
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--per-call', action='store_true')
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.per_call))
+
+
+if __name__ == '__main__':
+    main()
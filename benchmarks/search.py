@@ -0,0 +1,98 @@
+"""
+Задержка поиска по каталогу: запросы без кеша (в базу) и из кеша Redis.
+
+Запросы строятся из случайных слов названий блюд, которые уже есть в базе,
+часть из них с опечаткой. Без кеша измеряется SearchRepository,
+с кешем - эндпоинт поиска после прогрева. Выводятся перцентили задержки.
+
+Запуск из корня проекта (нужны PostgreSQL и Redis из .env с данными каталога):
+    PYTHONPATH=.:src python -m benchmarks.search --queries 500
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from httpx import AsyncClient
+from sqlalchemy import func, select
+
+from database import AsyncSession
+from main import app
+from menu_app.repositories.search_repository import SearchRepository
+from models.models import Dish
+
+url = '/api/v1/menus/search'
+
+
+async def get_queries(count: int) -> list[str]:
+    async with AsyncSession() as session:
+        titles = (await session.execute(
+            select(Dish.title).order_by(func.random()).limit(count)
+        )).scalars().all()
+    queries = []
+    for title in titles:
+        words = [word for word in title.split() if len(word) > 3]
+        query = random.choice(words)
+        if random.random() < 0.3:
+            position = random.randrange(1, len(query) - 1)
+            query = query[:position] + query[position + 1:]
+        queries.append(query.lower())
+    # Повторы попали бы в кеш уже при первом проходе
+    return list(dict.fromkeys(queries))
+
+
+def report(name: str, timings: list[float]) -> None:
+    timings = sorted(timings)
+    percentile = statistics.quantiles(timings, n=100)
+    print(f'{name:8} p50 {percentile[49] * 1000:7.1f} ms  '
+          f'p95 {percentile[94] * 1000:7.1f} ms  '
+          f'p99 {percentile[98] * 1000:7.1f} ms  '
+          f'max {timings[-1] * 1000:7.1f} ms')
+
+
+async def measure_repository(queries: list[str]) -> list[float]:
+    timings = []
+    hits = 0
+    async with AsyncSession() as session:
+        repository = SearchRepository(session)
+        for query in queries:
+            started = time.perf_counter()
+            items = await repository.search(query, 21, 0)
+            await repository.release()
+            timings.append(time.perf_counter() - started)
+            hits += bool(items)
+    print(f'queries with results: {hits}/{len(queries)}')
+    return timings
+
+
+async def measure_endpoint(queries: list[str]) -> list[float]:
+    timings = []
+    async with AsyncClient(app=app, base_url='http://bench') as client:
+        for query in queries:
+            # Прогрев прямо перед замером: результаты живут в кеше недолго
+            await client.get(url, params={'q': query})
+            started = time.perf_counter()
+            await client.get(url, params={'q': query})
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def run(queries_count: int) -> None:
+    async with AsyncSession() as session:
+        dishes = await session.scalar(select(func.count(Dish.id)))
+    print(f'dishes in catalogue: {dishes}')
+    queries = await get_queries(queries_count)
+    report('no cache', await measure_repository(queries))
+    report('cached', await measure_endpoint(queries))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.queries))
+
+
+if __name__ == '__main__':
+    main()
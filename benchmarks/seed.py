@@ -0,0 +1,209 @@
+"""
+Синтетический каталог для нагрузочных замеров: menus меню по submenus
+подменю по dishes блюд, до миллионов строк. Строки загружаются через
+COPY одной транзакцией, id задаются заранее, поэтому подменю и блюда
+не ждут id родителей. Триггеры outbox на время загрузки отключаются:
+вместо записи на каждую строку кеш каталога сбрасывается новым
+поколением, как при переполнении outbox. В очищенные таблицы (--truncate)
+строки загружаются без триграммных индексов, индексы строятся после
+загрузки: одна сборка быстрее вставки каждой строки в GIN.
+
+Названия уникальны и содержат id, описания собраны из небольшого
+словаря, цены случайные. С --truncate каталог
+перед загрузкой очищается.
+
+Запуск из корня проекта (нужны PostgreSQL и Redis):
+    PYTHONPATH=.:src python -m benchmarks.seed --menus 10 --submenus 100 --dishes 1000
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections.abc import Iterator
+from decimal import Decimal
+
+from sqlalchemy import func, select, text
+
+from database import AsyncSession, engine
+from menu_app.redis_backend import RedisBackend
+from menu_app.repositories.outbox_repository import OutboxRepository
+from menu_app.services.aggregate_service import aggregates
+from menu_app.services.version_service import versions
+from models.models import Dish, Menu, SubMenu
+
+# Слова описаний: поиск по ним находит много объектов
+WORDS = (
+    'томатный', 'сливочный', 'острый', 'копченый', 'домашний', 'лесной',
+    'морской', 'сырный', 'грибной', 'овощной', 'пряный', 'ягодный',
+    'ореховый', 'медовый', 'чесночный', 'лимонный',
+)
+
+# Триггеры outbox, которые отключаются на время загрузки
+OUTBOX_TRIGGERS = ('menu', 'submenu', 'dish')
+
+# Триграммные индексы поиска, которые строятся после загрузки
+TRGM_INDEXES = [
+    index
+    for model in (Menu, SubMenu, Dish)
+    for index in model.__table__.indexes
+    if index.name.endswith('_trgm')
+]
+
+
+def describe(rng: random.Random) -> str:
+    return ' '.join(rng.sample(WORDS, 3))
+
+
+def menu_records(start: int, count: int, rng: random.Random) -> Iterator:
+    for menu_id in range(start, start + count):
+        yield menu_id, f'Меню {menu_id}', describe(rng)
+
+
+def submenu_records(
+    menu_start: int,
+    start: int,
+    menus: int,
+    submenus: int,
+    rng: random.Random
+) -> Iterator:
+    submenu_id = start
+    for menu_id in range(menu_start, menu_start + menus):
+        for _ in range(submenus):
+            yield submenu_id, f'Подменю {submenu_id}', describe(rng), menu_id
+            submenu_id += 1
+
+
+def dish_records(
+    submenu_start: int,
+    start: int,
+    submenus: int,
+    dishes: int,
+    rng: random.Random
+) -> Iterator:
+    dish_id = start
+    for submenu_id in range(submenu_start, submenu_start + submenus):
+        for _ in range(dishes):
+            price = Decimal(rng.randrange(5000, 500000)) / 100
+            yield (
+                dish_id, f'Блюдо {dish_id}', describe(rng), price, submenu_id
+            )
+            dish_id += 1
+
+
+async def next_id(connection, model) -> int:
+    return (await connection.scalar(
+        select(func.coalesce(func.max(model.id), 0))
+    )) + 1
+
+
+async def load(
+    menus: int,
+    submenus: int,
+    dishes: int,
+    truncate: bool,
+    seed: int
+) -> dict[str, int]:
+    """Загружает каталог, возвращает количество строк по таблицам"""
+    rng = random.Random(seed)
+    async with engine.begin() as connection:
+        if truncate:
+            await connection.execute(text(
+                'TRUNCATE dish, submenu, menu, tombstone, cache_outbox '
+                'RESTART IDENTITY'
+            ))
+            for index in TRGM_INDEXES:
+                await connection.run_sync(index.drop)
+        menu_start = await next_id(connection, Menu)
+        submenu_start = await next_id(connection, SubMenu)
+        dish_start = await next_id(connection, Dish)
+        for table in OUTBOX_TRIGGERS:
+            await connection.execute(text(
+                f'ALTER TABLE {table} DISABLE TRIGGER {table}_outbox_insert'
+            ))
+        driver_connection = \
+            (await connection.get_raw_connection()).driver_connection
+        await driver_connection.copy_records_to_table(
+            'menu',
+            records=menu_records(menu_start, menus, rng),
+            columns=['id', 'title', 'description'],
+        )
+        await driver_connection.copy_records_to_table(
+            'submenu',
+            records=submenu_records(
+                menu_start, submenu_start, menus, submenus, rng
+            ),
+            columns=['id', 'title', 'description', 'menu_id'],
+        )
+        await driver_connection.copy_records_to_table(
+            'dish',
+            records=dish_records(
+                submenu_start, dish_start, menus * submenus, dishes, rng
+            ),
+            columns=['id', 'title', 'description', 'price', 'submenu_id'],
+        )
+        for table in OUTBOX_TRIGGERS:
+            await connection.execute(text(
+                f'ALTER TABLE {table} ENABLE TRIGGER {table}_outbox_insert'
+            ))
+        if truncate:
+            await connection.execute(
+                text("SET LOCAL maintenance_work_mem = '256MB'")
+            )
+            for index in TRGM_INDEXES:
+                await connection.run_sync(index.create)
+        # id заданы явно, последовательности продолжаются после них
+        for table in ('menu', 'submenu', 'dish'):
+            await connection.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f'(SELECT max(id) FROM {table}))'
+            ))
+    return {
+        'menu': menus,
+        'submenu': menus * submenus,
+        'dish': menus * submenus * dishes,
+    }
+
+
+async def reset_cache() -> None:
+    """
+    Сбрасывает кеш каталога новым поколением и сообщает о нем
+    запущенным процессам приложения, см. OutboxService.overflow
+    """
+    generation = await RedisBackend().bump_generation()
+    async with AsyncSession() as session:
+        repository = OutboxRepository(session)
+        await repository.notify_generation(generation)
+        await repository.commit()
+    await versions.bump_all()
+
+
+async def run(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    counts = await load(
+        args.menus, args.submenus, args.dishes, args.truncate, args.seed
+    )
+    loaded = time.perf_counter() - started
+    async with engine.connect() as connection:
+        await connection.execute(text('ANALYZE menu, submenu, dish'))
+    await aggregates.refresh()
+    await reset_cache()
+    rows = sum(counts.values())
+    print(', '.join(f'{table}: {count}' for table, count in counts.items()))
+    print(f'загрузка: {loaded:.1f} с ({rows / loaded:.0f} строк/с), '
+          f'всего с ANALYZE и пересчетом представлений: '
+          f'{time.perf_counter() - started:.1f} с')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--menus', type=int, default=10)
+    parser.add_argument('--submenus', type=int, default=100)
+    parser.add_argument('--dishes', type=int, default=90)
+    parser.add_argument('--truncate', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
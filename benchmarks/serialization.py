@@ -0,0 +1,119 @@
+"""
+Процессорное время на сериализацию ответа горячих GET-эндпоинтов.
+
+Сравниваются прежний путь (FastAPI проверяет объекты ORM по response_model,
+затем JSONResponse со стандартным json) и текущий (serializers
+и ORJSONResponse). Данные загружаются из базы один раз, замеряется
+только построение тела ответа.
+
+Запуск из корня проекта (нужен PostgreSQL из .env с данными каталога):
+    PYTHONPATH=.:src python -m benchmarks.serialization --calls 20
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections.abc import Callable
+from typing import Any
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import func, select
+
+from database import AsyncSession
+from menu_app import schemas, serializers
+from menu_app.repositories.dish_repository import DishRepository
+from menu_app.repositories.menu_repository import MenuRepository
+from menu_app.repositories.submenu_repository import SubMenuRepository
+from models.models import Dish, SubMenu
+
+
+async def measure(render: Callable, calls: int) -> float:
+    """Процессорное время на один вызов в микросекундах"""
+    await render()
+    started = time.process_time()
+    for _ in range(calls):
+        await render()
+    return (time.process_time() - started) / calls * 1e6
+
+
+async def compare(
+    name: str,
+    content: Any,
+    response_model: Any,
+    serializer: Callable,
+    calls: int
+) -> None:
+    field = create_response_field('Response', response_model)
+
+    async def validated() -> bytes:
+        data = await serialize_response(field=field, response_content=content)
+        return JSONResponse(data).body
+
+    async def fast() -> bytes:
+        if isinstance(content, list):
+            data = [serializer(obj) for obj in content]
+        else:
+            data = serializer(content)
+        return ORJSONResponse(data).body
+
+    assert json.loads(await validated()) == json.loads(await fast())
+    before = await measure(validated, calls)
+    after = await measure(fast, calls)
+    print(f'{name:32} response_model {before:10.0f} us  '
+          f'orjson {after:8.0f} us  x{before / after:5.1f}')
+
+
+async def run(calls: int) -> None:
+    async with AsyncSession() as session:
+        menu_id, submenu_id = (await session.execute(
+            select(SubMenu.menu_id, SubMenu.id).
+            join(Dish, Dish.submenu_id == SubMenu.id).
+            group_by(SubMenu.id).
+            order_by(func.count(Dish.id).desc()).
+            limit(1)
+        )).one()
+        menus = MenuRepository(session)
+        submenus = SubMenuRepository(session)
+        dishes = DishRepository(session)
+        menu_list = await menus.get_menu_list_with_counts()
+        menu_obj = await menus.get_menu_with_counts(menu_id)
+        submenu_list = await submenus.\
+            get_submenu_list_with_dishes_count(menu_id)
+        dish_list = await dishes.get_dish_list(menu_id, submenu_id)
+        all_list = await menus.get_all_list()
+
+    cases = [
+        ('GET /menus', menu_list,
+         list[schemas.MenuGet], serializers.menu),
+        ('GET /menus/{id}', menu_obj,
+         schemas.MenuGet, serializers.menu),
+        (f'GET .../submenus ({len(submenu_list)})', submenu_list,
+         list[schemas.SubMenuGet], serializers.submenu),
+        (f'GET .../dishes ({len(dish_list)})', dish_list,
+         list[schemas.DishGet], serializers.dish),
+        ('GET .../dishes/{id}', dish_list[0],
+         schemas.DishGet, serializers.dish),
+        ('GET /menus/all', all_list,
+         list[schemas.MenuWithNestedSubMenus],
+         serializers.menu_with_submenus),
+    ]
+    for name, content, response_model, serializer in cases:
+        # Большие ответы замеряются реже
+        size = len(content) if isinstance(content, list) else 1
+        await compare(
+            name, content, response_model, serializer,
+            max(1, calls * 100 // max(size, 100))
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+
+if __name__ == '__main__':
+    main()
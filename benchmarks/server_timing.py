@@ -0,0 +1,122 @@
+"""
+Накладные расходы Server-Timing (см. src/menu_app/timing.py).
+
+Хуки установлены всегда, поэтому сначала измеряется их цена без
+выборки: команда Redis через TimedRedis и обычный клиент, запрос SQL
+с обработчиками событий и без них. Затем gunicorn с одним рабочим
+процессом отвечает на GET списка меню и блюд из кеша (как в
+benchmarks.workers) при разной доле SERVER_TIMING_SAMPLE. Разброс
+между запусками на одном ядре достигает 15%, поэтому доли чередуются
+repeats раз, а в итог идет медиана.
+
+Запуск из корня проекта (нужны PostgreSQL с данными каталога и Redis):
+    PYTHONPATH=.:src python -m benchmarks.server_timing --samples 0 0.01 1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from redis import asyncio as aioredis
+from sqlalchemy import Engine, event, text
+
+from benchmarks.workers import get_urls, run_client, start_server
+from config import REDIS_HOST, REDIS_PORT
+from database import engine
+from menu_app import timing
+
+
+async def per_call(call, calls: int) -> float:
+    """Время одного вызова в мкс, лучшее из пяти повторов"""
+    for _ in range(100):
+        await call()
+    results = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(calls):
+            await call()
+        results.append((time.perf_counter() - started) / calls * 1e6)
+    return min(results)
+
+
+async def hooks(calls: int) -> None:
+    url = f'redis://{REDIS_HOST}:{REDIS_PORT}'
+    for name, client in (
+        ('Redis GET', aioredis.from_url(url)),
+        ('Redis GET, TimedRedis', timing.TimedRedis.from_url(url)),
+    ):
+        cost = await per_call(lambda: client.get('server_timing'), calls)
+        print(f'{name:30}: {cost:6.1f} мкс')
+        await client.close()
+
+    async with engine.connect() as connection:
+        async def select():
+            await connection.execute(text('SELECT 1'))
+
+        listeners = (
+            ('before_cursor_execute', timing._before_cursor_execute),
+            ('after_cursor_execute', timing._after_cursor_execute),
+        )
+        for name, installed in (
+            ('SELECT 1, без обработчиков', False),
+            ('SELECT 1, с обработчиками', True),
+        ):
+            for identifier, listener in listeners:
+                if installed:
+                    event.listen(Engine, identifier, listener)
+                else:
+                    event.remove(Engine, identifier, listener)
+            cost = await per_call(select, calls)
+            print(f'{name:30}: {cost:6.1f} мкс')
+    await engine.dispose()
+
+
+def measure(
+    sample: float,
+    port: int,
+    urls: list[str],
+    connections: int,
+    duration: float
+) -> tuple[float, float, float]:
+    """Запросы в секунду, p50 и p99 времени ответа в мс"""
+    server = start_server(1, port, {'SERVER_TIMING_SAMPLE': str(sample)})
+    try:
+        with ProcessPoolExecutor(1) as pool:
+            for phase in (1, duration):
+                timings = pool.submit(
+                    run_client, (port, urls, connections, phase)
+                ).result()
+    finally:
+        server.terminate()
+        server.wait()
+    percentiles = statistics.quantiles(timings, n=100)
+    return len(timings) / duration, percentiles[49], percentiles[98]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--samples', type=float, nargs='+', default=[0, 0.01, 1])
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--port', type=int, default=8100)
+    args = parser.parse_args()
+    asyncio.run(hooks(args.calls))
+    urls = asyncio.run(get_urls(20))
+    results: dict[float, list[tuple[float, float, float]]] = \
+        {sample: [] for sample in args.samples}
+    for _ in range(args.repeats):
+        for sample in args.samples:
+            results[sample].append(measure(
+                sample, args.port, urls, args.connections, args.duration
+            ))
+    for sample, runs in results.items():
+        rps, p50, p99 = (statistics.median(values) for values in zip(*runs))
+        print(f'SERVER_TIMING_SAMPLE={sample:<5}: {rps:6.0f} запросов/с, '
+              f'p50 {p50:6.2f} мс, p99 {p99:6.2f} мс')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Пропускная способность и задержки сервера для продакшена
+(gunicorn с рабочими процессами uvicorn, см. src/gunicorn.conf.py)
+при разном числе рабочих процессов на одной машине.
+
+Для каждого числа процессов запускается gunicorn, нагрузку дают
+отдельные процессы-клиенты по keep-alive соединениям: GET списка
+меню и блюд по кругу, ответы берутся из кеша. Первые секунды
+нагрузки прогревают пулы и кеш и не учитываются. Клиенты делят
+машину с сервером, поэтому выигрыш ограничен числом ядер.
+
+Запуск из корня проекта (нужны PostgreSQL с данными каталога и Redis):
+    PYTHONPATH=.:src python -m benchmarks.workers --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import re
+import signal
+import statistics
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+from sqlalchemy import select
+
+from database import AsyncSession
+from models.models import Dish, SubMenu
+
+prefix = '/api/v1/menus'
+HOST = '127.0.0.1'
+CONTENT_LENGTH = re.compile(rb'content-length: (\d+)', re.IGNORECASE)
+
+
+async def get_urls(count: int) -> list[str]:
+    """
+    Адреса списка меню и count блюд одного подменю. Меню и подменю
+    не берутся: заполнение их кеша удаляет кеш вложенных объектов,
+    и нагрузка уходила бы в базу
+    """
+    async with AsyncSession() as session:
+        rows = (await session.execute(
+            select(SubMenu.menu_id, SubMenu.id, Dish.id).
+            join(Dish, Dish.submenu_id == SubMenu.id).
+            where(SubMenu.id == select(Dish.submenu_id).
+                  limit(1).scalar_subquery()).
+            order_by(Dish.id).
+            limit(count)
+        )).all()
+    return [prefix] + [
+        f'{prefix}/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}'
+        for menu_id, submenu_id, dish_id in rows
+    ]
+
+
+def content_length(head: bytes) -> int:
+    """Длина тела из заголовков ответа, без нее тело не прочитать"""
+    match = CONTENT_LENGTH.search(head)
+    if match is None:
+        raise RuntimeError(f'response has no Content-Length: {head!r}')
+    return int(match[1])
+
+
+async def keep_alive_client(
+    port: int,
+    requests: list[bytes],
+    deadline: float
+) -> list[float]:
+    """Запросы по одному соединению до deadline, время ответов в мс"""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    timings = []
+    index = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        writer.write(requests[index % len(requests)])
+        head = await reader.readuntil(b'\r\n\r\n')
+        assert head.startswith(b'HTTP/1.1 200'), head
+        await reader.readexactly(content_length(head))
+        timings.append((time.perf_counter() - started) * 1e3)
+        index += 1
+    writer.close()
+    return timings
+
+
+async def load(
+    port: int,
+    urls: list[str],
+    connections: int,
+    duration: float
+) -> list[float]:
+    deadline = time.perf_counter() + duration
+    results = await asyncio.gather(*(
+        keep_alive_client(
+            port,
+            [
+                f'GET {url} HTTP/1.1\r\nHost: bench\r\n\r\n'.encode()
+                for url in urls[number:] + urls[:number]
+            ],
+            deadline
+        )
+        for number in range(connections)
+    ))
+    return [timing for timings in results for timing in timings]
+
+
+def run_client(args: tuple) -> list[float]:
+    """Процесс-клиент со своим циклом событий"""
+    return asyncio.run(load(*args))
+
+
+def start_server(
+    workers: int,
+    port: int,
+    env: dict[str, str] | None = None
+) -> subprocess.Popen:
+    """Запускает gunicorn и ждет, пока он начнет отвечать"""
+    server = subprocess.Popen(
+        ['gunicorn', 'main:app', '--workers', str(workers),
+         '--bind', f'{HOST}:{port}'],
+        cwd='src',
+        env={**os.environ, 'SERVER_MAX_REQUESTS': '0', **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(300):
+        try:
+            httpx.get(f'http://{HOST}:{port}{prefix}')
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('gunicorn did not start')
+
+
+def measure(
+    workers: int,
+    port: int,
+    urls: list[str],
+    clients: int,
+    connections: int,
+    duration: float,
+    warmup: float
+) -> tuple[float, float, float]:
+    """Запросы в секунду, p50 и p99 времени ответа в мс"""
+    server = start_server(workers, port)
+    try:
+        with ProcessPoolExecutor(clients) as pool:
+            for phase in (warmup, duration):
+                results = list(pool.map(
+                    run_client,
+                    [(port, urls, connections // clients, phase)] * clients
+                ))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    timings = [timing for result in results for timing in result]
+    percentiles = statistics.quantiles(timings, n=100)
+    return len(timings) / duration, percentiles[49], percentiles[98]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--clients', type=int, default=2)
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--dishes', type=int, default=20)
+    args = parser.parse_args()
+    urls = asyncio.run(get_urls(args.dishes))
+    print(f'ядер: {os.cpu_count()}, клиентов: {args.clients}, '
+          f'соединений: {args.connections}')
+    for workers in args.workers:
+        rps, p50, p99 = measure(
+            workers, args.port, urls, args.clients,
+            args.connections, args.duration, args.warmup
+        )
+        print(f'{workers:2} процессов: {rps:8.0f} запросов/с, '
+              f'p50 {p50:7.2f} мс, p99 {p99:7.2f} мс')
+
+
+if __name__ == '__main__':
+    main()
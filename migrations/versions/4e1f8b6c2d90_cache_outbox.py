@@ -0,0 +1,132 @@
+"""'cache outbox'
+
+Revision ID: 4e1f8b6c2d90
+Revises: a9d3e5c7b214
+Create Date: 2026-10-19 23:41:07.215386
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '4e1f8b6c2d90'
+down_revision = 'a9d3e5c7b214'
+branch_labels = None
+depends_on = None
+
+TABLES = ('menu', 'submenu', 'dish')
+
+OUTBOX_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION menu_outbox() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO cache_outbox (menu_id)
+            SELECT id FROM old_rows WHERE deleted_at IS NULL;
+        ELSE
+            INSERT INTO cache_outbox (menu_id) SELECT id FROM new_rows;
+        END IF;
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION submenu_outbox() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO cache_outbox (menu_id, submenu_id)
+            SELECT old_rows.menu_id, old_rows.id
+            FROM old_rows JOIN menu ON menu.id = old_rows.menu_id
+            WHERE old_rows.deleted_at IS NULL AND menu.deleted_at IS NULL;
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            INSERT INTO cache_outbox (menu_id, submenu_id)
+            SELECT old_rows.menu_id, old_rows.id
+            FROM old_rows
+            JOIN new_rows ON new_rows.id = old_rows.id
+            JOIN menu ON menu.id = old_rows.menu_id
+            WHERE old_rows.menu_id IS DISTINCT FROM new_rows.menu_id
+                AND menu.deleted_at IS NULL;
+        END IF;
+        INSERT INTO cache_outbox (menu_id, submenu_id)
+        SELECT new_rows.menu_id, new_rows.id
+        FROM new_rows JOIN menu ON menu.id = new_rows.menu_id
+        WHERE menu.deleted_at IS NULL;
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dish_outbox() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO cache_outbox (menu_id, submenu_id, dish_id)
+            SELECT submenu.menu_id, submenu.id, old_rows.id
+            FROM old_rows
+            JOIN submenu ON submenu.id = old_rows.submenu_id
+            JOIN menu ON menu.id = submenu.menu_id
+            WHERE submenu.deleted_at IS NULL AND menu.deleted_at IS NULL;
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            INSERT INTO cache_outbox (menu_id, submenu_id, dish_id)
+            SELECT submenu.menu_id, submenu.id, old_rows.id
+            FROM old_rows
+            JOIN new_rows ON new_rows.id = old_rows.id
+            JOIN submenu ON submenu.id = old_rows.submenu_id
+            JOIN menu ON menu.id = submenu.menu_id
+            WHERE old_rows.submenu_id IS DISTINCT FROM new_rows.submenu_id
+                AND submenu.deleted_at IS NULL AND menu.deleted_at IS NULL;
+        END IF;
+        INSERT INTO cache_outbox (menu_id, submenu_id, dish_id)
+        SELECT submenu.menu_id, submenu.id, new_rows.id
+        FROM new_rows
+        JOIN submenu ON submenu.id = new_rows.submenu_id
+        JOIN menu ON menu.id = submenu.menu_id
+        WHERE submenu.deleted_at IS NULL AND menu.deleted_at IS NULL;
+        RETURN NULL;
+    END $$
+    """,
+    # Триггеры с таблицами переходов - на каждое событие отдельно
+    *(
+        f"""
+        CREATE TRIGGER {table}_outbox_{operation} AFTER {operation} ON {table}
+        REFERENCING {transition_tables}
+        FOR EACH STATEMENT EXECUTE FUNCTION {table}_outbox()
+        """
+        for table in TABLES
+        for operation, transition_tables in (
+            ('insert', 'NEW TABLE AS new_rows'),
+            ('update', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('delete', 'OLD TABLE AS old_rows'),
+        )
+    ),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'cache_outbox',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('menu_id', sa.Integer(), nullable=False),
+        sa.Column('submenu_id', sa.Integer(), nullable=True),
+        sa.Column('dish_id', sa.Integer(), nullable=True),
+        sa.Column(
+            'created_at', sa.DateTime(timezone=True), nullable=False,
+            server_default=sa.func.now()
+        ),
+        sa.Column('dispatched_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    for statement in OUTBOX_DDL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        for operation in ('insert', 'update', 'delete'):
+            op.execute(f'DROP TRIGGER {table}_outbox_{operation} ON {table}')
+        op.execute(f'DROP FUNCTION {table}_outbox()')
+    op.drop_table('cache_outbox')
@@ -0,0 +1,37 @@
+"""'search trgm indexes'
+
+Revision ID: 5b8f2c1d9e47
+Revises: 03ed0037ad18
+Create Date: 2026-10-19 14:35:12.402118
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5b8f2c1d9e47'
+down_revision = '03ed0037ad18'
+branch_labels = None
+depends_on = None
+
+TRGM_COLUMNS = [
+    (table, column)
+    for table in ('menu', 'submenu', 'dish')
+    for column in ('title', 'description')
+]
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in TRGM_COLUMNS:
+        op.create_index(
+            f'ix_{table}_{column}_trgm',
+            table,
+            [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+
+def downgrade() -> None:
+    for table, column in TRGM_COLUMNS:
+        op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
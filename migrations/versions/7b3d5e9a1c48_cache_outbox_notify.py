@@ -0,0 +1,56 @@
+"""'cache outbox notify'
+
+Revision ID: 7b3d5e9a1c48
+Revises: 4e1f8b6c2d90
+Create Date: 2026-10-20 01:12:44.603918
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '7b3d5e9a1c48'
+down_revision = '4e1f8b6c2d90'
+branch_labels = None
+depends_on = None
+
+NOTIFY_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION cache_outbox_notify() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        changed integer;
+        payload text;
+    BEGIN
+        SELECT count(*) INTO changed FROM new_rows;
+        IF changed = 0 THEN
+            RETURN NULL;
+        END IF;
+        IF changed <= 1000 THEN
+            SELECT string_agg(
+                concat_ws(':', menu_id, submenu_id, dish_id), ',' ORDER BY id
+            ) INTO payload
+            FROM new_rows;
+        END IF;
+        IF payload IS NULL OR octet_length(payload) >= 8000 THEN
+            payload := '*' || changed;
+        END IF;
+        PERFORM pg_notify('cache_outbox', payload);
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE TRIGGER cache_outbox_notify AFTER INSERT ON cache_outbox
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_outbox_notify()
+    """,
+)
+
+
+def upgrade() -> None:
+    for statement in NOTIFY_DDL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER cache_outbox_notify ON cache_outbox')
+    op.execute('DROP FUNCTION cache_outbox_notify()')
@@ -0,0 +1,44 @@
+"""'soft delete'
+
+Revision ID: 8c3e6a0f2b51
+Revises: 5b8f2c1d9e47
+Create Date: 2026-10-19 15:02:44.918305
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8c3e6a0f2b51'
+down_revision = '5b8f2c1d9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ('menu', 'submenu'):
+        op.add_column(
+            table,
+            sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True)
+        )
+        op.drop_constraint(f'{table}_title_key', table, type_='unique')
+        op.create_index(
+            f'uq_{table}_title', table, ['title'],
+            unique=True, postgresql_where=sa.text('deleted_at IS NULL')
+        )
+        op.create_index(
+            f'ix_{table}_deleted_at', table, ['deleted_at'],
+            postgresql_where=sa.text('deleted_at IS NOT NULL')
+        )
+    op.create_index('ix_submenu_menu_id', 'submenu', ['menu_id'])
+    op.create_index('ix_dish_submenu_id', 'dish', ['submenu_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_dish_submenu_id', table_name='dish')
+    op.drop_index('ix_submenu_menu_id', table_name='submenu')
+    for table in ('menu', 'submenu'):
+        op.drop_index(f'ix_{table}_deleted_at', table_name=table)
+        op.drop_index(f'uq_{table}_title', table_name=table)
+        op.create_unique_constraint(f'{table}_title_key', table, ['title'])
+        op.drop_column(table, 'deleted_at')
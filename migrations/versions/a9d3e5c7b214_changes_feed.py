@@ -0,0 +1,126 @@
+"""'changes feed'
+
+Revision ID: a9d3e5c7b214
+Revises: f7b2c94d1e36
+Create Date: 2026-10-19 21:06:18.530914
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e5c7b214'
+down_revision = 'f7b2c94d1e36'
+branch_labels = None
+depends_on = None
+
+TABLES = ('menu', 'submenu', 'dish')
+
+# Существующие строки получают версию 0 и попадают в ленту
+# при первой синхронизации (since=0)
+CHANGES_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION catalogue_touch() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.version := pg_current_xact_id()::text::bigint;
+        NEW.updated_at := now();
+        RETURN NEW;
+    END $$
+    """,
+    *(
+        f"""
+        CREATE TRIGGER {table}_touch BEFORE INSERT OR UPDATE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION catalogue_touch()
+        """
+        for table in TABLES
+    ),
+    """
+    CREATE OR REPLACE FUNCTION catalogue_soft_delete() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- Аргумент триггера - столбец с id меню
+        INSERT INTO tombstone (entity, object_id, menu_id, version)
+        VALUES (
+            TG_TABLE_NAME, NEW.id,
+            (to_jsonb(NEW) ->> TG_ARGV[0])::integer, NEW.version
+        );
+        RETURN NULL;
+    END $$
+    """,
+    *(
+        f"""
+        CREATE TRIGGER {table}_soft_delete AFTER UPDATE OF deleted_at
+        ON {table} FOR EACH ROW
+        WHEN (OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL)
+        EXECUTE FUNCTION catalogue_soft_delete('{menu_column}')
+        """
+        for table, menu_column in (('menu', 'id'), ('submenu', 'menu_id'))
+    ),
+    """
+    CREATE OR REPLACE FUNCTION dish_delete() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO tombstone (entity, object_id, menu_id, submenu_id, version)
+        SELECT 'dish', deleted.id, submenu.menu_id, submenu.id,
+               pg_current_xact_id()::text::bigint
+        FROM deleted
+        JOIN submenu ON submenu.id = deleted.submenu_id
+        JOIN menu ON menu.id = submenu.menu_id
+        WHERE submenu.deleted_at IS NULL AND menu.deleted_at IS NULL;
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE TRIGGER dish_delete AFTER DELETE ON dish
+    REFERENCING OLD TABLE AS deleted
+    FOR EACH STATEMENT EXECUTE FUNCTION dish_delete()
+    """,
+)
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column(
+            'version', sa.BigInteger(), nullable=False, server_default='0'
+        ))
+        op.add_column(table, sa.Column(
+            'updated_at', sa.DateTime(timezone=True), nullable=False,
+            server_default=sa.func.now()
+        ))
+        op.create_index(f'ix_{table}_version', table, ['version', 'id'])
+    op.create_table(
+        'tombstone',
+        sa.Column('id', sa.BigInteger(), nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('object_id', sa.Integer(), nullable=False),
+        sa.Column('menu_id', sa.Integer(), nullable=False),
+        sa.Column('submenu_id', sa.Integer(), nullable=True),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column(
+            'deleted_at', sa.DateTime(timezone=True), nullable=False,
+            server_default=sa.func.now()
+        ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_tombstone_version', 'tombstone', ['version', 'id']
+    )
+    for statement in CHANGES_DDL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    op.execute('DROP TRIGGER dish_delete ON dish')
+    for table in ('menu', 'submenu'):
+        op.execute(f'DROP TRIGGER {table}_soft_delete ON {table}')
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_touch ON {table}')
+    for function in ('dish_delete', 'catalogue_soft_delete', 'catalogue_touch'):
+        op.execute(f'DROP FUNCTION {function}()')
+    op.drop_index('ix_tombstone_version', table_name='tombstone')
+    op.drop_table('tombstone')
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_version', table_name=table)
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
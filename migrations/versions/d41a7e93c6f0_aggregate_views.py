@@ -0,0 +1,53 @@
+"""'aggregate views'
+
+Revision ID: d41a7e93c6f0
+Revises: 8c3e6a0f2b51
+Create Date: 2026-10-19 17:41:09.527130
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd41a7e93c6f0'
+down_revision = '8c3e6a0f2b51'
+branch_labels = None
+depends_on = None
+
+
+MENU_STATS_QUERY = """
+    SELECT menu.id AS menu_id,
+           count(DISTINCT submenu.id) AS submenus_count,
+           count(dish.id) AS dishes_count
+    FROM menu
+    LEFT JOIN submenu
+        ON submenu.menu_id = menu.id AND submenu.deleted_at IS NULL
+    LEFT JOIN dish ON dish.submenu_id = submenu.id
+    WHERE menu.deleted_at IS NULL
+    GROUP BY menu.id
+"""
+
+SUBMENU_STATS_QUERY = """
+    SELECT submenu.id AS submenu_id,
+           count(dish.id) AS dishes_count
+    FROM submenu
+    LEFT JOIN dish ON dish.submenu_id = submenu.id
+    WHERE submenu.deleted_at IS NULL
+    GROUP BY submenu.id
+"""
+
+
+def upgrade() -> None:
+    op.execute(f'CREATE MATERIALIZED VIEW menu_stats AS {MENU_STATS_QUERY}')
+    op.execute('CREATE UNIQUE INDEX uq_menu_stats_menu_id ON menu_stats (menu_id)')
+    op.execute(
+        f'CREATE MATERIALIZED VIEW submenu_stats AS {SUBMENU_STATS_QUERY}'
+    )
+    op.execute(
+        'CREATE UNIQUE INDEX uq_submenu_stats_submenu_id '
+        'ON submenu_stats (submenu_id)'
+    )
+
+
+def downgrade() -> None:
+    op.execute('DROP MATERIALIZED VIEW submenu_stats')
+    op.execute('DROP MATERIALIZED VIEW menu_stats')
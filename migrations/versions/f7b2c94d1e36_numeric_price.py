@@ -0,0 +1,124 @@
+"""'numeric price'
+
+Revision ID: f7b2c94d1e36
+Revises: d41a7e93c6f0
+Create Date: 2026-10-19 19:12:37.402816
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'f7b2c94d1e36'
+down_revision = 'd41a7e93c6f0'
+branch_labels = None
+depends_on = None
+
+# Сколько строк заполняется за одну транзакцию
+BACKFILL_BATCH_SIZE = 10000
+
+BACKFILL_BATCH = sa.text("""
+    UPDATE dish SET price_numeric = price::numeric(12, 2)
+    WHERE id IN (
+        SELECT id FROM dish WHERE price_numeric IS NULL LIMIT :limit
+    )
+""")
+
+MENU_STATS_QUERY = """
+    SELECT menu.id AS menu_id,
+           count(DISTINCT submenu.id) AS submenus_count,
+           count(dish.id) AS dishes_count,
+           min(dish.price) AS min_price,
+           max(dish.price) AS max_price,
+           round(avg(dish.price), 2) AS avg_price
+    FROM menu
+    LEFT JOIN submenu
+        ON submenu.menu_id = menu.id AND submenu.deleted_at IS NULL
+    LEFT JOIN dish ON dish.submenu_id = submenu.id
+    WHERE menu.deleted_at IS NULL
+    GROUP BY menu.id
+"""
+
+SUBMENU_STATS_QUERY = """
+    SELECT submenu.id AS submenu_id,
+           count(dish.id) AS dishes_count,
+           min(dish.price) AS min_price,
+           max(dish.price) AS max_price,
+           round(avg(dish.price), 2) AS avg_price
+    FROM submenu
+    LEFT JOIN dish ON dish.submenu_id = submenu.id
+    WHERE submenu.deleted_at IS NULL
+    GROUP BY submenu.id
+"""
+
+OLD_MENU_STATS_QUERY = """
+    SELECT menu.id AS menu_id,
+           count(DISTINCT submenu.id) AS submenus_count,
+           count(dish.id) AS dishes_count
+    FROM menu
+    LEFT JOIN submenu
+        ON submenu.menu_id = menu.id AND submenu.deleted_at IS NULL
+    LEFT JOIN dish ON dish.submenu_id = submenu.id
+    WHERE menu.deleted_at IS NULL
+    GROUP BY menu.id
+"""
+
+OLD_SUBMENU_STATS_QUERY = """
+    SELECT submenu.id AS submenu_id,
+           count(dish.id) AS dishes_count
+    FROM submenu
+    LEFT JOIN dish ON dish.submenu_id = submenu.id
+    WHERE submenu.deleted_at IS NULL
+    GROUP BY submenu.id
+"""
+
+
+def create_views(menu_stats_query: str, submenu_stats_query: str) -> None:
+    op.execute(f'CREATE MATERIALIZED VIEW menu_stats AS {menu_stats_query}')
+    op.execute('CREATE UNIQUE INDEX uq_menu_stats_menu_id ON menu_stats (menu_id)')
+    op.execute(
+        f'CREATE MATERIALIZED VIEW submenu_stats AS {submenu_stats_query}'
+    )
+    op.execute(
+        'CREATE UNIQUE INDEX uq_submenu_stats_submenu_id '
+        'ON submenu_stats (submenu_id)'
+    )
+
+
+def drop_views() -> None:
+    op.execute('DROP MATERIALIZED VIEW submenu_stats')
+    op.execute('DROP MATERIALIZED VIEW menu_stats')
+
+
+def upgrade() -> None:
+    # ALTER COLUMN TYPE переписал бы таблицу под блокировкой целиком.
+    # Вместо этого новая колонка заполняется короткими транзакциями,
+    # а под блокировкой пересчитываются строки, записанные или измененные
+    # за это время: цена могла измениться уже после заполнения ее пачки
+    op.add_column('dish', sa.Column('price_numeric', sa.Numeric(12, 2)))
+    with op.get_context().autocommit_block():
+        while op.get_bind().execute(
+            BACKFILL_BATCH, {'limit': BACKFILL_BATCH_SIZE}
+        ).rowcount:
+            pass
+    op.execute('LOCK TABLE dish IN ACCESS EXCLUSIVE MODE')
+    op.execute(
+        'UPDATE dish SET price_numeric = price::numeric(12, 2) '
+        'WHERE price_numeric IS DISTINCT FROM price::numeric(12, 2)'
+    )
+    drop_views()
+    op.drop_column('dish', 'price')
+    op.alter_column(
+        'dish', 'price_numeric', new_column_name='price', nullable=False
+    )
+    create_views(MENU_STATS_QUERY, SUBMENU_STATS_QUERY)
+
+
+def downgrade() -> None:
+    drop_views()
+    op.alter_column(
+        'dish', 'price',
+        type_=sa.String(),
+        postgresql_using='price::text'
+    )
+    create_views(OLD_MENU_STATS_QUERY, OLD_SUBMENU_STATS_QUERY)
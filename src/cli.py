@@ -0,0 +1,104 @@
+"""
+Команды обслуживания каталога.
+
+Запуск из директории src:
+    python cli.py import menu.xlsx [--prune]
+    python cli.py export catalogue.csv [--format xlsx] [--gzip]
+    python cli.py audit [--sample 0.1] [--rate 500] [--repair]
+"""
+import argparse
+import asyncio
+
+from fastapi import BackgroundTasks
+
+from config import AUDIT_RATE, AUDIT_SAMPLE
+from database import AsyncSession
+from menu_app.redis_backend import RedisBackend
+from menu_app.repositories.import_repository import ImportRepository
+from menu_app.repositories.menu_repository import MenuRepository
+from menu_app.schemas import ExportFormat
+from menu_app.services.aggregate_service import aggregates
+from menu_app.services.audit_service import AuditService
+from menu_app.services.export_service import ExportService
+from menu_app.services.import_service import ImportService
+
+
+async def import_catalogue(args: argparse.Namespace) -> None:
+    """Импортирует каталог из файла csv или xlsx"""
+    async with AsyncSession() as session:
+        import_service = ImportService(
+            BackgroundTasks(), ImportRepository(session)
+        )
+        report = await import_service.import_file(args.path, args.prune)
+    # Процесс завершится раньше отложенного пересчета представлений
+    await aggregates.wait()
+    print(report.model_dump_json(indent=2))
+
+
+async def export_catalogue(args: argparse.Namespace) -> None:
+    """Выгружает каталог в файл csv или xlsx"""
+    async with AsyncSession() as session:
+        export_service = ExportService(MenuRepository(session))
+        with open(args.path, 'wb') as file:
+            async for chunk in export_service.export(args.format, args.gzip):
+                file.write(chunk)
+
+
+async def audit_cache(args: argparse.Namespace) -> None:
+    """Сверяет кеш каталога с базой"""
+    await RedisBackend().load_generation()
+    audit_service = AuditService(rate=args.rate, sample=args.sample)
+    report = await audit_service.audit(args.repair)
+    print(report.model_dump_json(indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser(
+        'import', help='импорт каталога из файла csv или xlsx'
+    )
+    import_parser.add_argument('path')
+    import_parser.add_argument(
+        '--prune', action='store_true',
+        help='удалить меню, подменю и блюда, которых нет в файле'
+    )
+    import_parser.set_defaults(handler=import_catalogue)
+
+    export_parser = commands.add_parser(
+        'export', help='выгрузка каталога в файл csv или xlsx'
+    )
+    export_parser.add_argument('path')
+    export_parser.add_argument(
+        '--format', type=ExportFormat, default=ExportFormat.csv,
+        choices=list(ExportFormat)
+    )
+    export_parser.add_argument(
+        '--gzip', action='store_true', help='сжать файл в gzip'
+    )
+    export_parser.set_defaults(handler=export_catalogue)
+
+    audit_parser = commands.add_parser(
+        'audit', help='сверка кеша каталога с базой'
+    )
+    audit_parser.add_argument(
+        '--sample', type=float, default=AUDIT_SAMPLE,
+        help='доля проверяемых ключей'
+    )
+    audit_parser.add_argument(
+        '--rate', type=float, default=AUDIT_RATE,
+        help='не больше стольких ключей в секунду'
+    )
+    audit_parser.add_argument(
+        '--repair', action='store_true',
+        help='удалить из кеша значения, которые расходятся с базой'
+    )
+    audit_parser.set_defaults(handler=audit_cache)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == '__main__':
+    main()
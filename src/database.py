@@ -1,20 +1,274 @@
+import asyncio
+import itertools
+import time
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-
-from config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from sqlalchemy import URL, Engine, make_url, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
+from config import (
+    DB_HOST,
+    DB_MAX_OVERFLOW,
+    DB_NAME,
+    DB_PASS,
+    DB_PGBOUNCER,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_PORT,
+    DB_REPLICA_CHECK_INTERVAL,
+    DB_REPLICA_MAX_LAG,
+    DB_REPLICA_URLS,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_USER,
+)
+from metrics import (
+    DB_POOL_CHECKOUT,
+    DB_POOL_IN_USE,
+    DB_POOL_OVERFLOW,
+    DB_REPLICA_FALLBACK,
+    DB_REPLICA_LAG,
+    DB_ROUTE,
+)
 
 DATABASE_URL =\
     f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 
+# Ключи Session.info: пул реплик и признак закрепления за основной базой
+REPLICAS = 'replicas'
+USE_PRIMARY = 'use_primary'
+
+# Отставание реплики в секундах. Если реплика проиграла все полученные
+# изменения, она не отстает, даже если запись на основной базе давно не было
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery()
+            OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END::float
+    """
+)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который измеряет время выдачи соединения.
+    Заполненность пула обновляется при выдаче и возврате соединения,
+    а не вычисляется при чтении метрик: под gunicorn метрики
+    собираются из файлов всех процессов, и вычисляемые значения
+    туда не попадают
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT.labels(self.logging_name).\
+                observe(time.perf_counter() - start)
+
+    def _do_get(self):
+        connection = super()._do_get()
+        self.__update_metrics()
+        return connection
+
+    def _do_return_conn(self, record) -> None:
+        super()._do_return_conn(record)
+        self.__update_metrics()
+
+    def __update_metrics(self) -> None:
+        DB_POOL_IN_USE.labels(self.logging_name).set(self.checkedout())
+        DB_POOL_OVERFLOW.labels(self.logging_name).\
+            set(max(self.overflow(), 0))
+
+
+def get_engine_name(url: URL) -> str:
+    """Возвращает имя базы для метрик, без логина и пароля"""
+    return f'{url.host}:{url.port}/{url.database}'
+
+
+def create_db_engine(url: str, pgbouncer: bool = DB_PGBOUNCER) -> AsyncEngine:
+    """Создает движок с пулом соединений по настройкам из config"""
+    connect_args = {'prepared_statement_cache_size': DB_STATEMENT_CACHE_SIZE}
+    if pgbouncer:
+        connect_args = {
+            'statement_cache_size': 0,
+            'prepared_statement_cache_size': 0,
+        }
+    name = get_engine_name(make_url(url))
+    engine = create_async_engine(
+        url,
+        pool_logging_name=name,
+        poolclass=InstrumentedPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+    return engine
+
+
+async def warm_up(engine: AsyncEngine, size: int) -> None:
+    """
+    Открывает size соединений и возвращает их в пул, чтобы первые
+    запросы процесса не ждали подключения. Недоступная база
+    не мешает старту: соединения откроются при первых запросах
+    """
+    connections = await asyncio.gather(
+        *(engine.connect().start() for _ in range(size)),
+        return_exceptions=True
+    )
+    for conn in connections:
+        if not isinstance(conn, BaseException):
+            await conn.close()
+
+
+class ReplicaPool:
+    """
+    Реплики для чтения.
+    Реплика исключается из ротации, если она недоступна
+    или отстает от основной базы больше чем на max_lag секунд
+    """
+
+    def __init__(self, urls: list[str], max_lag: float) -> None:
+        self.engines = [create_db_engine(url) for url in urls]
+        self.max_lag = max_lag
+        self.__available = list(self.engines)
+        self.__fallback_reason = 'unavailable'
+        self.__counter = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def choose(self) -> Engine | None:
+        """Возвращает следующую доступную реплику по кругу"""
+        if not self.__available:
+            DB_REPLICA_FALLBACK.labels(self.__fallback_reason).inc()
+            return None
+        index = next(self.__counter) % len(self.__available)
+        return self.__available[index].sync_engine
+
+    async def check_lag(self) -> None:
+        """Проверяет отставание реплик и обновляет список доступных"""
+        available = []
+        fallback_reason = 'unavailable'
+        for engine in self.engines:
+            try:
+                lag = await asyncio.wait_for(
+                    self.__get_lag(engine), DB_REPLICA_CHECK_INTERVAL
+                )
+            except (OSError, asyncio.TimeoutError, SQLAlchemyError):
+                continue
+            DB_REPLICA_LAG.labels(get_engine_name(engine.url)).set(lag)
+            if lag > self.max_lag:
+                fallback_reason = 'lag'
+                continue
+            available.append(engine)
+        self.__available = available
+        self.__fallback_reason = fallback_reason
+
+    async def run_lag_monitor(self) -> None:
+        """Периодически проверяет отставание реплик"""
+        while True:
+            await self.check_lag()
+            await asyncio.sleep(DB_REPLICA_CHECK_INTERVAL)
+
+    @staticmethod
+    async def __get_lag(engine: AsyncEngine) -> float:
+        async with engine.connect() as connection:
+            return (await connection.execute(REPLICA_LAG_QUERY)).scalar()
+
+
+class RoutingSession(Session):
+    """
+    Сессия, которая отправляет чтение на реплики, а запись - в основную базу.
+    После первой записи сессия закрепляется за основной базой,
+    чтобы следующие чтения в том же запросе видели записанные данные
+    """
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        primary = super().get_bind(mapper, clause=clause, **kwargs)
+        if self.info.get(USE_PRIMARY):
+            DB_ROUTE.labels('primary', 'pinned').inc()
+            return primary
+        if self._flushing or not getattr(clause, 'is_select', False):
+            self.info[USE_PRIMARY] = True
+            DB_ROUTE.labels('primary', 'write').inc()
+            return primary
+
+        replicas = self.info.get(REPLICAS)
+        if not replicas:
+            DB_ROUTE.labels('primary', 'read').inc()
+            return primary
+        replica = replicas.choose()
+        if replica is None:
+            DB_ROUTE.labels('primary', 'fallback').inc()
+            return primary
+        DB_ROUTE.labels('replica', 'read').inc()
+        return replica
+
+
+class LazySession:
+    """
+    Откладывает создание сессии до первого обращения к ней.
+    Запрос, на который ответил кеш, не создает сессию
+    и не берет соединение из пула
+    """
+
+    def __init__(self, session_maker: async_sessionmaker) -> None:
+        self.__session_maker = session_maker
+        self.__session = None
+
+    def __getattr__(self, name: str):
+        if self.__session is None:
+            self.__session = self.__session_maker()
+        return getattr(self.__session, name)
+
+    async def close(self) -> None:
+        """Завершает транзакцию и возвращает соединение в пул"""
+        if self.__session is not None:
+            await self.__session.close()
+
+
+def use_primary(session: AsyncSession) -> None:
+    """Закрепляет сессию за основной базой"""
+    session.info[USE_PRIMARY] = True
+
+
+def create_session_maker(
+    primary: AsyncEngine,
+    replicas: ReplicaPool
+) -> async_sessionmaker:
+    return async_sessionmaker(
+        primary,
+        sync_session_class=RoutingSession,
+        expire_on_commit=False,
+        info={REPLICAS: replicas},
+    )
+
 
-engine = create_async_engine(DATABASE_URL)
-AsyncSession =\
-    sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+engine = create_db_engine(DATABASE_URL)
+replicas = ReplicaPool(DB_REPLICA_URLS, DB_REPLICA_MAX_LAG)
+AsyncSession = create_session_maker(engine, replicas)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with AsyncSession() as session:
+    session = LazySession(AsyncSession)
+    try:
         yield session
+    finally:
+        await session.close()
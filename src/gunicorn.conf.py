@@ -0,0 +1,78 @@
+"""
+Настройки gunicorn для продакшена. Gunicorn читает их из текущей
+директории, значения задаются переменными окружения (см. config.py).
+
+Запуск из директории src:
+    gunicorn main:app
+Плавный перезапуск рабочих процессов с новым кодом:
+    kill -HUP <pid мастера>
+"""
+import glob
+import os
+import tempfile
+
+from config import (
+    SERVER_BACKLOG,
+    SERVER_BIND,
+    SERVER_GRACEFUL_TIMEOUT,
+    SERVER_KEEPALIVE,
+    SERVER_MAX_REQUESTS,
+    SERVER_MAX_REQUESTS_JITTER,
+    SERVER_TIMEOUT,
+    SERVER_WORKERS,
+)
+
+# Метрики рабочих процессов пишутся в файлы общего каталога
+# и собираются вместе в /metrics любого процесса (см. metrics.py).
+# Переменная задается до загрузки приложения в рабочих процессах
+METRICS_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), f'menu-app-metrics-{os.getpid()}')
+)
+
+bind = SERVER_BIND
+workers = SERVER_WORKERS
+worker_class = 'server.UvicornWorker'
+backlog = SERVER_BACKLOG
+keepalive = SERVER_KEEPALIVE
+timeout = SERVER_TIMEOUT
+graceful_timeout = SERVER_GRACEFUL_TIMEOUT
+max_requests = SERVER_MAX_REQUESTS
+max_requests_jitter = SERVER_MAX_REQUESTS_JITTER
+# Приложение загружается в каждом рабочем процессе после fork:
+# пулы соединений, клиенты Redis и фоновые задачи у каждого свои,
+# а HUP перезапускает процессы с новым кодом
+preload_app = False
+
+
+def clear_metrics() -> None:
+    """Удаляет файлы метрик, каталог может быть задан снаружи"""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.db')):
+        os.remove(path)
+
+
+def on_starting(server) -> None:
+    """Метрики прошлого запуска не должны попасть в новые счетчики"""
+    clear_metrics()
+
+
+def child_exit(server, worker) -> None:
+    """
+    Показатели остановленного процесса больше не учитываются, как
+    в prometheus_client.multiprocess.mark_process_dead. Мастер
+    не импортирует prometheus_client: способ хранения метрик
+    выбирается при импорте, а рабочие процессы наследуют модули мастера
+    """
+    pattern = os.path.join(METRICS_DIR, f'gauge_live*_{worker.pid}.db')
+    for path in glob.glob(pattern):
+        os.remove(path)
+
+
+def on_exit(server) -> None:
+    clear_metrics()
+    # Каталог удаляется, только если в нем нет других файлов
+    try:
+        os.rmdir(METRICS_DIR)
+    except OSError:
+        pass
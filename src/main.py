@@ -1,10 +1,68 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from redis.exceptions import RedisError
 
+from config import AUDIT_INTERVAL, DB_POOL_WARMUP
+from database import engine, replicas, warm_up
+from menu_app.admission import AdmissionMiddleware
+from menu_app.compression import CompressionMiddleware
+from menu_app.redis_backend import RedisBackend
 from menu_app.router import menu_router
+from menu_app.services.audit_service import AuditService
+from menu_app.services.event_service import events
+from menu_app.services.listener_service import ListenerService
+from menu_app.services.outbox_service import outbox
+from menu_app.services.purge_service import PurgeService
+from menu_app.timing import TimingMiddleware
+from metrics import make_metrics_app
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Выполняется в каждом рабочем процессе: пулы у процессов свои
+    await asyncio.gather(*(
+        warm_up(pool_engine, DB_POOL_WARMUP)
+        for pool_engine in (engine, *replicas.engines)
+    ))
+    lag_monitor = None
+    if replicas:
+        lag_monitor = asyncio.create_task(replicas.run_lag_monitor())
+    purger = asyncio.create_task(PurgeService().run_forever())
+    dispatcher = asyncio.create_task(outbox.run_forever())
+    # Поколение кеша нужно до первого запроса, дальше его обновляет слушатель
+    with contextlib.suppress(RedisError):
+        await RedisBackend().load_generation()
+    listener = asyncio.create_task(ListenerService().run_forever())
+    auditor = None
+    if AUDIT_INTERVAL:
+        auditor = asyncio.create_task(AuditService().run_forever())
+    yield
+    events.close()
+    tasks = [
+        task for task in (purger, dispatcher, listener, lag_monitor, auditor)
+        if task is not None
+    ]
+    for task in tasks:
+        task.cancel()
+    # Отмененные задачи закрывают соединения и откатывают транзакции
+    await asyncio.gather(*tasks, return_exceptions=True)
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(CompressionMiddleware)
+# Выполняется раньше сжатия и обработчиков: лишние запросы
+# отклоняются до любой работы над ними
+app.add_middleware(AdmissionMiddleware)
+# Добавлен последним, поэтому выполняется первым, снаружи всех:
+# время ожидания в очереди ограничения тоже учитывается
+app.add_middleware(TimingMiddleware)
 
 app.include_router(
     router=menu_router,
     prefix='/api/v1',
 )
+app.mount('/metrics', make_metrics_app())
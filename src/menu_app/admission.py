@@ -0,0 +1,208 @@
+"""
+Ограничение числа одновременных запросов и сброс нагрузки.
+
+AdmissionMiddleware пропускает в приложение не больше limit запросов
+каждого вида (чтения и записи) на рабочий процесс, остальные ждут
+в ограниченной очереди. Запрос, которому не хватило места в очереди
+или который прождал в ней ADMISSION_QUEUE_TIMEOUT секунд, сразу
+получает 503 с Retry-After: при всплеске нагрузки запросы не копятся
+в ожидании пула соединений и Redis, и принятые отвечают быстро.
+С ADMISSION_TARGET_LATENCY ограничение подстраивается под время ответа
+"""
+import asyncio
+import collections
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import (
+    ADMISSION_MIN_LIMIT,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_READ_LIMIT,
+    ADMISSION_RETRY_AFTER,
+    ADMISSION_TARGET_LATENCY,
+    ADMISSION_WRITE_LIMIT,
+)
+from menu_app.timing import measure
+from metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_LIMIT,
+    ADMISSION_QUEUED,
+    ADMISSION_SHED,
+)
+
+READ = 'read'
+WRITE = 'write'
+READ_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# Метрики и лента событий не ограничиваются: лента занимала бы место
+# все время подключения, а метрики нужны именно при перегрузке
+EXEMPT_PATHS = ('/metrics', '/api/v1/menus/events')
+
+# Во сколько раз уменьшается ограничение, когда ответы медленнее цели
+DECREASE_FACTOR = 0.9
+
+
+class ConcurrencyLimiter:
+    """
+    Не больше limit одновременных владельцев и не больше queue_size
+    ожидающих. Освободившееся место передается первому в очереди.
+    С target_latency ограничение пересчитывается после каждых limit
+    ответов (AIMD): уменьшается в DECREASE_FACTOR раз, если среднее
+    время ответа больше цели, и растет на 1 до max_limit, если
+    цель выполнена, а место в это время кончалось
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        target_latency: float = ADMISSION_TARGET_LATENCY,
+        min_limit: int = ADMISSION_MIN_LIMIT
+    ) -> None:
+        self.name = name
+        self.limit = limit
+        self.max_limit = limit
+        self.min_limit = max(1, min(min_limit, limit))
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.__waiters: collections.deque[asyncio.Future] = \
+            collections.deque()
+        self.__saturated = False
+        self.__window_count = 0
+        self.__window_latency = 0.0
+        ADMISSION_LIMIT.labels(name).set(limit)
+
+    @property
+    def queued(self) -> int:
+        return len(self.__waiters)
+
+    async def acquire(self) -> str | None:
+        """
+        Занимает место. Возвращает None, если место получено,
+        иначе причину отказа: queue_full или timeout
+        """
+        if self.in_flight < self.limit and not self.__waiters:
+            self.__take()
+            return None
+        self.__saturated = True
+        if len(self.__waiters) >= self.queue_size:
+            return 'queue_full'
+        waiter = asyncio.get_running_loop().create_future()
+        self.__waiters.append(waiter)
+        ADMISSION_QUEUED.labels(self.name).inc()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return None
+            return 'timeout'
+        except asyncio.CancelledError:
+            # Клиент отключился, но место могло быть уже передано
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self.__waiters:
+                self.__waiters.remove(waiter)
+            ADMISSION_QUEUED.labels(self.name).dec()
+        return None
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.labels(self.name).dec()
+        self.__wake()
+
+    def observe(self, latency: float) -> None:
+        """Учитывает время ответа в подстраиваемом ограничении"""
+        if not self.target_latency:
+            return
+        self.__window_count += 1
+        self.__window_latency += latency
+        if self.__window_count < self.limit:
+            return
+        average = self.__window_latency / self.__window_count
+        if average > self.target_latency:
+            self.limit = max(
+                self.min_limit, int(self.limit * DECREASE_FACTOR)
+            )
+        elif self.__saturated:
+            self.limit = min(self.max_limit, self.limit + 1)
+        self.__saturated = False
+        self.__window_count = 0
+        self.__window_latency = 0.0
+        ADMISSION_LIMIT.labels(self.name).set(self.limit)
+        self.__wake()
+
+    def __take(self) -> None:
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.labels(self.name).inc()
+
+    def __wake(self) -> None:
+        """Передает свободные места ожидающим по порядку очереди"""
+        while self.__waiters and self.in_flight < self.limit:
+            waiter = self.__waiters.popleft()
+            if waiter.done():
+                continue
+            self.__take()
+            waiter.set_result(None)
+
+
+class AdmissionMiddleware:
+    """
+    Пропускает запросы через ограничитель их вида, лишние
+    отклоняет с 503. Ограничители свои у каждого рабочего процесса
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        read_limit: int = ADMISSION_READ_LIMIT,
+        write_limit: int = ADMISSION_WRITE_LIMIT,
+        exempt_paths: tuple[str, ...] = EXEMPT_PATHS,
+        **limiter_options
+    ) -> None:
+        self.app = app
+        self.exempt_paths = exempt_paths
+        self.limiters = {
+            route_class: ConcurrencyLimiter(
+                route_class, limit, **limiter_options
+            )
+            for route_class, limit in ((READ, read_limit), (WRITE, write_limit))
+            if limit
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or \
+                scope['path'].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+        route_class = READ if scope['method'] in READ_METHODS else WRITE
+        limiter = self.limiters.get(route_class)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        with measure('queue'):
+            reason = await limiter.acquire()
+        if reason is not None:
+            ADMISSION_SHED.labels(route_class, reason).inc()
+            response = JSONResponse(
+                {'detail': 'server is overloaded, retry later'},
+                status_code=503,
+                headers={'Retry-After': str(ADMISSION_RETRY_AFTER)},
+            )
+            await response(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+            limiter.observe(time.perf_counter() - started)
@@ -0,0 +1,201 @@
+"""
+Сжатие ответов с выбором кодировки по заголовку Accept-Encoding.
+
+CompressionMiddleware сжимает на лету ответы не меньше
+COMPRESSION_MIN_SIZE байт. Кешируемые списки сжимаются один раз
+при записи в кеш (precompress), и попадание в кеш отдает готовое
+сжатое тело без затрат процессора: такие ответы уже содержат
+Content-Encoding, и middleware пропускает их без изменений.
+Сжимая ответ с ETag, middleware добавляет к нему кодировку.
+Brotli используется, если установлен пакет brotli
+"""
+import gzip
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import COMPRESSION_MIN_SIZE
+from menu_app.timing import measure
+from metrics import COMPRESSED_RESPONSES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IDENTITY = 'identity'
+GZIP = 'gzip'
+BROTLI = 'br'
+
+# Кодировки в порядке предпочтения при равном весе q
+ENCODINGS = (BROTLI, GZIP) if brotli is not None else (GZIP,)
+
+# Сжатие на лету выполняется при каждом запросе, поэтому быстрое,
+# предварительное - один раз на запись в кеш, поэтому сильнее.
+# Но и оно выполняется в запросе, промахнувшемся мимо кеша: на /menus/all
+# (16 МБ) brotli 11 занимает 50 с, gzip 9 - 1.8 с против 0.5 с у gzip 6
+# при выигрыше в 5%, поэтому максимальные уровни не используются
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+BROTLI_PRECOMPRESS_QUALITY = 8
+
+
+def negotiate(accept_encoding: str) -> str:
+    """
+    Выбирает поддерживаемую кодировку с наибольшим весом q
+    из заголовка Accept-Encoding, identity - если подходящей нет
+    """
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+    best, best_weight = IDENTITY, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def requested_encoding(request: Request) -> str:
+    """Зависимость FastAPI: кодировка ответа для запроса"""
+    return negotiate(request.headers.get('accept-encoding', ''))
+
+
+def compress(body: bytes, encoding: str, precompress: bool = False) -> bytes:
+    """Сжимает тело ответа в заданной кодировке"""
+    with measure('compress'):
+        if encoding == BROTLI:
+            return brotli.compress(
+                body,
+                quality=BROTLI_PRECOMPRESS_QUALITY if precompress
+                else BROTLI_QUALITY
+            )
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_variants(content: list | dict) -> dict[str, bytes]:
+    """
+    Сериализует ответ и сжимает его во всех поддерживаемых кодировках.
+    Тела меньше порога хранятся только без сжатия
+    """
+    with measure('serialize'):
+        body = orjson.dumps(content)
+    variants = {IDENTITY: body}
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        for encoding in ENCODINGS:
+            variants[encoding] = compress(body, encoding, precompress=True)
+    return variants
+
+
+def pick_variant(
+    variants: dict[str, bytes],
+    encoding: str
+) -> tuple[bytes, str]:
+    """Возвращает тело в запрошенной кодировке или без сжатия"""
+    if encoding in variants:
+        return variants[encoding], encoding
+    return variants[IDENTITY], IDENTITY
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    ETag представления в кодировке encoding: сжатые и несжатое
+    представления различаются байтами, поэтому их строгие ETag разные
+    """
+    if encoding == IDENTITY:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decoded_etag(etag: str) -> str:
+    """ETag несжатого представления для ETag из encoded_etag"""
+    for encoding in (BROTLI, GZIP):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+class PrecompressedResponse(Response):
+    """JSON-ответ с заранее сериализованным и сжатым телом"""
+
+    media_type = 'application/json'
+
+    def __init__(self, body: bytes, encoding: str) -> None:
+        headers = {'Vary': 'Accept-Encoding'}
+        if encoding != IDENTITY:
+            headers['Content-Encoding'] = encoding
+            COMPRESSED_RESPONSES.labels(encoding, 'precompressed').inc()
+        super().__init__(content=body, headers=headers)
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы, тело которых передается одним сообщением
+    и не меньше minimum_size байт. Потоковые ответы
+    и уже сжатые ответы отдаются как есть
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(
+            Headers(scope=scope).get('accept-encoding', '')
+        )
+        if encoding == IDENTITY:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start['headers'])
+            body = message.get('body', b'')
+            final = message['type'] == 'http.response.body' and \
+                not message.get('more_body', False)
+            compressible = 'content-encoding' not in headers and \
+                len(body) >= self.minimum_size
+            if final and compressible:
+                body = compress(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+                if 'etag' in headers:
+                    headers['ETag'] = encoded_etag(headers['etag'], encoding)
+                headers.add_vary_header('Accept-Encoding')
+                message = {'type': 'http.response.body', 'body': body}
+                COMPRESSED_RESPONSES.labels(encoding, 'middleware').inc()
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,86 @@
+"""
+Условные GET-запросы по версии данных.
+
+Зависимости catalogue_version и menu_version читают из Redis версию
+каталога или меню одним запросом и, если клиент прислал совпадающий
+If-None-Match, отвечают 304 до обращения к кешированным ответам и базе.
+Иначе ETag сохраняется в request.state, и ConditionalRoute добавляет его
+вместе с Cache-Control к успешному ответу. ETag зависит только от версии:
+ответы с разными параметрами запроса - разные ресурсы для клиента
+"""
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from fastapi import HTTPException, Request, status
+from starlette.responses import Response
+
+from config import HTTP_CACHE_CONTROL
+from menu_app.compression import IDENTITY, decoded_etag, encoded_etag
+from menu_app.services.version_service import versions
+from menu_app.timing import TimedRoute
+from metrics import NOT_MODIFIED
+
+
+def matching_etag(if_none_match: str, etag: str) -> str | None:
+    """
+    Возвращает ETag из заголовка If-None-Match, совпадающий с etag
+    при слабом сравнении и без учета кодировки представления
+    """
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if decoded_etag(tag.removeprefix('W/')) == etag:
+            return tag
+    return None
+
+
+async def check_version(
+    request: Request,
+    scope: str,
+    menu_id: int | None = None
+) -> None:
+    """Отвечает 304, если у клиента актуальная версия данных"""
+    etag = f'"{await versions.get(menu_id)}"'
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tag = matching_etag(if_none_match, etag)
+        if tag is not None:
+            NOT_MODIFIED.labels(scope).inc()
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': tag, 'Cache-Control': HTTP_CACHE_CONTROL}
+            )
+    request.state.etag = etag
+
+
+async def catalogue_version(request: Request) -> None:
+    """Зависимость FastAPI для ответов, зависящих от всего каталога"""
+    await check_version(request, 'catalogue')
+
+
+async def menu_version(request: Request, menu_id: int) -> None:
+    """Зависимость FastAPI для ответов, зависящих от одного меню"""
+    await check_version(request, 'menu', menu_id)
+
+
+class ConditionalRoute(TimedRoute):
+    """
+    Маршрут, добавляющий ETag и Cache-Control к ответам 200.
+    Время FastAPI вне эндпоинта учитывается в Server-Timing
+    """
+
+    def get_route_handler(
+        self
+    ) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def conditional_handler(request: Request) -> Response:
+            response = await handler(request)
+            etag = getattr(request.state, 'etag', None)
+            if etag is not None and response.status_code == status.HTTP_200_OK:
+                response.headers['ETag'] = encoded_etag(
+                    etag, response.headers.get('content-encoding', IDENTITY)
+                )
+                response.headers['Cache-Control'] = HTTP_CACHE_CONTROL
+            return response
+
+        return conditional_handler
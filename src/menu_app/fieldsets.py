@@ -0,0 +1,44 @@
+"""
+Выбор полей ответа параметром ?fields=id,title,price.
+
+Зависимости проверяют имена полей до обращения к кешу и базе
+и возвращают их в порядке полей схемы, чтобы одинаковые наборы
+давали один ключ кеша. Без параметра возвращается None - полный ответ
+"""
+from collections.abc import Callable
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+
+from menu_app import schemas
+
+
+def fieldset(schema: type[BaseModel]) -> Callable:
+    """Создает зависимость с допустимыми полями схемы schema"""
+    allowed = tuple(schema.model_fields)
+
+    def dependency(
+        fields: str | None = Query(
+            None,
+            max_length=200,
+            description=f'Поля ответа через запятую: {",".join(allowed)}'
+        )
+    ) -> tuple[str, ...] | None:
+        if fields is None:
+            return None
+        names = {name.strip() for name in fields.split(',') if name.strip()}
+        unknown = names.difference(allowed)
+        if not names or unknown:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f'unknown fields: {",".join(sorted(unknown))}'
+                if unknown else 'fields is empty'
+            )
+        return tuple(name for name in allowed if name in names)
+
+    return dependency
+
+
+menu_fields = fieldset(schemas.MenuGet)
+submenu_fields = fieldset(schemas.SubMenuGet)
+dish_fields = fieldset(schemas.DishGet)
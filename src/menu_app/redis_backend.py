@@ -1,23 +1,70 @@
+import asyncio
 import pickle
+import secrets
+import weakref
+from collections.abc import AsyncIterator
 
 from redis import asyncio as aioredis
 
-from config import REDIS_HOST, REDIS_PORT
+from config import EVENTS_HISTORY, REDIS_HOST, REDIS_PORT
+from menu_app.compression import IDENTITY
+from menu_app.schemas import ImportJob, SearchResult
+from menu_app.timing import TimedRedis
 from models.models import Dish, Menu, SubMenu
 
 
+def event_key(event_id: str) -> tuple[int, int]:
+    """Ключ для сравнения id событий потока вида <мс>-<номер>"""
+    milliseconds, _, sequence = event_id.partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+
+# Клиенты Redis по циклу событий и адресу. Соединения из пула клиента
+# переиспользуются всеми запросами процесса, а не открываются заново
+# для каждого RedisBackend. Соединения привязаны к циклу событий,
+# поэтому у каждого цикла свои клиенты
+CLIENTS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_client(url: str) -> aioredis.Redis:
+    """
+    Клиент Redis с общим пулом соединений для текущего цикла событий.
+    Время команд учитывается в Server-Timing, см. menu_app.timing
+    """
+    clients = CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    if url not in clients:
+        clients[url] = TimedRedis.from_url(url)
+    return clients[url]
+
+
 class RedisBackend:
 
     TTL_CACHE = 60 * 60 * 24
+    # Результаты поиска не инвалидируются при изменениях,
+    # поэтому хранятся недолго
+    TTL_SEARCH = 60
+    # Поколение кеша каталога - часть ключей объектов, списков, тел
+    # ответов и результатов поиска. Новое поколение (bump_generation)
+    # разом делает недоступным весь кеш каталога, старые ключи удаляются
+    # по TTL. Поколение хранится в Redis, а процесс держит его копию,
+    # которую обновляет по уведомлению PostgreSQL (см. ListenerService)
+    generation = 0
 
     def __init__(self, host=REDIS_HOST, port=REDIS_PORT, db=0):
-        url = f'redis://{host}:{port}'
-        self.__redis_cli = aioredis.from_url(url)
+        self.__url = f'redis://{host}:{port}'
+
+    @property
+    def __redis_cli(self) -> aioredis.Redis:
+        """
+        Клиент выбирается при обращении, а не при создании объекта:
+        синхронные зависимости FastAPI создаются в потоке без цикла событий
+        """
+        return get_client(self.__url)
 
     async def get_menu(self, menu_id: int) -> Menu | None:
         """Возвращает объект menu из кеша"""
         menu_var = self.__get_menu_var_name(menu_id)
-        menu_obj = await self.__redis_cli.get(menu_var)
+        menu_obj = await self.__redis_cli.get(self.__key(menu_var))
         if menu_obj is None:
             return None
         return pickle.loads(menu_obj)
@@ -30,11 +77,45 @@ class RedisBackend:
         """Возвращает объект submenu из кеша"""
         submenu_var = self.\
             __get_submenu_var_name(menu_id, submenu_id)
-        submenu_obj = await self.__redis_cli.get(submenu_var)
+        submenu_obj = await self.__redis_cli.get(self.__key(submenu_var))
         if submenu_obj is None:
             return None
         return pickle.loads(submenu_obj)
 
+    async def get_submenus(
+        self,
+        menu_id: int,
+        submenu_ids: list[int]
+    ) -> list[SubMenu | None]:
+        """
+        Возвращает из кеша объекты submenu одной командой MGET,
+        None - для отсутствующих в кеше
+        """
+        submenus = await self.__redis_cli.mget([
+            self.__key(self.__get_submenu_var_name(menu_id, submenu_id))
+            for submenu_id in submenu_ids
+        ])
+        return [
+            None if submenu_obj is None else pickle.loads(submenu_obj)
+            for submenu_obj in submenus
+        ]
+
+    async def set_submenus(self, submenu_list: list[SubMenu]) -> None:
+        """
+        Сохраняет в кеше объекты submenu одним пайплайном.
+        Объекты прочитаны из базы, поэтому инвалидировать нечего
+        """
+        async with self.__redis_cli.pipeline(transaction=False) as pipe:
+            for submenu_obj in submenu_list:
+                pipe.setex(
+                    name=self.__key(self.__get_submenu_var_name(
+                        submenu_obj.menu_id, submenu_obj.id
+                    )),
+                    value=pickle.dumps(submenu_obj),
+                    time=self.TTL_CACHE
+                )
+            await pipe.execute()
+
     async def get_dish(
             self,
             menu_id: int,
@@ -44,14 +125,14 @@ class RedisBackend:
         """Возвращает объект dish из кеша"""
         dish_var = self.\
             __get_dish_var_name(menu_id, submenu_id, dish_id)
-        dish_obj = await self.__redis_cli.get(dish_var)
+        dish_obj = await self.__redis_cli.get(self.__key(dish_var))
         if dish_obj is None:
             return None
         return pickle.loads(dish_obj)
 
     async def get_menu_list(self) -> list[Menu] | None:
         """Возвращает список объектов menu из кеша"""
-        menu_list = await self.__redis_cli.get('menu_list')
+        menu_list = await self.__redis_cli.get(self.__key('menu_list'))
         if menu_list is None:
             return None
         return pickle.loads(menu_list)
@@ -63,11 +144,46 @@ class RedisBackend:
         которые относятся к объекту menu, из кеша
         """
         submenu_list = await self.__redis_cli.\
-            get(f'submenu_list:{menu_id}')
+            get(self.__key(f'submenu_list:{menu_id}'))
         if submenu_list is None:
             return None
         return pickle.loads(submenu_list)
 
+    async def get_dishes(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        dish_ids: list[int]
+    ) -> list[Dish | None]:
+        """
+        Возвращает из кеша объекты dish одной командой MGET,
+        None - для отсутствующих в кеше
+        """
+        dishes = await self.__redis_cli.mget([
+            self.__key(self.__get_dish_var_name(menu_id, submenu_id, dish_id))
+            for dish_id in dish_ids
+        ])
+        return [
+            None if dish_obj is None else pickle.loads(dish_obj)
+            for dish_obj in dishes
+        ]
+
+    async def set_dishes(self, dish_list: list[Dish], menu_id: int) -> None:
+        """
+        Сохраняет в кеше объекты dish одним пайплайном.
+        Объекты прочитаны из базы, поэтому инвалидировать нечего
+        """
+        async with self.__redis_cli.pipeline(transaction=False) as pipe:
+            for dish_obj in dish_list:
+                pipe.setex(
+                    name=self.__key(self.__get_dish_var_name(
+                        menu_id, dish_obj.submenu_id, dish_obj.id
+                    )),
+                    value=pickle.dumps(dish_obj),
+                    time=self.TTL_CACHE
+                )
+            await pipe.execute()
+
     async def get_dish_list(
         self,
         menu_id: int,
@@ -79,7 +195,7 @@ class RedisBackend:
         """
         dish_list_var = self.\
             __get_dish_list_var_name(menu_id, submenu_id)
-        dish_list = await self.__redis_cli.get(dish_list_var)
+        dish_list = await self.__redis_cli.get(self.__key(dish_list_var))
         if dish_list is None:
             return None
         return pickle.loads(dish_list)
@@ -92,11 +208,10 @@ class RedisBackend:
         await self.delete_menu_list()
         await self.delete_submenu_list(menu_id)
         menu_var = self.__get_menu_var_name(menu_id)
-        invalid_keys = await self.__redis_cli.keys(f'{menu_var}*')
-        invalid_keys += await self.__redis_cli.\
-            keys(f'dish_list:{menu_id}:*')
+        invalid_keys = await self.__keys(f'{menu_var}*')
+        invalid_keys += await self.__keys(f'dish_list:{menu_id}:*')
         if invalid_keys:
-            await self.__redis_cli.delete(*invalid_keys)
+            await self.__delete(*invalid_keys)
 
     async def delete_submenu(
         self,
@@ -114,9 +229,9 @@ class RedisBackend:
         submenu_var = self.\
             __get_submenu_var_name(menu_id, submenu_id)
 
-        invalid_keys = await self.__redis_cli.keys(f'{submenu_var}*')
+        invalid_keys = await self.__keys(f'{submenu_var}*')
         invalid_keys.append(menu_var)
-        await self.__redis_cli.delete(*invalid_keys)
+        await self.__delete(*invalid_keys)
 
     async def delete_dish(
         self,
@@ -138,21 +253,85 @@ class RedisBackend:
         dish_var = self.\
             __get_dish_var_name(menu_id, submenu_id, dish_id)
 
-        await self.__redis_cli.delete(menu_var)
-        await self.__redis_cli.delete(submenu_var)
-        await self.__redis_cli.delete(dish_var)
+        await self.__delete(menu_var)
+        await self.__delete(submenu_var)
+        await self.__delete(dish_var)
+
+    async def delete_submenus(
+        self,
+        menu_id: int,
+        submenu_ids: set[int]
+    ) -> None:
+        """
+        Удаляет из кеша несколько объектов submenu и связанные объекты
+        одной командой, меню и списки инвалидируются один раз
+        """
+        prefixes = tuple(
+            self.__get_submenu_var_name(menu_id, submenu_id)
+            for submenu_id in submenu_ids
+        )
+        menu_var = self.__get_menu_var_name(menu_id)
+        invalid_keys = [
+            key for key in
+            await self.__keys(f'{menu_var}:submenu:*')
+            if key.startswith(prefixes)
+        ]
+        invalid_keys += [
+            self.__get_dish_list_var_name(menu_id, submenu_id)
+            for submenu_id in submenu_ids
+        ]
+        invalid_keys += [
+            'all', 'menu_list', f'submenu_list:{menu_id}', menu_var
+        ]
+        await self.__delete(*invalid_keys)
+
+    async def delete_dishes(
+        self,
+        menu_id: int,
+        dishes: dict[int, set[int]]
+    ) -> None:
+        """
+        Удаляет из кеша несколько объектов dish и связанные объекты
+        одной командой, каждое подменю инвалидируется один раз.
+        dishes - id блюд, сгруппированные по id подменю
+        """
+        invalid_keys = [
+            'all', 'menu_list', f'submenu_list:{menu_id}',
+            self.__get_menu_var_name(menu_id)
+        ]
+        for submenu_id, dish_ids in dishes.items():
+            invalid_keys.append(
+                self.__get_submenu_var_name(menu_id, submenu_id)
+            )
+            invalid_keys.append(
+                self.__get_dish_list_var_name(menu_id, submenu_id)
+            )
+            invalid_keys += [
+                self.__get_dish_var_name(menu_id, submenu_id, dish_id)
+                for dish_id in dish_ids
+            ]
+        await self.__delete(*invalid_keys)
 
     async def delete_menu_list(self) -> None:
         """Удаляет список объектов menu из кеша"""
         await self.delete_all_list()
-        await self.__redis_cli.delete('menu_list')
+        await self.__delete('menu_list')
+
+    async def delete_lists_with_counts(self) -> None:
+        """
+        Удаляет из кеша списки меню и подменю всех меню:
+        в них хранится количество подменю и блюд
+        """
+        invalid_keys = await self.__keys('submenu_list:*')
+        invalid_keys.append('menu_list')
+        await self.__delete(*invalid_keys)
 
     async def delete_submenu_list(self, menu_id: int) -> None:
         """
         Удаляет список объектов submenu,
         которые относятся к объекту menu, из кеша
         """
-        await self.__redis_cli.delete(f'submenu_list:{menu_id}')
+        await self.__delete(f'submenu_list:{menu_id}')
 
     async def delete_dish_list(
         self,
@@ -165,7 +344,7 @@ class RedisBackend:
         """
         dish_list_var = self.\
             __get_dish_list_var_name(menu_id, submenu_id)
-        await self.__redis_cli.delete(dish_list_var)
+        await self.__delete(dish_list_var)
 
     async def set_menu(self, menu_obj: Menu) -> None:
         """
@@ -176,7 +355,7 @@ class RedisBackend:
 
         menu_var = self.__get_menu_var_name(menu_obj.id)
         await self.__redis_cli.setex(
-            name=menu_var,
+            name=self.__key(menu_var),
             value=pickle.dumps(menu_obj),
             time=self.TTL_CACHE
         )
@@ -191,7 +370,7 @@ class RedisBackend:
         submenu_var = self.\
             __get_submenu_var_name(submenu_obj.menu_id, submenu_obj.id)
         await self.__redis_cli.setex(
-            name=submenu_var,
+            name=self.__key(submenu_var),
             value=pickle.dumps(submenu_obj),
             time=self.TTL_CACHE
         )
@@ -207,7 +386,7 @@ class RedisBackend:
         dish_var = self.\
             __get_dish_var_name(menu_id, submenu_id, dish_obj.id)
         await self.__redis_cli.setex(
-            name=dish_var,
+            name=self.__key(dish_var),
             value=pickle.dumps(dish_obj),
             time=self.TTL_CACHE
         )
@@ -215,7 +394,7 @@ class RedisBackend:
     async def set_menu_list(self, menu_list: list[Menu]) -> None:
         """Сохраняет в кеше список объектов menu"""
         await self.__redis_cli.setex(
-            name='menu_list',
+            name=self.__key('menu_list'),
             value=pickle.dumps(menu_list),
             time=self.TTL_CACHE
         )
@@ -230,7 +409,7 @@ class RedisBackend:
         которые относятся к объекту menu
         """
         await self.__redis_cli.setex(
-            name=f'submenu_list:{menu_id}',
+            name=self.__key(f'submenu_list:{menu_id}'),
             value=pickle.dumps(submenu_list),
             time=self.TTL_CACHE
         )
@@ -248,7 +427,7 @@ class RedisBackend:
         dish_list_var = self.\
             __get_dish_list_var_name(menu_id, submenu_id)
         await self.__redis_cli.setex(
-            name=dish_list_var,
+            name=self.__key(dish_list_var),
             value=pickle.dumps(dish_list),
             time=self.TTL_CACHE
         )
@@ -259,28 +438,306 @@ class RedisBackend:
 
     async def get_all_list(self) -> list[Menu] | None:
         """Возвращает список объектов Menu со вложенными объектами"""
-        result = await self.__redis_cli.get('all')
+        result = await self.__redis_cli.get(self.__key('all'))
         if result is None:
             return None
         return pickle.loads(result)
 
     async def delete_all_list(self) -> None:
         """Удаляет список объектов Menu со вложенными объектами"""
-        await self.__redis_cli.delete('all')
+        await self.__delete('all')
 
     async def set_all_list(self, all_list: list[Menu]) -> None:
         """Сохраняет список объектов Menu со вложенными объектами"""
         await self.__redis_cli.setex(
-            name='all',
+            name=self.__key('all'),
             value=pickle.dumps(all_list),
             time=self.TTL_CACHE
         )
 
+    async def scan_cache(self, count: int) -> AsyncIterator[list[str]]:
+        """
+        Обходит ключи кеша каталога текущего поколения командой SCAN,
+        которая, в отличие от KEYS, не блокирует Redis. Отдает имена
+        без префикса пачками примерно по count, ключ может
+        встретиться дважды
+        """
+        prefix = self.__key('')
+        cursor = 0
+        while True:
+            cursor, keys = await self.__redis_cli.scan(
+                cursor, match=prefix + '*', count=count
+            )
+            if keys:
+                yield [key.decode()[len(prefix):] for key in keys]
+            if not cursor:
+                return
+
+    async def get_cached(self, names: list[str]) -> list:
+        """
+        Возвращает объекты кеша по именам одной командой MGET,
+        None - для отсутствующих в кеше
+        """
+        if not names:
+            return []
+        values = await self.__redis_cli.mget([
+            self.__key(name) for name in names
+        ])
+        return [
+            None if value is None else pickle.loads(value)
+            for value in values
+        ]
+
+    async def delete_cached(self, names: list[str]) -> None:
+        """Удаляет объекты кеша по именам вместе с готовыми телами ответов"""
+        if names:
+            await self.__delete(*names)
+
+    async def acquire_lock(self, name: str, ttl: float) -> bool:
+        """
+        Занимает блокировку name на ttl секунд для одного процесса
+        из всех. Возвращает False, если она уже занята
+        """
+        return bool(await self.__redis_cli.set(
+            f'lock:{name}', b'1', nx=True, px=int(ttl * 1000)
+        ))
+
+    async def get_import_job(self, job_id: str) -> ImportJob | None:
+        """Возвращает состояние задачи импорта"""
+        job = await self.__redis_cli.get(f'import_job:{job_id}')
+        if job is None:
+            return None
+        return pickle.loads(job)
+
+    async def set_import_job(self, job: ImportJob) -> None:
+        """Сохраняет состояние задачи импорта"""
+        await self.__redis_cli.setex(
+            name=f'import_job:{job.id}',
+            value=pickle.dumps(job),
+            time=self.TTL_CACHE
+        )
+
+    async def get_search_result(
+        self,
+        query: str,
+        limit: int,
+        offset: int
+    ) -> SearchResult | None:
+        """Возвращает результат поиска из кеша"""
+        result = await self.__redis_cli.get(
+            self.__key(self.__get_search_var_name(query, limit, offset))
+        )
+        if result is None:
+            return None
+        return pickle.loads(result)
+
+    async def set_search_result(self, result: SearchResult) -> None:
+        """Сохраняет в кеше результат поиска"""
+        await self.__redis_cli.setex(
+            name=self.__key(self.__get_search_var_name(
+                result.query, result.limit, result.offset
+            )),
+            value=pickle.dumps(result),
+            time=self.TTL_SEARCH
+        )
+
+    async def get_body(
+        self,
+        name: str,
+        encoding: str,
+        fields: tuple[str, ...] | None = None
+    ) -> tuple[bytes, str] | None:
+        """
+        Возвращает готовое тело ответа для закешированного объекта name
+        в запрошенной кодировке или без сжатия, если такой нет.
+        fields - выбранные поля ответа, None - все поля
+        """
+        body, identity = await self.__redis_cli.hmget(
+            self.__key(self.__get_body_var_name(name)),
+            self.__get_body_field_name(encoding, fields),
+            self.__get_body_field_name(IDENTITY, fields)
+        )
+        if body is not None:
+            return body, encoding
+        if identity is not None:
+            return identity, IDENTITY
+        return None
+
+    async def set_bodies(
+        self,
+        name: str,
+        variants: dict[str, bytes],
+        fields: tuple[str, ...] | None = None
+    ) -> None:
+        """
+        Сохраняет тело ответа для закешированного объекта name
+        во всех кодировках. Ответы со всеми и с выбранными полями
+        хранятся в одной переменной и удаляются вместе с объектом
+        """
+        body_var = self.__key(self.__get_body_var_name(name))
+        async with self.__redis_cli.pipeline() as pipe:
+            pipe.hset(body_var, mapping={
+                self.__get_body_field_name(encoding, fields): body
+                for encoding, body in variants.items()
+            })
+            pipe.expire(body_var, self.TTL_CACHE)
+            await pipe.execute()
+
+    async def get_version(self, menu_id: int | None = None) -> str:
+        """
+        Возвращает версию данных всего каталога или меню menu_id
+        вида <эпоха>.<счетчик>... Эпоха - случайная метка, созданная
+        вместе со счетчиками: если Redis потеряет их, версии
+        не повторятся, а начнутся с новой эпохой
+        """
+        names = ['version:epoch', *self.__get_version_var_names(menu_id)]
+        epoch, *counters = await self.__redis_cli.mget(names)
+        # Эпоху мог создать соседний процесс, а между SET NX и GET
+        # ключ может быть вытеснен - тогда попытка повторяется
+        while epoch is None:
+            candidate = secrets.token_hex(4).encode()
+            if await self.__redis_cli.set(
+                'version:epoch', candidate, nx=True
+            ):
+                epoch = candidate
+            else:
+                epoch = await self.__redis_cli.get('version:epoch')
+        return '.'.join(
+            [epoch.decode(), *(str(int(value or 0)) for value in counters)]
+        )
+
+    async def incr_version(
+        self,
+        menu_id: int | None = None,
+        aggregates: bool = False
+    ) -> None:
+        """
+        Увеличивает версию каталога и меню menu_id. С aggregates -
+        версию количества подменю и блюд, от которой зависят все меню
+        """
+        async with self.__redis_cli.pipeline(transaction=False) as pipe:
+            pipe.incr('version:all')
+            if aggregates:
+                pipe.incr('version:aggregates')
+            if menu_id is not None:
+                pipe.incr(self.__get_menu_version_var_name(menu_id))
+            await pipe.execute()
+
+    @classmethod
+    def set_generation(cls, generation: int) -> None:
+        """Переключает процесс на поколение кеша generation"""
+        cls.generation = generation
+
+    async def load_generation(self) -> int:
+        """Читает текущее поколение кеша из Redis"""
+        generation = int(await self.__redis_cli.get('cache:generation') or 0)
+        self.set_generation(generation)
+        return generation
+
+    async def bump_generation(self) -> int:
+        """
+        Начинает новое поколение кеша. Остальные процессы должны
+        узнать о нем сами, см. OutboxService.overflow
+        """
+        generation = await self.__redis_cli.incr('cache:generation')
+        self.set_generation(generation)
+        return generation
+
+    async def add_event(self, data: bytes) -> str:
+        """
+        Записывает событие в поток с ограниченной историей
+        и рассылает его подписчикам всех процессов.
+        Возвращает id события в потоке
+        """
+        event_id = await self.__redis_cli.xadd(
+            'events', {'data': data},
+            maxlen=EVENTS_HISTORY, approximate=True
+        )
+        await self.__redis_cli.publish('events', event_id + b' ' + data)
+        return event_id.decode()
+
+    async def get_events_after(
+        self,
+        event_id: str
+    ) -> list[tuple[str, bytes]] | None:
+        """
+        Возвращает события потока после event_id. None - если история
+        обрезана и события после event_id могли пропасть
+        """
+        first = await self.__redis_cli.xrange('events', count=1)
+        if first and event_key(first[0][0].decode()) > event_key(event_id):
+            return None
+        events = await self.__redis_cli.xrange('events', min=f'({event_id}')
+        return [(key.decode(), fields[b'data']) for key, fields in events]
+
+    async def listen_events(self) -> AsyncIterator[tuple[str, bytes] | None]:
+        """
+        Получает события, разосланные add_event, через одно подключение.
+        Первым отдает None - подписка оформлена
+        """
+        async with self.__redis_cli.pubsub() as pubsub:
+            await pubsub.subscribe('events')
+            async for message in pubsub.listen():
+                if message['type'] == 'subscribe':
+                    yield None
+                elif message['type'] == 'message':
+                    event_id, _, data = message['data'].partition(b' ')
+                    yield event_id.decode(), data
+
     async def close_connection(self) -> None:
         """Закрывает подключение и очищает базу данных"""
         await self.flushdb()
         await self.__redis_cli.close()
 
+    async def __delete(self, *names: str) -> None:
+        """Удаляет ключи из кеша вместе с готовыми телами ответов"""
+        await self.__redis_cli.delete(*(
+            self.__key(key)
+            for name in names
+            for key in (name, self.__get_body_var_name(name))
+        ))
+
+    async def __keys(self, pattern: str) -> list[str]:
+        """Имена ключей кеша текущего поколения по шаблону, без префикса"""
+        prefix = self.__key('')
+        return [
+            key.decode()[len(prefix):]
+            for key in await self.__redis_cli.keys(prefix + pattern)
+        ]
+
+    def __key(self, name: str) -> str:
+        """Ключ Redis объекта кеша name в текущем поколении"""
+        return f'cache:{self.generation}:{name}'
+
+    def __get_body_var_name(self, name: str) -> str:
+        """Генерирует имя переменной для готовых тел ответа"""
+        return f'{name}:body'
+
+    def __get_body_field_name(
+        self,
+        encoding: str,
+        fields: tuple[str, ...] | None
+    ) -> str:
+        """Генерирует имя поля для тела ответа с выбранными полями"""
+        if fields is None:
+            return encoding
+        return f'{",".join(fields)}:{encoding}'
+
+    def __get_version_var_names(self, menu_id: int | None) -> list[str]:
+        """
+        Генерирует имена счетчиков, из которых складывается версия
+        каталога или меню menu_id
+        """
+        if menu_id is None:
+            return ['version:all']
+        return [
+            'version:aggregates', self.__get_menu_version_var_name(menu_id)
+        ]
+
+    def __get_menu_version_var_name(self, menu_id: int) -> str:
+        """Генерирует имя переменной для версии меню"""
+        return f'version:menu:{menu_id}'
+
     def __get_menu_var_name(self, menu_id: int) -> str:
         """Генерирует имя переменной для объекта menu"""
         return f'menu:{menu_id}'
@@ -309,3 +766,12 @@ class RedisBackend:
     ) -> str:
         """Генерирует имя переменной для списка dish_list"""
         return f'dish_list:{menu_id}:{submenu_id}'
+
+    def __get_search_var_name(
+        self,
+        query: str,
+        limit: int,
+        offset: int
+    ) -> str:
+        """Генерирует имя переменной для результата поиска"""
+        return f'search:{limit}:{offset}:{query}'
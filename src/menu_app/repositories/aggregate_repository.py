@@ -0,0 +1,24 @@
+from sqlalchemy import text
+
+from models.models import menu_stats, submenu_stats
+
+from .base_repository import BaseRepository, on_primary
+
+
+class AggregateRepository(BaseRepository):
+    """
+    Репозиторий материализованных представлений с количеством
+    подменю и блюд
+    """
+
+    @on_primary
+    async def refresh(self) -> None:
+        """
+        Пересчитывает представления. CONCURRENTLY не блокирует чтение:
+        до конца пересчета запросы видят предыдущие данные
+        """
+        for view in (menu_stats, submenu_stats):
+            await self.session.execute(
+                text(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {view.name}')
+            )
+            await self.session.commit()
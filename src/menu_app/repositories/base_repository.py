@@ -1,7 +1,48 @@
+import functools
+from collections.abc import Callable, Iterator
+
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from database import get_async_session, use_primary
+from models.models import Dish, Menu, SubMenu
+
+# Количество строк в одном многострочном INSERT:
+# asyncpg не принимает больше 32767 параметров в одном запросе
+BULK_CHUNK_SIZE = 1000
+
+# Условия, скрывающие мягко удаленные меню и подменю.
+# Блюда скрываются вместе с подменю или меню, к которому относятся
+MENU_ALIVE = Menu.deleted_at.is_(None)
+SUBMENU_ALIVE = SubMenu.deleted_at.is_(None)
+
+# Статистика цен блюд, поля схемы PriceStats
+PRICE_STATS = (
+    func.count(Dish.id).label('dishes_count'),
+    func.min(Dish.price).label('min_price'),
+    func.max(Dish.price).label('max_price'),
+    func.round(func.avg(Dish.price), 2).label('avg_price'),
+)
 
-from database import get_async_session
+
+def chunked(rows: list, size: int = BULK_CHUNK_SIZE) -> Iterator[list]:
+    """Разбивает список на части размером не больше size"""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def on_primary(method: Callable) -> Callable:
+    """
+    Выполняет метод репозитория в основной базе.
+    Нужен пишущим методам, которые сначала читают данные:
+    реплика может отставать и вернуть устаревшее состояние
+    """
+    @functools.wraps(method)
+    async def wrapper(self: 'BaseRepository', *args, **kwargs):
+        use_primary(self.session)
+        return await method(self, *args, **kwargs)
+    return wrapper
 
 
 class BaseRepository:
@@ -12,3 +53,10 @@ class BaseRepository:
         session: AsyncSession = Depends(get_async_session)
     ) -> None:
         self.session = session
+
+    async def release(self) -> None:
+        """
+        Возвращает соединение в пул, не дожидаясь конца запроса.
+        Загруженные объекты остаются доступны
+        """
+        await self.session.close()
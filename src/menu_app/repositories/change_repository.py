@@ -0,0 +1,111 @@
+from sqlalchemy import BigInteger, Row, Text, bindparam, cast, func, select, tuple_
+
+from models.models import Dish, Menu, SubMenu, Tombstone
+
+from .base_repository import MENU_ALIVE, SUBMENU_ALIVE, BaseRepository
+
+# Все транзакции с id меньше xmin снимка завершены, и их изменения
+# уже видны. Транзакции новее могут завершиться в любом порядке,
+# поэтому их изменения отдаются, только когда горизонт их пройдет
+HORIZON_QUERY = select(cast(
+    cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text),
+    BigInteger
+))
+
+
+def changed_after(model) -> tuple:
+    """
+    Условия страницы изменений: после позиции (version, after_id)
+    и до горизонта. Сравнение пары использует индекс (version, id)
+    """
+    after = tuple_(model.version, model.id) > \
+        tuple_(bindparam('version'), bindparam('after_id'))
+    return after, model.version < bindparam('horizon')
+
+
+def page(query, model):
+    """Страница изменений по порядку индекса (version, id)"""
+    return query.\
+        order_by(model.version, model.id).\
+        limit(bindparam('limit'))
+
+
+# Подменю и блюда удаленных меню и подменю в ленту не попадают:
+# их удаление следует из удаления родителя. Родители проверяются
+# подзапросом для каждой строки, а не соединением: так планировщик
+# читает индекс (version, id) по порядку и останавливается на limit,
+# а не соединяет и сортирует все изменения после версии
+SUBMENU_PARENT_ALIVE = \
+    select(MENU_ALIVE).\
+    where(Menu.id == SubMenu.menu_id).\
+    scalar_subquery()
+
+DISH_PARENTS_ALIVE = \
+    select(MENU_ALIVE).\
+    join_from(SubMenu, Menu, SubMenu.menu_id == Menu.id).\
+    where(SubMenu.id == Dish.submenu_id, SUBMENU_ALIVE).\
+    scalar_subquery()
+
+# Запросы собираются один раз при импорте модуля, см. menu_repository
+CHANGES_QUERIES = {
+    'menu': page(
+        select(
+            Menu.version, Menu.id, Menu.title, Menu.description,
+            Menu.updated_at
+        ).
+        where(*changed_after(Menu), MENU_ALIVE),
+        Menu
+    ),
+    'submenu': page(
+        select(
+            SubMenu.version, SubMenu.id, SubMenu.menu_id, SubMenu.title,
+            SubMenu.description, SubMenu.updated_at
+        ).
+        where(*changed_after(SubMenu), SUBMENU_ALIVE, SUBMENU_PARENT_ALIVE),
+        SubMenu
+    ),
+    'dish': page(
+        select(
+            Dish.version, Dish.id, Dish.submenu_id, Dish.title,
+            Dish.description, Dish.price, Dish.updated_at
+        ).
+        where(*changed_after(Dish), DISH_PARENTS_ALIVE),
+        Dish
+    ),
+    'deleted': page(
+        select(
+            Tombstone.version, Tombstone.id, Tombstone.entity,
+            Tombstone.object_id, Tombstone.menu_id, Tombstone.submenu_id
+        ).
+        where(*changed_after(Tombstone)),
+        Tombstone
+    ),
+}
+
+
+class ChangeRepository(BaseRepository):
+    """Репозиторий ленты изменений для синхронизации каталога"""
+
+    async def get_horizon(self) -> int:
+        """Версия, до которой все изменения уже видны"""
+        return (await self.session.execute(HORIZON_QUERY)).scalar()
+
+    async def get_changes(
+        self,
+        kind: str,
+        version: int,
+        after_id: int,
+        horizon: int,
+        limit: int
+    ) -> list[Row]:
+        """
+        Изменения вида kind (menu, submenu, dish, deleted) после позиции
+        (version, after_id) и до горизонта по возрастанию версии и id
+        """
+        result = await self.session.execute(CHANGES_QUERIES[kind], {
+            'version': version,
+            'after_id': after_id,
+            'horizon': horizon,
+            'limit': limit,
+        })
+        return result.all()
@@ -1,10 +1,118 @@
-from sqlalchemy import select
+import functools
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import (
+    Integer,
+    Row,
+    Select,
+    String,
+    any_,
+    bindparam,
+    delete,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.exc import IntegrityError
 
 from models.models import Dish, Menu, SubMenu
 
-from ..schemas import DishCreate
-from .base_repository import BaseRepository
+from ..schemas import (
+    BulkItemResult,
+    BulkStatus,
+    DishBulkCreate,
+    DishBulkUpdate,
+    DishCreate,
+)
+from .base_repository import (
+    MENU_ALIVE,
+    SUBMENU_ALIVE,
+    BaseRepository,
+    chunked,
+    on_primary,
+)
+from .purge_repository import PURGED_SUBMENUS_QUERY
+
+# Горячие запросы собираются один раз при импорте модуля,
+# см. menu_repository
+DISH_LIST_QUERY = \
+    select(Dish).\
+    join(SubMenu, Dish.submenu_id == SubMenu.id).\
+    join(Menu, SubMenu.menu_id == Menu.id).\
+    filter(
+        Dish.submenu_id == bindparam('submenu_id'),
+        SubMenu.menu_id == bindparam('menu_id'),
+        SUBMENU_ALIVE,
+        MENU_ALIVE
+    )
+
+# Неудаленные подменю в неудаленных меню
+ALIVE_SUBMENUS_QUERY = \
+    select(SubMenu.id).\
+    join(Menu, SubMenu.menu_id == Menu.id).\
+    filter(SUBMENU_ALIVE, MENU_ALIVE)
+
+DISH_BY_ID_QUERY = \
+    DISH_LIST_QUERY.\
+    filter(Dish.id == bindparam('dish_id'))
+
+# Массив вместо IN: один prepared statement на любое количество id
+DISHES_BY_IDS_QUERY = \
+    DISH_LIST_QUERY.\
+    filter(Dish.id == any_(bindparam('dish_ids', type_=ARRAY(Integer))))
+
+# Блюда любых подменю вместе с id меню и подменю, в которых они видны
+DISHES_WITH_PARENTS_QUERY = \
+    select(Dish, SubMenu.menu_id).\
+    join(SubMenu, Dish.submenu_id == SubMenu.id).\
+    join(Menu, SubMenu.menu_id == Menu.id).\
+    filter(
+        Dish.id == any_(bindparam('dish_ids', type_=ARRAY(Integer))),
+        SUBMENU_ALIVE,
+        MENU_ALIVE
+    )
+
+# Блюда удаленных подменю и меню ждут фоновой очистки, а названия блюд
+# уникальны во всем каталоге. Такие блюда с занимаемыми названиями
+# удаляются сразу, в транзакции записи
+RELEASE_TITLES_QUERY = \
+    delete(Dish.__table__).\
+    where(
+        Dish.title == any_(bindparam('titles', type_=ARRAY(String))),
+        Dish.submenu_id.in_(PURGED_SUBMENUS_QUERY)
+    )
+
+# Столбцы ответов с выбранными полями (?fields=)
+DISH_FIELDS = {
+    'id': Dish.id,
+    'title': Dish.title,
+    'description': Dish.description,
+    'price': Dish.price,
+}
+
+
+@functools.lru_cache
+def dish_fields_query(fields: tuple[str, ...], by_id: bool = False) -> Select:
+    """
+    Запрос блюд подменю только с выбранными столбцами.
+    Собирается один раз на каждый набор полей
+    """
+    query = DISH_BY_ID_QUERY if by_id else DISH_LIST_QUERY
+    return query.with_only_columns(*(DISH_FIELDS[field] for field in fields))
+
+
+def filter_price(
+    query: Select,
+    price_min: Decimal | None,
+    price_max: Decimal | None
+) -> Select:
+    """Оставляет блюда с ценой в заданных границах"""
+    if price_min is not None:
+        query = query.filter(Dish.price >= price_min)
+    if price_max is not None:
+        query = query.filter(Dish.price <= price_max)
+    return query
 
 
 class DishRepository(BaseRepository):
@@ -13,23 +121,47 @@ class DishRepository(BaseRepository):
     async def get_dish_list(
         self,
         menu_id: int,
-        submenu_id: int
+        submenu_id: int,
+        price_min: Decimal | None = None,
+        price_max: Decimal | None = None
     ) -> list[Dish]:
-        """Возвращает список блюд из подменю"""
+        """
+        Возвращает список блюд из подменю,
+        при заданных границах - только блюда с ценой в этих границах
+        """
+        query = filter_price(DISH_LIST_QUERY, price_min, price_max)
         result = await self.session.execute(
-            select(Dish).
-            join(SubMenu, Dish.submenu_id == submenu_id).
-            join(Menu, SubMenu.menu_id == menu_id)
+            query, {'menu_id': menu_id, 'submenu_id': submenu_id}
         )
         result = [_tuple[0] for _tuple in result.all()]
         return result
 
+    async def get_dish_list_fields(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        fields: tuple[str, ...],
+        price_min: Decimal | None = None,
+        price_max: Decimal | None = None
+    ) -> list[Row]:
+        """
+        Возвращает список блюд из подменю только с выбранными полями,
+        при заданных границах - только блюда с ценой в этих границах
+        """
+        query = filter_price(dish_fields_query(fields), price_min, price_max)
+        result = await self.session.execute(
+            query, {'menu_id': menu_id, 'submenu_id': submenu_id}
+        )
+        return result.all()
+
+    @on_primary
     async def create_dish(
         self,
         new_dish: DishCreate,
         submenu_id: int
     ) -> Dish:
         """Создает блюдо"""
+        await self.__release_titles([new_dish.title])
         dish_obj = Dish(**new_dish.model_dump())
         dish_obj.submenu_id = submenu_id
         self.session.add(dish_obj)
@@ -46,19 +178,62 @@ class DishRepository(BaseRepository):
     ) -> Dish:
         """Возвращает блюдо"""
         result = await self.session.execute(
-            select(Dish).
-            join(SubMenu, Dish.submenu_id == submenu_id).
-            join(Menu, SubMenu.menu_id == menu_id).
-            filter(Dish.id == dish_id)
+            DISH_BY_ID_QUERY,
+            {'menu_id': menu_id, 'submenu_id': submenu_id, 'dish_id': dish_id}
         )
         return result.one()[0]
 
+    async def get_dish_fields(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        dish_id: int,
+        fields: tuple[str, ...]
+    ) -> Row:
+        """Возвращает выбранные поля блюда"""
+        result = await self.session.execute(
+            dish_fields_query(fields, by_id=True),
+            {'menu_id': menu_id, 'submenu_id': submenu_id, 'dish_id': dish_id}
+        )
+        return result.one()
+
+    async def get_dishes_by_ids(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        dish_ids: list[int]
+    ) -> list[Dish]:
+        """
+        Возвращает найденные блюда подменю одним запросом.
+        Отсутствующие id пропускаются
+        """
+        result = await self.session.execute(
+            DISHES_BY_IDS_QUERY,
+            {'menu_id': menu_id, 'submenu_id': submenu_id, 'dish_ids': dish_ids}
+        )
+        return list(result.scalars())
+
+    async def get_dishes_with_parents(
+        self,
+        dish_ids: list[int]
+    ) -> list[tuple[int, Dish]]:
+        """
+        Возвращает найденные блюда любых подменю с id их меню
+        одним запросом. Отсутствующие и скрытые id пропускаются
+        """
+        result = await self.session.execute(
+            DISHES_WITH_PARENTS_QUERY, {'dish_ids': dish_ids}
+        )
+        return [(menu_id, dish_obj) for dish_obj, menu_id in result]
+
+    @on_primary
     async def update_dish_by_id(
         self, menu_id: int, submenu_id: int,
         dish_id: int, item: DishCreate
     ) -> Dish:
         """Обновляет блюдо"""
         dish_obj = await self.get_dish_by_id(menu_id, submenu_id, dish_id)
+        await self.__release_titles([item.title])
         for key, value in item.model_dump().items():
             setattr(dish_obj, key, value)
         try:
@@ -68,6 +243,7 @@ class DishRepository(BaseRepository):
             raise ValueError('Ошибка при сохранении объекта')
         return dish_obj
 
+    @on_primary
     async def delete_dish_by_id(
         self, menu_id: int,
         submenu_id: int, dish_id: int
@@ -76,3 +252,204 @@ class DishRepository(BaseRepository):
         dish_obj = await self.get_dish_by_id(menu_id, submenu_id, dish_id)
         await self.session.delete(dish_obj)
         await self.session.commit()
+
+    @on_primary
+    async def create_dish_bulk(
+        self,
+        menu_id: int,
+        items: list[DishBulkCreate]
+    ) -> tuple[list[BulkItemResult], dict[int, set[int]]]:
+        """
+        Создает блюда одной транзакцией.
+        Возвращает результат по каждому элементу
+        и id созданных блюд, сгруппированные по подменю
+        """
+        results: dict[int, BulkItemResult] = {}
+        submenu_ids = await self.get_submenu_ids_in_menu(
+            menu_id, {item.submenu_id for item in items}
+        )
+        rows_by_title: dict[str, tuple[int, dict]] = {}
+        for index, item in enumerate(items):
+            if item.submenu_id not in submenu_ids:
+                results[index] = BulkItemResult(
+                    index=index,
+                    status=BulkStatus.not_found,
+                    detail='submenu not found'
+                )
+            elif item.title in rows_by_title:
+                results[index] = BulkItemResult(
+                    index=index,
+                    status=BulkStatus.conflict,
+                    detail='duplicate title in request'
+                )
+            else:
+                rows_by_title[item.title] = (index, item.model_dump())
+
+        created: dict[int, set[int]] = defaultdict(set)
+        rows = [row for _, row in rows_by_title.values()]
+        await self.__release_titles(list(rows_by_title))
+        try:
+            for chunk in chunked(rows):
+                inserted = await self.session.execute(
+                    insert(Dish.__table__).
+                    values(chunk).
+                    on_conflict_do_nothing(index_elements=[Dish.title]).
+                    returning(Dish.id, Dish.title, Dish.submenu_id)
+                )
+                for dish_id, title, submenu_id in inserted:
+                    index = rows_by_title[title][0]
+                    results[index] = BulkItemResult(
+                        index=index,
+                        status=BulkStatus.created,
+                        id=str(dish_id)
+                    )
+                    created[submenu_id].add(dish_id)
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            raise ValueError('Ошибка при сохранении объектов')
+
+        for index, _ in enumerate(items):
+            results.setdefault(index, BulkItemResult(
+                index=index,
+                status=BulkStatus.conflict,
+                detail='title already exists'
+            ))
+        return [results[index] for index in range(len(items))], created
+
+    @on_primary
+    async def update_dish_bulk(
+        self,
+        menu_id: int,
+        items: list[DishBulkUpdate]
+    ) -> tuple[list[BulkItemResult], dict[int, set[int]]]:
+        """
+        Обновляет блюда одной транзакцией (executemany).
+        Возвращает результат по каждому элементу
+        и id обновленных блюд, сгруппированные по подменю
+        """
+        existing = await self.session.execute(
+            select(Dish.id, Dish.submenu_id).
+            join(SubMenu, Dish.submenu_id == SubMenu.id).
+            filter(
+                SubMenu.menu_id == menu_id,
+                Dish.id.in_({item.id for item in items}),
+                Dish.submenu_id.in_(ALIVE_SUBMENUS_QUERY)
+            )
+        )
+        submenu_by_dish = dict(existing.all())
+        await self.__release_titles(list({item.title for item in items}))
+        taken_titles = await self.session.execute(
+            select(Dish.title, Dish.id).
+            filter(Dish.title.in_({item.title for item in items}))
+        )
+        owner_by_title = dict(taken_titles.all())
+
+        results: list[BulkItemResult] = []
+        params: list[dict] = []
+        seen_ids: set[int] = set()
+        seen_titles: set[str] = set()
+        updated: dict[int, set[int]] = defaultdict(set)
+        for index, item in enumerate(items):
+            if item.id not in submenu_by_dish:
+                status, detail = BulkStatus.not_found, 'dish not found'
+            elif item.id in seen_ids:
+                status, detail = BulkStatus.conflict, 'duplicate id in request'
+            elif item.title in seen_titles or \
+                    owner_by_title.get(item.title, item.id) != item.id:
+                status, detail = BulkStatus.conflict, 'title already exists'
+            else:
+                status, detail = BulkStatus.updated, None
+                seen_ids.add(item.id)
+                seen_titles.add(item.title)
+                params.append({
+                    'b_id': item.id,
+                    'title': item.title,
+                    'description': item.description,
+                    'price': item.price,
+                })
+                updated[submenu_by_dish[item.id]].add(item.id)
+            results.append(BulkItemResult(
+                index=index, status=status, id=str(item.id), detail=detail
+            ))
+
+        if params:
+            try:
+                await self.session.execute(
+                    update(Dish.__table__).
+                    where(Dish.id == bindparam('b_id')),
+                    params
+                )
+                await self.session.commit()
+            except IntegrityError:
+                await self.session.rollback()
+                raise ValueError('Ошибка при сохранении объектов')
+        return results, updated
+
+    @on_primary
+    async def delete_dish_bulk(
+        self,
+        menu_id: int,
+        dish_ids: list[int]
+    ) -> tuple[list[BulkItemResult], dict[int, set[int]]]:
+        """
+        Удаляет блюда одним запросом.
+        Возвращает результат по каждому элементу
+        и id удаленных блюд, сгруппированные по подменю
+        """
+        deleted_rows = await self.session.execute(
+            delete(Dish.__table__).
+            where(
+                Dish.id.in_(set(dish_ids)),
+                Dish.submenu_id.in_(
+                    ALIVE_SUBMENUS_QUERY.filter(SubMenu.menu_id == menu_id)
+                )
+            ).
+            returning(Dish.id, Dish.submenu_id)
+        )
+        deleted: dict[int, set[int]] = defaultdict(set)
+        for dish_id, submenu_id in deleted_rows:
+            deleted[submenu_id].add(dish_id)
+        await self.session.commit()
+
+        results = []
+        not_reported = set().union(*deleted.values())
+        for index, dish_id in enumerate(dish_ids):
+            if dish_id in not_reported:
+                not_reported.discard(dish_id)
+                results.append(BulkItemResult(
+                    index=index,
+                    status=BulkStatus.deleted,
+                    id=str(dish_id)
+                ))
+            else:
+                results.append(BulkItemResult(
+                    index=index,
+                    status=BulkStatus.not_found,
+                    id=str(dish_id),
+                    detail='dish not found'
+                ))
+        return results, deleted
+
+    async def get_submenu_ids_in_menu(
+        self,
+        menu_id: int,
+        submenu_ids: set[int]
+    ) -> set[int]:
+        """Возвращает те id из submenu_ids, которые относятся к меню"""
+        result = await self.session.execute(
+            ALIVE_SUBMENUS_QUERY.
+            filter(
+                SubMenu.menu_id == menu_id,
+                SubMenu.id.in_(submenu_ids)
+            )
+        )
+        return set(result.scalars().all())
+
+    async def __release_titles(self, titles: list[str]) -> None:
+        """
+        Освобождает названия, которые еще держат блюда удаленных
+        подменю и меню: иначе блюда удаленного меню нельзя создать заново
+        до фоновой очистки
+        """
+        await self.session.execute(RELEASE_TITLES_QUERY, {'titles': titles})
@@ -0,0 +1,365 @@
+from collections import defaultdict
+from collections.abc import AsyncIterable, AsyncIterator
+from dataclasses import dataclass, field
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    and_,
+    delete,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import exists, func, literal_column
+
+from models.models import Dish, Menu, SubMenu
+
+from ..schemas import ImportReport, normalize_price
+from .base_repository import (
+    MENU_ALIVE,
+    SUBMENU_ALIVE,
+    BaseRepository,
+    chunked,
+    on_primary,
+)
+
+# Сколько ошибок разбора строк попадает в отчет
+MAX_REPORTED_ERRORS = 100
+
+# Временная таблица, в которую блюда из файла загружаются через COPY
+dish_import = Table(
+    'dish_import',
+    MetaData(),
+    Column('row_number', Integer),
+    Column('title', String),
+    Column('description', String),
+    Column('price', Numeric(12, 2)),
+    Column('submenu_title', String),
+    prefixes=['TEMPORARY'],
+    postgresql_on_commit='DROP',
+)
+
+
+@dataclass
+class TouchedCache:
+    """Объекты, кеш которых нужно инвалидировать после импорта"""
+
+    menus: set[int] = field(default_factory=set)
+    submenus: dict[int, set[int]] = field(
+        default_factory=lambda: defaultdict(set)
+    )
+    dishes: dict[int, dict[int, set[int]]] = field(
+        default_factory=lambda: defaultdict(lambda: defaultdict(set))
+    )
+
+
+class ImportRepository(BaseRepository):
+    """Репозиторий для импорта каталога из файла"""
+
+    @on_primary
+    async def import_rows(
+        self,
+        rows: AsyncIterable[dict[str, str]],
+        prune: bool = False
+    ) -> tuple[ImportReport, TouchedCache]:
+        """
+        Применяет к базе данных только отличия файла каталога
+        от текущего состояния. Меню, подменю и блюда
+        сопоставляются по названию.
+        prune - удалить объекты, которых нет в файле
+        """
+        report = ImportReport()
+        touched = TouchedCache()
+        menus: dict[str, str] = {}
+        submenus: dict[str, tuple[str, str]] = {}
+
+        connection = await self.session.connection()
+        await connection.run_sync(dish_import.create)
+        driver_connection = \
+            (await connection.get_raw_connection()).driver_connection
+        await driver_connection.copy_records_to_table(
+            dish_import.name,
+            records=self.__dish_records(rows, menus, submenus, report),
+            columns=[column.name for column in dish_import.columns],
+        )
+
+        menu_ids = await self.__upsert_menus(menus, report, touched)
+        submenu_ids = await self.__upsert_submenus(
+            submenus, menu_ids, report, touched
+        )
+        await self.__upsert_dishes(submenu_ids, report, touched)
+        if prune:
+            if report.errors:
+                report.errors.append('prune skipped: file contains errors')
+            else:
+                await self.__prune(menus, submenus, report, touched)
+
+        await self.session.commit()
+        return report, touched
+
+    async def __dish_records(
+        self,
+        rows: AsyncIterable[dict[str, str]],
+        menus: dict[str, str],
+        submenus: dict[str, tuple[str, str]],
+        report: ImportReport
+    ) -> AsyncIterator[tuple]:
+        """
+        Разбирает строки файла: меню и подменю собирает в словари,
+        блюда отдает записями для COPY
+        """
+        def error(row_number: int, message: str) -> None:
+            if len(report.errors) < MAX_REPORTED_ERRORS:
+                report.errors.append(f'row {row_number}: {message}')
+
+        # первая строка файла - заголовок
+        row_number = 1
+        async for row in rows:
+            row_number += 1
+            report.rows += 1
+            menu_title = row['menu_title']
+            submenu_title = row['submenu_title']
+            dish_title = row['dish_title']
+            if not menu_title:
+                error(row_number, 'menu_title is empty')
+                continue
+            menus[menu_title] = row['menu_description']
+            if not submenu_title:
+                if dish_title:
+                    error(row_number, 'submenu_title is empty')
+                continue
+            submenus[submenu_title] = (menu_title, row['submenu_description'])
+            if not dish_title:
+                continue
+            try:
+                price = normalize_price(row['dish_price'])
+            except ValueError:
+                error(row_number, 'price is invalid')
+                continue
+            yield (
+                row_number,
+                dish_title,
+                row['dish_description'],
+                price,
+                submenu_title,
+            )
+
+    async def __upsert_menus(
+        self,
+        menus: dict[str, str],
+        report: ImportReport,
+        touched: TouchedCache
+    ) -> dict[str, int]:
+        """Создает новые и обновляет измененные меню, возвращает их id"""
+        existing = await self.session.execute(
+            select(Menu.title, Menu.id, Menu.description).
+            filter(Menu.title.in_(menus), MENU_ALIVE)
+        )
+        menu_ids = {}
+        changed = []
+        for title, menu_id, description in existing:
+            menu_ids[title] = menu_id
+            if description != menus[title]:
+                changed.append(title)
+        report.menus_updated = len(changed)
+        report.menus_created = len(menus) - len(menu_ids)
+        changed += [title for title in menus if title not in menu_ids]
+
+        for chunk in chunked(changed):
+            statement = insert(Menu.__table__).values([
+                {'title': title, 'description': menus[title]}
+                for title in chunk
+            ])
+            upserted = await self.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[Menu.title],
+                    index_where=MENU_ALIVE,
+                    set_={'description': statement.excluded.description},
+                ).returning(Menu.id, Menu.title)
+            )
+            for menu_id, title in upserted:
+                menu_ids[title] = menu_id
+                touched.menus.add(menu_id)
+        return menu_ids
+
+    async def __upsert_submenus(
+        self,
+        submenus: dict[str, tuple[str, str]],
+        menu_ids: dict[str, int],
+        report: ImportReport,
+        touched: TouchedCache
+    ) -> dict[str, tuple[int, int]]:
+        """
+        Создает новые и обновляет измененные подменю,
+        возвращает их id вместе с id меню
+        """
+        existing = await self.session.execute(
+            select(
+                SubMenu.title, SubMenu.id,
+                SubMenu.menu_id, SubMenu.description
+            ).
+            filter(SubMenu.title.in_(submenus), SUBMENU_ALIVE)
+        )
+        submenu_ids = {}
+        changed = []
+        for title, submenu_id, menu_id, description in existing:
+            menu_title, new_description = submenus[title]
+            new_menu_id = menu_ids[menu_title]
+            submenu_ids[title] = (submenu_id, new_menu_id)
+            if (menu_id, description) != (new_menu_id, new_description):
+                changed.append(title)
+                touched.submenus[menu_id].add(submenu_id)
+        report.submenus_updated = len(changed)
+        report.submenus_created = len(submenus) - len(submenu_ids)
+        changed += [title for title in submenus if title not in submenu_ids]
+
+        for chunk in chunked(changed):
+            statement = insert(SubMenu.__table__).values([
+                {
+                    'title': title,
+                    'description': submenus[title][1],
+                    'menu_id': menu_ids[submenus[title][0]],
+                }
+                for title in chunk
+            ])
+            upserted = await self.session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[SubMenu.title],
+                    index_where=SUBMENU_ALIVE,
+                    set_={
+                        'description': statement.excluded.description,
+                        'menu_id': statement.excluded.menu_id,
+                    },
+                ).returning(SubMenu.id, SubMenu.title, SubMenu.menu_id)
+            )
+            for submenu_id, title, menu_id in upserted:
+                submenu_ids[title] = (submenu_id, menu_id)
+                touched.submenus[menu_id].add(submenu_id)
+        return submenu_ids
+
+    async def __upsert_dishes(
+        self,
+        submenu_ids: dict[str, tuple[int, int]],
+        report: ImportReport,
+        touched: TouchedCache
+    ) -> None:
+        """
+        Одним запросом переносит блюда из временной таблицы:
+        новые создаются, измененные обновляются, остальные не трогаются
+        """
+        menu_by_submenu = dict(submenu_ids.values())
+        source = (
+            select(
+                dish_import.c.title,
+                dish_import.c.description,
+                dish_import.c.price,
+                SubMenu.id,
+            ).
+            join(SubMenu, and_(
+                SubMenu.title == dish_import.c.submenu_title,
+                SUBMENU_ALIVE
+            )).
+            distinct(dish_import.c.title).
+            order_by(dish_import.c.title, dish_import.c.row_number.desc())
+        ).subquery()
+
+        # старые подменю блюд, которые будут перенесены в другое подменю
+        moved = await self.session.execute(
+            select(Dish.id, Dish.submenu_id, SubMenu.menu_id).
+            join(SubMenu, SubMenu.id == Dish.submenu_id).
+            join(source, source.c.title == Dish.title).
+            filter(source.c.id != Dish.submenu_id)
+        )
+        for dish_id, submenu_id, menu_id in moved:
+            touched.dishes[menu_id][submenu_id].add(dish_id)
+
+        statement = insert(Dish.__table__).from_select(
+            ['title', 'description', 'price', 'submenu_id'],
+            select(source),
+        )
+        excluded = statement.excluded
+        upserted = await self.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[Dish.title],
+                set_={
+                    'description': excluded.description,
+                    'price': excluded.price,
+                    'submenu_id': excluded.submenu_id,
+                },
+                where=or_(
+                    Dish.description.is_distinct_from(excluded.description),
+                    Dish.price.is_distinct_from(excluded.price),
+                    Dish.submenu_id.is_distinct_from(excluded.submenu_id),
+                ),
+            ).returning(
+                Dish.id,
+                Dish.submenu_id,
+                literal_column('xmax = 0').label('inserted'),
+            )
+        )
+        for dish_id, submenu_id, inserted in upserted:
+            if inserted:
+                report.dishes_created += 1
+            else:
+                report.dishes_updated += 1
+            menu_id = menu_by_submenu[submenu_id]
+            touched.dishes[menu_id][submenu_id].add(dish_id)
+
+    async def __prune(
+        self,
+        menus: dict[str, str],
+        submenus: dict[str, tuple[str, str]],
+        report: ImportReport,
+        touched: TouchedCache
+    ) -> None:
+        """
+        Удаляет блюда, подменю и меню, которых нет в файле.
+        Подменю и меню удаляются мягко, их дочерние записи
+        удалит фоновая очистка
+        """
+        deleted_dishes = await self.session.execute(
+            delete(Dish.__table__).
+            where(
+                ~exists().where(dish_import.c.title == Dish.title),
+                Dish.submenu_id.in_(select(SubMenu.id).filter(SUBMENU_ALIVE))
+            ).
+            returning(Dish.id, Dish.submenu_id)
+        )
+        deleted_dishes = deleted_dishes.all()
+        report.dishes_deleted = len(deleted_dishes)
+        if deleted_dishes:
+            menu_by_submenu = dict((await self.session.execute(
+                select(SubMenu.id, SubMenu.menu_id).
+                filter(SubMenu.id.in_(
+                    {submenu_id for _, submenu_id in deleted_dishes}
+                ))
+            )).all())
+            for dish_id, submenu_id in deleted_dishes:
+                menu_id = menu_by_submenu[submenu_id]
+                touched.dishes[menu_id][submenu_id].add(dish_id)
+
+        deleted_submenus = await self.session.execute(
+            update(SubMenu.__table__).
+            where(SubMenu.title.not_in(submenus), SUBMENU_ALIVE).
+            values(deleted_at=func.now()).
+            returning(SubMenu.id, SubMenu.menu_id)
+        )
+        for submenu_id, menu_id in deleted_submenus:
+            report.submenus_deleted += 1
+            touched.submenus[menu_id].add(submenu_id)
+
+        deleted_menus = await self.session.execute(
+            update(Menu.__table__).
+            where(Menu.title.not_in(menus), MENU_ALIVE).
+            values(deleted_at=func.now()).
+            returning(Menu.id)
+        )
+        for menu_id in deleted_menus.scalars():
+            report.menus_deleted += 1
+            touched.menus.add(menu_id)
@@ -1,12 +1,180 @@
-from sqlalchemy import select
-from sqlalchemy.exc import IntegrityError
+import functools
+from collections.abc import AsyncIterator
+
+from sqlalchemy import (
+    Integer,
+    Row,
+    Select,
+    String,
+    and_,
+    any_,
+    bindparam,
+    cast,
+    select,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import func
 
-from models.models import Dish, Menu, SubMenu
+from config import AGGREGATES_MATVIEW
+from models.models import Dish, Menu, SubMenu, menu_stats
+
+from ..schemas import MenuCreate, PriceStats
+from .base_repository import (
+    MENU_ALIVE,
+    PRICE_STATS,
+    SUBMENU_ALIVE,
+    BaseRepository,
+    on_primary,
+)
+
+# Сколько строк серверный курсор получает из базы за раз
+STREAM_FETCH_SIZE = 1000
+
+# Горячие запросы собираются один раз при импорте модуля,
+# значения подставляются через bindparam при выполнении.
+# Поэтому запрос не строится заново на каждый вызов,
+# а SQLAlchemy компилирует его один раз на процесс
+MENU_SUBMENUS_JOIN = and_(Menu.id == SubMenu.menu_id, SUBMENU_ALIVE)
+
+MENU_LIST_WITH_DISHES_COUNT_QUERY = \
+    select(Menu, func.count(Dish.id)).\
+    select_from(Menu).\
+    outerjoin(SubMenu, MENU_SUBMENUS_JOIN).\
+    outerjoin(Dish, SubMenu.id == Dish.submenu_id).\
+    filter(MENU_ALIVE).\
+    group_by(Menu.id).order_by(Menu.id)
+
+SUBMENUS_COUNT_FOR_MENU_LIST_QUERY = \
+    select(Menu.id, func.count(SubMenu.menu_id)).\
+    select_from(Menu).\
+    outerjoin(SubMenu, MENU_SUBMENUS_JOIN).\
+    filter(MENU_ALIVE).\
+    group_by(Menu.id).order_by(Menu.id)
+
+MENU_BY_ID_QUERY = \
+    select(Menu).\
+    filter(Menu.id == bindparam('menu_id'), MENU_ALIVE)
+
+SUBMENUS_COUNT_IN_MENU_QUERY = \
+    select(func.count(SubMenu.menu_id)).\
+    select_from(SubMenu).\
+    filter(SubMenu.menu_id == bindparam('menu_id'), SUBMENU_ALIVE)
+
+DISHES_COUNT_IN_MENU_QUERY = \
+    select(func.count(Dish.id)).\
+    select_from(Menu).\
+    outerjoin(SubMenu, MENU_SUBMENUS_JOIN).\
+    outerjoin(Dish, SubMenu.id == Dish.submenu_id).\
+    filter(Menu.id == bindparam('menu_id'))
+
+# Количество подменю и блюд из материализованного представления.
+# Меню, созданное после последнего пересчета, получает нули
+MENU_LIST_FROM_STATS_QUERY = \
+    select(
+        Menu,
+        func.coalesce(menu_stats.c.dishes_count, 0),
+        func.coalesce(menu_stats.c.submenus_count, 0)
+    ).\
+    outerjoin(menu_stats, Menu.id == menu_stats.c.menu_id).\
+    filter(MENU_ALIVE).\
+    order_by(Menu.id)
+
+MENU_PRICE_STATS_QUERY = \
+    select(*PRICE_STATS).\
+    select_from(Menu).\
+    outerjoin(SubMenu, MENU_SUBMENUS_JOIN).\
+    outerjoin(Dish, SubMenu.id == Dish.submenu_id).\
+    filter(Menu.id == bindparam('menu_id'), MENU_ALIVE).\
+    group_by(Menu.id)
+
+MENU_PRICE_STATS_FROM_VIEW_QUERY = \
+    select(
+        func.coalesce(menu_stats.c.dishes_count, 0).label('dishes_count'),
+        menu_stats.c.min_price,
+        menu_stats.c.max_price,
+        menu_stats.c.avg_price
+    ).\
+    select_from(Menu).\
+    outerjoin(menu_stats, Menu.id == menu_stats.c.menu_id).\
+    filter(Menu.id == bindparam('menu_id'), MENU_ALIVE)
+
+# Столбцы ответов с выбранными полями (?fields=):
+# количество подменю и блюд считается, только если оно запрошено
+MENU_FIELDS = {
+    'id': Menu.id,
+    'title': Menu.title,
+    'description': Menu.description,
+    'submenus_count':
+        select(func.count(SubMenu.id)).
+        filter(SubMenu.menu_id == Menu.id, SUBMENU_ALIVE).
+        scalar_subquery(),
+    'dishes_count':
+        select(func.count(Dish.id)).
+        join(SubMenu, SubMenu.id == Dish.submenu_id).
+        filter(SubMenu.menu_id == Menu.id, SUBMENU_ALIVE).
+        scalar_subquery(),
+}
+MENU_FIELDS_FROM_STATS = {
+    **MENU_FIELDS,
+    'submenus_count': func.coalesce(
+        select(menu_stats.c.submenus_count).
+        filter(menu_stats.c.menu_id == Menu.id).
+        scalar_subquery(),
+        0
+    ),
+    'dishes_count': func.coalesce(
+        select(menu_stats.c.dishes_count).
+        filter(menu_stats.c.menu_id == Menu.id).
+        scalar_subquery(),
+        0
+    ),
+}
+
+
+# Меню с количеством подменю и блюд, которые считаются заново,
+# как в get_menu_with_counts. Массив вместо IN, см. submenu_repository
+MENUS_BY_IDS_QUERY = \
+    select(
+        Menu, MENU_FIELDS['submenus_count'], MENU_FIELDS['dishes_count']
+    ).\
+    filter(
+        Menu.id == any_(bindparam('menu_ids', type_=ARRAY(Integer))),
+        MENU_ALIVE
+    ).\
+    order_by(Menu.id)
+
+
+@functools.lru_cache
+def menu_fields_query(
+    fields: tuple[str, ...],
+    from_stats: bool = False,
+    by_id: bool = False
+) -> Select:
+    """
+    Запрос меню только с выбранными столбцами.
+    Собирается один раз на каждый набор полей
+    """
+    columns = MENU_FIELDS_FROM_STATS if from_stats else MENU_FIELDS
+    query = \
+        select(*(columns[field].label(field) for field in fields)).\
+        select_from(Menu).\
+        filter(MENU_ALIVE).\
+        order_by(Menu.id)
+    if by_id:
+        query = query.filter(Menu.id == bindparam('menu_id'))
+    return query
 
-from ..schemas import MenuCreate
-from .base_repository import BaseRepository
+
+ALL_LIST_QUERY = \
+    select(Menu).\
+    filter(MENU_ALIVE).\
+    options(
+        joinedload(Menu.submenus.and_(SUBMENU_ALIVE)).
+        joinedload(SubMenu.dishes)
+    )
 
 
 class MenuRepository(BaseRepository):
@@ -17,12 +185,10 @@ class MenuRepository(BaseRepository):
         Возвращает список всех меню
         с количеством блюд и подменю в каждом меню
         """
+        if AGGREGATES_MATVIEW:
+            return await self.get_menu_list_from_stats()
         menus_with_dishes_count = await self.session.execute(
-            select(Menu, func.count(Dish.id)).
-            select_from(Menu).
-            outerjoin(SubMenu, Menu.id == SubMenu.menu_id).
-            outerjoin(Dish, SubMenu.id == Dish.submenu_id).
-            group_by(Menu.id).order_by(Menu.id)
+            MENU_LIST_WITH_DISHES_COUNT_QUERY
         )
 
         menus = []
@@ -30,24 +196,45 @@ class MenuRepository(BaseRepository):
 
         for menu_obj, dishes_count in menus_with_dishes_count:
             setattr(menu_obj, 'dishes_count', dishes_count)
-            setattr(menu_obj, 'submenus_count', submenus_count[menu_obj.id])
+            # Меню, удаленного между запросами, во втором запросе нет
+            setattr(
+                menu_obj, 'submenus_count', submenus_count.get(menu_obj.id, 0)
+            )
+            menus.append(menu_obj)
+        return menus
+
+    async def get_menu_list_from_stats(self) -> list[Menu]:
+        """
+        Возвращает список всех меню с количеством блюд и подменю
+        из материализованного представления
+        """
+        result = await self.session.execute(MENU_LIST_FROM_STATS_QUERY)
+        menus = []
+        for menu_obj, dishes_count, submenus_count in result:
+            setattr(menu_obj, 'dishes_count', dishes_count)
+            setattr(menu_obj, 'submenus_count', submenus_count)
             menus.append(menu_obj)
         return menus
 
+    async def get_menu_list_fields(self, fields: tuple[str, ...]) -> list[Row]:
+        """Возвращает список всех меню только с выбранными полями"""
+        result = await self.session.execute(
+            menu_fields_query(fields, from_stats=AGGREGATES_MATVIEW)
+        )
+        return result.all()
+
     async def get_submenus_count_for_menu_list(self)\
             -> dict[int, int]:
         """Возвращает количество подменю во всех меню"""
         query_result = await self.session.execute(
-            select(Menu.id, func.count(SubMenu.menu_id)).
-            select_from(Menu).
-            outerjoin(SubMenu, Menu.id == SubMenu.menu_id).
-            group_by(Menu.id).order_by(Menu.id)
+            SUBMENUS_COUNT_FOR_MENU_LIST_QUERY
         )
         result_dict = {}  # ключ - menu_id, значение - количество подменю
         for key, value in query_result:
             result_dict[key] = value
         return result_dict
 
+    @on_primary
     async def create_menu(self, new_menu: MenuCreate) -> Menu:
         """Создает меню"""
         menu_obj = Menu(**new_menu.model_dump())
@@ -63,8 +250,7 @@ class MenuRepository(BaseRepository):
     async def get_menu_by_id(self, menu_id: int) -> Menu:
         """Возвращает меню"""
         result = await self.session.execute(
-            select(Menu).
-            filter(Menu.id == menu_id)
+            MENU_BY_ID_QUERY, {'menu_id': menu_id}
         )
         return result.one()[0]
 
@@ -81,15 +267,43 @@ class MenuRepository(BaseRepository):
         menu_obj.submenus_count = submenus_count
         return menu_obj
 
+    async def get_menus_by_ids(self, menu_ids: list[int]) -> list[Menu]:
+        """
+        Возвращает найденные меню с количеством подменю и блюд
+        одним запросом. Отсутствующие id пропускаются
+        """
+        result = await self.session.execute(
+            MENUS_BY_IDS_QUERY, {'menu_ids': menu_ids}
+        )
+        menus = []
+        for menu_obj, submenus_count, dishes_count in result:
+            menu_obj.submenus_count = submenus_count
+            menu_obj.dishes_count = dishes_count
+            menus.append(menu_obj)
+        return menus
+
+    async def get_menu_fields(
+        self,
+        menu_id: int,
+        fields: tuple[str, ...]
+    ) -> Row:
+        """
+        Возвращает выбранные поля меню. Количество подменю и блюд,
+        как и в get_menu_with_counts, всегда считается заново
+        """
+        result = await self.session.execute(
+            menu_fields_query(fields, by_id=True), {'menu_id': menu_id}
+        )
+        return result.one()
+
     async def get_submenus_count_in_menu(self, menu_id: int) -> int:
         """Возвращает количество подменю в меню"""
         result = await self.session.execute(
-            select(func.count(SubMenu.menu_id)).
-            select_from(SubMenu).
-            filter(SubMenu.menu_id == menu_id)
+            SUBMENUS_COUNT_IN_MENU_QUERY, {'menu_id': menu_id}
         )
         return result.scalar()
 
+    @on_primary
     async def update_menu_by_id(
         self,
         menu_id: int,
@@ -106,31 +320,70 @@ class MenuRepository(BaseRepository):
             raise ValueError('Ошибка при сохранении объекта')
         return await self.get_menu_with_counts(menu_id)
 
+    @on_primary
     async def delete_menu_by_id(self, menu_id: int) -> None:
-        """Удаляет меню"""
-        menu_obj = await self.get_menu_by_id(menu_id)
-        await self.session.delete(menu_obj)
+        """
+        Мягко удаляет меню: подменю и блюда сразу перестают быть видны,
+        а из базы их удаляет фоновая очистка. Подменю отмечаются
+        удаленными вместе с меню, чтобы их названия сразу освободились
+        """
+        result = await self.session.execute(
+            update(Menu.__table__).
+            where(Menu.id == menu_id, MENU_ALIVE).
+            values(deleted_at=func.now()).
+            returning(Menu.id)
+        )
+        if result.scalar() is None:
+            raise NoResultFound('menu not found')
+        await self.session.execute(
+            update(SubMenu.__table__).
+            where(SubMenu.menu_id == menu_id, SUBMENU_ALIVE).
+            values(deleted_at=func.now())
+        )
         await self.session.commit()
 
     async def get_dishes_count_in_menu(self, menu_id: int) -> int:
         """Возвращает количество блюд в меню"""
         result = await self.session.execute(
-            select(func.count(Dish.id)).
-            select_from(Menu).
-            outerjoin(SubMenu, Menu.id == SubMenu.menu_id).
-            outerjoin(Dish, SubMenu.id == Dish.submenu_id).
-            filter(Menu.id == menu_id)
+            DISHES_COUNT_IN_MENU_QUERY, {'menu_id': menu_id}
         )
         return result.scalar()
 
+    async def get_price_stats(self, menu_id: int) -> PriceStats:
+        """
+        Возвращает количество блюд в меню, минимальную,
+        максимальную и среднюю цену
+        """
+        query = MENU_PRICE_STATS_FROM_VIEW_QUERY if AGGREGATES_MATVIEW \
+            else MENU_PRICE_STATS_QUERY
+        result = await self.session.execute(query, {'menu_id': menu_id})
+        return PriceStats(**result.one()._asdict())
+
     async def get_all_list(self):
         """Возвращает все записи"""
-        menus = await self.session.execute(
-            select(Menu).
-            options(
-                joinedload(Menu.submenus).
-                joinedload(SubMenu.dishes)
-            )
-        )
+        menus = await self.session.execute(ALL_LIST_QUERY)
         result = [_tuple[0] for _tuple in menus.unique().all()]
         return result
+
+    async def stream_catalogue(self) -> AsyncIterator[tuple]:
+        """
+        Построчно отдает весь каталог через серверный курсор:
+        одна строка - блюдо вместе с подменю и меню
+        """
+        result = await self.session.stream(
+            select(
+                Menu.title, Menu.description,
+                SubMenu.title, SubMenu.description,
+                Dish.title, Dish.description,
+                # Цена в файле - строка с двумя знаками, как в API
+                cast(Dish.price, String)
+            ).
+            select_from(Menu).
+            outerjoin(SubMenu, MENU_SUBMENUS_JOIN).
+            outerjoin(Dish, SubMenu.id == Dish.submenu_id).
+            filter(MENU_ALIVE).
+            order_by(Menu.id, SubMenu.id, Dish.id).
+            execution_options(yield_per=STREAM_FETCH_SIZE)
+        )
+        async for row in result:
+            yield tuple(row)
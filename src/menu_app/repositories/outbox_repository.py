@@ -0,0 +1,128 @@
+from sqlalchemy import Float, Row, bindparam, delete, func, select, text, update
+
+from models.models import CacheOutbox
+
+from .base_repository import BaseRepository, on_primary
+
+OUTBOX_KEYS = (CacheOutbox.menu_id, CacheOutbox.submenu_id, CacheOutbox.dish_id)
+
+# Пачки записей по порядку. SKIP LOCKED: процессы разбирают
+# разные пачки и не ждут друг друга
+PENDING_QUERY = \
+    select(CacheOutbox.id).\
+    where(CacheOutbox.dispatched_at.is_(None)).\
+    order_by(CacheOutbox.id).\
+    limit(bindparam('limit')).\
+    with_for_update(skip_locked=True)
+
+SETTLED_QUERY = \
+    select(CacheOutbox.id).\
+    where(
+        CacheOutbox.dispatched_at < func.now() - func.make_interval(
+            0, 0, 0, 0, 0, 0, bindparam('delay', type_=Float)
+        )
+    ).\
+    order_by(CacheOutbox.id).\
+    limit(bindparam('limit')).\
+    with_for_update(skip_locked=True)
+
+CLAIM_PENDING_QUERY = \
+    update(CacheOutbox.__table__).\
+    where(CacheOutbox.id.in_(PENDING_QUERY.scalar_subquery())).\
+    values(dispatched_at=func.now()).\
+    returning(*OUTBOX_KEYS)
+
+# Те же пачки без SKIP LOCKED: запрос ждет commit процессов, которые
+# разбирают записи, и пропускает уже отмеченные ими
+CLAIM_WAITING_QUERY = \
+    update(CacheOutbox.__table__).\
+    where(CacheOutbox.id.in_(
+        PENDING_QUERY.with_for_update().scalar_subquery()
+    )).\
+    values(dispatched_at=func.now()).\
+    returning(*OUTBOX_KEYS)
+
+# Все новые записи разом, при переполнении
+CLAIM_ALL_QUERY = \
+    update(CacheOutbox.__table__).\
+    where(CacheOutbox.id.in_(
+        PENDING_QUERY.limit(None).scalar_subquery()
+    )).\
+    values(dispatched_at=func.now())
+
+CLAIM_SETTLED_QUERY = \
+    delete(CacheOutbox.__table__).\
+    where(CacheOutbox.id.in_(SETTLED_QUERY.scalar_subquery())).\
+    returning(*OUTBOX_KEYS)
+
+# Поколение кеша для слушателей всех процессов, отправляется при commit
+NOTIFY_GENERATION_QUERY = text(
+    "SELECT pg_notify('cache_generation', :generation)"
+)
+
+# Сколько записей ждет первой инвалидации и сколько секунд ждет самая старая
+BACKLOG_QUERY = \
+    select(
+        func.count(),
+        func.coalesce(
+            func.extract('epoch', func.now() - func.min(CacheOutbox.created_at)),
+            0
+        ),
+    ).\
+    where(CacheOutbox.dispatched_at.is_(None))
+
+
+class OutboxRepository(BaseRepository):
+    """
+    Репозиторий outbox инвалидации кеша. Пачка отмечается
+    или удаляется в открытой транзакции: она подтверждается commit
+    после удаления из кеша, а при ошибке записи вернутся в outbox
+    """
+
+    @on_primary
+    async def claim_pending(self, limit: int, wait: bool = False) -> list[Row]:
+        """
+        Отмечает инвалидированными до limit новых записей. Записи,
+        которые разбирает другой процесс, пропускаются, а с wait
+        запрос ждет его commit
+        """
+        result = await self.session.execute(
+            CLAIM_WAITING_QUERY if wait else CLAIM_PENDING_QUERY,
+            {'limit': limit}
+        )
+        return result.all()
+
+    @on_primary
+    async def claim_all(self) -> int:
+        """Отмечает инвалидированными все новые записи, возвращает их число"""
+        result = await self.session.execute(CLAIM_ALL_QUERY)
+        return result.rowcount
+
+    @on_primary
+    async def notify_generation(self, generation: int) -> None:
+        """Сообщает процессам о новом поколении кеша при commit"""
+        await self.session.execute(
+            NOTIFY_GENERATION_QUERY, {'generation': str(generation)}
+        )
+
+    @on_primary
+    async def claim_settled(self, limit: int, delay: float) -> list[Row]:
+        """Удаляет до limit записей, инвалидированных больше delay секунд назад"""
+        result = await self.session.execute(
+            CLAIM_SETTLED_QUERY, {'limit': limit, 'delay': delay}
+        )
+        return result.all()
+
+    async def commit(self) -> None:
+        """Подтверждает обработку пачки"""
+        await self.session.commit()
+
+    @on_primary
+    async def get_backlog(self) -> tuple[int, float]:
+        """
+        Сколько записей ждет инвалидации и сколько секунд
+        ждет самая старая из них
+        """
+        count, lag = (await self.session.execute(BACKLOG_QUERY)).one()
+        await self.session.commit()
+        return count, float(lag)
@@ -0,0 +1,88 @@
+from sqlalchemy import delete, exists, func, or_, select
+
+from models.models import Dish, Menu, SubMenu
+
+from .base_repository import BaseRepository, on_primary
+
+# Подменю, которые удалены сами или вместе с меню
+PURGED_SUBMENUS_QUERY = \
+    select(SubMenu.id).\
+    filter(or_(
+        SubMenu.deleted_at.is_not(None),
+        SubMenu.menu_id.in_(
+            select(Menu.id).filter(Menu.deleted_at.is_not(None))
+        )
+    ))
+
+# Сколько секунд ждет очистки самая старая удаленная запись
+PURGE_LAG_QUERY = select(func.coalesce(
+    func.extract('epoch', func.now() - func.least(
+        select(func.min(Menu.deleted_at)).scalar_subquery(),
+        select(func.min(SubMenu.deleted_at)).scalar_subquery(),
+    )),
+    0
+))
+
+
+class PurgeRepository(BaseRepository):
+    """
+    Репозиторий фоновой очистки мягко удаленных меню и подменю.
+    Записи удаляются снизу вверх пачками ограниченного размера,
+    каждая пачка - отдельная короткая транзакция
+    """
+
+    @on_primary
+    async def purge_dishes(self, limit: int) -> int:
+        """Удаляет блюда удаленных подменю"""
+        return await self.__delete_batch(
+            Dish,
+            select(Dish.id).
+            filter(Dish.submenu_id.in_(PURGED_SUBMENUS_QUERY)),
+            limit
+        )
+
+    @on_primary
+    async def purge_submenus(self, limit: int) -> int:
+        """Удаляет удаленные подменю, в которых не осталось блюд"""
+        return await self.__delete_batch(
+            SubMenu,
+            PURGED_SUBMENUS_QUERY.
+            filter(~exists().where(Dish.submenu_id == SubMenu.id)),
+            limit
+        )
+
+    @on_primary
+    async def purge_menus(self, limit: int) -> int:
+        """Удаляет удаленные меню, в которых не осталось подменю"""
+        return await self.__delete_batch(
+            Menu,
+            select(Menu.id).
+            filter(
+                Menu.deleted_at.is_not(None),
+                ~exists().where(SubMenu.menu_id == Menu.id)
+            ),
+            limit
+        )
+
+    @on_primary
+    async def get_lag(self) -> float:
+        """
+        Сколько секунд ждет очистки самая старая удаленная запись,
+        0 - если очищать нечего
+        """
+        lag = (await self.session.execute(PURGE_LAG_QUERY)).scalar()
+        await self.session.commit()
+        return float(lag)
+
+    async def __delete_batch(self, model, ids_query, limit: int) -> int:
+        # SKIP LOCKED: несколько процессов очищают разные пачки
+        # и не ждут друг друга
+        batch = ids_query.limit(limit).with_for_update(skip_locked=True)
+        deleted = await self.session.execute(
+            delete(model.__table__).
+            where(model.id.in_(batch)).
+            returning(model.id)
+        )
+        count = len(deleted.all())
+        await self.session.commit()
+        return count
@@ -0,0 +1,97 @@
+from sqlalchemy import (
+    BindParameter,
+    ColumnElement,
+    Label,
+    bindparam,
+    cast,
+    desc,
+    func,
+    literal,
+    null,
+    or_,
+    select,
+    union_all,
+)
+
+from models.models import Dish, Menu, SubMenu
+
+from ..schemas import SearchHit, SearchHitType
+from .base_repository import MENU_ALIVE, SUBMENU_ALIVE, BaseRepository
+
+# Совпадение в описании весит меньше совпадения в названии
+DESCRIPTION_WEIGHT = 0.5
+
+QUERY: BindParameter[str] = bindparam('query')
+
+# У меню и подменю нет цены, тип NULL должен совпасть с ценой блюда
+NO_PRICE = cast(null(), Dish.price.type).label('price')
+
+
+def rank(model) -> Label:
+    """Насколько запрос похож на слово из названия или описания"""
+    description = \
+        func.coalesce(func.word_similarity(QUERY, model.description), 0)
+    return func.greatest(
+        func.word_similarity(QUERY, model.title),
+        description * DESCRIPTION_WEIGHT
+    ).label('rank')
+
+
+def matches(model) -> ColumnElement[bool]:
+    """Оператор <% использует триграммные GIN индексы"""
+    return or_(QUERY.op('<%')(model.title), QUERY.op('<%')(model.description))
+
+
+# Запрос собирается один раз при импорте модуля, см. menu_repository
+SEARCH_QUERY = union_all(
+    select(
+        literal(SearchHitType.menu.value).label('type'),
+        Menu.id, Menu.title, Menu.description, NO_PRICE,
+        rank(Menu),
+        Menu.id.label('menu_id'), Menu.title.label('menu_title'),
+        null().label('submenu_id'), null().label('submenu_title'),
+    ).
+    where(matches(Menu), MENU_ALIVE),
+    select(
+        literal(SearchHitType.submenu.value),
+        SubMenu.id, SubMenu.title, SubMenu.description, NO_PRICE,
+        rank(SubMenu),
+        Menu.id, Menu.title,
+        SubMenu.id, SubMenu.title,
+    ).
+    join(Menu, SubMenu.menu_id == Menu.id).
+    where(matches(SubMenu), SUBMENU_ALIVE, MENU_ALIVE),
+    select(
+        literal(SearchHitType.dish.value),
+        Dish.id, Dish.title, Dish.description, Dish.price,
+        rank(Dish),
+        Menu.id, Menu.title,
+        SubMenu.id, SubMenu.title,
+    ).
+    join(SubMenu, Dish.submenu_id == SubMenu.id).
+    join(Menu, SubMenu.menu_id == Menu.id).
+    where(matches(Dish), SUBMENU_ALIVE, MENU_ALIVE),
+).\
+    order_by(desc('rank'), 'type', 'id').\
+    limit(bindparam('limit')).\
+    offset(bindparam('offset'))
+
+
+class SearchRepository(BaseRepository):
+    """Репозиторий для поиска по меню, подменю и блюдам"""
+
+    async def search(
+        self,
+        query: str,
+        limit: int,
+        offset: int
+    ) -> list[SearchHit]:
+        """
+        Возвращает меню, подменю и блюда, похожие на запрос,
+        от самых похожих к менее похожим
+        """
+        result = await self.session.execute(
+            SEARCH_QUERY,
+            {'query': query, 'limit': limit, 'offset': offset}
+        )
+        return [SearchHit(**row._asdict()) for row in result]
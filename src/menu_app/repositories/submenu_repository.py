@@ -1,11 +1,150 @@
-from sqlalchemy import select
-from sqlalchemy.exc import IntegrityError
+import functools
+
+from sqlalchemy import Integer, Row, Select, any_, bindparam, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.sql import func
 
-from models.models import Dish, SubMenu
+from config import AGGREGATES_MATVIEW
+from models.models import Dish, Menu, SubMenu, submenu_stats
+
+from ..schemas import (
+    BulkItemResult,
+    BulkStatus,
+    PriceStats,
+    SubMenuBulkUpdate,
+    SubMenuCreate,
+)
+from .base_repository import (
+    MENU_ALIVE,
+    PRICE_STATS,
+    SUBMENU_ALIVE,
+    BaseRepository,
+    chunked,
+    on_primary,
+)
+
+# Горячие запросы собираются один раз при импорте модуля,
+# см. menu_repository
+SUBMENU_LIST_WITH_DISHES_COUNT_QUERY = \
+    select(SubMenu, func.count(Dish.id)).\
+    select_from(SubMenu).\
+    join(Menu, SubMenu.menu_id == Menu.id).\
+    filter(
+        SubMenu.menu_id == bindparam('menu_id'),
+        SUBMENU_ALIVE,
+        MENU_ALIVE
+    ).\
+    outerjoin(Dish, SubMenu.id == Dish.submenu_id).\
+    group_by(SubMenu.id).order_by(SubMenu.id)
+
+# Количество блюд из материализованного представления, см. menu_repository
+SUBMENU_LIST_FROM_STATS_QUERY = \
+    select(SubMenu, func.coalesce(submenu_stats.c.dishes_count, 0)).\
+    join(Menu, SubMenu.menu_id == Menu.id).\
+    outerjoin(submenu_stats, SubMenu.id == submenu_stats.c.submenu_id).\
+    filter(
+        SubMenu.menu_id == bindparam('menu_id'),
+        SUBMENU_ALIVE,
+        MENU_ALIVE
+    ).\
+    order_by(SubMenu.id)
+
+# Массив вместо IN: один prepared statement на любое количество id
+SUBMENUS_BY_IDS_QUERY = \
+    SUBMENU_LIST_WITH_DISHES_COUNT_QUERY.\
+    filter(SubMenu.id == any_(bindparam('submenu_ids', type_=ARRAY(Integer))))
+
+SUBMENU_BY_ID_QUERY = \
+    select(SubMenu).\
+    join(Menu, SubMenu.menu_id == Menu.id).\
+    filter(
+        SubMenu.id == bindparam('submenu_id'),
+        SubMenu.menu_id == bindparam('menu_id'),
+        SUBMENU_ALIVE,
+        MENU_ALIVE
+    )
+
+SUBMENU_PRICE_STATS_QUERY = \
+    select(*PRICE_STATS).\
+    select_from(SubMenu).\
+    join(Menu, SubMenu.menu_id == Menu.id).\
+    outerjoin(Dish, SubMenu.id == Dish.submenu_id).\
+    filter(
+        SubMenu.id == bindparam('submenu_id'),
+        SubMenu.menu_id == bindparam('menu_id'),
+        SUBMENU_ALIVE,
+        MENU_ALIVE
+    ).\
+    group_by(SubMenu.id)
+
+SUBMENU_PRICE_STATS_FROM_VIEW_QUERY = \
+    select(
+        func.coalesce(submenu_stats.c.dishes_count, 0).label('dishes_count'),
+        submenu_stats.c.min_price,
+        submenu_stats.c.max_price,
+        submenu_stats.c.avg_price
+    ).\
+    select_from(SubMenu).\
+    join(Menu, SubMenu.menu_id == Menu.id).\
+    outerjoin(submenu_stats, SubMenu.id == submenu_stats.c.submenu_id).\
+    filter(
+        SubMenu.id == bindparam('submenu_id'),
+        SubMenu.menu_id == bindparam('menu_id'),
+        SUBMENU_ALIVE,
+        MENU_ALIVE
+    )
+
+DISHES_COUNT_IN_SUBMENU_QUERY = \
+    select(func.count(Dish.id)).\
+    filter(Dish.submenu_id == bindparam('submenu_id'))
+
+# Столбцы ответов с выбранными полями (?fields=):
+# количество блюд считается, только если оно запрошено
+SUBMENU_FIELDS = {
+    'id': SubMenu.id,
+    'title': SubMenu.title,
+    'description': SubMenu.description,
+    'dishes_count':
+        select(func.count(Dish.id)).
+        filter(Dish.submenu_id == SubMenu.id).
+        scalar_subquery(),
+}
+SUBMENU_FIELDS_FROM_STATS = {
+    **SUBMENU_FIELDS,
+    'dishes_count': func.coalesce(
+        select(submenu_stats.c.dishes_count).
+        filter(submenu_stats.c.submenu_id == SubMenu.id).
+        scalar_subquery(),
+        0
+    ),
+}
+
 
-from ..schemas import SubMenuCreate
-from .base_repository import BaseRepository
+@functools.lru_cache
+def submenu_fields_query(
+    fields: tuple[str, ...],
+    from_stats: bool = False,
+    by_id: bool = False
+) -> Select:
+    """
+    Запрос подменю меню только с выбранными столбцами.
+    Собирается один раз на каждый набор полей
+    """
+    columns = SUBMENU_FIELDS_FROM_STATS if from_stats else SUBMENU_FIELDS
+    query = \
+        select(*(columns[field].label(field) for field in fields)).\
+        select_from(SubMenu).\
+        join(Menu, SubMenu.menu_id == Menu.id).\
+        filter(
+            SubMenu.menu_id == bindparam('menu_id'),
+            SUBMENU_ALIVE,
+            MENU_ALIVE
+        ).\
+        order_by(SubMenu.id)
+    if by_id:
+        query = query.filter(SubMenu.id == bindparam('submenu_id'))
+    return query
 
 
 class SubMenuRepository(BaseRepository):
@@ -19,12 +158,10 @@ class SubMenuRepository(BaseRepository):
         Возвращает список всех подменю
         с количеством блюд в каждом подменю
         """
+        query = SUBMENU_LIST_FROM_STATS_QUERY if AGGREGATES_MATVIEW \
+            else SUBMENU_LIST_WITH_DISHES_COUNT_QUERY
         submenus_with_dishes_count = await self.session.execute(
-            select(SubMenu, func.count(Dish.id)).
-            select_from(SubMenu).
-            filter(SubMenu.menu_id == menu_id).
-            outerjoin(Dish, SubMenu.id == Dish.submenu_id).
-            group_by(SubMenu.id).order_by(SubMenu.id)
+            query, {'menu_id': menu_id}
         )
         submenus = []
         for submenu_obj, dishes_count in submenus_with_dishes_count:
@@ -32,6 +169,36 @@ class SubMenuRepository(BaseRepository):
             submenus.append(submenu_obj)
         return submenus
 
+    async def get_submenu_list_fields(
+        self,
+        menu_id: int,
+        fields: tuple[str, ...]
+    ) -> list[Row]:
+        """Возвращает список подменю только с выбранными полями"""
+        result = await self.session.execute(
+            submenu_fields_query(fields, from_stats=AGGREGATES_MATVIEW),
+            {'menu_id': menu_id}
+        )
+        return result.all()
+
+    async def get_submenu_fields(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        fields: tuple[str, ...]
+    ) -> Row:
+        """
+        Возвращает выбранные поля подменю.
+        Количество блюд, как и в get_submenu_with_dishes_count,
+        всегда считается заново
+        """
+        result = await self.session.execute(
+            submenu_fields_query(fields, by_id=True),
+            {'menu_id': menu_id, 'submenu_id': submenu_id}
+        )
+        return result.one()
+
+    @on_primary
     async def create_submenu(
         self,
         new_submenu: SubMenuCreate,
@@ -54,11 +221,8 @@ class SubMenuRepository(BaseRepository):
     ) -> SubMenu:
         """Возвращает подменю"""
         result = await self.session.execute(
-            select(SubMenu).
-            filter(
-                SubMenu.id == submenu_id,
-                SubMenu.menu_id == menu_id
-            )
+            SUBMENU_BY_ID_QUERY,
+            {'menu_id': menu_id, 'submenu_id': submenu_id}
         )
         return result.one()[0]
 
@@ -72,6 +236,26 @@ class SubMenuRepository(BaseRepository):
         setattr(submenu_obj, 'dishes_count', dishes_count)
         return submenu_obj
 
+    async def get_submenus_by_ids(
+        self,
+        menu_id: int,
+        submenu_ids: list[int]
+    ) -> list[SubMenu]:
+        """
+        Возвращает найденные подменю меню с количеством блюд
+        одним запросом. Отсутствующие id пропускаются
+        """
+        result = await self.session.execute(
+            SUBMENUS_BY_IDS_QUERY,
+            {'menu_id': menu_id, 'submenu_ids': submenu_ids}
+        )
+        submenus = []
+        for submenu_obj, dishes_count in result:
+            setattr(submenu_obj, 'dishes_count', dishes_count)
+            submenus.append(submenu_obj)
+        return submenus
+
+    @on_primary
     async def update_submenu_by_id(
         self,
         menu_id: int,
@@ -89,20 +273,224 @@ class SubMenuRepository(BaseRepository):
             raise ValueError('Ошибка при сохранении объекта')
         return await self.get_submenu_with_dishes_count(menu_id, submenu_id)
 
+    @on_primary
     async def delete_submenu_by_id(
         self,
         menu_id: int,
         submenu_id: int
     ) -> None:
-        """Удаляет подменю"""
-        submenu_obj = await self.get_submenu_by_id(menu_id, submenu_id)
-        await self.session.delete(submenu_obj)
+        """
+        Мягко удаляет подменю: блюда сразу перестают быть видны,
+        а из базы их удаляет фоновая очистка
+        """
+        result = await self.session.execute(
+            update(SubMenu.__table__).
+            where(
+                SubMenu.id == submenu_id,
+                SubMenu.menu_id == menu_id,
+                SUBMENU_ALIVE,
+                SubMenu.menu_id.in_(select(Menu.id).filter(MENU_ALIVE))
+            ).
+            values(deleted_at=func.now()).
+            returning(SubMenu.id)
+        )
+        if result.scalar() is None:
+            raise NoResultFound('submenu not found')
         await self.session.commit()
 
     async def get_count_dishes_in_submenu(self, submenu_id: int) -> int:
         """Возвращает количество блюд в подменю"""
         result = await self.session.execute(
-            select(func.count(Dish.id)).
-            filter(Dish.submenu_id == submenu_id)
+            DISHES_COUNT_IN_SUBMENU_QUERY, {'submenu_id': submenu_id}
         )
         return result.scalar()
+
+    async def get_price_stats(
+        self,
+        menu_id: int,
+        submenu_id: int
+    ) -> PriceStats:
+        """
+        Возвращает количество блюд в подменю, минимальную,
+        максимальную и среднюю цену
+        """
+        query = SUBMENU_PRICE_STATS_FROM_VIEW_QUERY if AGGREGATES_MATVIEW \
+            else SUBMENU_PRICE_STATS_QUERY
+        result = await self.session.execute(
+            query, {'menu_id': menu_id, 'submenu_id': submenu_id}
+        )
+        return PriceStats(**result.one()._asdict())
+
+    @on_primary
+    async def create_submenu_bulk(
+        self,
+        menu_id: int,
+        items: list[SubMenuCreate]
+    ) -> tuple[list[BulkItemResult], set[int]]:
+        """
+        Создает подменю одной транзакцией.
+        Возвращает результат по каждому элементу и id созданных подменю
+        """
+        menu_exists = await self.session.execute(
+            select(Menu.id).filter(Menu.id == menu_id, MENU_ALIVE)
+        )
+        if menu_exists.scalar() is None:
+            raise NoResultFound('menu not found')
+
+        results: dict[int, BulkItemResult] = {}
+        rows_by_title: dict[str, tuple[int, dict]] = {}
+        for index, item in enumerate(items):
+            if item.title in rows_by_title:
+                results[index] = BulkItemResult(
+                    index=index,
+                    status=BulkStatus.conflict,
+                    detail='duplicate title in request'
+                )
+            else:
+                row = {**item.model_dump(), 'menu_id': menu_id}
+                rows_by_title[item.title] = (index, row)
+
+        created: set[int] = set()
+        rows = [row for _, row in rows_by_title.values()]
+        try:
+            for chunk in chunked(rows):
+                inserted = await self.session.execute(
+                    insert(SubMenu.__table__).
+                    values(chunk).
+                    on_conflict_do_nothing(
+                        index_elements=[SubMenu.title],
+                        index_where=SUBMENU_ALIVE
+                    ).
+                    returning(SubMenu.id, SubMenu.title)
+                )
+                for submenu_id, title in inserted:
+                    index = rows_by_title[title][0]
+                    results[index] = BulkItemResult(
+                        index=index,
+                        status=BulkStatus.created,
+                        id=str(submenu_id)
+                    )
+                    created.add(submenu_id)
+            await self.session.commit()
+        except IntegrityError:
+            await self.session.rollback()
+            raise ValueError('Ошибка при сохранении объектов')
+
+        for index, _ in enumerate(items):
+            results.setdefault(index, BulkItemResult(
+                index=index,
+                status=BulkStatus.conflict,
+                detail='title already exists'
+            ))
+        return [results[index] for index in range(len(items))], created
+
+    @on_primary
+    async def update_submenu_bulk(
+        self,
+        menu_id: int,
+        items: list[SubMenuBulkUpdate]
+    ) -> tuple[list[BulkItemResult], set[int]]:
+        """
+        Обновляет подменю одной транзакцией (executemany).
+        Возвращает результат по каждому элементу и id обновленных подменю
+        """
+        existing = await self.session.execute(
+            select(SubMenu.id).
+            join(Menu, SubMenu.menu_id == Menu.id).
+            filter(
+                SubMenu.menu_id == menu_id,
+                SubMenu.id.in_({item.id for item in items}),
+                SUBMENU_ALIVE,
+                MENU_ALIVE
+            )
+        )
+        existing_ids = set(existing.scalars().all())
+        taken_titles = await self.session.execute(
+            select(SubMenu.title, SubMenu.id).
+            filter(
+                SubMenu.title.in_({item.title for item in items}),
+                SUBMENU_ALIVE
+            )
+        )
+        owner_by_title = dict(taken_titles.all())
+
+        results: list[BulkItemResult] = []
+        params: list[dict] = []
+        updated: set[int] = set()
+        seen_titles: set[str] = set()
+        for index, item in enumerate(items):
+            if item.id not in existing_ids:
+                status, detail = BulkStatus.not_found, 'submenu not found'
+            elif item.id in updated:
+                status, detail = BulkStatus.conflict, 'duplicate id in request'
+            elif item.title in seen_titles or \
+                    owner_by_title.get(item.title, item.id) != item.id:
+                status, detail = BulkStatus.conflict, 'title already exists'
+            else:
+                status, detail = BulkStatus.updated, None
+                updated.add(item.id)
+                seen_titles.add(item.title)
+                params.append({
+                    'b_id': item.id,
+                    'title': item.title,
+                    'description': item.description,
+                })
+            results.append(BulkItemResult(
+                index=index, status=status, id=str(item.id), detail=detail
+            ))
+
+        if params:
+            try:
+                await self.session.execute(
+                    update(SubMenu.__table__).
+                    where(SubMenu.id == bindparam('b_id')),
+                    params
+                )
+                await self.session.commit()
+            except IntegrityError:
+                await self.session.rollback()
+                raise ValueError('Ошибка при сохранении объектов')
+        return results, updated
+
+    @on_primary
+    async def delete_submenu_bulk(
+        self,
+        menu_id: int,
+        submenu_ids: list[int]
+    ) -> tuple[list[BulkItemResult], set[int]]:
+        """
+        Мягко удаляет подменю одним запросом, блюда удалит фоновая очистка.
+        Возвращает результат по каждому элементу и id удаленных подменю
+        """
+        deleted_rows = await self.session.execute(
+            update(SubMenu.__table__).
+            where(
+                SubMenu.menu_id == menu_id,
+                SubMenu.id.in_(set(submenu_ids)),
+                SUBMENU_ALIVE,
+                SubMenu.menu_id.in_(select(Menu.id).filter(MENU_ALIVE))
+            ).
+            values(deleted_at=func.now()).
+            returning(SubMenu.id)
+        )
+        deleted = set(deleted_rows.scalars().all())
+        await self.session.commit()
+
+        results = []
+        not_reported = set(deleted)
+        for index, submenu_id in enumerate(submenu_ids):
+            if submenu_id in not_reported:
+                not_reported.discard(submenu_id)
+                results.append(BulkItemResult(
+                    index=index,
+                    status=BulkStatus.deleted,
+                    id=str(submenu_id)
+                ))
+            else:
+                results.append(BulkItemResult(
+                    index=index,
+                    status=BulkStatus.not_found,
+                    id=str(submenu_id),
+                    detail='submenu not found'
+                ))
+        return results, deleted
@@ -1,29 +1,151 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from decimal import Decimal
+
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    UploadFile,
+    status,
+)
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm.exc import NoResultFound
 
-from menu_app import schemas
+from config import BATCH_MAX_ITEMS, BULK_MAX_ITEMS
+from menu_app import compression, conditional, fieldsets, schemas, serializers
+from menu_app.services.change_service import ChangeService
 from menu_app.services.dish_service import DishService
+from menu_app.services.event_service import events
+from menu_app.services.export_service import ExportService
+from menu_app.services.import_service import ImportService
 from menu_app.services.menu_service import MenuService
+from menu_app.services.search_service import SearchService
 from menu_app.services.submenu_service import SubMenuService
 
-
+# Горячие GET-эндпоинты отдают ORJSONResponse из serializers:
+# FastAPI не проверяет готовый ответ повторно, а response_model
+# остается только для схемы OpenAPI. Кешируемые списки отдаются
+# готовыми телами из кеша, уже сжатыми в кодировке клиента.
+# Чтения каталога и меню отвечают 304 по версии данных до обращения
+# к кешу и базе (см. conditional)
 menu_router: APIRouter = APIRouter(
     prefix='/menus',
-    tags=['Menu']
+    tags=['Menu'],
+    route_class=conditional.ConditionalRoute
 )
 
 
-@menu_router.get('', response_model=list[schemas.MenuGet])
-async def menu_list(menu_service: MenuService = Depends(MenuService)):
-    return await menu_service.get_menu_list_with_counts()
+@menu_router.get(
+    '',
+    response_model=list[schemas.MenuGet],
+    dependencies=[Depends(conditional.catalogue_version)]
+)
+async def menu_list(
+    fields: tuple[str, ...] | None = Depends(fieldsets.menu_fields),
+    encoding: str = Depends(compression.requested_encoding),
+    menu_service: MenuService = Depends(MenuService)
+):
+    body = await menu_service.get_menu_list_body(encoding, fields)
+    return compression.PrecompressedResponse(*body)
 
 
 @menu_router.get(
     '/all',
-    response_model=list[schemas.MenuWithNestedSubMenus]
+    response_model=list[schemas.MenuWithNestedSubMenus],
+    dependencies=[Depends(conditional.catalogue_version)]
+)
+async def get_all(
+    encoding: str = Depends(compression.requested_encoding),
+    menu_service: MenuService = Depends(MenuService)
+):
+    body = await menu_service.get_all_list_body(encoding)
+    return compression.PrecompressedResponse(*body)
+
+
+@menu_router.get('/search', response_model=schemas.SearchResult)
+async def catalogue_search(
+    q: str = Query(min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    search_service: SearchService = Depends(SearchService)
+):
+    return await search_service.search(q, limit, offset)
+
+
+@menu_router.get('/changes', response_model=schemas.Changes)
+async def catalogue_changes(
+    since: str = Query('0', max_length=64),
+    limit: int = Query(1000, ge=1, le=5000),
+    change_service: ChangeService = Depends(ChangeService)
+):
+    try:
+        changes = await change_service.get_changes(since, limit)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail='since is invalid'
+        )
+    except NoResultFound:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail='full resync required'
+        )
+    return ORJSONResponse(changes)
+
+
+@menu_router.get('/events', response_class=StreamingResponse)
+async def catalogue_events(
+    last_event_id: str | None = Header(None, max_length=64)
+):
+    return StreamingResponse(
+        events.stream(last_event_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@menu_router.get('/export', response_class=StreamingResponse)
+async def catalogue_export(
+    format: schemas.ExportFormat = schemas.ExportFormat.csv,
+    gzip: bool = False,
+    export_service: ExportService = Depends(ExportService)
+):
+    filename, media_type = export_service.get_file_info(format, gzip)
+    return StreamingResponse(
+        export_service.export(format, gzip),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@menu_router.post(
+    '/import',
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=schemas.ImportJob
 )
-async def get_all(menu_service: MenuService = Depends(MenuService)):
-    return await menu_service.get_all_list()
+async def catalogue_import(
+    file: UploadFile,
+    prune: bool = False,
+    import_service: ImportService = Depends(ImportService)
+):
+    return await import_service.start_import_job(file, prune)
+
+
+@menu_router.get('/import/{job_id}', response_model=schemas.ImportJob)
+async def catalogue_import_status(
+    job_id: str,
+    import_service: ImportService = Depends(ImportService)
+):
+    try:
+        job = await import_service.get_import_job(job_id)
+    except NoResultFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='import job not found'
+        )
+    return job
 
 
 @menu_router.post(
@@ -44,19 +166,48 @@ async def menu_create(
     return menu_obj
 
 
-@menu_router.get('/{menu_id}', response_model=schemas.MenuGet)
+@menu_router.get(
+    '/{menu_id}',
+    response_model=schemas.MenuGet,
+    dependencies=[Depends(conditional.menu_version)]
+)
 async def menu_detail(
     menu_id: int,
+    fields: tuple[str, ...] | None = Depends(fieldsets.menu_fields),
+    encoding: str = Depends(compression.requested_encoding),
     menu_service: MenuService = Depends(MenuService)
 ):
     try:
+        if fields is not None:
+            body = await menu_service.\
+                get_menu_fields_body(menu_id, fields, encoding)
+            return compression.PrecompressedResponse(*body)
         menu_obj = await menu_service.get_menu_with_counts(menu_id)
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='menu not found'
         )
-    return menu_obj
+    return ORJSONResponse(serializers.menu(menu_obj))
+
+
+@menu_router.get(
+    '/{menu_id}/price-stats',
+    response_model=schemas.PriceStats,
+    dependencies=[Depends(conditional.menu_version)]
+)
+async def menu_price_stats(
+    menu_id: int,
+    menu_service: MenuService = Depends(MenuService)
+):
+    try:
+        price_stats = await menu_service.get_price_stats(menu_id)
+    except NoResultFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='menu not found'
+        )
+    return price_stats
 
 
 @menu_router.patch('/{menu_id}', response_model=schemas.MenuGet)
@@ -91,14 +242,18 @@ async def menu_delete(
 
 @menu_router.get(
     '/{menu_id}/submenus',
-    response_model=list[schemas.SubMenuGet]
+    response_model=list[schemas.SubMenuGet],
+    dependencies=[Depends(conditional.menu_version)]
 )
 async def submenu_list(
     menu_id: int,
+    fields: tuple[str, ...] | None = Depends(fieldsets.submenu_fields),
+    encoding: str = Depends(compression.requested_encoding),
     submenu_service: SubMenuService = Depends(SubMenuService)
 ):
-    return await submenu_service.\
-        get_submenu_list_with_dishes_count(menu_id)
+    body = await submenu_service.\
+        get_submenu_list_body(menu_id, encoding, fields)
+    return compression.PrecompressedResponse(*body)
 
 
 @menu_router.post(
@@ -121,16 +276,141 @@ async def submenu_create(
     return submenu_obj
 
 
+@menu_router.post(
+    '/{menu_id}/submenus/bulk',
+    response_model=schemas.BulkResult
+)
+async def submenu_bulk_create(
+    menu_id: int,
+    items: list[schemas.SubMenuCreate] = Body(max_length=BULK_MAX_ITEMS),
+    submenu_service: SubMenuService = Depends(SubMenuService)
+):
+    try:
+        result = await submenu_service.create_submenu_bulk(menu_id, items)
+    except NoResultFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='menu not found'
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+        )
+    return result
+
+
+@menu_router.patch(
+    '/{menu_id}/submenus/bulk',
+    response_model=schemas.BulkResult
+)
+async def submenu_bulk_patch(
+    menu_id: int,
+    items: list[schemas.SubMenuBulkUpdate] = Body(max_length=BULK_MAX_ITEMS),
+    submenu_service: SubMenuService = Depends(SubMenuService)
+):
+    try:
+        result = await submenu_service.update_submenu_bulk(menu_id, items)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+        )
+    return result
+
+
+@menu_router.delete(
+    '/{menu_id}/submenus/bulk',
+    response_model=schemas.BulkResult
+)
+async def submenu_bulk_delete(
+    menu_id: int,
+    ids: list[int] = Body(max_length=BULK_MAX_ITEMS),
+    submenu_service: SubMenuService = Depends(SubMenuService)
+):
+    return await submenu_service.delete_submenu_bulk(menu_id, ids)
+
+
+@menu_router.post(
+    '/{menu_id}/dishes/bulk',
+    response_model=schemas.BulkResult
+)
+async def dish_bulk_create(
+    menu_id: int,
+    items: list[schemas.DishBulkCreate] = Body(max_length=BULK_MAX_ITEMS),
+    dish_service: DishService = Depends(DishService)
+):
+    try:
+        result = await dish_service.create_dish_bulk(menu_id, items)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+        )
+    return result
+
+
+@menu_router.patch(
+    '/{menu_id}/dishes/bulk',
+    response_model=schemas.BulkResult
+)
+async def dish_bulk_patch(
+    menu_id: int,
+    items: list[schemas.DishBulkUpdate] = Body(max_length=BULK_MAX_ITEMS),
+    dish_service: DishService = Depends(DishService)
+):
+    try:
+        result = await dish_service.update_dish_bulk(menu_id, items)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+        )
+    return result
+
+
+@menu_router.delete(
+    '/{menu_id}/dishes/bulk',
+    response_model=schemas.BulkResult
+)
+async def dish_bulk_delete(
+    menu_id: int,
+    ids: list[int] = Body(max_length=BULK_MAX_ITEMS),
+    dish_service: DishService = Depends(DishService)
+):
+    return await dish_service.delete_dish_bulk(menu_id, ids)
+
+
+@menu_router.get(
+    '/{menu_id}/submenus/batch',
+    response_model=schemas.SubMenuBatchResult,
+    dependencies=[Depends(conditional.menu_version)]
+)
+async def submenu_batch(
+    menu_id: int,
+    ids: list[int] = Query([], max_length=BATCH_MAX_ITEMS),
+    submenu_service: SubMenuService = Depends(SubMenuService)
+):
+    submenu_list = await submenu_service.get_submenus_by_ids(menu_id, ids)
+    return ORJSONResponse(
+        serializers.batch(ids, submenu_list, 'submenu', serializers.submenu)
+    )
+
+
 @menu_router.get(
     '/{menu_id}/submenus/{submenu_id}',
-    response_model=schemas.SubMenuGet
+    response_model=schemas.SubMenuGet,
+    dependencies=[Depends(conditional.menu_version)]
 )
 async def submenu_detail(
     menu_id: int,
     submenu_id: int,
+    fields: tuple[str, ...] | None = Depends(fieldsets.submenu_fields),
+    encoding: str = Depends(compression.requested_encoding),
     submenu_service: SubMenuService = Depends(SubMenuService)
 ):
     try:
+        if fields is not None:
+            body = await submenu_service.get_submenu_fields_body(
+                menu_id, submenu_id, fields, encoding
+            )
+            return compression.PrecompressedResponse(*body)
         submenu_obj = await submenu_service.\
             get_submenu_with_dishes_count(menu_id, submenu_id)
     except NoResultFound:
@@ -138,7 +418,28 @@ async def submenu_detail(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='submenu not found'
         )
-    return submenu_obj
+    return ORJSONResponse(serializers.submenu(submenu_obj))
+
+
+@menu_router.get(
+    '/{menu_id}/submenus/{submenu_id}/price-stats',
+    response_model=schemas.PriceStats,
+    dependencies=[Depends(conditional.menu_version)]
+)
+async def submenu_price_stats(
+    menu_id: int,
+    submenu_id: int,
+    submenu_service: SubMenuService = Depends(SubMenuService)
+):
+    try:
+        price_stats = await submenu_service.\
+            get_price_stats(menu_id, submenu_id)
+    except NoResultFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='submenu not found'
+        )
+    return price_stats
 
 
 @menu_router.patch(
@@ -180,16 +481,32 @@ async def submenu_delete(
 
 @menu_router.get(
     '/{menu_id}/submenus/{submenu_id}/dishes',
-    response_model=list[schemas.DishGet]
+    response_model=list[schemas.DishGet],
+    dependencies=[Depends(conditional.menu_version)]
 )
 async def dish_list(
     menu_id: int,
     submenu_id: int,
+    price_min: Decimal | None = Query(None, ge=0),
+    price_max: Decimal | None = Query(None, ge=0),
+    fields: tuple[str, ...] | None = Depends(fieldsets.dish_fields),
+    encoding: str = Depends(compression.requested_encoding),
     dish_service: DishService = Depends(DishService)
 ):
-    result = await dish_service.\
-        get_dish_list(menu_id, submenu_id)
-    return result
+    if price_min is None and price_max is None:
+        body = await dish_service.\
+            get_dish_list_body(menu_id, submenu_id, encoding, fields)
+        return compression.PrecompressedResponse(*body)
+    if fields is not None:
+        rows = await dish_service.get_dish_list_fields(
+            menu_id, submenu_id, fields, price_min, price_max
+        )
+        return ORJSONResponse(
+            [serializers.fieldset(row, fields) for row in rows]
+        )
+    dish_list = await dish_service.\
+        get_dish_list(menu_id, submenu_id, price_min, price_max)
+    return ORJSONResponse([serializers.dish(obj) for obj in dish_list])
 
 
 @menu_router.post(
@@ -213,17 +530,43 @@ async def dish_create(
     return dish_obj
 
 
+@menu_router.get(
+    '/{menu_id}/submenus/{submenu_id}/dishes/batch',
+    response_model=schemas.DishBatchResult,
+    dependencies=[Depends(conditional.menu_version)]
+)
+async def dish_batch(
+    menu_id: int,
+    submenu_id: int,
+    ids: list[int] = Query([], max_length=BATCH_MAX_ITEMS),
+    dish_service: DishService = Depends(DishService)
+):
+    dish_list = await dish_service.\
+        get_dishes_by_ids(menu_id, submenu_id, ids)
+    return ORJSONResponse(
+        serializers.batch(ids, dish_list, 'dish', serializers.dish)
+    )
+
+
 @menu_router.get(
     '/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}',
-    response_model=schemas.DishGet
+    response_model=schemas.DishGet,
+    dependencies=[Depends(conditional.menu_version)]
 )
 async def dish_detail(
     menu_id: int,
     submenu_id: int,
     dish_id: int,
+    fields: tuple[str, ...] | None = Depends(fieldsets.dish_fields),
+    encoding: str = Depends(compression.requested_encoding),
     dish_service: DishService = Depends(DishService)
 ):
     try:
+        if fields is not None:
+            body = await dish_service.get_dish_fields_body(
+                menu_id, submenu_id, dish_id, fields, encoding
+            )
+            return compression.PrecompressedResponse(*body)
         dish_obj = await dish_service.\
             get_dish_by_id(menu_id, submenu_id, dish_id)
     except NoResultFound:
@@ -231,7 +574,7 @@ async def dish_detail(
             status_code=status.HTTP_404_NOT_FOUND,
             detail='dish not found'
         )
-    return dish_obj
+    return ORJSONResponse(serializers.dish(dish_obj))
 
 
 @menu_router.patch(
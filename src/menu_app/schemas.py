@@ -1,8 +1,19 @@
+from datetime import datetime
 from decimal import Decimal, InvalidOperation
+from enum import Enum
 
 from pydantic import BaseModel, field_validator
 
 
+def normalize_price(value: str | Decimal) -> str:
+    """Приводит цену к строке с двумя знаками после запятой"""
+    try:
+        decimal_price = Decimal(value).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError('price is invalid')
+    return str(decimal_price)
+
+
 class AbstractEntity(BaseModel):
     title: str
     description: str
@@ -29,11 +40,7 @@ class DishCreate(AbstractEntity):
 
     @field_validator('price')
     def validate_price(cls, value):
-        try:
-            decimal_price = Decimal(value).quantize(Decimal('0.01'))
-        except InvalidOperation:
-            raise ValueError('price is invalid')
-        return str(decimal_price)
+        return normalize_price(value)
 
 
 class MenuGet(MenuCreate, IdMixin):
@@ -56,3 +63,185 @@ class SubMenuWithNestedDishes(SubMenuCreate, IdMixin):
 class MenuWithNestedSubMenus(MenuCreate, IdMixin):
 
     submenus: list[SubMenuWithNestedDishes]
+
+
+class PriceStats(BaseModel):
+    dishes_count: int = 0
+    min_price: str | None = None
+    max_price: str | None = None
+    avg_price: str | None = None
+
+    @field_validator('min_price', 'max_price', 'avg_price', mode='before')
+    def price_to_str(cls, value):
+        return None if value is None else normalize_price(value)
+
+
+class SubMenuBulkUpdate(SubMenuCreate):
+    id: int
+
+
+class DishBulkCreate(DishCreate):
+    submenu_id: int
+
+
+class DishBulkUpdate(DishCreate):
+    id: int
+
+
+class BulkStatus(str, Enum):
+    created = 'created'
+    updated = 'updated'
+    deleted = 'deleted'
+    conflict = 'conflict'
+    not_found = 'not_found'
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: BulkStatus
+    id: str | None = None
+    detail: str | None = None
+
+
+class BulkResult(BaseModel):
+    items: list[BulkItemResult]
+
+
+class BatchStatus(str, Enum):
+    found = 'found'
+    not_found = 'not_found'
+
+
+class SubMenuBatchItem(BaseModel):
+    id: str
+    status: BatchStatus
+    submenu: SubMenuGet | None = None
+
+
+class SubMenuBatchResult(BaseModel):
+    items: list[SubMenuBatchItem]
+
+
+class DishBatchItem(BaseModel):
+    id: str
+    status: BatchStatus
+    dish: DishGet | None = None
+
+
+class DishBatchResult(BaseModel):
+    items: list[DishBatchItem]
+
+
+class ImportStatus(str, Enum):
+    pending = 'pending'
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
+
+class ImportReport(BaseModel):
+    rows: int = 0
+    menus_created: int = 0
+    menus_updated: int = 0
+    menus_deleted: int = 0
+    submenus_created: int = 0
+    submenus_updated: int = 0
+    submenus_deleted: int = 0
+    dishes_created: int = 0
+    dishes_updated: int = 0
+    dishes_deleted: int = 0
+    errors: list[str] = []
+
+
+class AuditFamily(BaseModel):
+    checked: int = 0
+    drifted: int = 0
+    repaired: int = 0
+
+
+class AuditReport(BaseModel):
+    keys: int = 0
+    families: dict[str, AuditFamily] = {}
+    drifted_keys: list[str] = []
+
+
+class ImportJob(BaseModel):
+    id: str
+    status: ImportStatus
+    report: ImportReport | None = None
+    detail: str | None = None
+
+
+class ExportFormat(str, Enum):
+    csv = 'csv'
+    xlsx = 'xlsx'
+
+
+class SearchHitType(str, Enum):
+    menu = 'menu'
+    submenu = 'submenu'
+    dish = 'dish'
+
+
+class SearchHit(IdMixin):
+    type: SearchHitType
+    title: str
+    description: str | None = None
+    price: str | None = None
+    rank: float
+    menu_id: str
+    menu_title: str
+    submenu_id: str | None = None
+    submenu_title: str | None = None
+
+    @field_validator('menu_id', 'submenu_id', mode='before')
+    def parent_id_to_str(cls, value):
+        return None if value is None else str(value)
+
+    @field_validator('price', mode='before')
+    def price_to_str(cls, value):
+        return None if value is None else normalize_price(value)
+
+
+class SearchResult(BaseModel):
+    query: str
+    limit: int
+    offset: int
+    has_more: bool
+    items: list[SearchHit]
+
+
+class ChangedMenu(MenuCreate, IdMixin):
+    updated_at: datetime
+
+
+class ChangedSubMenu(SubMenuCreate, IdMixin):
+    menu_id: str
+    updated_at: datetime
+
+
+class ChangedDish(DishCreate, IdMixin):
+    submenu_id: str
+    updated_at: datetime
+
+
+class ChangeEntity(str, Enum):
+    menu = 'menu'
+    submenu = 'submenu'
+    dish = 'dish'
+
+
+class DeletedObject(IdMixin):
+    entity: ChangeEntity
+    menu_id: str
+    submenu_id: str | None = None
+
+
+class Changes(BaseModel):
+    since: str
+    next: str
+    has_more: bool
+    menus: list[ChangedMenu]
+    submenus: list[ChangedSubMenu]
+    dishes: list[ChangedDish]
+    deleted: list[DeletedObject]
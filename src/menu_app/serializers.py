@@ -0,0 +1,155 @@
+"""
+Сборка ответов API из объектов ORM без повторной валидации pydantic.
+
+Объекты уже проверены при записи, поэтому горячие GET-эндпоинты
+отдают ORJSONResponse с результатом этих функций. Результат совпадает
+с model_dump(mode='json') соответствующих схем из schemas,
+а эндпоинты по-прежнему объявляют response_model для схемы OpenAPI
+"""
+from collections.abc import Callable
+
+from sqlalchemy import Row
+
+from models.models import Dish, Menu, SubMenu
+
+# Поля, которые в ответе передаются строками
+STRING_FIELDS = frozenset(('id', 'price'))
+
+
+def menu(menu_obj: Menu) -> dict:
+    """Схема MenuGet"""
+    return {
+        'id': str(menu_obj.id),
+        'title': menu_obj.title,
+        'description': menu_obj.description,
+        'submenus_count': menu_obj.submenus_count,
+        'dishes_count': menu_obj.dishes_count,
+    }
+
+
+def submenu(submenu_obj: SubMenu) -> dict:
+    """Схема SubMenuGet"""
+    return {
+        'id': str(submenu_obj.id),
+        'title': submenu_obj.title,
+        'description': submenu_obj.description,
+        'dishes_count': getattr(submenu_obj, 'dishes_count', 0),
+    }
+
+
+def dish(dish_obj: Dish) -> dict:
+    """
+    Схема DishGet. Цена из базы - Decimal с двумя знаками,
+    у только что записанного блюда - уже нормализованная строка
+    """
+    return {
+        'id': str(dish_obj.id),
+        'title': dish_obj.title,
+        'description': dish_obj.description,
+        'price': str(dish_obj.price),
+    }
+
+
+def menu_with_submenus(menu_obj: Menu) -> dict:
+    """Схема MenuWithNestedSubMenus"""
+    return {
+        'id': str(menu_obj.id),
+        'title': menu_obj.title,
+        'description': menu_obj.description,
+        'submenus': [
+            {
+                'id': str(submenu_obj.id),
+                'title': submenu_obj.title,
+                'description': submenu_obj.description,
+                'dishes': [dish(dish_obj) for dish_obj in submenu_obj.dishes],
+            }
+            for submenu_obj in menu_obj.submenus
+        ],
+    }
+
+
+def batch(
+    ids: list[int],
+    objects: list,
+    name: str,
+    serializer: Callable
+) -> dict:
+    """
+    Схемы SubMenuBatchResult и DishBatchResult: objects идут
+    в порядке ids, None - объект не найден
+    """
+    return {
+        'items': [
+            {
+                'id': str(obj_id),
+                'status': 'not_found' if obj is None else 'found',
+                name: None if obj is None else serializer(obj),
+            }
+            for obj_id, obj in zip(ids, objects)
+        ]
+    }
+
+
+def fieldset(row: Row, fields: tuple[str, ...]) -> dict:
+    """
+    Ответ с выбранными полями (?fields=) из строки запроса,
+    столбцы которой идут в порядке fields
+    """
+    return {
+        field: str(value) if field in STRING_FIELDS else value
+        for field, value in zip(fields, row)
+    }
+
+
+def changes(
+    since: str,
+    next_since: str,
+    has_more: bool,
+    rows: list[tuple[str, Row]]
+) -> dict:
+    """Схема Changes из строк ленты изменений вида (вид, строка)"""
+    result: dict[str, list[dict]] = {
+        'menus': [],
+        'submenus': [],
+        'dishes': [],
+        'deleted': [],
+    }
+    for kind, row in rows:
+        if kind == 'menu':
+            result['menus'].append({
+                'id': str(row.id),
+                'title': row.title,
+                'description': row.description,
+                'updated_at': row.updated_at,
+            })
+        elif kind == 'submenu':
+            result['submenus'].append({
+                'id': str(row.id),
+                'menu_id': str(row.menu_id),
+                'title': row.title,
+                'description': row.description,
+                'updated_at': row.updated_at,
+            })
+        elif kind == 'dish':
+            result['dishes'].append({
+                'id': str(row.id),
+                'submenu_id': str(row.submenu_id),
+                'title': row.title,
+                'description': row.description,
+                'price': str(row.price),
+                'updated_at': row.updated_at,
+            })
+        else:
+            result['deleted'].append({
+                'id': str(row.object_id),
+                'entity': row.entity,
+                'menu_id': str(row.menu_id),
+                'submenu_id': None if row.submenu_id is None
+                else str(row.submenu_id),
+            })
+    return {
+        'since': since,
+        'next': next_since,
+        'has_more': has_more,
+        **result,
+    }
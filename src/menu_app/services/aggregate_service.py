@@ -0,0 +1,61 @@
+import asyncio
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import AGGREGATES_MATVIEW, AGGREGATES_REFRESH_DELAY
+from database import AsyncSession
+from menu_app.redis_backend import RedisBackend
+from menu_app.repositories.aggregate_repository import AggregateRepository
+from menu_app.services.version_service import versions
+from metrics import AGGREGATES_REFRESH
+
+
+class AggregateService:
+    """
+    Отложенный пересчет материализованных представлений с количеством
+    подменю и блюд. Изменения, сделанные за AGGREGATES_REFRESH_DELAY
+    секунд, объединяются в один пересчет. Списки меню и подменю
+    до пересчета могут показывать прежнее количество
+    """
+
+    def __init__(self, session_maker=AsyncSession) -> None:
+        self.__session_maker = session_maker
+        self.__task: asyncio.Task | None = None
+        self.__pending = False
+
+    def schedule(self) -> None:
+        """Планирует пересчет после изменения каталога"""
+        if not AGGREGATES_MATVIEW:
+            return
+        self.__pending = True
+        if self.__task is None or self.__task.done():
+            self.__task = asyncio.create_task(self.__run())
+
+    async def refresh(self) -> None:
+        """
+        Пересчитывает представления, удаляет из кеша списки,
+        прочитанные из них до пересчета, и увеличивает версии данных
+        """
+        with AGGREGATES_REFRESH.time():
+            async with self.__session_maker() as session:
+                await AggregateRepository(session).refresh()
+        await RedisBackend().delete_lists_with_counts()
+        await versions.bump_all()
+
+    async def wait(self) -> None:
+        """Дожидается запланированного пересчета"""
+        if self.__task is not None:
+            await self.__task
+
+    async def __run(self) -> None:
+        # Изменения во время пересчета планируют следующий пересчет
+        while self.__pending:
+            await asyncio.sleep(AGGREGATES_REFRESH_DELAY)
+            self.__pending = False
+            try:
+                await self.refresh()
+            except (OSError, SQLAlchemyError):
+                self.__pending = True
+
+
+aggregates = AggregateService()
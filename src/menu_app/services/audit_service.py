@@ -0,0 +1,261 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from collections.abc import Callable
+
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import (
+    AUDIT_BATCH_SIZE,
+    AUDIT_INTERVAL,
+    AUDIT_RATE,
+    AUDIT_REPAIR,
+    AUDIT_SAMPLE,
+    OUTBOX_SETTLE_DELAY,
+)
+from database import AsyncSession, use_primary
+from menu_app import serializers
+from menu_app.redis_backend import RedisBackend
+from menu_app.repositories.dish_repository import DishRepository
+from menu_app.repositories.menu_repository import MenuRepository
+from menu_app.repositories.submenu_repository import SubMenuRepository
+from menu_app.schemas import AuditFamily, AuditReport
+from menu_app.services.version_service import versions
+from metrics import CACHE_AUDIT_CHECKED, CACHE_AUDIT_DRIFT, CACHE_AUDIT_DRIFT_RATIO
+
+# Сериализатор ответа для каждого вида ключа: кеш и база сравниваются
+# по тому, что получит клиент. Списки сравниваются поэлементно
+SERIALIZERS: dict[str, Callable] = {
+    'menu': serializers.menu,
+    'submenu': serializers.submenu,
+    'dish': serializers.dish,
+    'menu_list': serializers.menu,
+    'submenu_list': serializers.submenu,
+    'dish_list': serializers.dish,
+}
+LIST_FAMILIES = frozenset(('menu_list', 'submenu_list', 'dish_list'))
+
+# Сколько расходящихся ключей перечисляется в отчете
+REPORT_KEYS = 100
+
+# Проверяемый ключ: имя, вид и id из имени (см. parse_key)
+AuditKey = tuple[str, str, tuple[int, ...]]
+
+
+def parse_key(name: str) -> tuple[str, tuple[int, ...]] | None:
+    """
+    Вид ключа кеша и id из его имени. None - для ключей, которые
+    не проверяются: готовых тел ответов, результатов поиска с коротким
+    TTL и списка 'all', который читается только готовым телом
+    """
+    parts = name.split(':')
+    if parts[0] == 'menu' and parts[2::2] == ['submenu']:
+        return 'submenu', (int(parts[1]), int(parts[3]))
+    if parts[0] == 'menu' and parts[2::2] == ['submenu', 'dish']:
+        return 'dish', (int(parts[1]), int(parts[3]), int(parts[5]))
+    if parts[0] == 'menu' and len(parts) == 2:
+        return 'menu', (int(parts[1]),)
+    if name == 'menu_list':
+        return 'menu_list', ()
+    if parts[0] == 'submenu_list' and len(parts) == 2:
+        return 'submenu_list', (int(parts[1]),)
+    if parts[0] == 'dish_list' and len(parts) == 3:
+        return 'dish_list', (int(parts[1]), int(parts[2]))
+    return None
+
+
+def serialize(family: str, obj) -> dict | list:
+    """
+    Ответ из объекта кеша или базы. Списки блюд читаются без сортировки,
+    поэтому элементы списков упорядочиваются по id
+    """
+    serializer = SERIALIZERS[family]
+    if family not in LIST_FAMILIES:
+        return serializer(obj)
+    return sorted(
+        (serializer(item) for item in obj), key=lambda item: int(item['id'])
+    )
+
+
+class AuditService:
+    """
+    Сверяет кеш каталога с базой: обходит ключи текущего поколения
+    (SCAN) или их долю sample, пачкой читает значения из Redis и заново
+    собирает их через репозитории - объекты одним запросом на пачку,
+    списки как при промахе кеша. Расхождение может быть временным:
+    запрос, прочитавший базу до изменения, записал старые данные, а
+    outbox удалит их через OUTBOX_SETTLE_DELAY. Поэтому подозрительные
+    ключи проверяются еще раз после confirm_delay в основной базе.
+    С repair расходящиеся ключи удаляются вместе с телами ответов, а
+    версии их меню увеличиваются. Проверяется не больше rate ключей
+    в секунду. Работает вне запросов, поэтому сама открывает сессии
+    """
+
+    def __init__(
+        self,
+        session_maker=AsyncSession,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        rate: float = AUDIT_RATE,
+        sample: float = AUDIT_SAMPLE,
+        confirm_delay: float = OUTBOX_SETTLE_DELAY
+    ) -> None:
+        self.__session_maker = session_maker
+        self.__batch_size = batch_size
+        self.__rate = rate
+        self.__sample = sample
+        self.__confirm_delay = confirm_delay
+        self.__redis_cli = RedisBackend()
+
+    async def audit(self, repair: bool = AUDIT_REPAIR) -> AuditReport:
+        """Один проход по кешу, возвращает отчет по видам ключей"""
+        report = AuditReport()
+        suspects: list[AuditKey] = []
+        async for names in self.__redis_cli.scan_cache(self.__batch_size):
+            report.keys += len(names)
+            keys = []
+            for name in names:
+                parsed = parse_key(name)
+                if parsed is not None and random.random() < self.__sample:
+                    family, ids = parsed
+                    keys.append((name, family, ids))
+            for start in range(0, len(keys), self.__batch_size):
+                batch = keys[start:start + self.__batch_size]
+                started = time.perf_counter()
+                suspects.extend(await self.__check(batch, report))
+                elapsed = time.perf_counter() - started
+                await asyncio.sleep(max(0, len(batch) / self.__rate - elapsed))
+
+        confirmed: dict[AuditKey, str] = {}
+        if suspects:
+            await asyncio.sleep(self.__confirm_delay)
+            for start in range(0, len(suspects), self.__batch_size):
+                confirmed.update(await self.__check(
+                    suspects[start:start + self.__batch_size], primary=True
+                ))
+        for (_, family, _), kind in confirmed.items():
+            report.families[family].drifted += 1
+            CACHE_AUDIT_DRIFT.labels(family, kind).inc()
+        for family, counts in report.families.items():
+            CACHE_AUDIT_DRIFT_RATIO.labels(family).set(
+                counts.drifted / counts.checked
+            )
+        report.drifted_keys = \
+            sorted(name for name, _, _ in confirmed)[:REPORT_KEYS]
+        if repair and confirmed:
+            await self.__repair(list(confirmed), report)
+        return report
+
+    async def run_forever(self, interval: float = AUDIT_INTERVAL) -> None:
+        """
+        Периодически проверяет кеш. Проход делает один процесс
+        из всех: тот, кто первым занял блокировку на interval секунд.
+        Ошибка базы или Redis не останавливает проверку
+        """
+        while True:
+            try:
+                if await self.__redis_cli.acquire_lock('cache_audit', interval):
+                    await self.audit()
+            except (OSError, SQLAlchemyError, RedisError):
+                pass
+            await asyncio.sleep(interval)
+
+    async def __check(
+        self,
+        keys: list[AuditKey],
+        report: AuditReport | None = None,
+        primary: bool = False
+    ) -> dict[AuditKey, str]:
+        """
+        Сверяет пачку ключей, возвращает расходящиеся: mismatch -
+        значение отличается, stale - объекта в базе уже нет.
+        Ключи, истекшие после обхода, пропускаются
+        """
+        names = [name for name, _, _ in keys]
+        cached = dict(zip(names, await self.__redis_cli.get_cached(names)))
+        keys = [key for key in keys if cached[key[0]] is not None]
+        async with self.__session_maker() as session:
+            if primary:
+                use_primary(session)
+            fresh = await self.__load(session, keys)
+        drifted: dict[AuditKey, str] = {}
+        for key in keys:
+            name, family, _ = key
+            if report is not None:
+                report.families.setdefault(family, AuditFamily()).checked += 1
+                CACHE_AUDIT_CHECKED.labels(family).inc()
+            if name not in fresh:
+                drifted[key] = 'stale'
+            elif serialize(family, cached[name]) != fresh[name]:
+                drifted[key] = 'mismatch'
+        return drifted
+
+    async def __load(self, session, keys: list[AuditKey]) -> dict:
+        """
+        Собирает из базы ответы для ключей: меню и блюда одним запросом,
+        подменю одним запросом на меню, списки - тем же методом, что и при
+        промахе кеша. Объектов, которых в базе нет или которые теперь
+        в другом подменю, в результате нет
+        """
+        menu_repository = MenuRepository(session)
+        submenu_repository = SubMenuRepository(session)
+        dish_repository = DishRepository(session)
+        menus: list[int] = []
+        submenus: defaultdict[int, list[int]] = defaultdict(list)
+        dishes: list[int] = []
+        fresh: dict[str, dict | list] = {}
+        for name, family, ids in keys:
+            if family == 'menu':
+                menus.append(ids[0])
+            elif family == 'submenu':
+                submenus[ids[0]].append(ids[1])
+            elif family == 'dish':
+                dishes.append(ids[2])
+            elif family == 'menu_list':
+                menu_list = await menu_repository.get_menu_list_with_counts()
+                fresh[name] = serialize(family, menu_list)
+            elif family == 'submenu_list':
+                menu_id, = ids
+                submenu_list = await submenu_repository.\
+                    get_submenu_list_with_dishes_count(menu_id)
+                fresh[name] = serialize(family, submenu_list)
+            else:
+                menu_id, submenu_id = ids
+                dish_list = await dish_repository.\
+                    get_dish_list(menu_id, submenu_id)
+                fresh[name] = serialize(family, dish_list)
+
+        if menus:
+            for menu_obj in await menu_repository.get_menus_by_ids(menus):
+                fresh[f'menu:{menu_obj.id}'] = serialize('menu', menu_obj)
+        for menu_id, submenu_ids in submenus.items():
+            for submenu_obj in await submenu_repository.\
+                    get_submenus_by_ids(menu_id, submenu_ids):
+                fresh[f'menu:{menu_id}:submenu:{submenu_obj.id}'] = \
+                    serialize('submenu', submenu_obj)
+        if dishes:
+            for menu_id, dish_obj in await dish_repository.\
+                    get_dishes_with_parents(dishes):
+                fresh[
+                    f'menu:{menu_id}:submenu:{dish_obj.submenu_id}'
+                    f':dish:{dish_obj.id}'
+                ] = serialize('dish', dish_obj)
+        return fresh
+
+    async def __repair(self, keys: list[AuditKey], report: AuditReport) -> None:
+        """
+        Удаляет расходящиеся ключи: следующий запрос прочитает базу.
+        Версии увеличиваются, чтобы клиенты не получили 304
+        на данные, собранные из испорченного кеша
+        """
+        await self.__redis_cli.delete_cached([name for name, _, _ in keys])
+        menu_ids = set()
+        for _, family, ids in keys:
+            report.families[family].repaired += 1
+            if ids:
+                menu_ids.add(ids[0])
+            else:
+                await versions.bump_all()
+        for menu_id in sorted(menu_ids):
+            await versions.bump(menu_id)
@@ -0,0 +1,80 @@
+from fastapi import Depends
+from sqlalchemy import Row
+from sqlalchemy.orm.exc import NoResultFound
+
+from menu_app import serializers
+from menu_app.repositories.change_repository import ChangeRepository
+
+# Виды изменений в порядке внутри одной версии
+KINDS = ('menu', 'submenu', 'dish', 'deleted')
+
+# Позиция после всех изменений вида внутри версии (id - integer)
+AFTER_ALL = 2 ** 31 - 1
+
+
+def parse_cursor(since: str) -> tuple[int, int, int]:
+    """
+    Разбирает позицию в ленте: <версия> - все изменения начиная
+    с версии, <версия>:<вид>:<id> - продолжение страницы после
+    изменения вида с номером в KINDS и id. ValueError - неверная позиция
+    """
+    version_part, _, position = since.partition(':')
+    if not position:
+        kind, after_id = 0, -1
+    else:
+        kind, after_id = map(int, position.split(':'))
+    version = int(version_part)
+    if version < 0 or not 0 <= kind < len(KINDS):
+        raise ValueError('since is invalid')
+    return version, kind, after_id
+
+
+class ChangeService:
+    """
+    Лента изменений каталога для клиентов с локальной копией:
+    строки, вставленные или измененные после версии, и удаления.
+    Стоимость запроса зависит от числа изменений, а не от размера каталога
+    """
+
+    def __init__(
+        self,
+        change_repository: ChangeRepository = Depends(ChangeRepository),
+    ) -> None:
+        self.__change_repository = change_repository
+
+    async def get_changes(self, since: str, limit: int) -> dict:
+        """
+        Страница изменений после позиции since, не больше limit.
+        NoResultFound - позиция новее данных в базе (например, база
+        восстановлена из резервной копии), нужна полная синхронизация
+        """
+        version, kind, after_id = parse_cursor(since)
+        horizon = await self.__change_repository.get_horizon()
+        if version > horizon:
+            raise NoResultFound('version not found')
+        changes: list[tuple[int, int, int, Row]] = []
+        for index, name in enumerate(KINDS):
+            if index < kind:
+                start = AFTER_ALL
+            elif index == kind:
+                start = after_id
+            else:
+                start = -1
+            rows = await self.__change_repository.\
+                get_changes(name, version, start, horizon, limit + 1)
+            changes.extend((row.version, index, row.id, row) for row in rows)
+        await self.__change_repository.release()
+        changes.sort(key=lambda change: change[:3])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        if has_more:
+            last_version, last_kind, last_id, _ = changes[-1]
+            next_since = f'{last_version}:{last_kind}:{last_id}'
+        else:
+            next_since = str(horizon)
+        return serializers.changes(
+            since,
+            next_since,
+            has_more,
+            [(KINDS[index], row) for _, index, _, row in changes]
+        )
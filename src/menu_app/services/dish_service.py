@@ -1,8 +1,16 @@
+from decimal import Decimal
+
 from fastapi import BackgroundTasks, Depends
+from sqlalchemy import Row
 
+from menu_app import compression, serializers
 from menu_app.redis_backend import RedisBackend
 from menu_app.repositories.dish_repository import DishRepository
-from menu_app.schemas import DishCreate
+from menu_app.schemas import BulkResult, DishBulkCreate, DishBulkUpdate, DishCreate
+from menu_app.services.aggregate_service import aggregates
+from menu_app.services.event_service import events
+from menu_app.services.outbox_service import outbox
+from menu_app.services.version_service import versions
 from models.models import Dish
 
 
@@ -23,17 +31,90 @@ class DishService:
     async def get_dish_list(
         self,
         menu_id: int,
-        submenu_id: int
+        submenu_id: int,
+        price_min: Decimal | None = None,
+        price_max: Decimal | None = None
     ) -> list[Dish]:
+        if price_min is not None or price_max is not None:
+            # Отфильтрованные списки не кешируются:
+            # сочетаний границ слишком много
+            dish_list = await self.__dish_repository.\
+                get_dish_list(menu_id, submenu_id, price_min, price_max)
+            await self.__dish_repository.release()
+            return dish_list
         dish_list = await self.__redis_cli.\
             get_dish_list(menu_id, submenu_id)
         if dish_list is None:
             dish_list = await self.__dish_repository.\
                 get_dish_list(menu_id, submenu_id)
+            await self.__dish_repository.release()
             await self.__redis_cli.\
                 set_dish_list(dish_list, menu_id, submenu_id)
         return dish_list
 
+    async def get_dish_list_fields(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        fields: tuple[str, ...],
+        price_min: Decimal | None = None,
+        price_max: Decimal | None = None
+    ) -> list[Row]:
+        """Список блюд с выбранными полями, не кешируется"""
+        dish_list = await self.__dish_repository.get_dish_list_fields(
+            menu_id, submenu_id, fields, price_min, price_max
+        )
+        await self.__dish_repository.release()
+        return dish_list
+
+    async def get_dish_list_body(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        encoding: str,
+        fields: tuple[str, ...] | None = None
+    ) -> tuple[bytes, str]:
+        """
+        Тело ответа со списком блюд подменю в запрошенной кодировке.
+        Если заданы fields, из базы читаются только эти поля
+        """
+        name = f'dish_list:{menu_id}:{submenu_id}'
+        body = await self.__redis_cli.get_body(name, encoding, fields)
+        if body is None:
+            if fields is None:
+                dish_list = await self.get_dish_list(menu_id, submenu_id)
+                content = [serializers.dish(obj) for obj in dish_list]
+            else:
+                rows = await self.\
+                    get_dish_list_fields(menu_id, submenu_id, fields)
+                content = [serializers.fieldset(row, fields) for row in rows]
+            variants = compression.encode_variants(content)
+            await self.__redis_cli.set_bodies(name, variants, fields)
+            body = compression.pick_variant(variants, encoding)
+        return body
+
+    async def get_dish_fields_body(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        dish_id: int,
+        fields: tuple[str, ...],
+        encoding: str
+    ) -> tuple[bytes, str]:
+        """Тело ответа с выбранными полями блюда"""
+        name = f'menu:{menu_id}:submenu:{submenu_id}:dish:{dish_id}'
+        body = await self.__redis_cli.get_body(name, encoding, fields)
+        if body is None:
+            row = await self.__dish_repository.\
+                get_dish_fields(menu_id, submenu_id, dish_id, fields)
+            await self.__dish_repository.release()
+            variants = compression.encode_variants(
+                serializers.fieldset(row, fields)
+            )
+            await self.__redis_cli.set_bodies(name, variants, fields)
+            body = compression.pick_variant(variants, encoding)
+        return body
+
     async def create_dish(
         self,
         new_dish: DishCreate,
@@ -42,8 +123,12 @@ class DishService:
     ) -> Dish:
         dish_obj = await self.__dish_repository.\
             create_dish(new_dish, submenu_id)
+        aggregates.schedule()
+        await outbox.after_write()
+        await versions.bump(menu_id)
         self.__background_tasks.add_task(
-            self.__redis_cli.delete_dish, menu_id, submenu_id, dish_obj.id
+            events.publish, 'dish', 'created', menu_id, [dish_obj.id],
+            submenu_id
         )
         return dish_obj
 
@@ -58,9 +143,40 @@ class DishService:
         if dish_obj is None:
             dish_obj = await self.__dish_repository.\
                 get_dish_by_id(menu_id, submenu_id, dish_id)
+            await self.__dish_repository.release()
             await self.__redis_cli.set_dish(dish_obj, menu_id)
         return dish_obj
 
+    async def get_dishes_by_ids(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        dish_ids: list[int]
+    ) -> list[Dish | None]:
+        """
+        Возвращает блюда в порядке dish_ids, None - для ненайденных.
+        Кеш читается одной командой, промахи - одним запросом к базе
+        """
+        if not dish_ids:
+            return []
+        unique_ids = list(dict.fromkeys(dish_ids))
+        cached = await self.__redis_cli.\
+            get_dishes(menu_id, submenu_id, unique_ids)
+        found = {
+            dish_id: dish_obj
+            for dish_id, dish_obj in zip(unique_ids, cached)
+            if dish_obj is not None
+        }
+        missing = [dish_id for dish_id in unique_ids if dish_id not in found]
+        if missing:
+            dish_list = await self.__dish_repository.\
+                get_dishes_by_ids(menu_id, submenu_id, missing)
+            await self.__dish_repository.release()
+            if dish_list:
+                await self.__redis_cli.set_dishes(dish_list, menu_id)
+            found.update((dish_obj.id, dish_obj) for dish_obj in dish_list)
+        return [found.get(dish_id) for dish_id in dish_ids]
+
     async def update_dish_by_id(
         self,
         menu_id: int,
@@ -70,8 +186,11 @@ class DishService:
     ) -> Dish:
         dish_obj = await self.__dish_repository.\
             update_dish_by_id(menu_id, submenu_id, dish_id, item)
+        aggregates.schedule()
+        await outbox.after_write()
+        await versions.bump(menu_id)
         self.__background_tasks.add_task(
-            self.__redis_cli.delete_dish, menu_id, submenu_id, dish_id
+            events.publish, 'dish', 'updated', menu_id, [dish_id], submenu_id
         )
         return dish_obj
 
@@ -83,6 +202,57 @@ class DishService:
     ) -> None:
         await self.__dish_repository.\
             delete_dish_by_id(menu_id, submenu_id, dish_id)
+        aggregates.schedule()
+        await outbox.after_write()
+        await versions.bump(menu_id)
         self.__background_tasks.add_task(
-            self.__redis_cli.delete_dish, menu_id, submenu_id, dish_id
+            events.publish, 'dish', 'deleted', menu_id, [dish_id], submenu_id
         )
+
+    async def create_dish_bulk(
+        self,
+        menu_id: int,
+        items: list[DishBulkCreate],
+    ) -> BulkResult:
+        results, created = await self.__dish_repository.\
+            create_dish_bulk(menu_id, items)
+        if created:
+            aggregates.schedule()
+            await outbox.after_write()
+            await versions.bump(menu_id)
+            self.__background_tasks.add_task(
+                events.publish_dishes, 'created', menu_id, created
+            )
+        return BulkResult(items=results)
+
+    async def update_dish_bulk(
+        self,
+        menu_id: int,
+        items: list[DishBulkUpdate],
+    ) -> BulkResult:
+        results, updated = await self.__dish_repository.\
+            update_dish_bulk(menu_id, items)
+        if updated:
+            aggregates.schedule()
+            await outbox.after_write()
+            await versions.bump(menu_id)
+            self.__background_tasks.add_task(
+                events.publish_dishes, 'updated', menu_id, updated
+            )
+        return BulkResult(items=results)
+
+    async def delete_dish_bulk(
+        self,
+        menu_id: int,
+        dish_ids: list[int],
+    ) -> BulkResult:
+        results, deleted = await self.__dish_repository.\
+            delete_dish_bulk(menu_id, dish_ids)
+        if deleted:
+            aggregates.schedule()
+            await outbox.after_write()
+            await versions.bump(menu_id)
+            self.__background_tasks.add_task(
+                events.publish_dishes, 'deleted', menu_id, deleted
+            )
+        return BulkResult(items=results)
@@ -0,0 +1,179 @@
+import asyncio
+from collections.abc import AsyncIterator, Iterable
+
+import orjson
+from redis.exceptions import RedisError
+
+from config import EVENTS_HEARTBEAT, EVENTS_QUEUE_SIZE
+from menu_app.redis_backend import RedisBackend, event_key
+from metrics import EVENTS_DROPPED, EVENTS_SUBSCRIBERS
+
+# Клиент переподключается через 3 секунды после обрыва
+RETRY_FRAME = b'retry: 3000\n\n'
+# Комментарий, который не дает прокси закрыть молчащее соединение
+PING_FRAME = b': ping\n\n'
+# События могли пропасть: клиент должен заново загрузить каталог
+RESET_FRAME = b'event: reset\ndata: {}\n\n'
+
+# Пауза перед переподключением к Redis после ошибки
+LISTEN_RETRY_DELAY = 1
+
+
+def event_frame(event_id: str, data: bytes) -> bytes:
+    """Событие в формате text/event-stream"""
+    return b'id: %s\nevent: change\ndata: %s\n\n' % (event_id.encode(), data)
+
+
+class Subscriber:
+    """Очередь событий одного подключения к ленте"""
+
+    __slots__ = ('queue', 'dropped')
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+
+class EventService:
+    """
+    Лента изменений каталога. События записываются в поток Redis
+    с ограниченной историей и рассылаются через pub/sub, поэтому
+    их получают подписчики всех процессов. Процесс держит одно
+    подключение к pub/sub на всех подписчиков, событие кодируется
+    один раз, а каждому подписчику достается ссылка на него
+    в очереди ограниченного размера
+    """
+
+    def __init__(self, queue_size: int = EVENTS_QUEUE_SIZE) -> None:
+        self.__queue_size = queue_size
+        self.__subscribers: set[Subscriber] = set()
+        self.__listener: asyncio.Task | None = None
+        # Событие готовности текущего слушателя, новое на каждый запуск
+        self.__ready = asyncio.Event()
+
+    async def publish(
+        self,
+        entity: str,
+        action: str,
+        menu_id: int,
+        ids: Iterable[int],
+        submenu_id: int | None = None
+    ) -> None:
+        """Публикует изменение объектов entity с id из ids"""
+        await RedisBackend().add_event(orjson.dumps({
+            'entity': entity,
+            'action': action,
+            'menu_id': str(menu_id),
+            'submenu_id': None if submenu_id is None else str(submenu_id),
+            'ids': [str(obj_id) for obj_id in ids],
+        }))
+
+    async def publish_dishes(
+        self,
+        action: str,
+        menu_id: int,
+        dishes: dict[int, set[int]]
+    ) -> None:
+        """
+        Публикует изменение блюд, сгруппированных по id подменю:
+        одно событие на подменю
+        """
+        for submenu_id, dish_ids in dishes.items():
+            await self.publish('dish', action, menu_id, dish_ids, submenu_id)
+
+    async def stream(
+        self,
+        last_event_id: str | None = None
+    ) -> AsyncIterator[bytes]:
+        """
+        События для одного подписчика в формате text/event-stream.
+        С last_event_id сначала отдаются пропущенные события из истории,
+        а если история уже обрезана - событие reset
+        """
+        subscriber = Subscriber(self.__queue_size)
+        self.__subscribers.add(subscriber)
+        EVENTS_SUBSCRIBERS.inc()
+        try:
+            await self.__start_listener()
+            yield RETRY_FRAME
+            last_key = None
+            if last_event_id:
+                try:
+                    last_key = event_key(last_event_id)
+                    backlog = await RedisBackend().\
+                        get_events_after(last_event_id)
+                except ValueError:
+                    backlog = None
+                if backlog is None:
+                    yield RESET_FRAME
+                for event_id, data in backlog or ():
+                    last_key = event_key(event_id)
+                    yield event_frame(event_id, data)
+            while not (subscriber.dropped and subscriber.queue.empty()):
+                try:
+                    event = await asyncio.wait_for(
+                        subscriber.queue.get(), EVENTS_HEARTBEAT
+                    )
+                except asyncio.TimeoutError:
+                    yield PING_FRAME
+                    continue
+                if event is None:
+                    break
+                event_id, frame = event
+                # События из истории могли прийти и через pub/sub
+                if last_key is not None and event_key(event_id) <= last_key:
+                    continue
+                yield frame
+        finally:
+            self.__subscribers.discard(subscriber)
+            EVENTS_SUBSCRIBERS.dec()
+            if not self.__subscribers:
+                self.close()
+
+    def close(self) -> None:
+        """Останавливает получение событий процессом"""
+        if self.__listener is not None:
+            self.__listener.cancel()
+            self.__listener = None
+
+    async def __start_listener(self) -> None:
+        if self.__listener is None:
+            self.__ready = asyncio.Event()
+            self.__listener = asyncio.create_task(self.__listen(self.__ready))
+        await self.__ready.wait()
+
+    async def __listen(self, ready: asyncio.Event) -> None:
+        while True:
+            try:
+                async for event in RedisBackend().listen_events():
+                    if event is None:
+                        ready.set()
+                        continue
+                    event = event[0], event_frame(*event)
+                    for subscriber in tuple(self.__subscribers):
+                        try:
+                            subscriber.queue.put_nowait(event)
+                        except asyncio.QueueFull:
+                            self.__drop(subscriber)
+            except (OSError, RedisError):
+                # События за время переподключения подписчики получат
+                # из истории, переподключившись с Last-Event-ID
+                for subscriber in tuple(self.__subscribers):
+                    self.__drop(subscriber)
+                await asyncio.sleep(LISTEN_RETRY_DELAY)
+
+    def __drop(self, subscriber: Subscriber) -> None:
+        """
+        Отключает подписчика: он дочитает очередь, а клиент
+        переподключится и продолжит с последнего полученного события
+        """
+        subscriber.dropped = True
+        self.__subscribers.discard(subscriber)
+        EVENTS_DROPPED.inc()
+        try:
+            subscriber.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+events = EventService()
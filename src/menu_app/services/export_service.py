@@ -0,0 +1,45 @@
+from collections.abc import AsyncIterator
+
+from fastapi import Depends
+
+from menu_app.repositories.menu_repository import MenuRepository
+from menu_app.schemas import ExportFormat
+from menu_app.spreadsheet import MEDIA_TYPES, gzip_chunks, write_csv, write_xlsx
+
+
+class ExportService:
+    """
+    Сервис выгрузки каталога в csv и xlsx.
+    Читает данные напрямую из базы, кеш не используется
+    """
+
+    def __init__(
+            self,
+            menu_repository: MenuRepository = Depends(MenuRepository),
+    ) -> None:
+        self.__menu_repository = menu_repository
+
+    def export(
+        self,
+        export_format: ExportFormat,
+        gzip: bool = False
+    ) -> AsyncIterator[bytes]:
+        rows = self.__menu_repository.stream_catalogue()
+        if export_format == ExportFormat.xlsx:
+            chunks = write_xlsx(rows)
+        else:
+            chunks = write_csv(rows)
+        if gzip:
+            return gzip_chunks(chunks)
+        return chunks
+
+    @staticmethod
+    def get_file_info(
+        export_format: ExportFormat,
+        gzip: bool = False
+    ) -> tuple[str, str]:
+        """Возвращает имя файла выгрузки и его media type"""
+        filename = f'catalogue.{export_format.value}'
+        if gzip:
+            return f'{filename}.gz', MEDIA_TYPES['gz']
+        return filename, MEDIA_TYPES[export_format.value]
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+from fastapi import BackgroundTasks, Depends, UploadFile
+from sqlalchemy.orm.exc import NoResultFound
+
+from database import AsyncSession
+from menu_app.redis_backend import RedisBackend
+from menu_app.repositories.import_repository import ImportRepository, TouchedCache
+from menu_app.schemas import ImportJob, ImportReport, ImportStatus
+from menu_app.services.aggregate_service import aggregates
+from menu_app.services.event_service import events
+from menu_app.services.outbox_service import outbox
+from menu_app.services.version_service import versions
+from menu_app.spreadsheet import CHUNK_SIZE, read_rows_in_thread
+
+
+class ImportService:
+    """
+    Сервис импорта каталога из файлов csv и xlsx,
+    объединяющий работу ImportRepository и RedisBackend
+    """
+
+    def __init__(
+        self,
+        background_tasks: BackgroundTasks,
+        import_repository: ImportRepository = Depends(ImportRepository),
+    ) -> None:
+        self.__import_repository = import_repository
+        self.__background_tasks = background_tasks
+        self.__redis_cli = RedisBackend()
+
+    async def import_file(
+        self,
+        path: str | Path,
+        prune: bool = False
+    ) -> ImportReport:
+        report, touched = await self.__import_repository.\
+            import_rows(read_rows_in_thread(path), prune)
+        await self.__invalidate(touched)
+        return report
+
+    async def start_import_job(
+        self,
+        file: UploadFile,
+        prune: bool = False
+    ) -> ImportJob:
+        suffix = Path(file.filename or '').suffix
+        # Чтение UploadFile с диска идет в потоке, запись - кусками
+        # в кеш страниц, поэтому большой файл не останавливает цикл событий
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            while chunk := await file.read(CHUNK_SIZE):
+                tmp.write(chunk)
+        job = ImportJob(id=uuid.uuid4().hex, status=ImportStatus.pending)
+        await self.__redis_cli.set_import_job(job)
+        self.__background_tasks.add_task(
+            self.__run_import_job, job, tmp.name, prune
+        )
+        return job
+
+    async def get_import_job(self, job_id: str) -> ImportJob:
+        job = await self.__redis_cli.get_import_job(job_id)
+        if job is None:
+            raise NoResultFound('import job not found')
+        return job
+
+    async def __run_import_job(
+        self,
+        job: ImportJob,
+        path: str,
+        prune: bool
+    ) -> None:
+        job.status = ImportStatus.running
+        await self.__redis_cli.set_import_job(job)
+        try:
+            async with AsyncSession() as session:
+                report, touched = await ImportRepository(session).\
+                    import_rows(read_rows_in_thread(path), prune)
+            await self.__invalidate(touched)
+        except Exception as error:
+            job.status = ImportStatus.failed
+            job.detail = str(error)
+        else:
+            job.status = ImportStatus.done
+            job.report = report
+        finally:
+            os.remove(path)
+        await self.__redis_cli.set_import_job(job)
+
+    async def __invalidate(self, touched: TouchedCache) -> None:
+        """Инвалидирует кеш только затронутых импортом объектов"""
+        aggregates.schedule()
+        # Затронутые объекты уже записаны в outbox триггерами
+        await outbox.flush()
+        # Импорт меняет много объектов сразу: вместо события на каждый
+        # подписчики получают одно событие на каждое затронутое меню
+        for menu_id in sorted(
+            touched.menus | touched.submenus.keys() | touched.dishes.keys()
+        ):
+            await versions.bump(menu_id)
+            await events.publish('menu', 'updated', menu_id, [menu_id])
@@ -0,0 +1,155 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+
+import asyncpg
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import (
+    DB_HOST,
+    DB_NAME,
+    DB_PASS,
+    DB_PORT,
+    DB_USER,
+    OUTBOX_INTERVAL,
+    OUTBOX_LISTEN_MAX_RETRY,
+    OUTBOX_LISTEN_RETRY,
+    OUTBOX_NOTIFY_DELAY,
+)
+from menu_app.redis_backend import RedisBackend
+from menu_app.services.outbox_service import OutboxService, outbox
+from metrics import LISTENER_CONNECTED, LISTENER_NOTIFICATIONS, LISTENER_RECONNECTS
+
+# Новые записи outbox, см. NOTIFY_DDL
+OUTBOX_CHANNEL = 'cache_outbox'
+# Новое поколение кеша, см. OutboxService.overflow
+GENERATION_CHANNEL = 'cache_generation'
+
+# Имя соединения слушателя в pg_stat_activity
+APPLICATION_NAME = 'menu_app_listener'
+
+# Ошибки соединения слушателя: после них он подключается заново
+CONNECTION_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresError,
+    asyncpg.InterfaceError,
+)
+
+
+def count_changes(payload: str) -> int:
+    """Количество объектов в уведомлении cache_outbox"""
+    if payload.startswith('*'):
+        return int(payload[1:])
+    return payload.count(',') + 1
+
+
+class ListenerService:
+    """
+    Слушает уведомления PostgreSQL об изменениях каталога (LISTEN)
+    на отдельном соединении и запускает инвалидацию кеша сразу, а не
+    на следующем проходе диспетчера, в том числе для записей в обход
+    API: миграций данных, правок через psql, других сервисов.
+    Уведомления за notify_delay секунд обрабатываются одним проходом:
+    outbox разбирается точечно, а если объектов не меньше порога
+    переполнения - весь кеш сбрасывается новым поколением.
+    Уведомления, отправленные, пока соединения не было, не нужны:
+    после подключения поколение читается заново, а outbox разбирается
+    целиком. Работает в каждом процессе, записи между процессами
+    делит OutboxService
+    """
+
+    def __init__(
+        self,
+        outbox_service: OutboxService = outbox,
+        notify_delay: float = OUTBOX_NOTIFY_DELAY,
+        retry: float = OUTBOX_LISTEN_RETRY,
+        max_retry: float = OUTBOX_LISTEN_MAX_RETRY
+    ) -> None:
+        self.__outbox = outbox_service
+        self.__notify_delay = notify_delay
+        self.__retry = retry
+        self.__max_retry = max_retry
+        self.__redis_cli = RedisBackend()
+
+    async def run_forever(self) -> None:
+        """
+        Подключается и слушает, после разрыва соединения
+        подключается заново с паузой, которая растет до max_retry
+        """
+        retry = self.__retry
+        while True:
+            try:
+                connection = await asyncpg.connect(
+                    host=DB_HOST, port=DB_PORT, user=DB_USER,
+                    password=DB_PASS, database=DB_NAME,
+                    server_settings={'application_name': APPLICATION_NAME},
+                )
+            except CONNECTION_ERRORS:
+                pass
+            else:
+                retry = self.__retry
+                try:
+                    await self.__listen(connection)
+                except CONNECTION_ERRORS:
+                    pass
+                finally:
+                    connection.terminate()
+            LISTENER_RECONNECTS.inc()
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, self.__max_retry)
+
+    async def __listen(self, connection: asyncpg.Connection) -> None:
+        changes: asyncio.Queue[str] = asyncio.Queue()
+        await connection.add_listener(
+            OUTBOX_CHANNEL,
+            lambda *args: changes.put_nowait(args[3])
+        )
+        await connection.add_listener(
+            GENERATION_CHANNEL,
+            lambda *args: RedisBackend.set_generation(int(args[3]))
+        )
+        await self.__run(self.__redis_cli.load_generation)
+        await self.__run(self.__outbox.catch_up)
+        # Подключенным слушатель считается, когда уже ничего не пропустит
+        LISTENER_CONNECTED.inc()
+        try:
+            await self.__wait(connection, changes)
+        finally:
+            LISTENER_CONNECTED.dec()
+
+    async def __wait(
+        self,
+        connection: asyncpg.Connection,
+        changes: asyncio.Queue[str]
+    ) -> None:
+        while True:
+            try:
+                payload = await asyncio.wait_for(
+                    changes.get(), OUTBOX_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                # Уведомлений нет: проверяется, что соединение живо,
+                # и поколение, если его уведомление не дошло
+                await connection.execute('SELECT 1')
+                await self.__run(self.__redis_cli.load_generation)
+                continue
+            await asyncio.sleep(self.__notify_delay)
+            payloads = [payload]
+            while not changes.empty():
+                payloads.append(changes.get_nowait())
+            LISTENER_NOTIFICATIONS.inc(len(payloads))
+            if sum(map(count_changes, payloads)) >= self.__outbox.overflow_size:
+                await self.__run(self.__outbox.overflow)
+            else:
+                await self.__run(self.__outbox.drain)
+
+    async def __run(self, step: Callable[[], Awaitable]) -> None:
+        """
+        Ошибка базы или Redis не разрывает соединение слушателя:
+        необработанные записи останутся в outbox
+        """
+        try:
+            await step()
+        except (SQLAlchemyError, RedisError):
+            pass
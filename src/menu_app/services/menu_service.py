@@ -1,8 +1,12 @@
 from fastapi import BackgroundTasks, Depends
 
+from menu_app import compression, serializers
 from menu_app.redis_backend import RedisBackend
 from menu_app.repositories.menu_repository import MenuRepository
-from menu_app.schemas import MenuCreate
+from menu_app.schemas import MenuCreate, PriceStats
+from menu_app.services.event_service import events
+from menu_app.services.outbox_service import outbox
+from menu_app.services.version_service import versions
 from models.models import Menu
 
 
@@ -22,6 +26,7 @@ class MenuService:
 
     async def get_all_list(self) -> list[Menu]:
         all_list = await self.__menu_repository.get_all_list()
+        await self.__menu_repository.release()
         await self.__redis_cli.set_all_list(all_list)
         return all_list
 
@@ -30,15 +35,79 @@ class MenuService:
         if menu_list is None:
             menu_list = await self.__menu_repository.\
                 get_menu_list_with_counts()
+            await self.__menu_repository.release()
             await self.__redis_cli.set_menu_list(menu_list)
         return menu_list
 
+    async def get_all_list_body(self, encoding: str) -> tuple[bytes, str]:
+        """
+        Тело ответа со всеми меню в запрошенной кодировке.
+        Сжатые варианты готовятся один раз при записи в кеш
+        """
+        body = await self.__redis_cli.get_body('all', encoding)
+        if body is None:
+            all_list = await self.get_all_list()
+            variants = compression.encode_variants(
+                [serializers.menu_with_submenus(obj) for obj in all_list]
+            )
+            await self.__redis_cli.set_bodies('all', variants)
+            body = compression.pick_variant(variants, encoding)
+        return body
+
+    async def get_menu_list_body(
+        self,
+        encoding: str,
+        fields: tuple[str, ...] | None = None
+    ) -> tuple[bytes, str]:
+        """
+        Тело ответа со списком меню в запрошенной кодировке.
+        Если заданы fields, из базы читаются только эти поля
+        """
+        body = await self.__redis_cli.get_body('menu_list', encoding, fields)
+        if body is None:
+            if fields is None:
+                menu_list = await self.get_menu_list_with_counts()
+                content = [serializers.menu(obj) for obj in menu_list]
+            else:
+                rows = await self.__menu_repository.\
+                    get_menu_list_fields(fields)
+                await self.__menu_repository.release()
+                content = [serializers.fieldset(row, fields) for row in rows]
+            variants = compression.encode_variants(content)
+            await self.__redis_cli.set_bodies('menu_list', variants, fields)
+            body = compression.pick_variant(variants, encoding)
+        return body
+
+    async def get_menu_fields_body(
+        self,
+        menu_id: int,
+        fields: tuple[str, ...],
+        encoding: str
+    ) -> tuple[bytes, str]:
+        """Тело ответа с выбранными полями меню"""
+        name = f'menu:{menu_id}'
+        body = await self.__redis_cli.get_body(name, encoding, fields)
+        if body is None:
+            row = await self.__menu_repository.\
+                get_menu_fields(menu_id, fields)
+            await self.__menu_repository.release()
+            variants = compression.encode_variants(
+                serializers.fieldset(row, fields)
+            )
+            await self.__redis_cli.set_bodies(name, variants, fields)
+            body = compression.pick_variant(variants, encoding)
+        return body
+
     async def create_menu(
         self,
         new_menu: MenuCreate,
     ) -> Menu:
         menu_obj = await self.__menu_repository.create_menu(new_menu)
-        self.__background_tasks.add_task(self.__redis_cli.delete_menu_list)
+        await outbox.after_write()
+        await versions.bump(menu_obj.id)
+        self.__background_tasks.add_task(
+            events.publish, 'menu', 'created', menu_obj.id, [menu_obj.id]
+        )
         return menu_obj
 
     async def get_menu_with_counts(self, menu_id: int) -> Menu:
@@ -46,9 +115,15 @@ class MenuService:
         if menu_obj is None:
             menu_obj = await self.__menu_repository.\
                 get_menu_with_counts(menu_id)
+            await self.__menu_repository.release()
             await self.__redis_cli.set_menu(menu_obj)
         return menu_obj
 
+    async def get_price_stats(self, menu_id: int) -> PriceStats:
+        price_stats = await self.__menu_repository.get_price_stats(menu_id)
+        await self.__menu_repository.release()
+        return price_stats
+
     async def update_menu_by_id(
         self,
         menu_id: int,
@@ -56,7 +131,11 @@ class MenuService:
     ) -> Menu:
         menu_obj = await self.__menu_repository.\
             update_menu_by_id(menu_id, menu)
-        self.__background_tasks.add_task(self.__redis_cli.delete_menu, menu_id)
+        await outbox.after_write()
+        await versions.bump(menu_id)
+        self.__background_tasks.add_task(
+            events.publish, 'menu', 'updated', menu_id, [menu_id]
+        )
         return menu_obj
 
     async def delete_menu_by_id(
@@ -64,4 +143,8 @@ class MenuService:
         menu_id,
     ) -> None:
         await self.__menu_repository.delete_menu_by_id(menu_id)
-        self.__background_tasks.add_task(self.__redis_cli.delete_menu, menu_id)
+        await outbox.after_write()
+        await versions.bump(menu_id)
+        self.__background_tasks.add_task(
+            events.publish, 'menu', 'deleted', menu_id, [menu_id]
+        )
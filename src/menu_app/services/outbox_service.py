@@ -0,0 +1,213 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+
+from redis.exceptions import RedisError
+from sqlalchemy import Row
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_INTERVAL,
+    OUTBOX_OVERFLOW,
+    OUTBOX_SETTLE_DELAY,
+)
+from database import AsyncSession
+from menu_app.redis_backend import RedisBackend
+from menu_app.repositories.import_repository import TouchedCache
+from menu_app.repositories.outbox_repository import OutboxRepository
+from menu_app.services.version_service import versions
+from metrics import OUTBOX_BACKLOG, OUTBOX_DISPATCHED, OUTBOX_LAG, OUTBOX_OVERFLOWS
+
+
+def coalesce(rows: Iterable[Row]) -> TouchedCache:
+    """
+    Объединяет записи outbox: каждый объект инвалидируется один раз,
+    подменю и блюда меню из menus и блюда подменю из submenus
+    уже покрыты инвалидацией родителя
+    """
+    touched = TouchedCache()
+    for menu_id, submenu_id, dish_id in rows:
+        if submenu_id is None:
+            touched.menus.add(menu_id)
+        elif dish_id is None:
+            touched.submenus[menu_id].add(submenu_id)
+        else:
+            touched.dishes[menu_id][submenu_id].add(dish_id)
+    for menu_id in touched.menus:
+        touched.submenus.pop(menu_id, None)
+        touched.dishes.pop(menu_id, None)
+    for menu_id, submenu_ids in touched.submenus.items():
+        dishes = touched.dishes.get(menu_id, {})
+        for submenu_id in submenu_ids:
+            dishes.pop(submenu_id, None)
+        if not dishes:
+            touched.dishes.pop(menu_id, None)
+    return touched
+
+
+class OutboxService:
+    """
+    Инвалидация кеша по outbox, который заполняют триггеры
+    (см. OUTBOX_DDL). Каждая запись обрабатывается дважды: сразу
+    и через settle_delay секунд, когда запросы, прочитавшие базу
+    до изменения, уже записали в кеш старые данные. Пачка отмечается
+    и удаляется в транзакции, которая подтверждается после удаления
+    из кеша, поэтому при ошибке Redis или падении процесса записи
+    обработает следующий проход. Работает вне запросов,
+    поэтому сама открывает сессии
+    """
+
+    def __init__(
+        self,
+        session_maker=AsyncSession,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        settle_delay: float = OUTBOX_SETTLE_DELAY,
+        overflow: int = OUTBOX_OVERFLOW
+    ) -> None:
+        self.__session_maker = session_maker
+        self.__batch_size = batch_size
+        self.__settle_delay = settle_delay
+        self.overflow_size = overflow
+        self.__redis_cli = RedisBackend()
+
+    async def drain(self) -> int:
+        """
+        Инвалидирует кеш всех новых изменений.
+        Возвращает количество обработанных записей
+        """
+        return await self.__dispatch(
+            'pending',
+            lambda repository: repository.claim_pending(self.__batch_size)
+        )
+
+    async def flush(self) -> int:
+        """
+        Инвалидирует кеш всех изменений, подтвержденных до вызова.
+        drain пропускает записи, которые уже разбирает другой процесс
+        или слушатель, и возвращается раньше, чем они удалены из кеша,
+        поэтому flush затем ждет commit их пачек. После flush можно
+        публиковать события: подписчик не прочитает старый кеш.
+        Возвращает количество обработанных записей
+        """
+        total = await self.drain()
+        return total + await self.__dispatch(
+            'pending',
+            lambda repository: repository.claim_pending(
+                self.__batch_size, wait=True
+            )
+        )
+
+    async def after_write(self) -> None:
+        """
+        Инвалидирует кеш записи API до ответа на нее (см. flush).
+        Запись уже подтверждена, поэтому ошибка базы или Redis
+        не превращает ответ в ошибку: записи останутся в outbox
+        до прохода диспетчера
+        """
+        try:
+            await self.flush()
+        except (OSError, SQLAlchemyError, RedisError):
+            pass
+
+    async def settle(self) -> int:
+        """
+        Повторно инвалидирует кеш изменений, обработанных больше
+        settle_delay секунд назад, и удаляет их записи.
+        Возвращает количество удаленных записей
+        """
+        return await self.__dispatch(
+            'settled',
+            lambda repository: repository.claim_settled(
+                self.__batch_size, self.__settle_delay
+            )
+        )
+
+    async def overflow(self) -> int:
+        """
+        Сбрасывает весь кеш каталога новым поколением ключей вместо
+        точечной инвалидации, когда изменений слишком много. Записи
+        отмечаются обработанными и через settle_delay проходят
+        повторную инвалидацию как обычно. Другие процессы переключаются
+        на новое поколение по уведомлению при commit (см. ListenerService).
+        Возвращает количество записей
+        """
+        async with self.__session_maker() as session:
+            repository = OutboxRepository(session)
+            count = await repository.claim_all()
+            if not count:
+                return 0
+            generation = await self.__redis_cli.bump_generation()
+            await repository.notify_generation(generation)
+            await versions.bump_all()
+            await repository.commit()
+        OUTBOX_OVERFLOWS.inc()
+        OUTBOX_DISPATCHED.labels('overflow').inc(count)
+        return count
+
+    async def catch_up(self) -> int:
+        """
+        Обрабатывает все новые записи: точечно или новым поколением
+        кеша, если их не меньше overflow_size
+        """
+        if await self.report_backlog() >= self.overflow_size:
+            return await self.overflow()
+        return await self.drain()
+
+    async def report_backlog(self) -> int:
+        """Обновляет метрики очереди, возвращает ее длину"""
+        async with self.__session_maker() as session:
+            count, lag = await OutboxRepository(session).get_backlog()
+        OUTBOX_BACKLOG.set(count)
+        OUTBOX_LAG.set(lag)
+        return count
+
+    async def run_forever(self) -> None:
+        """
+        Периодически обрабатывает outbox. Ошибка базы или Redis
+        не останавливает диспетчер: записи останутся до следующего прохода
+        """
+        while True:
+            try:
+                await self.catch_up()
+                await self.settle()
+            except (OSError, SQLAlchemyError, RedisError):
+                pass
+            await asyncio.sleep(OUTBOX_INTERVAL)
+
+    async def __dispatch(
+        self,
+        stage: str,
+        claim: Callable[[OutboxRepository], Awaitable[list[Row]]]
+    ) -> int:
+        total = 0
+        while True:
+            async with self.__session_maker() as session:
+                repository = OutboxRepository(session)
+                rows = await claim(repository)
+                if rows:
+                    await self.__invalidate(coalesce(rows))
+                    await repository.commit()
+            OUTBOX_DISPATCHED.labels(stage).inc(len(rows))
+            total += len(rows)
+            if len(rows) < self.__batch_size:
+                return total
+
+    async def __invalidate(self, touched: TouchedCache) -> None:
+        """
+        Удаляет объекты из кеша и увеличивает версии их меню:
+        ответ, собранный из старого кеша до удаления, не останется
+        с актуальной версией (см. VersionService.bump)
+        """
+        for menu_id in touched.menus:
+            await self.__redis_cli.delete_menu(menu_id)
+        for menu_id, submenu_ids in touched.submenus.items():
+            await self.__redis_cli.delete_submenus(menu_id, submenu_ids)
+        for menu_id, dishes in touched.dishes.items():
+            await self.__redis_cli.delete_dishes(menu_id, dishes)
+        for menu_id in sorted(
+            touched.menus | touched.submenus.keys() | touched.dishes.keys()
+        ):
+            await versions.bump(menu_id)
+
+
+outbox = OutboxService()
@@ -0,0 +1,58 @@
+import asyncio
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import PURGE_BATCH_SIZE, PURGE_INTERVAL
+from database import AsyncSession
+from menu_app.repositories.purge_repository import PurgeRepository
+from metrics import PURGE_LAG, PURGE_ROWS
+
+
+class PurgeService:
+    """
+    Фоновая очистка мягко удаленных меню и подменю.
+    Работает вне запросов, поэтому сама открывает сессии
+    """
+
+    def __init__(
+        self,
+        session_maker=AsyncSession,
+        batch_size: int = PURGE_BATCH_SIZE
+    ) -> None:
+        self.__session_maker = session_maker
+        self.__batch_size = batch_size
+
+    async def purge(self) -> int:
+        """
+        Удаляет все, что ждет очистки: сначала блюда, затем подменю
+        и меню. Возвращает количество удаленных строк
+        """
+        total = 0
+        async with self.__session_maker() as session:
+            repository = PurgeRepository(session)
+            steps = (
+                ('dish', repository.purge_dishes),
+                ('submenu', repository.purge_submenus),
+                ('menu', repository.purge_menus),
+            )
+            for table, purge_batch in steps:
+                while True:
+                    count = await purge_batch(self.__batch_size)
+                    PURGE_ROWS.labels(table).inc(count)
+                    total += count
+                    if count < self.__batch_size:
+                        break
+            PURGE_LAG.set(await repository.get_lag())
+        return total
+
+    async def run_forever(self) -> None:
+        """
+        Периодически запускает очистку. Ошибка базы не останавливает
+        очистку: недоделанное удалится на следующем проходе
+        """
+        while True:
+            try:
+                await self.purge()
+            except (OSError, SQLAlchemyError):
+                pass
+            await asyncio.sleep(PURGE_INTERVAL)
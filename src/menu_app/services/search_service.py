@@ -0,0 +1,43 @@
+from fastapi import Depends
+
+from menu_app.redis_backend import RedisBackend
+from menu_app.repositories.search_repository import SearchRepository
+from menu_app.schemas import SearchResult
+
+
+class SearchService:
+    """
+    Сервис поиска, объединяющий работу SearchRepository и RedisBackend
+    """
+
+    def __init__(
+        self,
+        search_repository: SearchRepository = Depends(SearchRepository),
+    ) -> None:
+        self.__search_repository = search_repository
+        self.__redis_cli = RedisBackend()
+
+    async def search(
+        self,
+        query: str,
+        limit: int,
+        offset: int
+    ) -> SearchResult:
+        # Регистр и лишние пробелы не влияют на поиск,
+        # поэтому такие запросы используют общий кеш
+        query = ' '.join(query.lower().split())
+        result = await self.__redis_cli.\
+            get_search_result(query, limit, offset)
+        if result is None:
+            hits = await self.__search_repository.\
+                search(query, limit + 1, offset)
+            await self.__search_repository.release()
+            result = SearchResult(
+                query=query,
+                limit=limit,
+                offset=offset,
+                has_more=len(hits) > limit,
+                items=hits[:limit],
+            )
+            await self.__redis_cli.set_search_result(result)
+        return result
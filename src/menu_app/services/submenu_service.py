@@ -1,8 +1,13 @@
 from fastapi import BackgroundTasks, Depends
 
+from menu_app import compression, serializers
 from menu_app.redis_backend import RedisBackend
 from menu_app.repositories.submenu_repository import SubMenuRepository
-from menu_app.schemas import SubMenuCreate
+from menu_app.schemas import BulkResult, PriceStats, SubMenuBulkUpdate, SubMenuCreate
+from menu_app.services.aggregate_service import aggregates
+from menu_app.services.event_service import events
+from menu_app.services.outbox_service import outbox
+from menu_app.services.version_service import versions
 from models.models import SubMenu
 
 
@@ -28,9 +33,58 @@ class SubMenuService:
         if submenu_list is None:
             submenu_list = await self.__submenu_repository.\
                 get_submenu_list_with_dishes_count(menu_id)
+            await self.__submenu_repository.release()
             await self.__redis_cli.set_submenu_list(submenu_list, menu_id)
         return submenu_list
 
+    async def get_submenu_list_body(
+        self,
+        menu_id: int,
+        encoding: str,
+        fields: tuple[str, ...] | None = None
+    ) -> tuple[bytes, str]:
+        """
+        Тело ответа со списком подменю в запрошенной кодировке.
+        Если заданы fields, из базы читаются только эти поля
+        """
+        name = f'submenu_list:{menu_id}'
+        body = await self.__redis_cli.get_body(name, encoding, fields)
+        if body is None:
+            if fields is None:
+                submenu_list = await self.\
+                    get_submenu_list_with_dishes_count(menu_id)
+                content = [serializers.submenu(obj) for obj in submenu_list]
+            else:
+                rows = await self.__submenu_repository.\
+                    get_submenu_list_fields(menu_id, fields)
+                await self.__submenu_repository.release()
+                content = [serializers.fieldset(row, fields) for row in rows]
+            variants = compression.encode_variants(content)
+            await self.__redis_cli.set_bodies(name, variants, fields)
+            body = compression.pick_variant(variants, encoding)
+        return body
+
+    async def get_submenu_fields_body(
+        self,
+        menu_id: int,
+        submenu_id: int,
+        fields: tuple[str, ...],
+        encoding: str
+    ) -> tuple[bytes, str]:
+        """Тело ответа с выбранными полями подменю"""
+        name = f'menu:{menu_id}:submenu:{submenu_id}'
+        body = await self.__redis_cli.get_body(name, encoding, fields)
+        if body is None:
+            row = await self.__submenu_repository.\
+                get_submenu_fields(menu_id, submenu_id, fields)
+            await self.__submenu_repository.release()
+            variants = compression.encode_variants(
+                serializers.fieldset(row, fields)
+            )
+            await self.__redis_cli.set_bodies(name, variants, fields)
+            body = compression.pick_variant(variants, encoding)
+        return body
+
     async def create_submenu(
         self,
         new_submenu: SubMenuCreate,
@@ -40,8 +94,11 @@ class SubMenuService:
             new_submenu,
             menu_id
         )
+        aggregates.schedule()
+        await outbox.after_write()
+        await versions.bump(menu_id)
         self.__background_tasks.add_task(
-            self.__redis_cli.delete_submenu, menu_id, submenu_obj.menu_id
+            events.publish, 'submenu', 'created', menu_id, [submenu_obj.id]
         )
         return submenu_obj
 
@@ -55,9 +112,52 @@ class SubMenuService:
         if submenu_obj is None:
             submenu_obj = await self.__submenu_repository.\
                 get_submenu_with_dishes_count(menu_id, submenu_id)
+            await self.__submenu_repository.release()
             await self.__redis_cli.set_submenu(submenu_obj)
         return submenu_obj
 
+    async def get_submenus_by_ids(
+        self,
+        menu_id: int,
+        submenu_ids: list[int]
+    ) -> list[SubMenu | None]:
+        """
+        Возвращает подменю в порядке submenu_ids, None - для ненайденных.
+        Кеш читается одной командой, промахи - одним запросом к базе
+        """
+        if not submenu_ids:
+            return []
+        unique_ids = list(dict.fromkeys(submenu_ids))
+        cached = await self.__redis_cli.get_submenus(menu_id, unique_ids)
+        found = {
+            submenu_id: submenu_obj
+            for submenu_id, submenu_obj in zip(unique_ids, cached)
+            if submenu_obj is not None
+        }
+        missing = [
+            submenu_id for submenu_id in unique_ids if submenu_id not in found
+        ]
+        if missing:
+            submenu_list = await self.__submenu_repository.\
+                get_submenus_by_ids(menu_id, missing)
+            await self.__submenu_repository.release()
+            if submenu_list:
+                await self.__redis_cli.set_submenus(submenu_list)
+            found.update(
+                (submenu_obj.id, submenu_obj) for submenu_obj in submenu_list
+            )
+        return [found.get(submenu_id) for submenu_id in submenu_ids]
+
+    async def get_price_stats(
+        self,
+        menu_id: int,
+        submenu_id: int
+    ) -> PriceStats:
+        price_stats = await self.__submenu_repository.\
+            get_price_stats(menu_id, submenu_id)
+        await self.__submenu_repository.release()
+        return price_stats
+
     async def update_submenu_by_id(
         self,
         menu_id: int,
@@ -66,8 +166,10 @@ class SubMenuService:
     ) -> SubMenu:
         submenu_obj = await self.__submenu_repository.\
             update_submenu_by_id(menu_id, submenu_id, item)
+        await outbox.after_write()
+        await versions.bump(menu_id)
         self.__background_tasks.add_task(
-            self.__redis_cli.delete_submenu, menu_id, submenu_id
+            events.publish, 'submenu', 'updated', menu_id, [submenu_id]
         )
         return submenu_obj
 
@@ -78,6 +180,56 @@ class SubMenuService:
     ) -> None:
         await self.__submenu_repository.\
             delete_submenu_by_id(menu_id, submenu_id)
+        aggregates.schedule()
+        await outbox.after_write()
+        await versions.bump(menu_id)
         self.__background_tasks.add_task(
-            self.__redis_cli.delete_submenu, menu_id, submenu_id
+            events.publish, 'submenu', 'deleted', menu_id, [submenu_id]
         )
+
+    async def create_submenu_bulk(
+        self,
+        menu_id: int,
+        items: list[SubMenuCreate],
+    ) -> BulkResult:
+        results, created = await self.__submenu_repository.\
+            create_submenu_bulk(menu_id, items)
+        if created:
+            aggregates.schedule()
+            await outbox.after_write()
+            await versions.bump(menu_id)
+            self.__background_tasks.add_task(
+                events.publish, 'submenu', 'created', menu_id, created
+            )
+        return BulkResult(items=results)
+
+    async def update_submenu_bulk(
+        self,
+        menu_id: int,
+        items: list[SubMenuBulkUpdate],
+    ) -> BulkResult:
+        results, updated = await self.__submenu_repository.\
+            update_submenu_bulk(menu_id, items)
+        if updated:
+            await outbox.after_write()
+            await versions.bump(menu_id)
+            self.__background_tasks.add_task(
+                events.publish, 'submenu', 'updated', menu_id, updated
+            )
+        return BulkResult(items=results)
+
+    async def delete_submenu_bulk(
+        self,
+        menu_id: int,
+        submenu_ids: list[int],
+    ) -> BulkResult:
+        results, deleted = await self.__submenu_repository.\
+            delete_submenu_bulk(menu_id, submenu_ids)
+        if deleted:
+            aggregates.schedule()
+            await outbox.after_write()
+            await versions.bump(menu_id)
+            self.__background_tasks.add_task(
+                events.publish, 'submenu', 'deleted', menu_id, deleted
+            )
+        return BulkResult(items=results)
@@ -0,0 +1,34 @@
+from menu_app.redis_backend import RedisBackend
+
+
+class VersionService:
+    """
+    Версии данных для условных GET-запросов. Версия каталога
+    увеличивается при каждом изменении, версия меню - при изменении
+    меню, его подменю и блюд, а также при пересчете количества
+    подменю и блюд в материализованных представлениях
+    """
+
+    async def get(self, menu_id: int | None = None) -> str:
+        """Версия каталога или меню menu_id"""
+        return await RedisBackend().get_version(menu_id)
+
+    async def bump(self, menu_id: int) -> None:
+        """
+        Увеличивает версию после записи в меню menu_id. Версия
+        увеличивается дважды: до ответа, чтобы клиент сразу после записи
+        не получил 304 с прежними данными, и после удаления устаревших
+        объектов из кеша (см. OutboxService), чтобы ответ, собранный
+        в промежутке из старого кеша, не остался с актуальной версией
+        """
+        await RedisBackend().incr_version(menu_id)
+
+    async def bump_all(self) -> None:
+        """
+        Увеличивает версии всех меню: после пересчета представлений
+        и после сброса всего кеша каталога
+        """
+        await RedisBackend().incr_version(aggregates=True)
+
+
+versions = VersionService()
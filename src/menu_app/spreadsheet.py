@@ -0,0 +1,144 @@
+import csv
+import io
+import itertools
+import tempfile
+import zlib
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+
+import anyio
+
+# Колонки файла каталога: одна строка - одно блюдо вместе с его подменю и меню.
+# Строки без блюда (или без подменю) описывают пустые подменю (или меню)
+COLUMNS = (
+    'menu_title',
+    'menu_description',
+    'submenu_title',
+    'submenu_description',
+    'dish_title',
+    'dish_description',
+    'dish_price',
+)
+
+MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'gz': 'application/gzip',
+}
+
+# Сколько строк csv или байт xlsx отдается одним куском
+CHUNK_ROWS = 1000
+CHUNK_SIZE = 64 * 1024
+
+
+def read_rows(path: str | Path) -> Iterator[dict[str, str]]:
+    """
+    Построчно читает файл каталога в формате csv или xlsx,
+    не загружая его целиком в память
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.xlsx':
+        yield from _read_xlsx(path)
+    else:
+        yield from _read_csv(path)
+
+
+async def read_rows_in_thread(path: str | Path) -> AsyncIterator[dict[str, str]]:
+    """
+    read_rows для цикла событий: файл разбирается в отдельном потоке
+    пачками по CHUNK_ROWS строк, и разбор большого xlsx не останавливает
+    обработку других запросов
+    """
+    rows = read_rows(path)
+    while batch := await anyio.to_thread.run_sync(_next_batch, rows):
+        for row in batch:
+            yield row
+
+
+def _next_batch(rows: Iterator[dict[str, str]]) -> list[dict[str, str]]:
+    return list(itertools.islice(rows, CHUNK_ROWS))
+
+
+def _read_csv(path: Path) -> Iterator[dict[str, str]]:
+    with path.open(newline='', encoding='utf-8-sig') as file:
+        for row in csv.DictReader(file):
+            yield _normalize(row)
+
+
+def _read_xlsx(path: Path) -> Iterator[dict[str, str]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() for cell in next(rows, ())]
+        for values in rows:
+            yield _normalize(dict(zip(header, values)))
+    finally:
+        workbook.close()
+
+
+def _normalize(row: dict) -> dict[str, str]:
+    """Оставляет известные колонки, пустые ячейки заменяет пустой строкой"""
+    return {
+        column: '' if row.get(column) is None else str(row[column]).strip()
+        for column in COLUMNS
+    }
+
+
+async def write_csv(rows: AsyncIterator[tuple]) -> AsyncIterator[bytes]:
+    """Построчно пишет каталог в csv, отдавая его кусками"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    written = 0
+    async for row in rows:
+        writer.writerow(row)
+        written += 1
+        if written % CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+async def write_xlsx(rows: AsyncIterator[tuple]) -> AsyncIterator[bytes]:
+    """
+    Пишет каталог в xlsx в режиме write_only:
+    строки сразу сбрасываются во временный файл, а не копятся в памяти.
+    Запись строк пачками по CHUNK_ROWS, упаковка zip и чтение файла идут
+    в отдельном потоке и не останавливают обработку других запросов.
+    zip собирается только при сохранении, поэтому первый кусок
+    отдается после чтения всего каталога
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    batch: list[tuple] = [COLUMNS]
+    async for row in rows:
+        batch.append(row)
+        if len(batch) == CHUNK_ROWS:
+            await anyio.to_thread.run_sync(_append_rows, sheet, batch)
+            batch = []
+    await anyio.to_thread.run_sync(_append_rows, sheet, batch)
+    with tempfile.TemporaryFile() as file:
+        await anyio.to_thread.run_sync(workbook.save, file)
+        file.seek(0)
+        while chunk := await anyio.to_thread.run_sync(file.read, CHUNK_SIZE):
+            yield chunk
+
+
+def _append_rows(sheet, rows: list[tuple]) -> None:
+    for row in rows:
+        sheet.append(row)
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Сжимает поток байт в формат gzip на лету"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,249 @@
+"""
+Время обработки запроса по слоям: Server-Timing и журнал.
+
+TimingMiddleware для доли SERVER_TIMING_SAMPLE запросов создает
+RequestTiming в контекстной переменной, а хуки слоев добавляют в него
+свое время: очередь AdmissionMiddleware (queue), задержка цикла событий
+(loop), команды Redis (redis), запросы SQL (db), работа FastAPI вне
+эндпоинта - проверка запроса, зависимости и сериализация response_model
+(fastapi), сериализация тел для кеша (serialize) и сжатие (compress).
+Остаток до общего времени - код эндпоинтов и сервисов (app).
+Итоги уходят в заголовок Server-Timing и строкой JSON в журнал
+server_timing. Без выборки хук только читает контекстную переменную
+"""
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import random
+import sys
+import time
+from collections.abc import Callable, Coroutine, Iterator
+from typing import Any
+
+import orjson
+from fastapi import Request
+from fastapi.routing import APIRoute
+from redis import asyncio as aioredis
+from redis.asyncio.client import Pipeline
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import SERVER_TIMING_SAMPLE
+
+# Слои в порядке вывода; app и total вычисляются
+LAYERS = ('queue', 'loop', 'db', 'redis', 'fastapi', 'serialize', 'compress')
+# Слои, для которых считается и число обращений
+COUNTED = ('db', 'redis')
+
+logger = logging.getLogger('server_timing')
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RequestTiming:
+    """Время и число обращений по слоям для одного запроса"""
+
+    __slots__ = ('started', 'durations', 'counts')
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.durations = dict.fromkeys(LAYERS, 0.0)
+        self.counts = dict.fromkeys(COUNTED, 0)
+
+    def add(self, layer: str, seconds: float) -> None:
+        self.durations[layer] += seconds
+        if layer in self.counts:
+            self.counts[layer] += 1
+
+    def recorded(self) -> float:
+        """Сумма времени слоев, кроме fastapi: его вычисляет TimedRoute"""
+        return sum(self.durations.values()) - self.durations['fastapi']
+
+    def summary(self) -> dict[str, float]:
+        """Время слоев в мс вместе с app и total"""
+        total = time.perf_counter() - self.started
+        durations = {
+            **self.durations,
+            'app': max(total - sum(self.durations.values()), 0.0),
+            'total': total,
+        }
+        return {
+            layer: round(seconds * 1e3, 2)
+            for layer, seconds in durations.items()
+        }
+
+    def header(self) -> str:
+        """Значение заголовка Server-Timing"""
+        metrics = []
+        for layer, duration in self.summary().items():
+            if layer in self.counts:
+                metrics.append(
+                    f'{layer};dur={duration};desc="{self.counts[layer]}"'
+                )
+            elif duration or layer in ('app', 'total'):
+                metrics.append(f'{layer};dur={duration}')
+        return ', '.join(metrics)
+
+
+current: contextvars.ContextVar[RequestTiming | None] = \
+    contextvars.ContextVar('server_timing', default=None)
+
+
+@contextlib.contextmanager
+def measure(layer: str) -> Iterator[None]:
+    """Добавляет время блока к слою layer запроса из выборки"""
+    timing = current.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(layer, time.perf_counter() - started)
+
+
+def _exclusive_time(coroutine_function: Callable, sign: int) -> Callable:
+    """
+    Добавляет к слою fastapi со знаком sign время вызова
+    без времени учтенных в нем слоев
+    """
+    @functools.wraps(coroutine_function)
+    async def wrapper(*args, **kwargs):
+        timing = current.get()
+        if timing is None:
+            return await coroutine_function(*args, **kwargs)
+        started, recorded = time.perf_counter(), timing.recorded()
+        try:
+            return await coroutine_function(*args, **kwargs)
+        finally:
+            timing.durations['fastapi'] += sign * (
+                time.perf_counter() - started - (timing.recorded() - recorded)
+            )
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Маршрут, который относит к слою fastapi время обработчика FastAPI
+    без эндпоинта: разбор и проверку запроса, зависимости, проверку
+    и сериализацию ответа по response_model
+    """
+
+    def get_route_handler(
+        self
+    ) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        if asyncio.iscoroutinefunction(self.dependant.call):
+            self.dependant.call = _exclusive_time(self.dependant.call, -1)
+        return _exclusive_time(super().get_route_handler(), 1)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current.get() is not None:
+        context._server_timing_started = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timing = current.get()
+    if timing is not None and hasattr(context, '_server_timing_started'):
+        timing.add('db', time.perf_counter() - context._server_timing_started)
+
+
+class TimedPipeline(Pipeline):
+    """Конвейер Redis: время выполнения всех команд - одно обращение"""
+
+    async def execute(self, raise_on_error: bool = True):
+        timing = current.get()
+        if timing is None:
+            return await super().execute(raise_on_error)
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            timing.add('redis', time.perf_counter() - started)
+
+
+class TimedRedis(aioredis.Redis):
+    """Клиент Redis, который учитывает время команд в слое redis"""
+
+    async def execute_command(self, *args, **options):
+        timing = current.get()
+        if timing is None:
+            return await super().execute_command(*args, **options)
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            timing.add('redis', time.perf_counter() - started)
+
+    def pipeline(
+        self,
+        transaction: bool = True,
+        shard_hint: str | None = None
+    ) -> TimedPipeline:
+        return TimedPipeline(
+            self.connection_pool, self.response_callbacks,
+            transaction, shard_hint
+        )
+
+
+class TimingMiddleware:
+    """
+    Измеряет долю sample запросов. Заголовок Server-Timing содержит
+    время до начала ответа, строка журнала - до его конца, вместе
+    с потоковой частью ответа
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample: float = SERVER_TIMING_SAMPLE
+    ) -> None:
+        self.app = app
+        self.sample = sample
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        sampled = bool(self.sample) and scope['type'] == 'http'
+        if not sampled or random.random() >= self.sample:
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = current.set(timing)
+        status = None
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                MutableHeaders(scope=message).append(
+                    'Server-Timing', timing.header()
+                )
+            await send(message)
+
+        try:
+            # Сколько ждут своей очереди готовые к выполнению задачи
+            with measure('loop'):
+                await asyncio.sleep(0)
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current.reset(token)
+            route = scope.get('route')
+            logger.info(orjson.dumps({
+                'method': scope['method'],
+                'path': scope['path'],
+                'route': getattr(route, 'path', None),
+                'status': status,
+                **{f'{layer}_ms': value for layer, value in timing.summary().items()},
+                **{f'{layer}_count': count for layer, count in timing.counts.items()},
+            }).decode())
@@ -0,0 +1,172 @@
+"""
+Метрики приложения в формате Prometheus.
+Отдаются по адресу /metrics. Под gunicorn (задан каталог
+PROMETHEUS_MULTIPROC_DIR) метрики всех рабочих процессов пишутся
+в файлы и собираются вместе, для показателей задан способ сложения
+"""
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    make_asgi_app,
+    multiprocess,
+)
+
+DB_ROUTE = Counter(
+    'db_route',
+    'Запросы к базе данных по месту выполнения и причине выбора',
+    ['target', 'reason'],
+)
+DB_REPLICA_FALLBACK = Counter(
+    'db_replica_fallback',
+    'Чтения, отправленные в основную базу из-за недоступности реплик',
+    ['reason'],
+)
+DB_REPLICA_LAG = Gauge(
+    'db_replica_lag_seconds',
+    'Отставание реплики от основной базы',
+    ['replica'],
+    multiprocess_mode='livemax',
+)
+DB_POOL_CHECKOUT = Histogram(
+    'db_pool_checkout_seconds',
+    'Время получения соединения из пула, включая ожидание свободного',
+    ['pool'],
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_IN_USE = Gauge(
+    'db_pool_in_use',
+    'Соединения, выданные из пула',
+    ['pool'],
+    multiprocess_mode='livesum',
+)
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow',
+    'Соединения, открытые сверх размера пула',
+    ['pool'],
+    multiprocess_mode='livesum',
+)
+PURGE_ROWS = Counter(
+    'purge_rows',
+    'Строки, удаленные фоновой очисткой мягко удаленных записей',
+    ['table'],
+)
+PURGE_LAG = Gauge(
+    'purge_lag_seconds',
+    'Сколько ждет очистки самая старая мягко удаленная запись',
+    multiprocess_mode='livemax',
+)
+OUTBOX_BACKLOG = Gauge(
+    'cache_outbox_backlog',
+    'Изменения, кеш которых еще не инвалидирован',
+    multiprocess_mode='livemax',
+)
+OUTBOX_LAG = Gauge(
+    'cache_outbox_lag_seconds',
+    'Сколько ждет инвалидации кеша самое старое изменение',
+    multiprocess_mode='livemax',
+)
+OUTBOX_DISPATCHED = Counter(
+    'cache_outbox_dispatched',
+    'Записи outbox, обработанные при первой инвалидации кеша '
+    'и при повторной после задержки',
+    ['stage'],
+)
+OUTBOX_OVERFLOWS = Counter(
+    'cache_outbox_overflows',
+    'Сбросы всего кеша каталога новым поколением из-за большого '
+    'числа изменений',
+)
+LISTENER_CONNECTED = Gauge(
+    'cache_listener_connected',
+    'Процессы, подключенные к уведомлениям PostgreSQL об изменениях',
+    multiprocess_mode='livesum',
+)
+LISTENER_RECONNECTS = Counter(
+    'cache_listener_reconnects',
+    'Повторные подключения слушателя уведомлений после ошибок',
+)
+LISTENER_NOTIFICATIONS = Counter(
+    'cache_listener_notifications',
+    'Полученные уведомления PostgreSQL об изменениях каталога',
+)
+CACHE_AUDIT_CHECKED = Counter(
+    'cache_audit_checked',
+    'Ключи кеша каталога, сверенные с базой, по виду ключа',
+    ['family'],
+)
+CACHE_AUDIT_DRIFT = Counter(
+    'cache_audit_drift',
+    'Ключи кеша каталога, расходящиеся с базой, по виду ключа: '
+    'значение отличается или объекта в базе уже нет',
+    ['family', 'kind'],
+)
+CACHE_AUDIT_DRIFT_RATIO = Gauge(
+    'cache_audit_drift_ratio',
+    'Доля расходящихся с базой ключей кеша в последней проверке',
+    ['family'],
+    multiprocess_mode='livemax',
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight',
+    'Запросы, которые обрабатываются сейчас, по виду запроса',
+    ['route_class'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_QUEUED = Gauge(
+    'admission_queued',
+    'Запросы, которые ждут в очереди, по виду запроса',
+    ['route_class'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_LIMIT = Gauge(
+    'admission_limit',
+    'Ограничение одновременных запросов по виду запроса',
+    ['route_class'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_SHED = Counter(
+    'admission_shed',
+    'Запросы, отклоненные с 503 из-за перегрузки: очередь заполнена '
+    'или время ожидания в ней истекло',
+    ['route_class', 'reason'],
+)
+AGGREGATES_REFRESH = Histogram(
+    'aggregates_refresh_seconds',
+    'Время пересчета материализованных представлений с количеством '
+    'подменю и блюд',
+    buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60),
+)
+COMPRESSED_RESPONSES = Counter(
+    'compressed_responses',
+    'Сжатые ответы по кодировке и способу сжатия: '
+    'заранее при записи в кеш или на лету',
+    ['encoding', 'source'],
+)
+EVENTS_SUBSCRIBERS = Gauge(
+    'events_subscribers',
+    'Подписчики ленты изменений каталога',
+    multiprocess_mode='livesum',
+)
+EVENTS_DROPPED = Counter(
+    'events_dropped_subscribers',
+    'Подписчики ленты изменений, отключенные из-за переполнения очереди '
+    'или потери подключения к Redis',
+)
+NOT_MODIFIED = Counter(
+    'not_modified_responses',
+    'Ответы 304 на условные GET-запросы по версии каталога или меню',
+    ['scope'],
+)
+
+
+def make_metrics_app():
+    """Приложение /metrics: метрики процесса или всех рабочих процессов"""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return make_asgi_app()
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return make_asgi_app(registry)
@@ -1,17 +1,97 @@
-from sqlalchemy import Column, ForeignKey, Integer, String
-from sqlalchemy.orm import DeclarativeBase, relationship
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    event,
+    func,
+    text,
+)
+from sqlalchemy.orm import DeclarativeBase, deferred, relationship
 
 
 class Base(DeclarativeBase):
     pass
 
 
+# Триграммные индексы для поиска по названию и описанию
+event.listen(
+    Base.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+)
+
+
+def trgm_index(table: str, column: str) -> Index:
+    return Index(
+        f'ix_{table}_{column}_trgm',
+        column,
+        postgresql_using='gin',
+        postgresql_ops={column: 'gin_trgm_ops'}
+    )
+
+
+# Меню и подменю удаляются мягко: запись получает deleted_at,
+# а затем вместе с дочерними записями удаляется фоновой очисткой
+def alive_unique_index(table: str, column: str) -> Index:
+    """Уникальность среди неудаленных записей"""
+    return Index(
+        f'uq_{table}_{column}',
+        column,
+        unique=True,
+        postgresql_where=text('deleted_at IS NULL')
+    )
+
+
+def deleted_index(table: str) -> Index:
+    """Индекс только по удаленным записям, которые ждут очистки"""
+    return Index(
+        f'ix_{table}_deleted_at',
+        'deleted_at',
+        postgresql_where=text('deleted_at IS NOT NULL')
+    )
+
+
+# Версия строки - id транзакции, которая ее записала (см. CHANGES_DDL).
+# Столбцы версии отложены: обычные чтения их не загружают
+def version_column() -> Column:
+    return deferred(Column(BigInteger, nullable=False, server_default='0'))
+
+
+def updated_at_column() -> Column:
+    return deferred(Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    ))
+
+
+def version_index(table: str) -> Index:
+    """Индекс для чтения изменений после версии по порядку"""
+    return Index(f'ix_{table}_version', 'version', 'id')
+
+
 class Menu(Base):
     __tablename__ = 'menu'
+    __table_args__ = (
+        alive_unique_index('menu', 'title'),
+        deleted_index('menu'),
+        version_index('menu'),
+        trgm_index('menu', 'title'),
+        trgm_index('menu', 'description'),
+    )
 
     id = Column(Integer, primary_key=True)
-    title = Column(String, nullable=False, unique=True)
+    title = Column(String, nullable=False)
     description = Column(String)
+    deleted_at = Column(DateTime(timezone=True))
+    version = version_column()
+    updated_at = updated_at_column()
     submenus = relationship(
         'SubMenu',
         back_populates='menu',
@@ -23,12 +103,22 @@ class Menu(Base):
 
 class SubMenu(Base):
     __tablename__ = 'submenu'
+    __table_args__ = (
+        alive_unique_index('submenu', 'title'),
+        deleted_index('submenu'),
+        version_index('submenu'),
+        trgm_index('submenu', 'title'),
+        trgm_index('submenu', 'description'),
+    )
 
     id = Column(Integer, primary_key=True)
-    title = Column(String, nullable=False, unique=True)
+    title = Column(String, nullable=False)
     description = Column(String)
+    deleted_at = Column(DateTime(timezone=True))
+    version = version_column()
+    updated_at = updated_at_column()
     menu = relationship('Menu', back_populates='submenus')
-    menu_id = Column(Integer, ForeignKey('menu.id'))
+    menu_id = Column(Integer, ForeignKey('menu.id'), index=True)
     dishes = relationship(
         'Dish',
         back_populates='submenu',
@@ -38,10 +128,336 @@ class SubMenu(Base):
 
 class Dish(Base):
     __tablename__ = 'dish'
+    __table_args__ = (
+        trgm_index('dish', 'title'),
+        trgm_index('dish', 'description'),
+        version_index('dish'),
+    )
 
     id = Column(Integer, primary_key=True)
     title = Column(String, nullable=False, unique=True)
     description = Column(String)
-    price = Column(String, nullable=False)
+    price = Column(Numeric(12, 2), nullable=False)
+    version = version_column()
+    updated_at = updated_at_column()
     submenu = relationship('SubMenu', back_populates='dishes')
-    submenu_id = Column(Integer, ForeignKey('submenu.id'))
+    submenu_id = Column(Integer, ForeignKey('submenu.id'), index=True)
+
+
+class Tombstone(Base):
+    """Удаление меню, подменю или блюда для ленты изменений"""
+    __tablename__ = 'tombstone'
+    __table_args__ = (
+        version_index('tombstone'),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    entity = Column(String, nullable=False)
+    object_id = Column(Integer, nullable=False)
+    menu_id = Column(Integer, nullable=False)
+    submenu_id = Column(Integer)
+    version = Column(BigInteger, nullable=False)
+    deleted_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+# Лента изменений. Триггеры записывают в version id пишущей транзакции
+# при любой вставке и изменении строки, в том числе из пакетных запросов
+# и импорта, а удаления записывают в tombstone: мягкие удаления меню
+# и подменю - сразу, удаления блюд - если их подменю и меню не удалены.
+# Удаление потомков удаленного меню или подменю следует из удаления
+# родителя, поэтому очистка в ленту не пишет
+CHANGES_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION catalogue_touch() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.version := pg_current_xact_id()::text::bigint;
+        NEW.updated_at := now();
+        RETURN NEW;
+    END $$
+    """,
+    *(
+        f"""
+        CREATE TRIGGER {table}_touch BEFORE INSERT OR UPDATE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION catalogue_touch()
+        """
+        for table in ('menu', 'submenu', 'dish')
+    ),
+    """
+    CREATE OR REPLACE FUNCTION catalogue_soft_delete() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        -- Аргумент триггера - столбец с id меню
+        INSERT INTO tombstone (entity, object_id, menu_id, version)
+        VALUES (
+            TG_TABLE_NAME, NEW.id,
+            (to_jsonb(NEW) ->> TG_ARGV[0])::integer, NEW.version
+        );
+        RETURN NULL;
+    END $$
+    """,
+    *(
+        f"""
+        CREATE TRIGGER {table}_soft_delete AFTER UPDATE OF deleted_at
+        ON {table} FOR EACH ROW
+        WHEN (OLD.deleted_at IS NULL AND NEW.deleted_at IS NOT NULL)
+        EXECUTE FUNCTION catalogue_soft_delete('{menu_column}')
+        """
+        for table, menu_column in (('menu', 'id'), ('submenu', 'menu_id'))
+    ),
+    """
+    CREATE OR REPLACE FUNCTION dish_delete() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO tombstone (entity, object_id, menu_id, submenu_id, version)
+        SELECT 'dish', deleted.id, submenu.menu_id, submenu.id,
+               pg_current_xact_id()::text::bigint
+        FROM deleted
+        JOIN submenu ON submenu.id = deleted.submenu_id
+        JOIN menu ON menu.id = submenu.menu_id
+        WHERE submenu.deleted_at IS NULL AND menu.deleted_at IS NULL;
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE TRIGGER dish_delete AFTER DELETE ON dish
+    REFERENCING OLD TABLE AS deleted
+    FOR EACH STATEMENT EXECUTE FUNCTION dish_delete()
+    """,
+)
+
+for statement in CHANGES_DDL:
+    event.listen(Base.metadata, 'after_create', DDL(statement))
+
+
+class CacheOutbox(Base):
+    """
+    Объект, кеш которого устарел: меню (submenu_id и dish_id пустые),
+    подменю (dish_id пустой) или блюдо
+    """
+    __tablename__ = 'cache_outbox'
+
+    id = Column(BigInteger, primary_key=True)
+    menu_id = Column(Integer, nullable=False)
+    submenu_id = Column(Integer)
+    dish_id = Column(Integer)
+    created_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    # Время первой инвалидации. Запись удаляется после второй,
+    # см. OutboxService
+    dispatched_at = Column(DateTime(timezone=True))
+
+
+# Outbox инвалидации кеша. Триггеры записывают затронутые объекты
+# в той же транзакции, что и изменение, поэтому инвалидация
+# не теряется, если процесс завершится после commit, и не происходит
+# для отмененной транзакции. Потомки удаленных меню и подменю
+# не записываются: их покрывает запись родителя, а очистка удаленных
+# записей кеш не трогает. Перенесенное подменю или блюдо записывается
+# и под прежним родителем
+OUTBOX_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION menu_outbox() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO cache_outbox (menu_id)
+            SELECT id FROM old_rows WHERE deleted_at IS NULL;
+        ELSE
+            INSERT INTO cache_outbox (menu_id) SELECT id FROM new_rows;
+        END IF;
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION submenu_outbox() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO cache_outbox (menu_id, submenu_id)
+            SELECT old_rows.menu_id, old_rows.id
+            FROM old_rows JOIN menu ON menu.id = old_rows.menu_id
+            WHERE old_rows.deleted_at IS NULL AND menu.deleted_at IS NULL;
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            INSERT INTO cache_outbox (menu_id, submenu_id)
+            SELECT old_rows.menu_id, old_rows.id
+            FROM old_rows
+            JOIN new_rows ON new_rows.id = old_rows.id
+            JOIN menu ON menu.id = old_rows.menu_id
+            WHERE old_rows.menu_id IS DISTINCT FROM new_rows.menu_id
+                AND menu.deleted_at IS NULL;
+        END IF;
+        INSERT INTO cache_outbox (menu_id, submenu_id)
+        SELECT new_rows.menu_id, new_rows.id
+        FROM new_rows JOIN menu ON menu.id = new_rows.menu_id
+        WHERE menu.deleted_at IS NULL;
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dish_outbox() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            INSERT INTO cache_outbox (menu_id, submenu_id, dish_id)
+            SELECT submenu.menu_id, submenu.id, old_rows.id
+            FROM old_rows
+            JOIN submenu ON submenu.id = old_rows.submenu_id
+            JOIN menu ON menu.id = submenu.menu_id
+            WHERE submenu.deleted_at IS NULL AND menu.deleted_at IS NULL;
+            RETURN NULL;
+        END IF;
+        IF TG_OP = 'UPDATE' THEN
+            INSERT INTO cache_outbox (menu_id, submenu_id, dish_id)
+            SELECT submenu.menu_id, submenu.id, old_rows.id
+            FROM old_rows
+            JOIN new_rows ON new_rows.id = old_rows.id
+            JOIN submenu ON submenu.id = old_rows.submenu_id
+            JOIN menu ON menu.id = submenu.menu_id
+            WHERE old_rows.submenu_id IS DISTINCT FROM new_rows.submenu_id
+                AND submenu.deleted_at IS NULL AND menu.deleted_at IS NULL;
+        END IF;
+        INSERT INTO cache_outbox (menu_id, submenu_id, dish_id)
+        SELECT submenu.menu_id, submenu.id, new_rows.id
+        FROM new_rows
+        JOIN submenu ON submenu.id = new_rows.submenu_id
+        JOIN menu ON menu.id = submenu.menu_id
+        WHERE submenu.deleted_at IS NULL AND menu.deleted_at IS NULL;
+        RETURN NULL;
+    END $$
+    """,
+    # Триггеры с таблицами переходов - на каждое событие отдельно
+    *(
+        f"""
+        CREATE TRIGGER {table}_outbox_{operation} AFTER {operation} ON {table}
+        REFERENCING {transition_tables}
+        FOR EACH STATEMENT EXECUTE FUNCTION {table}_outbox()
+        """
+        for table in ('menu', 'submenu', 'dish')
+        for operation, transition_tables in (
+            ('insert', 'NEW TABLE AS new_rows'),
+            ('update', 'OLD TABLE AS old_rows NEW TABLE AS new_rows'),
+            ('delete', 'OLD TABLE AS old_rows'),
+        )
+    ),
+)
+
+for statement in OUTBOX_DDL:
+    event.listen(Base.metadata, 'after_create', DDL(statement))
+
+
+# Уведомление о новых записях outbox в канал cache_outbox
+# (см. ListenerService), отправляется при commit. Содержит объекты
+# через запятую: меню, меню:подменю или меню:подменю:блюдо, а если
+# их слишком много для уведомления (до 8000 байт) - * и их количество
+NOTIFY_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION cache_outbox_notify() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        changed integer;
+        payload text;
+    BEGIN
+        SELECT count(*) INTO changed FROM new_rows;
+        IF changed = 0 THEN
+            RETURN NULL;
+        END IF;
+        IF changed <= 1000 THEN
+            SELECT string_agg(
+                concat_ws(':', menu_id, submenu_id, dish_id), ',' ORDER BY id
+            ) INTO payload
+            FROM new_rows;
+        END IF;
+        IF payload IS NULL OR octet_length(payload) >= 8000 THEN
+            payload := '*' || changed;
+        END IF;
+        PERFORM pg_notify('cache_outbox', payload);
+        RETURN NULL;
+    END $$
+    """,
+    """
+    CREATE TRIGGER cache_outbox_notify AFTER INSERT ON cache_outbox
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION cache_outbox_notify()
+    """,
+)
+
+for statement in NOTIFY_DDL:
+    event.listen(Base.metadata, 'after_create', DDL(statement))
+
+
+# Материализованные представления с количеством подменю и блюд
+# и статистикой цен блюд.
+# Пересчитываются фоном после изменений (AGGREGATES_MATVIEW).
+# Таблицы для запросов описаны в отдельных метаданных views, чтобы
+# create_all не создал их как обычные таблицы: сами представления
+# создает DDL after_create ниже
+MENU_STATS_QUERY = """
+    SELECT menu.id AS menu_id,
+           count(DISTINCT submenu.id) AS submenus_count,
+           count(dish.id) AS dishes_count,
+           min(dish.price) AS min_price,
+           max(dish.price) AS max_price,
+           round(avg(dish.price), 2) AS avg_price
+    FROM menu
+    LEFT JOIN submenu
+        ON submenu.menu_id = menu.id AND submenu.deleted_at IS NULL
+    LEFT JOIN dish ON dish.submenu_id = submenu.id
+    WHERE menu.deleted_at IS NULL
+    GROUP BY menu.id
+"""
+
+SUBMENU_STATS_QUERY = """
+    SELECT submenu.id AS submenu_id,
+           count(dish.id) AS dishes_count,
+           min(dish.price) AS min_price,
+           max(dish.price) AS max_price,
+           round(avg(dish.price), 2) AS avg_price
+    FROM submenu
+    LEFT JOIN dish ON dish.submenu_id = submenu.id
+    WHERE submenu.deleted_at IS NULL
+    GROUP BY submenu.id
+"""
+
+views = MetaData()
+
+menu_stats = Table(
+    'menu_stats',
+    views,
+    Column('menu_id', Integer, primary_key=True),
+    Column('submenus_count', Integer),
+    Column('dishes_count', Integer),
+    Column('min_price', Numeric(12, 2)),
+    Column('max_price', Numeric(12, 2)),
+    Column('avg_price', Numeric(12, 2)),
+)
+
+submenu_stats = Table(
+    'submenu_stats',
+    views,
+    Column('submenu_id', Integer, primary_key=True),
+    Column('dishes_count', Integer),
+    Column('min_price', Numeric(12, 2)),
+    Column('max_price', Numeric(12, 2)),
+    Column('avg_price', Numeric(12, 2)),
+)
+
+for view, query, key in (
+    (menu_stats, MENU_STATS_QUERY, 'menu_id'),
+    (submenu_stats, SUBMENU_STATS_QUERY, 'submenu_id'),
+):
+    # Уникальный индекс нужен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+    event.listen(Base.metadata, 'after_create', DDL(
+        f'CREATE MATERIALIZED VIEW {view.name} AS {query}'
+    ))
+    event.listen(Base.metadata, 'after_create', DDL(
+        f'CREATE UNIQUE INDEX uq_{view.name}_{key} ON {view.name} ({key})'
+    ))
+    event.listen(Base.metadata, 'before_drop', DDL(
+        f'DROP MATERIALIZED VIEW IF EXISTS {view.name}'
+    ))
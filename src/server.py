@@ -0,0 +1,31 @@
+"""
+Рабочий процесс gunicorn: uvicorn с циклом событий uvloop
+и разбором HTTP на httptools.
+
+Запуск из директории src (настройки в gunicorn.conf.py):
+    gunicorn main:app
+"""
+from uvicorn.workers import UvicornWorker as BaseUvicornWorker
+
+
+class UvicornWorker(BaseUvicornWorker):
+    """
+    Реализации цикла событий и протокола заданы явно: без uvloop
+    или httptools процесс не стартует, а не переходит молча
+    на медленные asyncio и h11. Ошибка при старте приложения
+    (lifespan) тоже останавливает процесс
+    """
+
+    CONFIG_KWARGS = {
+        'loop': 'uvloop',
+        'http': 'httptools',
+        'lifespan': 'on',
+    }
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # Запросы, которые не закончились за graceful_timeout
+        # (например, ленты событий), отменяются, и приложение
+        # успевает закрыться до того, как мастер убьет процесс
+        self.config.timeout_graceful_shutdown = \
+            max(self.cfg.graceful_timeout - 1, 0)
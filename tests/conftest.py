@@ -1,4 +1,5 @@
 import asyncio
+from collections.abc import Awaitable, Callable
 from typing import AsyncGenerator
 
 import pytest
@@ -9,9 +10,10 @@ from sqlalchemy.orm import close_all_sessions, sessionmaker
 from sqlalchemy.pool import NullPool
 
 from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER, MODE
-from src.database import get_async_session
+from src.database import LazySession, get_async_session
 from src.main import app
 from src.menu_app.redis_backend import RedisBackend
+from src.menu_app.services.purge_service import PurgeService
 from src.models.models import Base, Dish, Menu, SubMenu
 
 DATABASE_URL_TEST =\
@@ -24,8 +26,11 @@ metadata.bind = engine_test
 
 
 async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+    session = LazySession(async_session_maker)
+    try:
         yield session
+    finally:
+        await session.close()
 
 app.dependency_overrides[get_async_session] = override_get_async_session
 
@@ -44,6 +49,16 @@ async def setup_db() -> None:
         await conn.run_sync(metadata.drop_all)
 
 
+@pytest.fixture(autouse=True, scope='module')
+async def purge_deleted() -> None:
+    """
+    Удаления мягкие, поэтому после модуля удаленные записи очищаются,
+    иначе фикстуры ниже найдут их вместе с новыми
+    """
+    yield
+    await PurgeService(async_session_maker).purge()
+
+
 @pytest.fixture(scope='module')
 async def current_menu() -> Menu:
     session_generator = override_get_async_session()
@@ -71,6 +86,65 @@ async def current_dish():
     await session.close()
 
 
+@pytest.fixture(scope='module')
+async def make_catalogue(
+    client: AsyncClient
+) -> AsyncGenerator[Callable[..., Awaitable[dict]], None]:
+    """
+    Фабрика каталога: создает через API меню с подменю и блюдами.
+    Созданные меню удаляются после модуля
+    """
+    menus = []
+
+    def created_ids(response) -> list[str]:
+        """id созданных объектов, ошибка - если создано не все"""
+        assert response.status_code == 200, response.text
+        items = response.json()['items']
+        assert [item['status'] for item in items] == \
+            ['created'] * len(items), items
+        return [item['id'] for item in items]
+
+    def dish(menu: dict, item: dict) -> dict:
+        item = {'description': '', 'price': '1', 'submenu': 0, **item}
+        item['submenu_id'] = menu['submenu_ids'][item.pop('submenu')]
+        return item
+
+    async def make(
+        title: str,
+        description: str = '',
+        submenus: list[dict] | None = None,
+        dishes: list[dict] | None = None
+    ) -> dict:
+        """
+        submenus и dishes - поля подменю и блюд, пустое описание
+        и цену 1 можно не указывать. submenu - номер подменю блюда
+        в submenus, по умолчанию первое. В меню добавляются
+        submenu_ids и dish_ids созданных подменю и блюд
+        """
+        response = await client.post(
+            'api/v1/menus', json={'title': title, 'description': description}
+        )
+        assert response.status_code == 201, response.text
+        menu = response.json()
+        menus.append(menu)
+        url = f'api/v1/menus/{menu["id"]}'
+        menu['submenu_ids'], menu['dish_ids'] = [], []
+        if submenus:
+            menu['submenu_ids'] = created_ids(await client.post(
+                f'{url}/submenus/bulk',
+                json=[{'description': '', **item} for item in submenus]
+            ))
+        if dishes:
+            menu['dish_ids'] = created_ids(await client.post(
+                f'{url}/dishes/bulk', json=[dish(menu, item) for item in dishes]
+            ))
+        return menu
+
+    yield make
+    for menu in menus:
+        await client.delete(f'api/v1/menus/{menu["id"]}')
+
+
 @pytest.fixture(scope='session')
 async def client() -> AsyncGenerator[AsyncClient, None]:
     async with AsyncClient(app=app, base_url='http://test') as ac:
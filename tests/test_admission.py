@@ -0,0 +1,95 @@
+import asyncio
+
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from starlette.responses import PlainTextResponse
+
+from src.menu_app.admission import AdmissionMiddleware, ConcurrencyLimiter
+
+
+def slow_app(release: asyncio.Event):
+    """Приложение, которое отвечает только после release"""
+    async def app(scope, receive, send):
+        await release.wait()
+        await PlainTextResponse('ok')(scope, receive, send)
+    return app
+
+
+async def test_limiter_queues_and_sheds():
+    limiter = ConcurrencyLimiter('test_queue', 1, queue_size=1)
+    assert await limiter.acquire() is None
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    assert limiter.queued == 1
+    assert await limiter.acquire() == 'queue_full'
+
+    limiter.release()
+    assert await waiting is None
+    assert limiter.in_flight == 1
+    assert limiter.queued == 0
+
+
+async def test_limiter_queue_timeout():
+    limiter = ConcurrencyLimiter('test_timeout', 1, queue_timeout=0.01)
+    await limiter.acquire()
+    assert await limiter.acquire() == 'timeout'
+    assert limiter.queued == 0
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+async def test_limiter_cancelled_waiter_leaves_queue():
+    limiter = ConcurrencyLimiter('test_cancel', 1)
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiting.cancel()
+    await asyncio.gather(waiting, return_exceptions=True)
+    limiter.release()
+    assert limiter.in_flight == limiter.queued == 0
+
+
+def test_adaptive_limit():
+    limiter = ConcurrencyLimiter(
+        'test_adaptive', 20, target_latency=0.1, min_limit=4
+    )
+    for _ in range(20):
+        limiter.observe(0.5)
+    assert limiter.limit == 18
+    for _ in range(200):
+        limiter.observe(0.5)
+    assert limiter.limit == 4
+
+    # Быстрые ответы без нехватки мест ограничение не поднимают
+    for _ in range(4):
+        limiter.observe(0.01)
+    assert limiter.limit == 4
+
+
+async def test_middleware_sheds_with_retry_after():
+    release = asyncio.Event()
+    app = AdmissionMiddleware(
+        slow_app(release), read_limit=1, write_limit=1, queue_size=1
+    )
+    async with AsyncClient(app=app, base_url='http://test') as client:
+        running = [
+            asyncio.create_task(client.get('/api/v1/menus')),
+            asyncio.create_task(client.get('/api/v1/menus')),
+        ]
+        await asyncio.sleep(0.01)
+        shed = await client.get('/api/v1/menus')
+        assert shed.status_code == 503
+        assert shed.headers['retry-after'] == '1'
+
+        # У записей свое ограничение, и метрики не ограничиваются
+        writing = asyncio.create_task(client.post('/api/v1/menus'))
+        exempt = asyncio.create_task(client.get('/metrics'))
+        await asyncio.sleep(0.01)
+        assert not writing.done()
+
+        release.set()
+        responses = await asyncio.gather(*running, writing, exempt)
+    assert [response.status_code for response in responses] == [200] * 4
+    assert REGISTRY.get_sample_value(
+        'admission_shed_total', {'route_class': 'read', 'reason': 'queue_full'}
+    ) >= 1
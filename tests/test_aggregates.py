@@ -0,0 +1,97 @@
+import pytest
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+
+# Тесты работают с модулями, которые импортирует приложение
+from menu_app.repositories import menu_repository, submenu_repository
+from menu_app.services import aggregate_service
+
+prefix = 'api/v1/menus'
+
+
+def refreshes() -> float:
+    return REGISTRY.get_sample_value('aggregates_refresh_seconds_count') or 0
+
+
+@pytest.fixture(autouse=True)
+def matview_mode(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(menu_repository, 'AGGREGATES_MATVIEW', True)
+    monkeypatch.setattr(submenu_repository, 'AGGREGATES_MATVIEW', True)
+    monkeypatch.setattr(aggregate_service, 'AGGREGATES_MATVIEW', True)
+    monkeypatch.setattr(aggregate_service, 'AGGREGATES_REFRESH_DELAY', 0.2)
+
+
+@pytest.fixture
+async def menu(request: pytest.FixtureRequest, make_catalogue) -> dict:
+    # Меню удаляются только после модуля: названия уникальны для теста
+    name = request.node.name
+    menu = await make_catalogue(
+        f'Stats menu {name}',
+        submenus=[{'title': f'Stats submenu {name}'}],
+        dishes=[
+            {'title': f'Stats dish {name}.{index}', 'price': '10'}
+            for index in range(2)
+        ]
+    )
+    menu['submenu_id'] = menu['submenu_ids'][0]
+    return menu
+
+
+async def get_counts(client: AsyncClient, menu: dict) -> tuple[int, int, int]:
+    menus = (await client.get(prefix)).json()
+    menu_obj = next(item for item in menus if item['id'] == menu['id'])
+    submenus = (await client.get(f'{prefix}/{menu["id"]}/submenus')).json()
+    return (
+        menu_obj['submenus_count'],
+        menu_obj['dishes_count'],
+        submenus[0]['dishes_count'],
+    )
+
+
+async def test_writes_are_batched_into_one_refresh(
+    client: AsyncClient,
+    menu: dict
+):
+    refreshes_before = refreshes()
+    await aggregate_service.aggregates.wait()
+    assert refreshes() == refreshes_before + 1
+    assert await get_counts(client, menu) == (1, 2, 2)
+
+
+async def test_lists_are_stale_until_refresh(
+    client: AsyncClient,
+    menu: dict
+):
+    await aggregate_service.aggregates.wait()
+    dish_url = f'{prefix}/{menu["id"]}/submenus/{menu["submenu_id"]}' \
+        f'/dishes/{menu["dish_ids"][0]}'
+    await client.delete(dish_url)
+
+    assert await get_counts(client, menu) == (1, 2, 2)
+    await aggregate_service.aggregates.wait()
+    assert await get_counts(client, menu) == (1, 1, 1)
+
+
+async def test_price_stats_from_views(client: AsyncClient, menu: dict):
+    await aggregate_service.aggregates.wait()
+    expected = {
+        'dishes_count': 2,
+        'min_price': '10.00',
+        'max_price': '10.00',
+        'avg_price': '10.00',
+    }
+    response = await client.get(f'{prefix}/{menu["id"]}/price-stats')
+    assert response.json() == expected
+    response = await client.get(
+        f'{prefix}/{menu["id"]}/submenus/{menu["submenu_id"]}/price-stats'
+    )
+    assert response.json() == expected
+
+
+async def test_refresh_changes_versions(client: AsyncClient, menu: dict):
+    await aggregate_service.aggregates.wait()
+    url = f'{prefix}/{menu["id"]}/submenus'
+    etag = (await client.get(url)).headers['etag']
+    await aggregate_service.aggregates.refresh()
+    response = await client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
@@ -0,0 +1,155 @@
+import pytest
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from src.menu_app.services.audit_service import AuditService, parse_key
+from src.menu_app.services.outbox_service import OutboxService
+from src.menu_app.services.purge_service import PurgeService
+from src.models.models import Dish
+
+DATABASE_URL =\
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+async_session_maker = async_sessionmaker(
+    create_async_engine(DATABASE_URL, poolclass=NullPool)
+)
+
+prefix = 'api/v1/menus'
+
+
+async def write_dish(dish_id: int, **values) -> None:
+    """Запись в базу в обход API и outbox: кеш о ней не узнает"""
+    async with async_session_maker() as session:
+        if values:
+            await session.execute(
+                update(Dish).where(Dish.id == dish_id).values(**values)
+            )
+        else:
+            await session.execute(delete(Dish).where(Dish.id == dish_id))
+        await session.commit()
+
+
+def audit_service(**options) -> AuditService:
+    return AuditService(
+        async_session_maker, rate=10000, confirm_delay=0, **options
+    )
+
+
+@pytest.fixture
+async def catalogue(client: AsyncClient) -> dict[str, str]:
+    """Меню с подменю и двумя блюдами, блюда и списки в кеше"""
+    menu = (await client.post(
+        prefix, json={'title': 'Audit menu', 'description': ''}
+    )).json()
+    menu_url = f'{prefix}/{menu["id"]}'
+    submenu = (await client.post(
+        f'{menu_url}/submenus', json={'title': 'Audit submenu', 'description': ''}
+    )).json()
+    submenu_url = f'{menu_url}/submenus/{submenu["id"]}'
+    dishes = [
+        (await client.post(f'{submenu_url}/dishes', json={
+            'title': f'Audit dish {number}', 'description': '', 'price': '10.5'
+        })).json()
+        for number in range(2)
+    ]
+    # Объект в кеше удаляет из него списки и родителей,
+    # поэтому списки запрашиваются последними
+    for url in (
+        *(f'{submenu_url}/dishes/{dish["id"]}' for dish in dishes),
+        f'{submenu_url}/dishes', f'{menu_url}/submenus', prefix
+    ):
+        assert (await client.get(url)).status_code == 200
+    ids = {
+        'menu': menu['id'], 'submenu': submenu['id'],
+        'dish': dishes[0]['id'], 'other_dish': dishes[1]['id'],
+    }
+    yield ids
+    await client.delete(menu_url)
+    # Названия блюд освобождаются только после очистки, а записи outbox
+    # внешних изменений не должны достаться другим тестам
+    await PurgeService(async_session_maker).purge()
+    await OutboxService(async_session_maker).drain()
+
+
+def test_parse_key():
+    assert parse_key('menu:1') == ('menu', (1,))
+    assert parse_key('menu:1:submenu:2') == ('submenu', (1, 2))
+    assert parse_key('menu:1:submenu:2:dish:3') == ('dish', (1, 2, 3))
+    assert parse_key('menu_list') == ('menu_list', ())
+    assert parse_key('submenu_list:1') == ('submenu_list', (1,))
+    assert parse_key('dish_list:1:2') == ('dish_list', (1, 2))
+    assert parse_key('menu:1:body') is None
+    assert parse_key('menu:1:submenu:2:dish:3:body') is None
+    assert parse_key('search:10:0:soup') is None
+    assert parse_key('all') is None
+
+
+async def test_audit_finds_and_repairs_drift(
+    client: AsyncClient,
+    catalogue: dict[str, str]
+):
+    menu_id, submenu_id, dish_id = \
+        catalogue['menu'], catalogue['submenu'], catalogue['dish']
+    dish_key = f'menu:{menu_id}:submenu:{submenu_id}:dish:{dish_id}'
+    dish_list_key = f'dish_list:{menu_id}:{submenu_id}'
+    report = await audit_service().audit(repair=False)
+    assert dish_key not in report.drifted_keys
+    assert report.families['dish'].checked >= 2
+
+    await write_dish(int(dish_id), title='Audit dish drifted')
+    drift = REGISTRY.get_sample_value(
+        'cache_audit_drift_total', {'family': 'dish', 'kind': 'mismatch'}
+    ) or 0
+    report = await audit_service().audit(repair=False)
+    assert {dish_key, dish_list_key} <= set(report.drifted_keys)
+    # Количество блюд не изменилось
+    assert f'submenu_list:{menu_id}' not in report.drifted_keys
+    assert REGISTRY.get_sample_value(
+        'cache_audit_drift_total', {'family': 'dish', 'kind': 'mismatch'}
+    ) >= drift + 1
+    dish_url = f'{prefix}/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}'
+    assert (await client.get(dish_url)).json()['title'] == 'Audit dish 0'
+
+    report = await audit_service().audit(repair=True)
+    assert report.families['dish'].repaired >= 1
+    assert report.families['dish_list'].repaired >= 1
+    assert (await client.get(dish_url)).json()['title'] == 'Audit dish drifted'
+    report = await audit_service().audit(repair=False)
+    assert dish_key not in report.drifted_keys
+
+
+async def test_audit_reports_deleted_object(
+    client: AsyncClient,
+    catalogue: dict[str, str]
+):
+    menu_id, submenu_id = catalogue['menu'], catalogue['submenu']
+    dish_id = catalogue['other_dish']
+    dish_key = f'menu:{menu_id}:submenu:{submenu_id}:dish:{dish_id}'
+    stale = REGISTRY.get_sample_value(
+        'cache_audit_drift_total', {'family': 'dish', 'kind': 'stale'}
+    ) or 0
+    await write_dish(int(dish_id))
+    report = await audit_service().audit(repair=True)
+    assert dish_key in report.drifted_keys
+    # Количество блюд в списках подменю и меню тоже устарело
+    assert {
+        f'dish_list:{menu_id}:{submenu_id}', f'submenu_list:{menu_id}',
+        'menu_list'
+    } <= set(report.drifted_keys)
+    assert REGISTRY.get_sample_value(
+        'cache_audit_drift_total', {'family': 'dish', 'kind': 'stale'}
+    ) == stale + 1
+    response = await client.get(
+        f'{prefix}/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}'
+    )
+    assert response.status_code == 404
+
+
+async def test_audit_sample(catalogue: dict[str, str]):
+    report = await audit_service(sample=0).audit(repair=False)
+    assert report.keys > 0
+    assert report.families == {}
@@ -0,0 +1,79 @@
+import pytest
+from httpx import AsyncClient
+
+from menu_app.repositories.dish_repository import DishRepository
+from menu_app.repositories.submenu_repository import SubMenuRepository
+from src.config import BATCH_MAX_ITEMS
+from src.menu_app import schemas
+
+prefix = 'api/v1/menus'
+
+
+@pytest.fixture(scope='module', autouse=True)
+async def menu(make_catalogue) -> dict:
+    return await make_catalogue(
+        'Batch menu',
+        submenus=[{'title': f'Batch submenu {i}'} for i in range(2)],
+        dishes=[
+            {'title': f'Batch dish {i}', 'price': '5', 'submenu': i % 2}
+            for i in range(4)
+        ]
+    )
+
+
+async def test_dish_batch(client: AsyncClient, menu: dict):
+    first, second, third, _ = menu['dish_ids']
+    url = f'{prefix}/{menu["id"]}/submenus/{menu["submenu_ids"][0]}/dishes/batch'
+    # второе блюдо относится к другому подменю
+    ids = [third, '0', first, second, third]
+    response = await client.get(url, params={'ids': ids})
+    assert response.status_code == 200
+    result = schemas.DishBatchResult.model_validate(response.json())
+    assert [item.id for item in result.items] == ids
+    assert [item.status for item in result.items] == [
+        'found', 'not_found', 'found', 'not_found', 'found'
+    ]
+    assert result.items[0].dish.title == 'Batch dish 2'
+    assert result.items[1].dish is None
+    assert result.items[2].dish.price == '5.00'
+
+
+async def test_batch_fills_cache(
+    client: AsyncClient,
+    menu: dict,
+    monkeypatch: pytest.MonkeyPatch
+):
+    submenu_ids = menu['submenu_ids']
+    submenus_url = f'{prefix}/{menu["id"]}/submenus/batch'
+    dishes_url = f'{prefix}/{menu["id"]}/submenus/{submenu_ids[1]}/dishes/batch'
+    dish_ids = menu['dish_ids'][1::2]
+    first = (await client.get(submenus_url, params={'ids': submenu_ids})).json()
+    await client.get(dishes_url, params={'ids': dish_ids})
+
+    async def fail(*args, **kwargs):
+        raise AssertionError('cache miss')
+
+    monkeypatch.setattr(SubMenuRepository, 'get_submenus_by_ids', fail)
+    monkeypatch.setattr(DishRepository, 'get_dishes_by_ids', fail)
+    second = (await client.get(submenus_url, params={'ids': submenu_ids})).json()
+    assert second == first
+    assert [item['submenu']['dishes_count'] for item in second['items']] == [2, 2]
+    response = await client.get(dishes_url, params={'ids': dish_ids})
+    assert [item['status'] for item in response.json()['items']] == \
+        ['found', 'found']
+    response = await client.get(
+        f'{prefix}/{menu["id"]}/submenus/{submenu_ids[1]}/dishes/{dish_ids[0]}'
+    )
+    assert response.json()['title'] == 'Batch dish 1'
+
+
+async def test_batch_limits(client: AsyncClient, menu: dict):
+    url = f'{prefix}/{menu["id"]}/submenus/batch'
+    response = await client.get(url)
+    assert response.json() == {'items': []}
+    response = await client.get(
+        url, params={'ids': list(range(BATCH_MAX_ITEMS + 1))}
+    )
+    assert response.status_code == 422
+    response = await client.get(url, params={'ids': 'abc'})
+    assert response.status_code == 422
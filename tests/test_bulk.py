@@ -0,0 +1,173 @@
+import pytest
+from httpx import AsyncClient
+
+prefix = 'api/v1'
+
+
+@pytest.fixture(scope='module')
+async def bulk_menu(client: AsyncClient) -> dict:
+    response = await client.post(
+        f'{prefix}/menus',
+        json={'title': 'Bulk menu', 'description': 'Bulk description'}
+    )
+    menu = response.json()
+    yield menu
+    await client.delete(f'{prefix}/menus/{menu["id"]}')
+
+
+@pytest.fixture(scope='module')
+async def bulk_submenus(client: AsyncClient, bulk_menu: dict) -> list[str]:
+    response = await client.post(
+        f'{prefix}/menus/{bulk_menu["id"]}/submenus/bulk',
+        json=[
+            {'title': 'Bulk submenu 1', 'description': 'Some description'},
+            {'title': 'Bulk submenu 2', 'description': 'Some description'},
+            {'title': 'Bulk submenu 1', 'description': 'Duplicate'},
+        ]
+    )
+    assert response.status_code == 200
+    items = response.json()['items']
+    assert [item['status'] for item in items] == \
+        ['created', 'created', 'conflict']
+    return [items[0]['id'], items[1]['id']]
+
+
+async def test_bulk_create_submenus_in_missing_menu(client: AsyncClient):
+    response = await client.post(
+        f'{prefix}/menus/0/submenus/bulk',
+        json=[{'title': 'Orphan submenu', 'description': ''}]
+    )
+    assert response.status_code == 404
+
+
+async def test_bulk_create_dishes(
+    client: AsyncClient,
+    bulk_menu: dict,
+    bulk_submenus: list[str]
+):
+    first, second = bulk_submenus
+    dishes_url = f'{prefix}/menus/{bulk_menu["id"]}/submenus/{first}/dishes'
+    response = await client.get(dishes_url)
+    assert response.json() == []
+
+    response = await client.post(
+        f'{prefix}/menus/{bulk_menu["id"]}/dishes/bulk',
+        json=[
+            {'title': 'Bulk dish 1', 'description': '', 'price': '1.5',
+             'submenu_id': first},
+            {'title': 'Bulk dish 2', 'description': '', 'price': '2',
+             'submenu_id': second},
+            {'title': 'Bulk dish 3', 'description': '', 'price': '3',
+             'submenu_id': 0},
+            {'title': 'Bulk dish 1', 'description': '', 'price': '4',
+             'submenu_id': second},
+        ]
+    )
+    assert response.status_code == 200
+    items = response.json()['items']
+    assert [item['status'] for item in items] == \
+        ['created', 'created', 'not_found', 'conflict']
+
+    response = await client.get(dishes_url)
+    assert [dish['title'] for dish in response.json()] == ['Bulk dish 1']
+    assert response.json()[0]['price'] == '1.50'
+
+    response = await client.get(f'{prefix}/menus/{bulk_menu["id"]}')
+    assert response.json()['dishes_count'] == 2
+    assert response.json()['submenus_count'] == 2
+
+
+async def test_bulk_create_dishes_existing_title(
+    client: AsyncClient,
+    bulk_menu: dict,
+    bulk_submenus: list[str]
+):
+    response = await client.post(
+        f'{prefix}/menus/{bulk_menu["id"]}/dishes/bulk',
+        json=[{'title': 'Bulk dish 2', 'description': '', 'price': '2',
+               'submenu_id': bulk_submenus[0]}]
+    )
+    assert response.json()['items'][0]['status'] == 'conflict'
+
+
+async def test_bulk_update_dishes(
+    client: AsyncClient,
+    bulk_menu: dict,
+    bulk_submenus: list[str]
+):
+    first = bulk_submenus[0]
+    dishes_url = f'{prefix}/menus/{bulk_menu["id"]}/submenus/{first}/dishes'
+    dish = (await client.get(dishes_url)).json()[0]
+
+    response = await client.patch(
+        f'{prefix}/menus/{bulk_menu["id"]}/dishes/bulk',
+        json=[
+            {'id': dish['id'], 'title': 'Bulk dish 1 updated',
+             'description': 'Updated', 'price': '10'},
+            {'id': 0, 'title': 'Missing', 'description': '', 'price': '1'},
+            {'id': dish['id'], 'title': 'Bulk dish 2',
+             'description': '', 'price': '1'},
+        ]
+    )
+    assert response.status_code == 200
+    assert [item['status'] for item in response.json()['items']] == \
+        ['updated', 'not_found', 'conflict']
+
+    response = await client.get(f'{dishes_url}/{dish["id"]}')
+    assert response.json()['title'] == 'Bulk dish 1 updated'
+    assert response.json()['price'] == '10.00'
+
+
+async def test_bulk_update_submenus(
+    client: AsyncClient,
+    bulk_menu: dict,
+    bulk_submenus: list[str]
+):
+    response = await client.patch(
+        f'{prefix}/menus/{bulk_menu["id"]}/submenus/bulk',
+        json=[
+            {'id': bulk_submenus[0], 'title': 'Bulk submenu 1 updated',
+             'description': 'Updated'},
+            {'id': bulk_submenus[1], 'title': 'Bulk submenu 1 updated',
+             'description': 'Updated'},
+        ]
+    )
+    assert [item['status'] for item in response.json()['items']] == \
+        ['updated', 'conflict']
+
+
+async def test_bulk_delete_dishes(
+    client: AsyncClient,
+    bulk_menu: dict,
+    bulk_submenus: list[str]
+):
+    first = bulk_submenus[0]
+    dishes_url = f'{prefix}/menus/{bulk_menu["id"]}/submenus/{first}/dishes'
+    dish = (await client.get(dishes_url)).json()[0]
+
+    response = await client.request(
+        'DELETE',
+        f'{prefix}/menus/{bulk_menu["id"]}/dishes/bulk',
+        json=[int(dish['id']), 0]
+    )
+    assert [item['status'] for item in response.json()['items']] == \
+        ['deleted', 'not_found']
+    assert (await client.get(dishes_url)).json() == []
+
+
+async def test_bulk_delete_submenus(
+    client: AsyncClient,
+    bulk_menu: dict,
+    bulk_submenus: list[str]
+):
+    response = await client.request(
+        'DELETE',
+        f'{prefix}/menus/{bulk_menu["id"]}/submenus/bulk',
+        json=[int(submenu_id) for submenu_id in bulk_submenus]
+    )
+    assert [item['status'] for item in response.json()['items']] == \
+        ['deleted', 'deleted']
+
+    response = await client.get(f'{prefix}/menus/{bulk_menu["id"]}')
+    assert response.json()['submenus_count'] == 0
+    assert response.json()['dishes_count'] == 0
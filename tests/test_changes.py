@@ -0,0 +1,138 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from src.models.models import Menu
+
+DATABASE_URL =\
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+async_session_maker = async_sessionmaker(
+    create_async_engine(DATABASE_URL, poolclass=NullPool)
+)
+
+prefix = 'api/v1/menus'
+
+
+async def sync(client: AsyncClient, since: str, limit: int = 5000) -> dict:
+    """Собирает все страницы изменений после since"""
+    result = {'menus': [], 'submenus': [], 'dishes': [], 'deleted': []}
+    has_more = True
+    while has_more:
+        page = (await client.get(
+            f'{prefix}/changes', params={'since': since, 'limit': limit}
+        )).json()
+        for name, items in result.items():
+            items.extend(page[name])
+        since, has_more = page['next'], page['has_more']
+    result['next'] = since
+    return result
+
+
+@pytest.fixture
+async def since(client: AsyncClient) -> str:
+    return (await sync(client, '0'))['next']
+
+
+async def test_changes_since_version(client: AsyncClient, since: str):
+    menu = (await client.post(
+        prefix, json={'title': 'Changes menu', 'description': ''}
+    )).json()
+    submenu = (await client.post(
+        f'{prefix}/{menu["id"]}/submenus',
+        json={'title': 'Changes submenu', 'description': ''}
+    )).json()
+    dishes = (await client.post(
+        f'{prefix}/{menu["id"]}/dishes/bulk',
+        json=[
+            {'title': f'Changes dish {i}', 'description': '', 'price': '3',
+             'submenu_id': submenu['id']}
+            for i in range(2)
+        ]
+    )).json()['items']
+    dishes_url = f'{prefix}/{menu["id"]}/submenus/{submenu["id"]}/dishes'
+    await client.patch(f'{dishes_url}/{dishes[0]["id"]}', json={
+        'title': 'Changes dish renamed', 'description': '', 'price': '4'
+    })
+    await client.delete(f'{dishes_url}/{dishes[1]["id"]}')
+
+    changes = await sync(client, since)
+    assert [item['id'] for item in changes['menus']] == [menu['id']]
+    assert changes['submenus'][0]['menu_id'] == menu['id']
+    assert [
+        (item['id'], item['title'], item['price'])
+        for item in changes['dishes']
+    ] == [(dishes[0]['id'], 'Changes dish renamed', '4.00')]
+    assert changes['deleted'] == [{
+        'id': dishes[1]['id'], 'entity': 'dish',
+        'menu_id': menu['id'], 'submenu_id': submenu['id'],
+    }]
+
+    # Удаление меню - одна запись на меню и его подменю, без блюд
+    await client.delete(f'{prefix}/{menu["id"]}')
+    changes = await sync(client, changes['next'])
+    assert changes['menus'] == changes['submenus'] == changes['dishes'] == []
+    assert sorted(item['entity'] for item in changes['deleted']) == \
+        ['menu', 'submenu']
+
+
+async def test_pages_match_single_response(client: AsyncClient, since: str):
+    menu = (await client.post(
+        prefix, json={'title': 'Pages menu', 'description': ''}
+    )).json()
+    submenus = (await client.post(
+        f'{prefix}/{menu["id"]}/submenus/bulk',
+        json=[
+            {'title': f'Pages submenu {i}', 'description': ''}
+            for i in range(3)
+        ]
+    )).json()['items']
+    await client.delete(
+        f'{prefix}/{menu["id"]}/submenus/{submenus[0]["id"]}'
+    )
+    single = await sync(client, since)
+    paged = await sync(client, since, limit=1)
+    assert paged == single
+    assert len(single['submenus']) == 2
+    assert len(single['deleted']) == 1
+    await client.delete(f'{prefix}/{menu["id"]}')
+
+
+async def test_open_transaction_holds_back_later_changes(
+    client: AsyncClient,
+    since: str
+):
+    async with async_session_maker() as session:
+        await session.execute(insert(Menu.__table__).values(
+            title='Changes slow menu', description=''
+        ))
+        # Меню ниже записано позже, но его версия новее незавершенной
+        # транзакции: лента подождет ее, чтобы не пропустить меню выше
+        fast = (await client.post(
+            prefix, json={'title': 'Changes fast menu', 'description': ''}
+        )).json()
+        changes = await sync(client, since)
+        assert changes['menus'] == []
+        await session.commit()
+
+    changes = await sync(client, changes['next'])
+    assert sorted(item['title'] for item in changes['menus']) == \
+        ['Changes fast menu', 'Changes slow menu']
+    for item in changes['menus']:
+        await client.delete(f'{prefix}/{item["id"]}')
+    assert fast['id'] in [item['id'] for item in changes['menus']]
+
+
+async def test_invalid_since(client: AsyncClient, since: str):
+    for value in ('abc', '1:9:1', '1:2', '-1'):
+        response = await client.get(
+            f'{prefix}/changes', params={'since': value}
+        )
+        assert response.status_code == 422
+    response = await client.get(
+        f'{prefix}/changes', params={'since': str(int(since) + 10 ** 9)}
+    )
+    assert response.status_code == 410
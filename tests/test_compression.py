@@ -0,0 +1,79 @@
+import gzip
+
+import pytest
+from httpx import AsyncClient
+
+from src.menu_app.compression import compress, negotiate
+
+prefix = 'api/v1/menus'
+
+
+@pytest.fixture(scope='module', autouse=True)
+async def menu(make_catalogue) -> dict:
+    menu = await make_catalogue('Compression menu', submenus=[
+        {'title': f'Compression submenu {i}', 'description': 'x' * 50}
+        for i in range(30)
+    ])
+    menu['submenus_url'] = f'{prefix}/{menu["id"]}/submenus'
+    return menu
+
+
+def test_negotiate():
+    assert negotiate('') == 'identity'
+    assert negotiate('gzip, deflate') == 'gzip'
+    assert negotiate('gzip;q=0, deflate') == 'identity'
+    assert negotiate('*') in ('br', 'gzip')
+    assert negotiate('identity, *;q=0') == 'identity'
+    assert negotiate('GZIP;q=0.5, unknown') == 'gzip'
+
+
+async def test_cached_list_is_precompressed(client: AsyncClient, menu: dict):
+    url = menu['submenus_url']
+    plain = await client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in plain.headers
+    assert plain.headers['vary'] == 'Accept-Encoding'
+    assert len(plain.json()) == 30
+
+    for _ in range(2):
+        response = await client.get(url, headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['content-encoding'] == 'gzip'
+        assert int(response.headers['content-length']) < len(plain.content)
+        assert response.content == plain.content
+
+
+async def test_precompressed_bodies_are_invalidated(
+    client: AsyncClient,
+    menu: dict
+):
+    url = menu['submenus_url']
+    await client.get(url, headers={'Accept-Encoding': 'gzip'})
+    await client.post(url, json={'title': 'Compression extra', 'description': ''})
+    response = await client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert len(response.json()) == 31
+
+
+async def test_middleware_compresses_large_responses(client: AsyncClient):
+    response = await client.get(
+        '/openapi.json', headers={'Accept-Encoding': 'gzip'}
+    )
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['vary']
+    assert 'paths' in response.json()
+
+
+async def test_small_responses_are_not_compressed(
+    client: AsyncClient,
+    menu: dict
+):
+    response = await client.get(
+        f'{prefix}/{menu["id"]}', headers={'Accept-Encoding': 'gzip'}
+    )
+    assert 'content-encoding' not in response.headers
+    assert response.json()['title'] == 'Compression menu'
+
+
+def test_gzip_is_reproducible():
+    # mtime=0: одинаковые тела дают одинаковый сжатый результат
+    body = b'{"title": "menu"}' * 100
+    assert compress(body, 'gzip') == compress(body, 'gzip')
+    assert gzip.decompress(compress(body, 'gzip', precompress=True)) == body
@@ -0,0 +1,152 @@
+import statistics
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from menu_app.redis_backend import RedisBackend, get_client
+from menu_app.repositories.menu_repository import MenuRepository
+from src.config import REDIS_HOST, REDIS_PORT
+
+prefix = 'api/v1/menus'
+
+
+@pytest.fixture(scope='module', autouse=True)
+async def menu(make_catalogue) -> dict:
+    menu = await make_catalogue(
+        'Conditional menu',
+        submenus=[{'title': 'Conditional submenu'}],
+        dishes=[
+            {'title': f'Conditional dish {i}', 'description': 'x' * 100,
+             'price': '7'}
+            for i in range(20)
+        ]
+    )
+    menu['submenu_url'] = \
+        f'{prefix}/{menu["id"]}/submenus/{menu["submenu_ids"][0]}'
+    menu['dish_id'] = menu['dish_ids'][0]
+    return menu
+
+
+def fail(*args, **kwargs):
+    raise AssertionError('payload fetched')
+
+
+async def measure(client: AsyncClient, url: str, headers: dict, calls: int):
+    """Медиана времени ответа в мс и переданные байты тела"""
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        timings.append((time.perf_counter() - started) * 1e3)
+    return statistics.median(timings), response.num_bytes_downloaded, \
+        response
+
+
+async def test_not_modified_saves_bytes_and_latency(
+    client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+    record_property
+):
+    url = f'{prefix}/all'
+    full_ms, full_size, response = await measure(client, url, {}, 20)
+    assert response.status_code == 200
+    etag = response.headers['etag']
+    assert response.headers['cache-control'] == 'no-cache'
+
+    # 304 отдается без обращения к готовым ответам в Redis и к базе
+    monkeypatch.setattr(RedisBackend, 'get_body', fail)
+    monkeypatch.setattr(MenuRepository, 'get_all_list', fail)
+    cached_ms, cached_size, response = \
+        await measure(client, url, {'If-None-Match': etag}, 20)
+    assert response.status_code == 304
+    assert response.headers['etag'] == etag
+    assert cached_size == 0
+    assert full_size > 0
+    record_property('bytes_saved', full_size - cached_size)
+    record_property('ms_saved', round(full_ms - cached_ms, 3))
+
+
+async def test_etag_per_encoding(client: AsyncClient, menu: dict):
+    url = f'{menu["submenu_url"]}/dishes'
+    identity = await client.get(url, headers={'Accept-Encoding': 'identity'})
+    compressed = await client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['content-encoding'] == 'gzip'
+    assert compressed.headers['etag'] == \
+        identity.headers['etag'][:-1] + '-gzip"'
+
+    # Сжатое и несжатое представления одной версии не устарели
+    for etag in (identity.headers['etag'], compressed.headers['etag']):
+        response = await client.get(url, headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': f'"other", W/{etag}',
+        })
+        assert response.status_code == 304
+        assert response.headers['etag'] == f'W/{etag}'
+
+
+async def test_write_changes_version(client: AsyncClient, menu: dict):
+    other = (await client.post(
+        prefix, json={'title': 'Conditional other', 'description': ''}
+    )).json()
+    urls = [
+        prefix,
+        f'{prefix}/{menu["id"]}',
+        f'{menu["submenu_url"]}/dishes/{menu["dish_id"]}',
+        f'{prefix}/{other["id"]}',
+    ]
+    before = [(await client.get(url)).headers['etag'] for url in urls]
+    await client.patch(
+        f'{menu["submenu_url"]}/dishes/{menu["dish_id"]}',
+        json={'title': 'Conditional renamed', 'description': '', 'price': '8'}
+    )
+    responses = [
+        await client.get(url, headers={'If-None-Match': etag})
+        for url, etag in zip(urls, before)
+    ]
+    assert [response.status_code for response in responses] == \
+        [200, 200, 200, 304]
+    assert responses[2].json()['title'] == 'Conditional renamed'
+    await client.delete(f'{prefix}/{other["id"]}')
+
+
+async def test_lost_versions_change_etag(client: AsyncClient, menu: dict):
+    url = f'{prefix}/{menu["id"]}/submenus'
+    etag = (await client.get(url)).headers['etag']
+    await RedisBackend().flushdb()
+    response = await client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['etag'] != etag
+
+
+async def test_epoch_evicted_between_set_and_get(monkeypatch, menu: dict):
+    """Эпоху создал соседний процесс, но до чтения ее вытеснили"""
+    redis_cli = get_client(f'redis://{REDIS_HOST}:{REDIS_PORT}')
+    await redis_cli.delete('version:epoch')
+    set_epoch, get_epoch = redis_cli.set, redis_cli.get
+    attempts = []
+
+    async def lost_race(name, value, **kwargs):
+        attempts.append(value)
+        if len(attempts) == 1:
+            return None
+        return await set_epoch(name, value, **kwargs)
+
+    async def evicted(name):
+        return None if name == 'version:epoch' else await get_epoch(name)
+
+    monkeypatch.setattr(redis_cli, 'set', lost_race)
+    monkeypatch.setattr(redis_cli, 'get', evicted)
+    version = await RedisBackend().get_version(int(menu['id']))
+    assert version.split('.')[0] == attempts[1].decode()
+
+
+async def test_errors_have_no_etag(client: AsyncClient):
+    response = await client.get(f'{prefix}/0')
+    assert response.status_code == 404
+    assert 'etag' not in response.headers
+    response = await client.get(
+        f'{prefix}/0/submenus', params={'fields': 'secret'}
+    )
+    assert response.status_code == 422
+    assert 'etag' not in response.headers
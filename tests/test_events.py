@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from menu_app.services.event_service import (
+    PING_FRAME,
+    RESET_FRAME,
+    RETRY_FRAME,
+    EventService,
+    events,
+)
+
+prefix = 'api/v1/menus'
+
+
+def parse(frame: bytes) -> tuple[str, dict]:
+    lines = dict(
+        line.split(': ', 1) for line in frame.decode().strip().split('\n')
+    )
+    return lines['id'], json.loads(lines['data'])
+
+
+async def next_frame(stream) -> bytes:
+    while True:
+        frame = await asyncio.wait_for(stream.__anext__(), 5)
+        if frame != PING_FRAME:
+            return frame
+
+
+@pytest.fixture
+async def stream():
+    stream = events.stream()
+    assert await next_frame(stream) == RETRY_FRAME
+    yield stream
+    await stream.aclose()
+
+
+async def test_writes_are_published(client: AsyncClient, stream):
+    menu = (await client.post(
+        prefix, json={'title': 'Events menu', 'description': ''}
+    )).json()
+    _, event = parse(await next_frame(stream))
+    assert event == {
+        'entity': 'menu', 'action': 'created',
+        'menu_id': menu['id'], 'submenu_id': None, 'ids': [menu['id']],
+    }
+    submenu = (await client.post(
+        f'{prefix}/{menu["id"]}/submenus',
+        json={'title': 'Events submenu', 'description': ''}
+    )).json()
+    _, event = parse(await next_frame(stream))
+    assert (event['entity'], event['action']) == ('submenu', 'created')
+    await client.post(
+        f'{prefix}/{menu["id"]}/dishes/bulk',
+        json=[{'title': 'Events dish', 'description': '', 'price': '1',
+               'submenu_id': submenu['id']}]
+    )
+    _, event = parse(await next_frame(stream))
+    assert event['entity'] == 'dish'
+    assert event['submenu_id'] == submenu['id']
+    assert len(event['ids']) == 1
+
+    await client.delete(f'{prefix}/{menu["id"]}')
+    _, event = parse(await next_frame(stream))
+    assert (event['entity'], event['action']) == ('menu', 'deleted')
+
+
+async def test_resume_from_last_event_id(stream):
+    await events.publish('menu', 'updated', 1, [1])
+    first_id, _ = parse(await next_frame(stream))
+    for menu_id in (2, 3):
+        await events.publish('menu', 'updated', menu_id, [menu_id])
+
+    resumed = events.stream(first_id)
+    try:
+        assert await next_frame(resumed) == RETRY_FRAME
+        missed = [parse(await next_frame(resumed))[1] for _ in range(2)]
+        assert [event['menu_id'] for event in missed] == ['2', '3']
+        # Те же события, пришедшие через pub/sub, не повторяются
+        await events.publish('menu', 'updated', 4, [4])
+        assert parse(await next_frame(resumed))[1]['menu_id'] == '4'
+    finally:
+        await resumed.aclose()
+
+
+@pytest.mark.parametrize('last_event_id', ['0-1', 'not-an-id'])
+async def test_reset_when_history_is_lost(last_event_id: str):
+    await events.publish('menu', 'updated', 1, [1])
+    stream = events.stream(last_event_id)
+    try:
+        assert await next_frame(stream) == RETRY_FRAME
+        assert await next_frame(stream) == RESET_FRAME
+    finally:
+        await stream.aclose()
+
+
+async def test_slow_subscriber_is_dropped():
+    service = EventService(queue_size=2)
+    stream = service.stream()
+    try:
+        assert await next_frame(stream) == RETRY_FRAME
+        for menu_id in range(5):
+            await service.publish('menu', 'updated', menu_id, [menu_id])
+        await asyncio.sleep(0.2)
+        frames = [frame async for frame in stream]
+        assert [parse(frame)[1]['menu_id'] for frame in frames] == ['0', '1']
+    finally:
+        await stream.aclose()
@@ -0,0 +1,83 @@
+import csv
+import gzip
+import io
+
+import pytest
+from httpx import AsyncClient
+from openpyxl import load_workbook
+
+from src.menu_app import spreadsheet
+from src.menu_app.spreadsheet import COLUMNS
+
+prefix = 'api/v1'
+
+EXPECTED_ROWS = [
+    ['Export menu', 'Menu', 'Export submenu', 'Sub', 'Export dish', 'Dish',
+     '5.00'],
+    ['Export menu', 'Menu', 'Empty submenu', 'Empty', '', '', ''],
+]
+
+
+@pytest.fixture(scope='module', autouse=True)
+async def export_menu(make_catalogue) -> dict:
+    return await make_catalogue(
+        'Export menu', 'Menu',
+        submenus=[
+            {'title': 'Export submenu', 'description': 'Sub'},
+            {'title': 'Empty submenu', 'description': 'Empty'},
+        ],
+        dishes=[{'title': 'Export dish', 'description': 'Dish', 'price': '5'}]
+    )
+
+
+async def test_export_csv(client: AsyncClient):
+    response = await client.get(f'{prefix}/menus/export')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/csv')
+    assert 'catalogue.csv' in response.headers['content-disposition']
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows == [list(COLUMNS)] + EXPECTED_ROWS
+
+
+async def test_export_csv_gzip(client: AsyncClient):
+    response = await client.get(
+        f'{prefix}/menus/export', params={'gzip': True}
+    )
+    assert response.headers['content-type'] == 'application/gzip'
+    assert 'catalogue.csv.gz' in response.headers['content-disposition']
+    content = gzip.decompress(response.content).decode()
+    assert list(csv.reader(io.StringIO(content)))[1:] == EXPECTED_ROWS
+
+
+async def test_export_xlsx(client: AsyncClient):
+    response = await client.get(
+        f'{prefix}/menus/export', params={'format': 'xlsx'}
+    )
+    assert response.status_code == 200
+    workbook = load_workbook(io.BytesIO(response.content), read_only=True)
+    rows = [
+        ['' if cell is None else cell for cell in row]
+        for row in workbook.active.iter_rows(
+            max_col=len(COLUMNS), values_only=True
+        )
+    ]
+    assert rows == [list(COLUMNS)] + EXPECTED_ROWS
+
+
+async def test_write_xlsx_in_batches(monkeypatch):
+    monkeypatch.setattr(spreadsheet, 'CHUNK_ROWS', 3)
+    monkeypatch.setattr(spreadsheet, 'CHUNK_SIZE', 1024)
+    expected = [[f'Menu {i}', '', '', '', '', '', ''] for i in range(8)]
+
+    async def rows():
+        for row in expected:
+            yield tuple(row)
+
+    chunks = [chunk async for chunk in spreadsheet.write_xlsx(rows())]
+    assert len(chunks) > 1
+    workbook = load_workbook(io.BytesIO(b''.join(chunks)), read_only=True)
+    rows_read = [
+        ['' if cell is None else cell for cell in row]
+        for row in workbook.active.iter_rows(values_only=True)
+    ]
+    assert rows_read == [list(COLUMNS)] + expected
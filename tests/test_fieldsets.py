@@ -0,0 +1,122 @@
+import pytest
+from httpx import AsyncClient
+
+from src.menu_app.repositories.dish_repository import dish_fields_query
+
+prefix = 'api/v1/menus'
+
+
+@pytest.fixture(scope='module', autouse=True)
+async def menu(make_catalogue) -> dict:
+    menu = await make_catalogue(
+        'Fields menu', 'Long text',
+        submenus=[{'title': 'Fields submenu', 'description': 'Long text'}],
+        dishes=[
+            {'title': f'Fields dish {price}', 'description': 'Long text',
+             'price': price}
+            for price in ('10', '25.5')
+        ]
+    )
+    menu['submenu_url'] = \
+        f'{prefix}/{menu["id"]}/submenus/{menu["submenu_ids"][0]}'
+    return menu
+
+
+async def test_dish_list_fields(client: AsyncClient, menu: dict):
+    url = f'{menu["submenu_url"]}/dishes'
+    response = await client.get(url, params={'fields': 'price,id'})
+    assert response.status_code == 200
+    assert response.json() == [
+        {'id': menu['dish_ids'][0], 'price': '10.00'},
+        {'id': menu['dish_ids'][1], 'price': '25.50'},
+    ]
+    # Тот же набор полей в другом порядке - тот же ответ из кеша
+    response = await client.get(url, params={'fields': 'id, price'})
+    assert list(response.json()[0]) == ['id', 'price']
+
+    response = await client.get(
+        url, params={'fields': 'title', 'price_min': '20'}
+    )
+    assert response.json() == [{'title': 'Fields dish 25.5'}]
+
+    full = (await client.get(url)).json()
+    assert full[0]['description'] == 'Long text'
+
+
+async def test_detail_fields(client: AsyncClient, menu: dict):
+    response = await client.get(
+        f'{prefix}/{menu["id"]}',
+        params={'fields': 'id,submenus_count,dishes_count'}
+    )
+    assert response.json() == {
+        'id': menu['id'], 'submenus_count': 1, 'dishes_count': 2
+    }
+    response = await client.get(
+        menu['submenu_url'], params={'fields': 'dishes_count'}
+    )
+    assert response.json() == {'dishes_count': 2}
+    response = await client.get(
+        f'{menu["submenu_url"]}/dishes/{menu["dish_ids"][0]}',
+        params={'fields': 'title,price'}
+    )
+    assert response.json() == {'title': 'Fields dish 10', 'price': '10.00'}
+
+
+async def test_list_fields_match_full_response(
+    client: AsyncClient,
+    menu: dict
+):
+    full = (await client.get(prefix)).json()
+    sparse = (await client.get(
+        prefix, params={'fields': 'id,dishes_count'}
+    )).json()
+    assert sparse == [
+        {'id': item['id'], 'dishes_count': item['dishes_count']}
+        for item in full
+    ]
+    submenus = (await client.get(
+        f'{prefix}/{menu["id"]}/submenus', params={'fields': 'title'}
+    )).json()
+    assert submenus == [{'title': 'Fields submenu'}]
+
+
+async def test_fields_are_invalidated(client: AsyncClient, menu: dict):
+    url = f'{menu["submenu_url"]}/dishes'
+    dish_url = f'{url}/{menu["dish_ids"][0]}'
+    await client.get(url, params={'fields': 'title'})
+    await client.get(dish_url, params={'fields': 'title'})
+    await client.patch(dish_url, json={
+        'title': 'Fields dish renamed', 'description': '', 'price': '10'
+    })
+    titles = (await client.get(url, params={'fields': 'title'})).json()
+    assert {'title': 'Fields dish renamed'} in titles
+    dish = (await client.get(dish_url, params={'fields': 'title'})).json()
+    assert dish == {'title': 'Fields dish renamed'}
+
+
+async def test_invalid_fields(client: AsyncClient, menu: dict):
+    for fields in ('id,secret', '', ' , '):
+        response = await client.get(prefix, params={'fields': fields})
+        assert response.status_code == 422
+    response = await client.get(
+        f'{menu["submenu_url"]}/dishes', params={'fields': 'dishes_count'}
+    )
+    assert response.status_code == 422
+    assert response.json()['detail'] == 'unknown fields: dishes_count'
+
+
+async def test_fields_not_found(client: AsyncClient):
+    response = await client.get(f'{prefix}/0', params={'fields': 'id'})
+    assert response.status_code == 404
+    response = await client.get(
+        f'{prefix}/0/submenus/0/dishes/0', params={'fields': 'id'}
+    )
+    assert response.status_code == 404
+
+
+def test_fields_are_pushed_down_to_select():
+    query = str(dish_fields_query(('id', 'title')))
+    select_list = query.split('FROM')[0]
+    assert 'dish.title' in select_list
+    assert 'dish.description' not in select_list
+    assert 'dish.price' not in select_list
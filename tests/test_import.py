@@ -0,0 +1,128 @@
+import csv
+import io
+
+import pytest
+from httpx import AsyncClient
+
+from src.menu_app import spreadsheet
+from src.menu_app.spreadsheet import COLUMNS
+
+prefix = 'api/v1'
+
+
+def make_csv(rows: list[tuple]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+CATALOGUE = [
+    ('Import menu', 'Menu', 'Import submenu 1', 'Sub', 'Import dish 1', '', '1'),
+    ('Import menu', 'Menu', 'Import submenu 1', 'Sub', 'Import dish 2', '', '2'),
+    ('Import menu', 'Menu', 'Import submenu 2', 'Sub', 'Import dish 3', '', '3'),
+    ('Import menu', 'Menu', 'Import submenu 3', 'Empty', '', '', ''),
+]
+
+
+async def run_import(
+    client: AsyncClient,
+    rows: list[tuple],
+    prune: bool = False
+) -> dict:
+    response = await client.post(
+        f'{prefix}/menus/import',
+        params={'prune': prune},
+        files={'file': ('catalogue.csv', make_csv(rows), 'text/csv')},
+    )
+    assert response.status_code == 202
+    response = await client.get(
+        f'{prefix}/menus/import/{response.json()["id"]}'
+    )
+    job = response.json()
+    assert job['status'] == 'done', job
+    return job['report']
+
+
+@pytest.fixture(scope='module')
+async def imported_menu(client: AsyncClient) -> dict:
+    report = await run_import(client, CATALOGUE)
+    assert report['menus_created'] == 1
+    assert report['submenus_created'] == 3
+    assert report['dishes_created'] == 3
+    menu = (await client.get(f'{prefix}/menus')).json()[0]
+    yield menu
+    await client.delete(f'{prefix}/menus/{menu["id"]}')
+
+
+async def test_import_creates_catalogue(
+    client: AsyncClient,
+    imported_menu: dict
+):
+    assert imported_menu['title'] == 'Import menu'
+    assert imported_menu['submenus_count'] == 3
+    assert imported_menu['dishes_count'] == 3
+
+
+async def test_reimport_without_changes(
+    client: AsyncClient,
+    imported_menu: dict
+):
+    report = await run_import(client, CATALOGUE)
+    assert report['rows'] == 4
+    for key, value in report.items():
+        if key != 'rows':
+            assert not value, key
+
+
+async def test_import_applies_diff(
+    client: AsyncClient,
+    imported_menu: dict
+):
+    submenus = (await client.get(
+        f'{prefix}/menus/{imported_menu["id"]}/submenus'
+    )).json()
+    first = next(s for s in submenus if s['title'] == 'Import submenu 1')
+    dishes_url = \
+        f'{prefix}/menus/{imported_menu["id"]}/submenus/{first["id"]}/dishes'
+    assert len((await client.get(dishes_url)).json()) == 2
+
+    changed = CATALOGUE[:1] + [
+        ('Import menu', 'Menu', 'Import submenu 2', 'Sub',
+         'Import dish 2', '', '2.5'),
+        ('Import menu', 'Menu', 'Import submenu 2', 'Sub',
+         'Import dish 4', '', 'bad price'),
+    ] + CATALOGUE[2:]
+    report = await run_import(client, changed)
+    assert report['dishes_created'] == 0
+    assert report['dishes_updated'] == 1
+    assert report['errors'] == ['row 4: price is invalid']
+
+    dishes = (await client.get(dishes_url)).json()
+    assert [dish['title'] for dish in dishes] == ['Import dish 1']
+
+
+async def test_import_prune(client: AsyncClient, imported_menu: dict):
+    report = await run_import(client, CATALOGUE[:1], prune=True)
+    assert report['dishes_deleted'] == 2
+    assert report['submenus_deleted'] == 2
+    assert report['menus_deleted'] == 0
+
+    menu = (await client.get(f'{prefix}/menus/{imported_menu["id"]}')).json()
+    assert menu['submenus_count'] == 1
+    assert menu['dishes_count'] == 1
+
+
+async def test_import_job_not_found(client: AsyncClient):
+    response = await client.get(f'{prefix}/menus/import/unknown')
+    assert response.status_code == 404
+
+
+async def test_read_rows_in_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(spreadsheet, 'CHUNK_ROWS', 3)
+    path = tmp_path / 'catalogue.csv'
+    path.write_bytes(make_csv(CATALOGUE * 2))
+    rows = [row async for row in spreadsheet.read_rows_in_thread(path)]
+    assert rows == list(spreadsheet.read_rows(path))
+    assert len(rows) == 8
@@ -0,0 +1,50 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+prefix = 'api/v1'
+
+
+@pytest.fixture(scope='module')
+async def lazy_menu(client: AsyncClient) -> dict:
+    response = await client.post(
+        f'{prefix}/menus',
+        json={'title': 'Lazy menu', 'description': 'Lazy description'}
+    )
+    menu = response.json()
+    yield menu
+    await client.delete(f'{prefix}/menus/{menu["id"]}')
+
+
+@pytest.fixture
+def checkouts() -> list:
+    """Соединения, выданные из любого пула во время теста"""
+    checkouts = []
+
+    def on_checkout(*args) -> None:
+        checkouts.append(args)
+    event.listen(Pool, 'checkout', on_checkout)
+    yield checkouts
+    event.remove(Pool, 'checkout', on_checkout)
+
+
+async def test_cache_miss_uses_pool(
+    client: AsyncClient,
+    lazy_menu: dict,
+    checkouts: list
+):
+    response = await client.get(f'{prefix}/menus/{lazy_menu["id"]}')
+    assert response.status_code == 200
+    assert len(checkouts) == 1
+
+
+async def test_cache_hit_does_not_touch_pool(
+    client: AsyncClient,
+    lazy_menu: dict,
+    checkouts: list
+):
+    response = await client.get(f'{prefix}/menus/{lazy_menu["id"]}')
+    assert response.status_code == 200
+    assert response.json()['title'] == 'Lazy menu'
+    assert checkouts == []
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from src.menu_app.redis_backend import RedisBackend
+from src.menu_app.services.listener_service import (
+    APPLICATION_NAME,
+    ListenerService,
+    count_changes,
+)
+from src.menu_app.services.outbox_service import OutboxService
+from src.models.models import Menu
+
+DATABASE_URL =\
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+async_session_maker = async_sessionmaker(
+    create_async_engine(DATABASE_URL, poolclass=NullPool)
+)
+
+prefix = 'api/v1/menus'
+
+
+async def rename_menus(menu_ids: list[int], suffix: str) -> None:
+    """Запись в базу в обход API"""
+    async with async_session_maker() as session:
+        await session.execute(
+            update(Menu).
+            where(Menu.id.in_(menu_ids)).
+            values(title=Menu.title + suffix)
+        )
+        await session.commit()
+
+
+async def wait_for_title(client: AsyncClient, menu_id: int, title: str):
+    for _ in range(100):
+        menu = (await client.get(f'{prefix}/{menu_id}')).json()
+        if menu['title'] == title:
+            return
+        await asyncio.sleep(0.02)
+    pytest.fail(f'cache was not invalidated: {menu["title"]!r}')
+
+
+def metric(name: str) -> float:
+    return REGISTRY.get_sample_value(name) or 0
+
+
+@pytest.fixture
+async def listen():
+    """
+    Запускает слушатель с диспетчером на тестовой базе. Фикстура
+    идет после menus: слушатель останавливается до удаления меню
+    """
+    tasks = []
+
+    async def start(**options) -> None:
+        service = ListenerService(
+            OutboxService(async_session_maker, **options),
+            notify_delay=0.01, retry=0.01
+        )
+        tasks.append(asyncio.create_task(service.run_forever()))
+        for _ in range(100):
+            if metric('cache_listener_connected'):
+                return
+            await asyncio.sleep(0.01)
+
+    yield start
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.fixture
+async def menus(client: AsyncClient) -> list[int]:
+    menu_ids = []
+    for number in range(3):
+        menu = (await client.post(
+            prefix, json={'title': f'Listener menu {number}', 'description': ''}
+        )).json()
+        menu_ids.append(int(menu['id']))
+        await client.get(f'{prefix}/{menu["id"]}')
+    yield menu_ids
+    for menu_id in menu_ids:
+        await client.delete(f'{prefix}/{menu_id}')
+
+
+def test_count_changes():
+    assert count_changes('1') == 1
+    assert count_changes('1,1:2,1:2:3') == 3
+    assert count_changes('*12000') == 12000
+
+
+async def test_notify_invalidates_external_write(
+    client: AsyncClient,
+    menus: list[int],
+    listen
+):
+    await listen()
+    generation = await RedisBackend().load_generation()
+    await rename_menus(menus[:1], ' renamed')
+    await wait_for_title(client, menus[0], 'Listener menu 0 renamed')
+    assert await RedisBackend().load_generation() == generation
+
+
+async def test_overflow_bumps_generation(
+    client: AsyncClient,
+    menus: list[int],
+    listen
+):
+    await listen(overflow=2)
+    generation = await RedisBackend().load_generation()
+    overflows = metric('cache_outbox_overflows_total')
+    await rename_menus(menus, ' overflow')
+    for number, menu_id in enumerate(menus):
+        await wait_for_title(
+            client, menu_id, f'Listener menu {number} overflow'
+        )
+    assert await RedisBackend().load_generation() == generation + 1
+    assert metric('cache_outbox_overflows_total') == overflows + 1
+
+
+async def test_reconnects_after_connection_loss(
+    client: AsyncClient,
+    menus: list[int],
+    listen
+):
+    await listen()
+    reconnects = metric('cache_listener_reconnects_total')
+    async with async_session_maker() as session:
+        await session.execute(text(
+            'SELECT pg_terminate_backend(pid) FROM pg_stat_activity '
+            'WHERE application_name = :name'
+        ), {'name': APPLICATION_NAME})
+    await rename_menus(menus[:1], ' reconnected')
+    await wait_for_title(client, menus[0], 'Listener menu 0 reconnected')
+    assert metric('cache_listener_reconnects_total') == reconnects + 1
@@ -221,7 +221,7 @@ async def test_get_dish_detail(
     assert str(current_dish.id) == response_data['id']
     assert current_dish.title == response_data['title']
     assert current_dish.description == response_data['description']
-    assert current_dish.price == response_data['price']
+    assert str(current_dish.price) == response_data['price']
 
 
 async def test_update_dish(
@@ -243,7 +243,7 @@ async def test_update_dish(
     )
     response_data = response.json()
     assert response.status_code == 200
-    assert str(current_submenu.id) == response_data['id']
+    assert str(current_dish.id) == response_data['id']
     assert data['title'] == response_data['title']
     assert data['description'] == response_data['description']
     assert data['price'] == response_data['price']
@@ -0,0 +1,173 @@
+import asyncio
+
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from redis.exceptions import RedisError
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from menu_app.services.outbox_service import outbox
+from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from src.menu_app.redis_backend import RedisBackend
+from src.menu_app.services import outbox_service
+from src.menu_app.services.outbox_service import OutboxService, coalesce
+from src.models.models import CacheOutbox, Menu
+
+DATABASE_URL =\
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+async_session_maker = async_sessionmaker(
+    create_async_engine(DATABASE_URL, poolclass=NullPool)
+)
+
+prefix = 'api/v1/menus'
+
+
+async def rename_menu(menu_id: int, title: str, commit: bool = True) -> None:
+    """Запись в базу в обход API, как из другого процесса или psql"""
+    async with async_session_maker() as session:
+        await session.execute(
+            update(Menu).where(Menu.id == menu_id).values(title=title)
+        )
+        if commit:
+            await session.commit()
+        else:
+            await session.rollback()
+
+
+async def outbox_rows(menu_id: int) -> int:
+    async with async_session_maker() as session:
+        return (await session.execute(
+            select(func.count()).where(CacheOutbox.menu_id == menu_id)
+        )).scalar()
+
+
+async def create_menu(client: AsyncClient, title: str) -> int:
+    menu = (await client.post(
+        prefix, json={'title': title, 'description': ''}
+    )).json()
+    return int(menu['id'])
+
+
+async def test_drain_invalidates_committed_write(client: AsyncClient):
+    menu_id = await create_menu(client, 'Outbox menu')
+    assert (await client.get(f'{prefix}/{menu_id}')).json()['title'] == \
+        'Outbox menu'
+
+    await rename_menu(menu_id, 'Outbox menu renamed')
+    # Кеш не знает о записи, пока outbox не обработан
+    assert (await client.get(f'{prefix}/{menu_id}')).json()['title'] == \
+        'Outbox menu'
+
+    assert await OutboxService(async_session_maker).drain() >= 1
+    assert (await client.get(f'{prefix}/{menu_id}')).json()['title'] == \
+        'Outbox menu renamed'
+
+
+async def test_rollback_leaves_no_outbox_rows(client: AsyncClient):
+    menu_id = await create_menu(client, 'Rollback menu')
+    before = await outbox_rows(menu_id)
+    await rename_menu(menu_id, 'Rollback menu renamed', commit=False)
+    assert await outbox_rows(menu_id) == before
+
+
+async def test_settle_removes_stale_refill(client: AsyncClient):
+    redis_cli = RedisBackend()
+    menu_id = await create_menu(client, 'Settle menu')
+    await client.get(f'{prefix}/{menu_id}')
+    await client.get(prefix)
+    stale = await redis_cli.get_menu(menu_id)
+
+    await rename_menu(menu_id, 'Settle menu renamed')
+    service = OutboxService(async_session_maker, settle_delay=0)
+    await service.drain()
+    # Запрос, прочитавший базу до изменения, записал кеш после drain
+    await redis_cli.set_menu(stale)
+
+    assert await service.settle() >= 1
+    assert await redis_cli.get_menu(menu_id) is None
+    assert await outbox_rows(menu_id) == 0
+
+
+async def test_backlog_metric(client: AsyncClient):
+    service = OutboxService(async_session_maker)
+    menu_id = await create_menu(client, 'Backlog menu')
+    await service.drain()
+    await rename_menu(menu_id, 'Backlog menu renamed')
+
+    await service.report_backlog()
+    assert REGISTRY.get_sample_value('cache_outbox_backlog') == 1
+    assert REGISTRY.get_sample_value('cache_outbox_lag_seconds') > 0
+
+    await service.drain()
+    await service.report_backlog()
+    assert REGISTRY.get_sample_value('cache_outbox_backlog') == 0
+    assert REGISTRY.get_sample_value('cache_outbox_lag_seconds') == 0
+
+
+async def test_flush_waits_for_concurrent_drain(client: AsyncClient, monkeypatch):
+    service = OutboxService(async_session_maker)
+    menu_id = await create_menu(client, 'Concurrent menu')
+    await service.drain()
+    await client.get(f'{prefix}/{menu_id}')
+    await rename_menu(menu_id, 'Concurrent menu renamed')
+
+    delete_menu = outbox_service.RedisBackend.delete_menu
+    release = asyncio.Event()
+
+    async def slow_delete(self, menu_id: int) -> None:
+        await release.wait()
+        await delete_menu(self, menu_id)
+
+    monkeypatch.setattr(outbox_service.RedisBackend, 'delete_menu', slow_delete)
+    # Другой процесс отметил запись, но еще не удалил меню из кеша
+    other = asyncio.create_task(OutboxService(async_session_maker).drain())
+    await asyncio.sleep(0.2)
+    try:
+        # drain пропускает ее, а flush ждет commit другого процесса
+        assert await service.drain() == 0
+        flush = asyncio.create_task(service.flush())
+        await asyncio.sleep(0.2)
+        assert not flush.done()
+    finally:
+        release.set()
+    assert await other >= 1
+    assert await flush == 0
+    assert (await client.get(f'{prefix}/{menu_id}')).json()['title'] == \
+        'Concurrent menu renamed'
+
+
+async def test_write_survives_failed_invalidation(
+    client: AsyncClient,
+    monkeypatch
+):
+    async def unavailable() -> int:
+        raise RedisError('unavailable')
+
+    monkeypatch.setattr(outbox, 'flush', unavailable)
+    response = await client.post(
+        prefix, json={'title': 'Unflushed menu', 'description': ''}
+    )
+    # Запись подтверждена, ее записи outbox разберет диспетчер
+    assert response.status_code == 201
+    menu_id = int(response.json()['id'])
+    assert await outbox_rows(menu_id) == 1
+    monkeypatch.undo()
+    await client.delete(f'{prefix}/{menu_id}')
+
+
+def test_coalesce_skips_covered_children():
+    touched = coalesce([
+        (1, None, None),
+        (1, 10, None),
+        (1, 10, 100),
+        (2, 20, None),
+        (2, 20, 200),
+        (2, 21, 210),
+        (2, 21, 211),
+        (3, 30, 300),
+    ])
+    assert touched.menus == {1}
+    assert touched.submenus == {2: {20}}
+    assert touched.dishes == {2: {21: {210, 211}}, 3: {30: {300}}}
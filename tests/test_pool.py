@@ -0,0 +1,82 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+from sqlalchemy import select
+
+from src.config import (
+    DB_HOST,
+    DB_MAX_OVERFLOW,
+    DB_NAME,
+    DB_PASS,
+    DB_POOL_SIZE,
+    DB_PORT,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_USER,
+)
+from src.database import create_db_engine, warm_up
+
+DATABASE_URL =\
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+POOL_NAME = f'{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+
+def sample(name: str) -> float:
+    return REGISTRY.get_sample_value(name, {'pool': POOL_NAME}) or 0
+
+
+async def test_pool_settings_from_config():
+    engine = create_db_engine(DATABASE_URL)
+    pool = engine.sync_engine.pool
+    assert pool.size() == DB_POOL_SIZE
+    assert pool._max_overflow == DB_MAX_OVERFLOW
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        assert raw.dbapi_connection._prepared_statement_cache.capacity == \
+            DB_STATEMENT_CACHE_SIZE
+    await engine.dispose()
+
+
+async def test_pool_metrics():
+    engine = create_db_engine(DATABASE_URL)
+    checkouts = sample('db_pool_checkout_seconds_count')
+
+    async with engine.connect():
+        assert sample('db_pool_in_use') == 1
+        assert sample('db_pool_overflow') == 0
+    assert sample('db_pool_in_use') == 0
+    assert sample('db_pool_checkout_seconds_count') == checkouts + 1
+
+    connections = [engine.connect() for _ in range(DB_POOL_SIZE + 1)]
+    await asyncio.gather(*(conn.start() for conn in connections))
+    assert sample('db_pool_in_use') == DB_POOL_SIZE + 1
+    assert sample('db_pool_overflow') == 1
+    for conn in connections:
+        await conn.close()
+    await engine.dispose()
+
+
+async def test_warm_up_fills_pool():
+    engine = create_db_engine(DATABASE_URL)
+    pool = engine.sync_engine.pool
+    await warm_up(engine, DB_POOL_SIZE)
+    assert pool.checkedin() == DB_POOL_SIZE
+    assert pool.checkedout() == 0
+    assert sample('db_pool_in_use') == 0
+    await engine.dispose()
+
+
+async def test_warm_up_ignores_unavailable_database():
+    engine = create_db_engine(DATABASE_URL.replace(f':{DB_PORT}/', ':1/'))
+    await warm_up(engine, 2)
+    assert engine.sync_engine.pool.checkedin() == 0
+    await engine.dispose()
+
+
+async def test_pgbouncer_mode_disables_statement_cache():
+    engine = create_db_engine(DATABASE_URL, pgbouncer=True)
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(1))).scalar() == 1
+        raw = await conn.get_raw_connection()
+        assert raw.dbapi_connection._prepared_statement_cache is None
+        assert raw.driver_connection._stmt_cache.get_max_size() == 0
+    await engine.dispose()
@@ -0,0 +1,72 @@
+import pytest
+from httpx import AsyncClient
+
+prefix = 'api/v1/menus'
+
+
+@pytest.fixture(scope='module', autouse=True)
+async def menu(make_catalogue) -> dict:
+    menu = await make_catalogue(
+        'Price menu',
+        submenus=[{'title': 'Price submenu'}, {'title': 'Empty price submenu'}],
+        dishes=[
+            {'title': f'Price dish {price}', 'price': price}
+            for price in ('10', '20.5', '30.004')
+        ]
+    )
+    submenu_id, empty_submenu_id = menu['submenu_ids']
+    menu['submenu_url'] = f'{prefix}/{menu["id"]}/submenus/{submenu_id}'
+    menu['empty_submenu_url'] = \
+        f'{prefix}/{menu["id"]}/submenus/{empty_submenu_id}'
+    return menu
+
+
+async def test_price_is_a_string_with_two_decimals(
+    client: AsyncClient,
+    menu: dict
+):
+    dishes = (await client.get(f'{menu["submenu_url"]}/dishes')).json()
+    assert sorted(dish['price'] for dish in dishes) == \
+        ['10.00', '20.50', '30.00']
+
+
+async def test_dish_list_price_range(client: AsyncClient, menu: dict):
+    url = f'{menu["submenu_url"]}/dishes'
+    dishes = (await client.get(url, params={'price_min': '15'})).json()
+    assert sorted(dish['price'] for dish in dishes) == ['20.50', '30.00']
+
+    dishes = (await client.get(url, params={
+        'price_min': '10', 'price_max': '20.5'
+    })).json()
+    assert sorted(dish['price'] for dish in dishes) == ['10.00', '20.50']
+
+    response = await client.get(url, params={'price_min': '-1'})
+    assert response.status_code == 422
+
+
+async def test_price_stats(client: AsyncClient, menu: dict):
+    expected = {
+        'dishes_count': 3,
+        'min_price': '10.00',
+        'max_price': '30.00',
+        'avg_price': '20.17',
+    }
+    response = await client.get(f'{prefix}/{menu["id"]}/price-stats')
+    assert response.json() == expected
+    response = await client.get(f'{menu["submenu_url"]}/price-stats')
+    assert response.json() == expected
+
+    response = await client.get(f'{menu["empty_submenu_url"]}/price-stats')
+    assert response.json() == {
+        'dishes_count': 0,
+        'min_price': None,
+        'max_price': None,
+        'avg_price': None,
+    }
+
+
+async def test_price_stats_not_found(client: AsyncClient):
+    response = await client.get(f'{prefix}/0/price-stats')
+    assert response.status_code == 404
+    response = await client.get(f'{prefix}/0/submenus/0/price-stats')
+    assert response.status_code == 404
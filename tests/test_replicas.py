@@ -0,0 +1,126 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from src.database import ReplicaPool, create_session_maker, use_primary
+from src.models.models import Base, Menu
+
+DATABASE_URL =\
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}'
+REPLICA_DB_NAME = f'{DB_NAME}_replica'
+
+MENU_TITLE = 'Replica menu'
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture(scope='module')
+async def primary():
+    engine = create_async_engine(f'{DATABASE_URL}/{DB_NAME}')
+    async with engine.begin() as conn:
+        await conn.execute(
+            Menu.__table__.insert().values(title=MENU_TITLE, description='')
+        )
+    yield engine
+    async with engine.begin() as conn:
+        await conn.execute(delete(Menu).where(Menu.title == MENU_TITLE))
+    await engine.dispose()
+
+
+@pytest.fixture(scope='module')
+async def replica_url():
+    """Вторая база с той же схемой, но без данных: реплика, которая отстает"""
+    admin = create_async_engine(
+        f'{DATABASE_URL}/{DB_NAME}', isolation_level='AUTOCOMMIT'
+    )
+    async with admin.connect() as conn:
+        await conn.execute(text(f'DROP DATABASE IF EXISTS {REPLICA_DB_NAME}'))
+        await conn.execute(text(f'CREATE DATABASE {REPLICA_DB_NAME}'))
+    url = f'{DATABASE_URL}/{REPLICA_DB_NAME}'
+    replica = create_async_engine(url)
+    async with replica.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await replica.dispose()
+    yield url
+    async with admin.connect() as conn:
+        await conn.execute(
+            text(f'DROP DATABASE IF EXISTS {REPLICA_DB_NAME} WITH (FORCE)')
+        )
+    await admin.dispose()
+
+
+@pytest.fixture
+async def make_session(primary, replica_url):
+    pools = []
+
+    def make(url: str = replica_url, max_lag: float = 5):
+        pool = ReplicaPool([url], max_lag)
+        pools.append(pool)
+        return pool, create_session_maker(primary, pool)
+    yield make
+    for pool in pools:
+        for engine in pool.engines:
+            await engine.dispose()
+
+
+async def get_menu_titles(session) -> list[str]:
+    result = await session.execute(
+        select(Menu.title).where(Menu.title == MENU_TITLE)
+    )
+    return result.scalars().all()
+
+
+async def test_reads_go_to_replica(make_session):
+    _, session_maker = make_session()
+    reads = sample('db_route_total', target='replica', reason='read')
+    async with session_maker() as session:
+        assert await get_menu_titles(session) == []
+    assert sample('db_route_total', target='replica', reason='read') == \
+        reads + 1
+
+
+async def test_reads_after_write_stay_on_primary(make_session):
+    _, session_maker = make_session()
+    async with session_maker() as session:
+        assert await get_menu_titles(session) == []
+        await session.execute(
+            update(Menu).where(Menu.title == MENU_TITLE).values(description='')
+        )
+        assert await get_menu_titles(session) == [MENU_TITLE]
+        await session.commit()
+        assert await get_menu_titles(session) == [MENU_TITLE]
+
+
+async def test_use_primary(make_session):
+    _, session_maker = make_session()
+    async with session_maker() as session:
+        use_primary(session)
+        assert await get_menu_titles(session) == [MENU_TITLE]
+
+
+async def test_lagging_replica_falls_back_to_primary(make_session, replica_url):
+    replicas, session_maker = make_session(max_lag=-1)
+    await replicas.check_lag()
+    name = replica_url.split('@')[1]
+    assert sample('db_replica_lag_seconds', replica=name) == 0
+
+    fallbacks = sample('db_replica_fallback_total', reason='lag')
+    async with session_maker() as session:
+        assert await get_menu_titles(session) == [MENU_TITLE]
+    assert sample('db_replica_fallback_total', reason='lag') == fallbacks + 1
+
+
+async def test_unavailable_replica_falls_back_to_primary(make_session):
+    replicas, session_maker = make_session(
+        f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:1/{DB_NAME}'
+    )
+    await replicas.check_lag()
+    fallbacks = sample('db_replica_fallback_total', reason='unavailable')
+    async with session_maker() as session:
+        assert await get_menu_titles(session) == [MENU_TITLE]
+    assert sample('db_replica_fallback_total', reason='unavailable') == \
+        fallbacks + 1
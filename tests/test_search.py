@@ -0,0 +1,80 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+prefix = 'api/v1'
+
+
+@pytest.fixture(scope='module', autouse=True)
+async def search_menu(make_catalogue) -> dict:
+    return await make_catalogue(
+        'Завтраки', 'Утреннее меню',
+        submenus=[{'title': 'Каши', 'description': 'На молоке'}],
+        dishes=[
+            {'title': 'Овсяная каша', 'description': 'С ягодами',
+             'price': '150'},
+            {'title': 'Гречневая каша', 'description': 'С маслом',
+             'price': '120'},
+            {'title': 'Сырники', 'description': 'Со сметаной и овсяными '
+             'хлопьями', 'price': '200'},
+        ]
+    )
+
+
+async def search(client: AsyncClient, **params) -> dict:
+    response = await client.get(f'{prefix}/menus/search', params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_search_ranks_title_before_description(client: AsyncClient):
+    result = await search(client, q='овсяная')
+    titles = [hit['title'] for hit in result['items']]
+    assert titles == ['Овсяная каша', 'Сырники']
+    hit = result['items'][0]
+    assert hit['type'] == 'dish'
+    assert hit['price'] == '150.00'
+    assert hit['menu_title'] == 'Завтраки'
+    assert hit['submenu_title'] == 'Каши'
+
+
+async def test_search_tolerates_typos(client: AsyncClient):
+    result = await search(client, q='гречневую')
+    assert [hit['title'] for hit in result['items']] == ['Гречневая каша']
+
+
+async def test_search_returns_parents(client: AsyncClient):
+    result = await search(client, q='Каши')
+    submenu = next(h for h in result['items'] if h['type'] == 'submenu')
+    assert submenu['title'] == 'Каши'
+    assert submenu['submenu_id'] == submenu['id']
+    assert submenu['menu_title'] == 'Завтраки'
+
+
+async def test_search_pagination(client: AsyncClient):
+    first = await search(client, q='каша', limit=1)
+    second = await search(client, q='каша', limit=1, offset=1)
+    assert first['has_more'] is True
+    assert first['items'][0]['id'] != second['items'][0]['id']
+
+
+async def test_search_result_is_cached(client: AsyncClient):
+    await search(client, q='сырники')
+    checkouts = []
+
+    def on_checkout(*args) -> None:
+        checkouts.append(args)
+    event.listen(Pool, 'checkout', on_checkout)
+    try:
+        result = await search(client, q='  Сырники ')
+    finally:
+        event.remove(Pool, 'checkout', on_checkout)
+    assert result['query'] == 'сырники'
+    assert [hit['title'] for hit in result['items']] == ['Сырники']
+    assert checkouts == []
+
+
+async def test_search_validates_query(client: AsyncClient):
+    response = await client.get(f'{prefix}/menus/search', params={'q': 'a'})
+    assert response.status_code == 422
@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+from httpx import AsyncClient
+
+from src.menu_app import schemas, serializers
+from src.models.models import Dish, Menu, SubMenu
+
+
+def make_menu() -> Menu:
+    menu_obj = Menu(id=1, title='Menu', description='Menu description')
+    submenu_obj = SubMenu(id=2, title='Submenu', description='')
+    submenu_obj.dishes = [
+        Dish(id=3, title='Dish', description='', price=Decimal('150.00')),
+        Dish(id=4, title='New dish', description='', price='9.50'),
+    ]
+    menu_obj.submenus = [submenu_obj]
+    menu_obj.submenus_count = 1
+    menu_obj.dishes_count = 2
+    return menu_obj
+
+
+def test_serializers_match_schemas():
+    menu_obj = make_menu()
+    submenu_obj = menu_obj.submenus[0]
+    cases = [
+        (serializers.menu, schemas.MenuGet, menu_obj),
+        (serializers.submenu, schemas.SubMenuGet, submenu_obj),
+        (
+            serializers.menu_with_submenus,
+            schemas.MenuWithNestedSubMenus,
+            menu_obj
+        ),
+    ] + [
+        (serializers.dish, schemas.DishGet, dish_obj)
+        for dish_obj in submenu_obj.dishes
+    ]
+    for serializer, schema, obj in cases:
+        expected = schema.model_validate(obj, from_attributes=True).\
+            model_dump(mode='json')
+        assert serializer(obj) == expected
+
+
+async def test_openapi_keeps_response_models(client: AsyncClient):
+    paths = (await client.get('/openapi.json')).json()['paths']
+    response = paths['/api/v1/menus']['get']['responses']['200']
+    schema = response['content']['application/json']['schema']
+    assert schema['items']['$ref'] == '#/components/schemas/MenuGet'
+    dish_path = '/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}'
+    response = paths[dish_path]['get']['responses']['200']
+    schema = response['content']['application/json']['schema']
+    assert schema['$ref'] == '#/components/schemas/DishGet'
@@ -0,0 +1,151 @@
+import pytest
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from src.menu_app.services.purge_service import PurgeService
+from src.models.models import Dish, Menu, SubMenu
+
+DATABASE_URL =\
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+async_session_maker = async_sessionmaker(
+    create_async_engine(DATABASE_URL, poolclass=NullPool)
+)
+
+prefix = 'api/v1/menus'
+
+
+async def count_rows(model) -> int:
+    async with async_session_maker() as session:
+        return await session.scalar(select(func.count(model.id)))
+
+
+@pytest.fixture
+async def menu(client: AsyncClient) -> dict:
+    menu = (await client.post(
+        prefix, json={'title': 'Soft menu', 'description': ''}
+    )).json()
+    submenu = (await client.post(
+        f'{prefix}/{menu["id"]}/submenus',
+        json={'title': 'Soft submenu', 'description': ''}
+    )).json()
+    await client.post(
+        f'{prefix}/{menu["id"]}/dishes/bulk',
+        json=[
+            {'title': f'Soft dish {index}', 'description': '',
+             'price': '10', 'submenu_id': submenu['id']}
+            for index in range(5)
+        ]
+    )
+    menu['submenu_id'] = submenu['id']
+    yield menu
+    await client.delete(f'{prefix}/{menu["id"]}')
+    await PurgeService(async_session_maker).purge()
+
+
+async def test_deleted_menu_is_hidden(client: AsyncClient, menu: dict):
+    url = f'{prefix}/{menu["id"]}'
+    submenu_url = f'{url}/submenus/{menu["submenu_id"]}'
+    assert (await client.delete(url)).status_code == 200
+
+    assert (await client.get(url)).status_code == 404
+    assert (await client.get(submenu_url)).status_code == 404
+    assert (await client.get(f'{submenu_url}/dishes')).json() == []
+    assert menu['id'] not in [m['id'] for m in (await client.get(prefix)).json()]
+    assert (await client.get(f'{prefix}/search', params={
+        'q': 'soft dish'
+    })).json()['items'] == []
+    assert (await client.delete(url)).status_code == 404
+
+    # Строки остаются в базе до фоновой очистки
+    assert await count_rows(Dish) >= 5
+
+
+async def test_deleted_title_can_be_reused(client: AsyncClient, menu: dict):
+    await client.delete(f'{prefix}/{menu["id"]}')
+    response = await client.post(
+        prefix, json={'title': 'Soft menu', 'description': ''}
+    )
+    assert response.status_code == 201
+    new_menu_url = f'{prefix}/{response.json()["id"]}'
+    response = await client.post(
+        f'{new_menu_url}/submenus',
+        json={'title': 'Soft submenu', 'description': ''}
+    )
+    assert response.status_code == 201
+    await client.delete(new_menu_url)
+
+
+async def test_deleted_dish_title_can_be_reused(
+    client: AsyncClient,
+    menu: dict
+):
+    await client.delete(f'{prefix}/{menu["id"]}')
+    new_menu = (await client.post(
+        prefix, json={'title': 'Soft menu', 'description': ''}
+    )).json()
+    new_menu_url = f'{prefix}/{new_menu["id"]}'
+    submenu = (await client.post(
+        f'{new_menu_url}/submenus',
+        json={'title': 'Soft submenu', 'description': ''}
+    )).json()
+    dishes_url = f'{new_menu_url}/submenus/{submenu["id"]}/dishes'
+
+    response = await client.post(dishes_url, json={
+        'title': 'Soft dish 0', 'description': '', 'price': '10'
+    })
+    assert response.status_code == 201
+    dish_url = f'{dishes_url}/{response.json()["id"]}'
+    response = await client.post(f'{new_menu_url}/dishes/bulk', json=[
+        {'title': f'Soft dish {index}', 'description': '',
+         'price': '10', 'submenu_id': submenu['id']}
+        for index in (1, 2)
+    ])
+    assert [item['status'] for item in response.json()['items']] == \
+        ['created', 'created']
+    response = await client.patch(
+        dish_url,
+        json={'title': 'Soft dish 3', 'description': '', 'price': '10'}
+    )
+    assert response.status_code == 200
+    assert sorted(dish['title'] for dish in (
+        await client.get(dishes_url)
+    ).json()) == ['Soft dish 1', 'Soft dish 2', 'Soft dish 3']
+    await client.delete(new_menu_url)
+
+async def test_deleted_submenu_is_hidden(client: AsyncClient, menu: dict):
+    url = f'{prefix}/{menu["id"]}'
+    submenu_url = f'{url}/submenus/{menu["submenu_id"]}'
+    assert (await client.delete(submenu_url)).status_code == 200
+
+    assert (await client.get(submenu_url)).status_code == 404
+    menu_obj = (await client.get(url)).json()
+    assert menu_obj['submenus_count'] == 0
+    assert menu_obj['dishes_count'] == 0
+
+
+async def test_purge_removes_subtree_in_batches(
+    client: AsyncClient,
+    menu: dict
+):
+    dishes = await count_rows(Dish)
+    submenus = await count_rows(SubMenu)
+    menus = await count_rows(Menu)
+    purged_dishes = REGISTRY.get_sample_value(
+        'purge_rows_total', {'table': 'dish'}
+    ) or 0
+
+    await client.delete(f'{prefix}/{menu["id"]}')
+    assert await PurgeService(async_session_maker, batch_size=2).purge() == 7
+
+    assert await count_rows(Dish) == dishes - 5
+    assert await count_rows(SubMenu) == submenus - 1
+    assert await count_rows(Menu) == menus - 1
+    assert REGISTRY.get_sample_value(
+        'purge_rows_total', {'table': 'dish'}
+    ) == purged_dishes + 5
+    assert REGISTRY.get_sample_value('purge_lag_seconds') == 0
@@ -0,0 +1,96 @@
+import time
+
+import orjson
+from httpx import AsyncClient
+from sqlalchemy import text
+
+from menu_app import timing
+from menu_app.redis_backend import get_client
+from src.config import REDIS_HOST, REDIS_PORT
+from src.main import app
+from tests.conftest import engine_test
+
+prefix = 'api/v1/menus'
+
+
+def parse(header: str) -> dict[str, str]:
+    """Метрики Server-Timing: имя -> параметры"""
+    metrics = {}
+    for metric in header.split(', '):
+        name, _, params = metric.partition(';')
+        metrics[name] = params
+    return metrics
+
+
+def test_header_format():
+    request_timing = timing.RequestTiming()
+    request_timing.add('db', 0.002)
+    request_timing.add('db', 0.001)
+    request_timing.add('compress', 0.0005)
+    metrics = parse(request_timing.header())
+
+    assert metrics['db'] == 'dur=3.0;desc="2"'
+    assert metrics['redis'] == 'dur=0.0;desc="0"'
+    assert metrics['compress'] == 'dur=0.5'
+    assert 'queue' not in metrics
+    assert {'app', 'total'} <= metrics.keys()
+
+
+def test_measure_without_sample():
+    with timing.measure('db'):
+        pass
+    assert timing.current.get() is None
+
+    request_timing = timing.RequestTiming()
+    token = timing.current.set(request_timing)
+    try:
+        with timing.measure('serialize'):
+            time.sleep(0.001)
+    finally:
+        timing.current.reset(token)
+    assert request_timing.durations['serialize'] >= 0.001
+
+
+async def test_redis_and_sql_hooks():
+    request_timing = timing.RequestTiming()
+    token = timing.current.set(request_timing)
+    try:
+        client = get_client(f'redis://{REDIS_HOST}:{REDIS_PORT}')
+        await client.get('server_timing')
+        async with client.pipeline() as pipe:
+            await pipe.get('server_timing').get('server_timing').execute()
+        async with engine_test.connect() as connection:
+            await connection.execute(text('SELECT 1'))
+    finally:
+        timing.current.reset(token)
+    assert request_timing.counts == {'db': 1, 'redis': 2}
+    assert request_timing.durations['db'] > 0
+
+
+async def test_sampled_request(monkeypatch, make_catalogue):
+    menu = await make_catalogue('Timing menu')
+    lines = []
+    monkeypatch.setattr(timing.logger, 'info', lines.append)
+    async with AsyncClient(
+        app=timing.TimingMiddleware(app, sample=1),
+        base_url='http://test'
+    ) as ac:
+        response = await ac.get(f'{prefix}/{menu["id"]}')
+    assert response.status_code == 200
+
+    metrics = parse(response.headers['server-timing'])
+    assert {'db', 'redis', 'fastapi', 'app', 'total'} <= metrics.keys()
+    assert int(metrics['redis'].split('desc="')[1][:-1]) >= 1
+
+    entry = orjson.loads(lines[0])
+    assert entry['route'] == '/api/v1/menus/{menu_id}'
+    assert entry['status'] == 200
+    assert entry['total_ms'] >= entry['db_ms'] + entry['redis_ms']
+
+
+async def test_not_sampled(monkeypatch, client):
+    lines = []
+    monkeypatch.setattr(timing.logger, 'info', lines.append)
+    response = await client.get(prefix)
+    assert 'server-timing' not in response.headers
+    assert lines == []